@@ -15,33 +15,89 @@
 # limitations under the License.
 
 import argparse
+import io
 import os
 import sys
-from typing import List
-
-from fontTools.ttLib import TTFont  # type: ignore
+from typing import TYPE_CHECKING, Dict, Iterable, Iterator, List, Optional, TextIO, Tuple
 
 from . import __version__
-from .datastructures import Panose
+from .cache import (
+    DEFAULT_CACHE_MAX_AGE_DAYS,
+    DEFAULT_CACHE_MAX_ENTRIES,
+    DEFAULT_CACHE_PATH,
+)
+from .datastructures import PANOSE_FIELDS, Panose, override_panose
+from .discovery import (
+    FONT_EXTENSIONS,
+    parse_extensions,
+    path_is_discoverable,
+)
+from .timing import NULL_TIMER, Span, Timer, summarize_spans, write_chrome_trace
 
+if TYPE_CHECKING:
+    from .edit import EditResult, FontEditItem
+    from .rules import RuleMatcher
 
-def main() -> None:  # pragma: no cover
-    run(sys.argv[1:])
+CACHE_ENVIRONMENT_VARIABLE = "PANOSIFIER_CACHE"
+# the edit module ENGINES and STREAM_PATH.  The edit pipeline modules are
+# imported after the command line arguments are parsed so that commands that
+# do not edit fonts (e.g., --help and --version) are run without the import
+# time.
+ENGINES = ("fast", "fonttools")
+STREAM_PATH = "-"
+# define to run commands in the current process when a server is running
+NO_SERVER_ENVIRONMENT_VARIABLE = "PANOSIFIER_NO_SERVER"
+# options that are handled in the current process without a server
+LOCAL_OPTIONS = ("-h", "--help", "-v", "--version")
 
 
-def validate_args_exclusive(args: argparse.Namespace) -> None:
-    if args.panose and (
-        args.familytype
-        or args.serifstyle
-        or args.weight
-        or args.proportion
-        or args.contrast
-        or args.strokevar
-        or args.armstyle
-        or args.letterform
-        or args.midline
-        or args.xheight
+def main() -> None:
+    argv = sys.argv[1:]
+    # forward commands to a running server.  The server does not have access
+    # to the standard streams of the command.  The server module is imported
+    # only when the server socket file exists.
+    if (
+        argv[:1] != ["serve"]
+        and STREAM_PATH not in argv
+        and not any(arg in LOCAL_OPTIONS for arg in argv)
+        and not os.environ.get(NO_SERVER_ENVIRONMENT_VARIABLE)
     ):
+        from .socketpath import get_default_socket_path
+
+        socket_path = get_default_socket_path()
+        if os.path.exists(socket_path):
+            from .server import forward_run
+
+            exit_code = forward_run(argv, socket_path)
+            if exit_code is not None:
+                sys.exit(exit_code)
+    run(argv)
+
+
+def jobs_count(value: str) -> int:
+    if value == "auto":
+        return os.cpu_count() or 1
+    try:
+        jobs = int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid jobs value: '{value}'")
+    if jobs < 1:
+        raise argparse.ArgumentTypeError(f"jobs value must be 1 or more: '{value}'")
+    return jobs
+
+
+def face_indexes(value: str) -> Tuple[int, ...]:
+    try:
+        indexes = tuple(int(index) for index in value.split(","))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid face index list: '{value}'")
+    if any(index < 0 for index in indexes):
+        raise argparse.ArgumentTypeError(f"face indexes must be 0 or more: '{value}'")
+    return indexes
+
+
+def validate_args_exclusive(args: argparse.Namespace) -> None:
+    if args.panose and any(getattr(args, field) is not None for field in PANOSE_FIELDS):
         sys.stderr.write(
             f"[ERROR] the '--panose' option cannot be used with other panose definition "
             f"options{os.linesep}"
@@ -50,17 +106,12 @@ def validate_args_exclusive(args: argparse.Namespace) -> None:
 
 
 def validate_args_at_least_one_definition(args: argparse.Namespace) -> None:
-    if not args.panose and not (
-        args.familytype
-        or args.serifstyle
-        or args.weight
-        or args.proportion
-        or args.contrast
-        or args.strokevar
-        or args.armstyle
-        or args.letterform
-        or args.midline
-        or args.xheight
+    # panose values are inferred from the fonts with the --infer option, or
+    # defined by the --rules file rules
+    if getattr(args, "infer", False) or getattr(args, "rules", None):
+        return
+    if not args.panose and not any(
+        getattr(args, field) is not None for field in PANOSE_FIELDS
     ):
         sys.stderr.write(
             f"[ERROR] include at least one panose definition in your command "
@@ -69,16 +120,360 @@ def validate_args_at_least_one_definition(args: argparse.Namespace) -> None:
         sys.exit(1)
 
 
+def validate_args_infer(args: argparse.Namespace) -> None:
+    if args.infer and (args.panose or args.manifest):
+        sys.stderr.write(
+            f"[ERROR] the '--infer' option cannot be used with the '--panose' or "
+            f"'--manifest' options{os.linesep}"
+        )
+        sys.exit(1)
+
+
+def validate_args_rules(args: argparse.Namespace) -> None:
+    if args.rules and (args.panose or args.manifest or args.infer):
+        sys.stderr.write(
+            f"[ERROR] the '--rules' option cannot be used with the '--panose', "
+            f"'--manifest', or '--infer' options{os.linesep}"
+        )
+        sys.exit(1)
+
+
+def read_rules_matcher(rules_path: str) -> "RuleMatcher":
+    from .rules import RuleMatcher, read_rules
+
+    try:
+        return RuleMatcher(read_rules(rules_path))
+    except (OSError, ValueError) as e:
+        sys.stderr.write(f"[ERROR] {str(e)}{os.linesep}")
+        sys.exit(1)
+
+
 def validate_args_filepaths_exist(args: argparse.Namespace) -> None:
+    # directories and glob patterns are expanded during the edits
     for fontpath in args.PATH:
-        if not os.path.isfile(fontpath):
+        if fontpath != STREAM_PATH and not path_is_discoverable(fontpath):
+            sys.stderr.write(
+                f"[ERROR] '{fontpath}' does not appear to be a valid file or "
+                f"directory{os.linesep}"
+            )
+            sys.exit(1)
+
+
+def validate_args_at_least_one_path(args: argparse.Namespace) -> None:
+    if not args.PATH:
+        sys.stderr.write(
+            f"[ERROR] include at least one font path in your command{os.linesep}"
+        )
+        sys.exit(1)
+
+
+def validate_args_manifest(args: argparse.Namespace) -> None:
+    if (
+        args.PATH
+        or args.panose
+        or any(getattr(args, field) is not None for field in PANOSE_FIELDS)
+    ):
+        sys.stderr.write(
+            f"[ERROR] the '--manifest' option cannot be used with font path arguments "
+            f"or panose definition options{os.linesep}"
+        )
+        sys.exit(1)
+
+
+def validate_args_output_dir(args: argparse.Namespace) -> None:
+    if args.output_dir is not None and not os.path.isdir(args.output_dir):
+        sys.stderr.write(
+            f"[ERROR] '{args.output_dir}' does not appear to be a valid "
+            f"directory{os.linesep}"
+        )
+        sys.exit(1)
+
+
+def validate_args_resume(args: argparse.Namespace) -> None:
+    if args.resume and args.journal is None:
+        sys.stderr.write(
+            f"[ERROR] the '--resume' option requires the '--journal' option{os.linesep}"
+        )
+        sys.exit(1)
+
+
+def validate_args_stream(args: argparse.Namespace) -> None:
+    if STREAM_PATH not in args.PATH:
+        return
+    if len(args.PATH) > 1:
+        sys.stderr.write(
+            f"[ERROR] the '{STREAM_PATH}' path cannot be used with other font "
+            f"paths{os.linesep}"
+        )
+        sys.exit(1)
+    if args.output_dir is not None or args.journal is not None:
+        sys.stderr.write(
+            f"[ERROR] the '{STREAM_PATH}' path cannot be used with the "
+            f"'--output-dir' or '--journal' options{os.linesep}"
+        )
+        sys.exit(1)
+
+
+def iter_unique_output_edits(
+    edits: Iterable["FontEditItem"],
+) -> Iterator["FontEditItem"]:
+    """Yields edits and raises ValueError before a font that would overwrite an
+    earlier font with the same file name in the output directory."""
+    from .edit import EditResult
+
+    fontpaths: Dict[str, str] = {}
+    for item in edits:
+        if isinstance(item, EditResult):
+            yield item
+            continue
+        fontpath = item[0]
+        basename = os.path.basename(fontpath)
+        if basename in fontpaths:
+            raise ValueError(
+                f"'{fontpath}' and '{fontpaths[basename]}' have the same output "
+                f"directory path"
+            )
+        fontpaths[basename] = fontpath
+        yield item
+
+
+def get_panose_from_args(args: argparse.Namespace) -> Panose:
+    # define with comma-delimited panose definition string
+    if args.panose:
+        try:
+            panose = Panose.from_comma_delim_string(args.panose)
+        except ValueError as e:
+            sys.stderr.write(f"[ERROR] {str(e)}{os.linesep}")
+            sys.exit(1)
+    # or define with individual panose definition arguments
+    else:
+        try:
+            panose = Panose(
+                familytype=args.familytype,
+                serifstyle=args.serifstyle,
+                weight=args.weight,
+                proportion=args.proportion,
+                contrast=args.contrast,
+                strokevar=args.strokevar,
+                armstyle=args.armstyle,
+                letterform=args.letterform,
+                midline=args.midline,
+                xheight=args.xheight,
+            )
+        except ValueError as e:
+            sys.stderr.write(f"[ERROR] {str(e)}{os.linesep}")
+            sys.exit(1)
+    return panose
+
+
+def print_panose_report(
+    fontpath: str,
+    panose_bytes: bytes,
+    face_index: Optional[int] = None,
+    shared_with: Tuple[int, ...] = (),
+    file: Optional[TextIO] = None,
+) -> None:
+    # written to the standard output stream when file is None
+    if face_index is None:
+        print(f"{fontpath} panose:", file=file)
+    else:
+        print(f"{fontpath} face {face_index} panose:", file=file)
+    space = " " * 3
+    print(f"{space}FamilyType: {panose_bytes[0]}", file=file)
+    print(f"{space}SerifStyle: {panose_bytes[1]}", file=file)
+    print(f"{space}Weight: {panose_bytes[2]}", file=file)
+    print(f"{space}Proportion: {panose_bytes[3]}", file=file)
+    print(f"{space}Contrast: {panose_bytes[4]}", file=file)
+    print(f"{space}StrokeVariation: {panose_bytes[5]}", file=file)
+    print(f"{space}ArmStyle: {panose_bytes[6]}", file=file)
+    print(f"{space}LetterForm: {panose_bytes[7]}", file=file)
+    print(f"{space}Midline: {panose_bytes[8]}", file=file)
+    print(f"{space}XHeight: {panose_bytes[9]}", file=file)
+    if shared_with:
+        faces = ", ".join(str(index) for index in shared_with)
+        print(f"{space}OS/2 table shared with faces: {faces}", file=file)
+
+
+def print_edit_summary(
+    changed: int,
+    unchanged: int,
+    cached: int = 0,
+    dry_run: bool = False,
+    failed: int = 0,
+    resumed: int = 0,
+    duplicates: int = 0,
+    linked: int = 0,
+    file: Optional[TextIO] = None,
+) -> None:
+    # fonts that already include the panose definitions are not written
+    summary = f"{changed} changed, {unchanged} unchanged"
+    if failed:
+        summary += f", {failed} failed"
+    if cached:
+        summary += f" ({cached} from cache)"
+    if resumed:
+        summary += f" ({resumed} completed in the journal)"
+    if duplicates:
+        # duplicates of identical fonts are written without a font parse
+        summary += f" ({duplicates} duplicates of identical fonts were not edited"
+        if linked:
+            summary += f", {linked} hard linked"
+        summary += ")"
+    if dry_run:
+        summary += " (dry run, no fonts were written)"
+    print(summary, file=file)
+
+
+def format_result_error(result: "EditResult") -> str:
+    # path discovery error messages include the path
+    if result.error is not None and result.error.startswith(f"'{result.fontpath}'"):
+        return result.error
+    return f"'{result.fontpath}' error: {result.error}"
+
+
+def report_failure(
+    result: "EditResult", failures: List["EditResult"], keep_going: bool
+) -> None:
+    """Reports a failed font edit result and exits unless keep_going is True.
+    Failures of runs that keep going are appended to failures."""
+    sys.stderr.write(f"[ERROR] {format_result_error(result)}{os.linesep}")
+    if not keep_going:
+        sys.exit(1)
+    failures.append(result)
+
+
+def print_failure_summary(failures: List["EditResult"]) -> None:
+    sys.stderr.write(f"[ERROR] {len(failures)} font edits failed:{os.linesep}")
+    for result in failures:
+        sys.stderr.write(f"   {format_result_error(result)}{os.linesep}")
+
+
+def print_timings_summary(spans: Iterable[Span]) -> None:
+    # written to the standard error stream so that the report format does
+    # not change
+    sys.stderr.write(
+        f"{'phase':<8}{'count':>8}{'total ms':>12}{'p50 ms':>10}{'p95 ms':>10}"
+        f"{os.linesep}"
+    )
+    for summary in summarize_spans(spans):
+        sys.stderr.write(
+            f"{summary.name:<8}{summary.samples:>8}{summary.total * 1000:>12.3f}"
+            f"{summary.p50 * 1000:>10.3f}{summary.p95 * 1000:>10.3f}{os.linesep}"
+        )
+
+
+def get_cache_path(args: argparse.Namespace) -> Optional[str]:
+    if args.no_cache:
+        return None
+    return args.cache or os.environ.get(CACHE_ENVIRONMENT_VARIABLE) or None
+
+
+def run_stream(args: argparse.Namespace, panose: Panose) -> None:
+    """Edits the font file data in the standard input stream and writes the
+    edited font file data to the standard output stream.  The report is
+    written to the standard error stream.  Font data are not written in dry
+    runs."""
+    from .edit import EditOptions, process_font_data
+
+    timings = args.timings or args.trace_file is not None
+    options = EditOptions(
+        engine=args.engine,
+        verify=args.verify,
+        timings=timings,
+        dry_run=args.dry_run,
+        face_indexes=args.face_index,
+    )
+    data = sys.stdin.buffer.read()
+    if args.infer:
+        try:
+            from .infer import classify_metrics, read_font_metrics
+
+            inferred = classify_metrics([read_font_metrics(io.BytesIO(data))])[0]
+        except Exception as e:
+            sys.stderr.write(
+                f"[ERROR] '{STREAM_PATH}' error: panose inference failed: {str(e)}"
+                f"{os.linesep}"
+            )
+            sys.exit(1)
+        panose = override_panose(inferred, panose)
+    elif args.rules:
+        matcher = read_rules_matcher(args.rules)
+        try:
+            matched = matcher.match_faces(
+                matcher.read_face_metadata(io.BytesIO(data), STREAM_PATH, args.face_index)
+            )
+        except Exception as e:
             sys.stderr.write(
-                f"[ERROR] '{fontpath}' does not appear to be a valid file{os.linesep}"
+                f"[ERROR] '{STREAM_PATH}' error: rules evaluation failed: {str(e)}"
+                f"{os.linesep}"
+            )
+            sys.exit(1)
+        panose = override_panose(matched, panose)
+    output, result = process_font_data(data, panose, options)
+    if result.panose_bytes is None:
+        sys.stderr.write(f"[ERROR] {format_result_error(result)}{os.linesep}")
+        sys.exit(1)
+
+    if result.faces:
+        for face in result.faces:
+            print_panose_report(
+                result.fontpath,
+                face.panose_bytes,
+                face.face_index,
+                face.shared_with,
+                file=sys.stderr,
+            )
+    else:
+        print_panose_report(result.fontpath, result.panose_bytes, file=sys.stderr)
+    print_edit_summary(
+        int(result.changed),
+        int(not result.changed),
+        dry_run=args.dry_run,
+        file=sys.stderr,
+    )
+
+    if args.timings:
+        print_timings_summary(result.spans)
+    if args.trace_file is not None:
+        try:
+            write_chrome_trace(
+                args.trace_file, [(result.fontpath, span) for span in result.spans]
             )
+        except OSError as e:
+            sys.stderr.write(f"[ERROR] {str(e)}{os.linesep}")
             sys.exit(1)
 
+    if not args.dry_run:
+        sys.stdout.buffer.write(output)
+        sys.stdout.buffer.flush()
+
 
 def run(argv: List[str]) -> None:
+    # read-only query subcommand
+    if argv[:1] == ["query"]:
+        from .query import run_query
+
+        run_query(argv[1:])
+        return
+    # variable font named instance subcommand
+    if argv[:1] == ["instances"]:
+        from .instances import run_instances
+
+        run_instances(argv[1:])
+        return
+    # font library panose index subcommand
+    if argv[:1] == ["index"]:
+        from .index import run_index
+
+        run_index(argv[1:])
+        return
+    # long-running server subcommand
+    if argv[:1] == ["serve"]:
+        from .server import run_serve
+
+        run_serve(argv[1:])
+        return
+
     # ===========================================================
     # argparse command line argument definitions
     # ===========================================================
@@ -101,68 +496,342 @@ def run(argv: List[str]) -> None:
     parser.add_argument("--letterform", type=int, required=False, help="Letterform value")
     parser.add_argument("--midline", type=int, required=False, help="Midline value")
     parser.add_argument("--xheight", type=int, required=False, help="XHeight value")
-    parser.add_argument("PATH", nargs="+", help="Font file path")
+    parser.add_argument(
+        "--infer",
+        action="store_true",
+        help="infer the FamilyType, Weight, Proportion, and XHeight values from the "
+        "font data.  Panose value options override inferred values.",
+    )
+    parser.add_argument(
+        "--engine",
+        choices=ENGINES,
+        default="fast",
+        help="font write engine (default: fast)",
+    )
+    parser.add_argument(
+        "--verify",
+        action="store_true",
+        help="re-read the written OS/2 table and confirm the panose data",
+    )
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="report the panose data edits without writing fonts",
+    )
+    parser.add_argument(
+        "--jobs",
+        type=jobs_count,
+        default=1,
+        metavar="N",
+        help="number of parallel font edit processes or 'auto' (default: 1)",
+    )
+    parser.add_argument(
+        "--face-index",
+        type=face_indexes,
+        default=None,
+        metavar="INDEXES",
+        help="comma delimited font collection face indexes to edit (default: all "
+        "faces)",
+    )
+    parser.add_argument(
+        "-r", "--recursive", action="store_true", help="search directories recursively"
+    )
+    parser.add_argument(
+        "--ext",
+        type=str,
+        required=False,
+        help="comma delimited directory and glob file extension list "
+        f"(default: {','.join(FONT_EXTENSIONS)})",
+    )
+    parser.add_argument(
+        "--output-dir",
+        type=str,
+        required=False,
+        help="write edited fonts to this directory instead of editing fonts in place",
+    )
+    parser.add_argument(
+        "--cache",
+        nargs="?",
+        const=DEFAULT_CACHE_PATH,
+        metavar="CACHE_PATH",
+        help=f"skip fonts with the content of a completed edit in a persistent "
+        f"cache (default path: {DEFAULT_CACHE_PATH}, or define the path with the "
+        f"{CACHE_ENVIRONMENT_VARIABLE} environment variable)",
+    )
+    parser.add_argument(
+        "--no-cache", action="store_true", help="do not use the persistent cache"
+    )
+    parser.add_argument(
+        "--cache-max-entries",
+        type=int,
+        default=DEFAULT_CACHE_MAX_ENTRIES,
+        metavar="N",
+        help=f"maximum number of cache entries (default: {DEFAULT_CACHE_MAX_ENTRIES})",
+    )
+    parser.add_argument(
+        "--cache-max-age",
+        type=float,
+        default=DEFAULT_CACHE_MAX_AGE_DAYS,
+        metavar="DAYS",
+        help="remove cache entries that were not used in DAYS days "
+        f"(default: {DEFAULT_CACHE_MAX_AGE_DAYS})",
+    )
+    parser.add_argument(
+        "--timings",
+        action="store_true",
+        help="write per-phase total, p50, and p95 edit times to the standard error "
+        "stream",
+    )
+    parser.add_argument(
+        "--trace-file",
+        type=str,
+        required=False,
+        metavar="TRACE_PATH",
+        help="write per-phase edit times to a Chrome trace event JSON file",
+    )
+    parser.add_argument(
+        "--dedupe",
+        action="store_true",
+        help="edit identical fonts once and copy the edited font to the duplicates",
+    )
+    parser.add_argument(
+        "--link-duplicates",
+        action="store_true",
+        help="replace identical fonts with hard links of the edited font (implies "
+        "--dedupe)",
+    )
+    parser.add_argument(
+        "--keep-going",
+        action="store_true",
+        help="continue after font edit errors and report all errors at the end",
+    )
+    parser.add_argument(
+        "--journal",
+        type=str,
+        required=False,
+        metavar="JOURNAL_PATH",
+        help="append completed font edits to a journal file",
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="skip fonts with completed edits in the --journal file",
+    )
+    parser.add_argument(
+        "--manifest",
+        type=str,
+        required=False,
+        help="CSV, JSON, or TOML file that maps font paths to panose definitions",
+    )
+    parser.add_argument(
+        "--rules",
+        type=str,
+        required=False,
+        metavar="RULES_PATH",
+        help="JSON or TOML file of rules that define panose values by font metadata.  "
+        "Panose value options override rule values.",
+    )
+    parser.add_argument(
+        "PATH",
+        nargs="*",
+        help=f"Font file, directory, or glob path, or '{STREAM_PATH}' to read a font "
+        f"from the standard input stream and write the edited font to the standard "
+        f"output stream",
+    )
     args = parser.parse_args(argv)
 
     # additional CL args validations
-    validate_args_at_least_one_definition(args)
-    validate_args_exclusive(args)
-    validate_args_filepaths_exist(args)
+    validate_args_infer(args)
+    validate_args_rules(args)
+    if args.manifest:
+        validate_args_manifest(args)
+    else:
+        validate_args_at_least_one_path(args)
+        validate_args_at_least_one_definition(args)
+        validate_args_exclusive(args)
+        validate_args_stream(args)
+        validate_args_filepaths_exist(args)
+    validate_args_output_dir(args)
+    validate_args_resume(args)
 
-    # panose data edit implementation
-    for fontpath in args.PATH:
+    # the edit pipeline is imported after the arguments are validated
+    from .api import iter_apply_panose_edits, iter_path_edits
+    from .journal import (
+        JournalWriter,
+        entry_from_result,
+        iter_resumed_edits,
+        read_journal,
+    )
+
+    extensions = FONT_EXTENSIONS
+    if args.ext:
         try:
-            tt = TTFont(fontpath)
-        except Exception as e:
-            sys.stderr.write(f"[ERROR] during edit of '{fontpath}': {str(e)}{os.linesep}")
+            extensions = parse_extensions(args.ext)
+        except ValueError as e:
+            sys.stderr.write(f"[ERROR] {str(e)}{os.linesep}")
             sys.exit(1)
 
-        # define with comma-delimited panose definition string
-        if args.panose:
-            panose = Panose()
-            try:
-                panose.set_panose_with_comma_delim_string(args.panose)
-            except ValueError as e:
-                sys.stderr.write(f"[ERROR] {str(e)}{os.linesep}")
-                sys.exit(1)
-        # or define with individual panose definition arguments
-        else:
-            try:
-                panose = Panose(
-                    familytype=args.familytype,
-                    serifstyle=args.serifstyle,
-                    weight=args.weight,
-                    proportion=args.proportion,
-                    contrast=args.contrast,
-                    strokevar=args.strokevar,
-                    armstyle=args.armstyle,
-                    letterform=args.letterform,
-                    midline=args.midline,
-                    xheight=args.xheight,
-                )
-            except ValueError as e:
-                sys.stderr.write(f"[ERROR] {str(e)}{os.linesep}")
-                sys.exit(1)
+    edits: Iterable["FontEditItem"]
+    if args.manifest:
+        from .manifest import build_manifest_plan, read_manifest
 
+        # the manifest is parsed and validated into the full edit plan
+        # before any fonts are edited
         try:
-            tt = panose.set_font_panose_data(TTFont(fontpath))
-            tt.save(fontpath)
+            entries = read_manifest(args.manifest)
+            edits = build_manifest_plan(
+                args.manifest, entries, recursive=args.recursive, extensions=extensions
+            )
+        except (OSError, ValueError) as e:
+            sys.stderr.write(f"[ERROR] {str(e)}{os.linesep}")
+            sys.exit(1)
+    else:
+        panose = get_panose_from_args(args)
+        if args.PATH == [STREAM_PATH]:
+            run_stream(args, panose)
+            return
+        # the rules are compiled before any fonts are read
+        matcher = read_rules_matcher(args.rules) if args.rules else None
+        # font paths are discovered as the edits proceed
+        edits = iter_path_edits(args.PATH, panose, args.recursive, extensions)
+        if args.infer:
+            from .infer import iter_inferred_edits
+
+            # the panose definition options override the inferred values
+            edits = iter_inferred_edits(edits, panose)
+        elif matcher is not None:
+            from .rules import iter_rule_edits
+
+            # the panose definition options override the rule values
+            edits = iter_rule_edits(edits, matcher, panose, args.face_index)
+
+    if args.output_dir is not None:
+        edits = iter_unique_output_edits(edits)
+
+    journal: Optional[JournalWriter] = None
+    if args.journal is not None:
+        try:
+            if args.resume:
+                journal_entries = read_journal(args.journal)
+                edits = iter_resumed_edits(
+                    edits, journal_entries, args.output_dir, args.verify
+                )
+            if not args.dry_run:
+                journal = JournalWriter(args.journal)
+        except OSError as e:
+            sys.stderr.write(f"[ERROR] {str(e)}{os.linesep}")
+            sys.exit(1)
+
+    # panose data edit implementation
+    cache_path = get_cache_path(args)
+    timings = args.timings or args.trace_file is not None
+    timer = Timer() if timings else NULL_TIMER
+    # (font path, Span) timing events of all fonts
+    events: List[Tuple[str, Span]] = []
+    changed = unchanged = cached = resumed = duplicates = linked = 0
+    failures: List["EditResult"] = []
+    try:
+        for result in iter_apply_panose_edits(
+            edits,
+            jobs=args.jobs,
+            dry_run=args.dry_run,
+            engine=args.engine,
+            verify=args.verify,
+            cache_path=cache_path,
+            output_dir=args.output_dir,
+            timings=timings,
+            face_indexes=args.face_index,
+            dedupe=args.dedupe,
+            link_duplicates=args.link_duplicates,
+        ):
+            if result.panose_bytes is None:
+                report_failure(result, failures, args.keep_going)
+                continue
+            if journal is not None and not result.resumed:
+                # journal write errors fail the font and not the batch
+                try:
+                    journal.write(entry_from_result(result, args.verify))
+                except (OSError, ValueError) as e:
+                    error = f"journal write failed: {str(e)}"
+                    report_failure(
+                        result._replace(error=error), failures, args.keep_going
+                    )
+                    continue
+
+            if result.changed:
+                changed += 1
+            else:
+                unchanged += 1
+            if result.cached:
+                cached += 1
+            if result.duplicate_of is not None:
+                duplicates += 1
+            if result.linked:
+                linked += 1
+            if result.resumed:
+                resumed += 1
 
             # edited font panose data report
-            tt_edited = TTFont(fontpath)
-            new_panose = tt_edited["OS/2"].panose.__dict__
-            print(f"{fontpath} panose:")
-            space = " " * 3
-            print(f"{space}FamilyType: {new_panose['bFamilyType']}")
-            print(f"{space}SerifStyle: {new_panose['bSerifStyle']}")
-            print(f"{space}Weight: {new_panose['bWeight']}")
-            print(f"{space}Proportion: {new_panose['bProportion']}")
-            print(f"{space}Contrast: {new_panose['bContrast']}")
-            print(f"{space}StrokeVariation: {new_panose['bStrokeVariation']}")
-            print(f"{space}ArmStyle: {new_panose['bArmStyle']}")
-            print(f"{space}LetterForm: {new_panose['bLetterForm']}")
-            print(f"{space}Midline: {new_panose['bMidline']}")
-            print(f"{space}XHeight: {new_panose['bXHeight']}")
-        except Exception as e:
-            sys.stderr.write(f"[ERROR] '{fontpath}' error: {str(e)}{os.linesep}")
+            with timer.phase("report"):
+                report_path = result.output_path or result.fontpath
+                try:
+                    if result.faces:
+                        for face in result.faces:
+                            print_panose_report(
+                                report_path,
+                                face.panose_bytes,
+                                face.face_index,
+                                face.shared_with,
+                            )
+                    else:
+                        print_panose_report(report_path, result.panose_bytes)
+                except (OSError, ValueError) as e:
+                    error = f"report failed: {str(e)}"
+                    report_failure(
+                        result._replace(error=error), failures, args.keep_going
+                    )
+            if timings:
+                events.extend((result.fontpath, span) for span in result.spans)
+                events.extend((result.fontpath, span) for span in timer.spans)
+                timer.spans.clear()
+    except (OSError, ValueError) as e:
+        sys.stderr.write(f"[ERROR] {str(e)}{os.linesep}")
+        sys.exit(1)
+    finally:
+        if journal is not None:
+            journal.close()
+
+    if cache_path is not None:
+        import sqlite3
+
+        from .cache import get_cache
+
+        try:
+            get_cache(cache_path).evict(args.cache_max_entries, args.cache_max_age)
+        except sqlite3.Error as e:
+            sys.stderr.write(f"[ERROR] cache eviction failed: {str(e)}{os.linesep}")
             sys.exit(1)
+
+    print_edit_summary(
+        changed,
+        unchanged,
+        cached,
+        args.dry_run,
+        failed=len(failures),
+        resumed=resumed,
+        duplicates=duplicates,
+        linked=linked,
+    )
+
+    if args.timings:
+        print_timings_summary(span for _, span in events)
+    if args.trace_file is not None:
+        try:
+            write_chrome_trace(args.trace_file, events)
+        except OSError as e:
+            sys.stderr.write(f"[ERROR] {str(e)}{os.linesep}")
+            sys.exit(1)
+
+    if failures:
+        print_failure_summary(failures)
+        sys.exit(1)
@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+
+# Copyright 2020 Source Foundry Authors
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Library API for batch panose edits.
+
+    from panosifier.api import apply_panose
+
+    results = apply_panose(["fonts"], {"weight": 8}, recursive=True, jobs=4)
+    for result in results:
+        if result.error is not None:
+            print(result.fontpath, result.error)
+
+The API functions do not write to the standard streams or exit.  Each font,
+and each path that cannot be found, is returned as an EditResult with the
+panose data, changed and error status, and per-phase times.
+"""
+
+from typing import (
+    Any,
+    Iterable,
+    Iterator,
+    List,
+    Mapping,
+    Optional,
+    Sequence,
+    Set,
+    Union,
+)
+
+from .datastructures import PANOSE_FIELDS, Panose
+from .discovery import FONT_EXTENSIONS, iter_font_paths
+from .edit import (
+    ENGINES,
+    EditOptions,
+    EditResult,
+    FontEditItem,
+    iter_process_font_edits,
+    normalize_font_path,
+)
+
+# a Panose, a comma delimited string or sequence of all ten values, or a
+# mapping of individual panose field names to values
+PanoseDefinition = Union[Panose, str, Sequence[int], Mapping[str, Any]]
+
+
+def get_panose(definition: PanoseDefinition) -> Panose:
+    """Returns the Panose of a panose definition.  Raises ValueError on
+    invalid definitions."""
+    from .manifest import panose_from_fields
+
+    if isinstance(definition, Panose):
+        return definition
+    if isinstance(definition, Mapping):
+        for key in definition:
+            if key != "panose" and key not in PANOSE_FIELDS:
+                raise ValueError(f"unsupported panose field '{key}'")
+        return panose_from_fields(dict(definition))
+    if isinstance(definition, str):
+        return panose_from_fields({"panose": definition})
+    return panose_from_fields({"panose": list(definition)})
+
+
+def iter_apply_panose_edits(
+    edits: Iterable[FontEditItem],
+    *,
+    jobs: int = 1,
+    dry_run: bool = False,
+    engine: str = "fast",
+    verify: bool = False,
+    cache_path: Optional[str] = None,
+    output_dir: Optional[str] = None,
+    timings: bool = True,
+    face_indexes: Optional[Sequence[int]] = None,
+    dedupe: bool = False,
+    link_duplicates: bool = False,
+) -> Iterator[EditResult]:
+    """Yields the EditResult of each (font path, Panose) edit in input order as
+    the edits complete.
+
+    Fonts are edited across a pool of jobs worker processes when jobs is
+    greater than 1.  Fonts are not written when dry_run is True, and the
+    results report the panose data and changed status of the edit.  Font
+    collection edits are limited to the faces in face_indexes when it is
+    defined, and the results report the edit of each face.
+
+    Identical fonts with the same panose definition are edited once when
+    dedupe is True, and the edited font is copied to the duplicate fonts, or
+    hard linked when link_duplicates is True.  The edits are collected before
+    the first edit in deduplicated runs.  Raises ValueError on unsupported
+    engines.
+    """
+    if engine not in ENGINES:
+        raise ValueError(f"unsupported engine '{engine}'")
+    options = EditOptions(
+        engine=engine,
+        verify=verify,
+        cache_path=cache_path,
+        output_dir=output_dir,
+        timings=timings,
+        dry_run=dry_run,
+        face_indexes=tuple(face_indexes) if face_indexes is not None else None,
+    )
+    if dedupe or link_duplicates:
+        from .dedupe import iter_deduplicated_edits
+
+        yield from iter_deduplicated_edits(edits, options, jobs, link_duplicates)
+        return
+    yield from iter_process_font_edits(edits, options=options, jobs=jobs)
+
+
+def iter_path_edits(
+    paths: Iterable[str],
+    panose: Panose,
+    recursive: bool = False,
+    extensions: Sequence[str] = FONT_EXTENSIONS,
+) -> Iterator[FontEditItem]:
+    """Yields (font path, panose) edits of the fonts in the file, directory, and
+    glob pattern paths as they are found.  Paths that do not exist or do not
+    match any files are yielded as error EditResult items, and fonts that
+    are found in more than one path are yielded once."""
+    found: Set[str] = set()
+    for path in paths:
+        try:
+            for fontpath in iter_font_paths([path], recursive, extensions):
+                key = normalize_font_path(fontpath)
+                if key not in found:
+                    found.add(key)
+                    yield fontpath, panose
+        except ValueError as e:
+            yield EditResult(path, None, False, str(e))
+
+
+def iter_apply_panose(
+    paths: Union[str, Iterable[str]],
+    panose: PanoseDefinition,
+    *,
+    recursive: bool = False,
+    extensions: Sequence[str] = FONT_EXTENSIONS,
+    jobs: int = 1,
+    dry_run: bool = False,
+    engine: str = "fast",
+    verify: bool = False,
+    cache_path: Optional[str] = None,
+    output_dir: Optional[str] = None,
+    timings: bool = True,
+    face_indexes: Optional[Sequence[int]] = None,
+    dedupe: bool = False,
+    link_duplicates: bool = False,
+) -> Iterator[EditResult]:
+    """Yields the EditResult of each font in the file, directory, and glob
+    pattern paths as the edits complete.  Paths that do not exist or do not
+    match any files are yielded as error results, and fonts that are found in
+    more than one path are edited once.  Raises ValueError on invalid panose
+    definitions."""
+    if isinstance(paths, str):
+        paths = [paths]
+    edits = iter_path_edits(paths, get_panose(panose), recursive, extensions)
+    yield from iter_apply_panose_edits(
+        edits,
+        jobs=jobs,
+        dry_run=dry_run,
+        engine=engine,
+        verify=verify,
+        cache_path=cache_path,
+        output_dir=output_dir,
+        timings=timings,
+        face_indexes=face_indexes,
+        dedupe=dedupe,
+        link_duplicates=link_duplicates,
+    )
+
+
+def apply_panose(
+    paths: Union[str, Iterable[str]],
+    panose: PanoseDefinition,
+    *,
+    recursive: bool = False,
+    extensions: Sequence[str] = FONT_EXTENSIONS,
+    jobs: int = 1,
+    dry_run: bool = False,
+    engine: str = "fast",
+    verify: bool = False,
+    cache_path: Optional[str] = None,
+    output_dir: Optional[str] = None,
+    timings: bool = True,
+    face_indexes: Optional[Sequence[int]] = None,
+    dedupe: bool = False,
+    link_duplicates: bool = False,
+) -> List[EditResult]:
+    """Edits the panose data of the fonts in the file, directory, and glob
+    pattern paths and returns the EditResult of each font in input order.
+    See iter_apply_panose."""
+    return list(
+        iter_apply_panose(
+            paths,
+            panose,
+            recursive=recursive,
+            extensions=extensions,
+            jobs=jobs,
+            dry_run=dry_run,
+            engine=engine,
+            verify=verify,
+            cache_path=cache_path,
+            output_dir=output_dir,
+            timings=timings,
+            face_indexes=face_indexes,
+            dedupe=dedupe,
+            link_duplicates=link_duplicates,
+        )
+    )
@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+
+# Copyright 2020 Source Foundry Authors
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Persistent content hash cache of completed panose edits.
+
+The cache is a SQLite database with one entry per (input file hash, panose
+definition) edit.  Entries record the hash of the edited output file so that
+a file that already has the content of a completed edit, or an output file
+that was written by a completed edit of the input file, is skipped without
+a font parse.
+"""
+
+import hashlib
+import os
+import time
+from typing import Dict, Optional, Tuple
+
+DEFAULT_CACHE_PATH = ".panosifier-cache"
+DEFAULT_CACHE_MAX_ENTRIES = 100000
+DEFAULT_CACHE_MAX_AGE_DAYS = 30
+# seconds to wait on a cache database locked by another process
+CACHE_TIMEOUT = 30.0
+
+_HASH_CHUNK_SIZE = 1024 * 1024
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS edits (
+    input_digest TEXT NOT NULL,
+    panose_key TEXT NOT NULL,
+    output_digest TEXT NOT NULL,
+    panose_bytes BLOB NOT NULL,
+    accessed REAL NOT NULL,
+    PRIMARY KEY (input_digest, panose_key)
+);
+CREATE INDEX IF NOT EXISTS edits_output ON edits (panose_key, output_digest);
+"""
+
+# per-process connections, keyed by process ID so that connections are not
+# shared with forked worker processes
+_caches: Dict[Tuple[str, int], "PanoseCache"] = {}
+
+
+def file_digest(path: str) -> str:
+    """Returns the SHA-256 hex digest of the file at path."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(_HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class PanoseCache(object):
+    def __init__(self, path: str) -> None:
+        # sqlite3 is imported when a cache is used
+        import sqlite3
+
+        self.path = path
+        self.connection = sqlite3.connect(path, timeout=CACHE_TIMEOUT)
+        self.connection.executescript(_SCHEMA)
+
+    def lookup(self, digest: str, panose_key: str) -> Optional[bytes]:
+        """Returns the panose data of a completed edit with an output file hash
+        of digest and a panose definition of panose_key, or None."""
+        with self.connection:
+            row = self.connection.execute(
+                "SELECT panose_bytes FROM edits WHERE panose_key = ? AND "
+                "output_digest = ? LIMIT 1",
+                (panose_key, digest),
+            ).fetchone()
+            if row is None:
+                return None
+            self.connection.execute(
+                "UPDATE edits SET accessed = ? WHERE panose_key = ? AND "
+                "output_digest = ?",
+                (time.time(), panose_key, digest),
+            )
+        return bytes(row[0])
+
+    def lookup_edit(
+        self, input_digest: str, panose_key: str
+    ) -> Optional[Tuple[str, bytes]]:
+        """Returns the (output file hash, panose data) of a completed edit of an
+        input file with a hash of input_digest and a panose definition of
+        panose_key, or None."""
+        with self.connection:
+            row = self.connection.execute(
+                "SELECT output_digest, panose_bytes FROM edits WHERE input_digest = ? "
+                "AND panose_key = ?",
+                (input_digest, panose_key),
+            ).fetchone()
+            if row is None:
+                return None
+            self.connection.execute(
+                "UPDATE edits SET accessed = ? WHERE input_digest = ? AND panose_key = ?",
+                (time.time(), input_digest, panose_key),
+            )
+        return row[0], bytes(row[1])
+
+    def record(
+        self, input_digest: str, panose_key: str, output_digest: str, panose_bytes: bytes
+    ) -> None:
+        with self.connection:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO edits VALUES (?, ?, ?, ?, ?)",
+                (input_digest, panose_key, output_digest, panose_bytes, time.time()),
+            )
+
+    def evict(self, max_entries: int, max_age_days: float) -> int:
+        """Removes entries that were not accessed in max_age_days and the least
+        recently accessed entries over max_entries.  Returns the number of
+        removed entries."""
+        with self.connection:
+            removed = self.connection.execute(
+                "DELETE FROM edits WHERE accessed < ?",
+                (time.time() - max_age_days * 86400,),
+            ).rowcount
+            removed += self.connection.execute(
+                "DELETE FROM edits WHERE rowid NOT IN (SELECT rowid FROM edits "
+                "ORDER BY accessed DESC LIMIT ?)",
+                (max_entries,),
+            ).rowcount
+        return removed
+
+    def __len__(self) -> int:
+        return self.connection.execute("SELECT COUNT(*) FROM edits").fetchone()[0]
+
+    def close(self) -> None:
+        self.connection.close()
+
+
+def get_cache(path: str) -> PanoseCache:
+    """Returns the open cache at path for the current process."""
+    key = (os.path.abspath(path), os.getpid())
+    if key not in _caches:
+        _caches[key] = PanoseCache(path)
+    return _caches[key]
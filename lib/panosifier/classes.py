@@ -0,0 +1,26 @@
+#!/usr/bin/env python3
+
+# Copyright 2020 Source Foundry Authors
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""PANOSE Latin Text classes of the OS/2 weight and width classes."""
+
+LATIN_TEXT_FAMILY_TYPE = 2
+# PANOSE Latin Text weights by OS/2 usWeightClass value, from Very Light (2)
+# below 150 to Extra Black (11) at 925 or more
+WEIGHT_CLASS_BINS = (150, 250, 350, 450, 550, 650, 750, 850, 925)
+# PANOSE Latin Text proportion of each OS/2 usWidthClass value, 0 for widths
+# that are not classified
+WIDTH_CLASS_PROPORTIONS = (0, 8, 8, 6, 6, 0, 5, 5, 7, 7)
+MONOSPACED_PROPORTION = 9
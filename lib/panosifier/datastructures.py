@@ -1,89 +1,202 @@
-from typing import Optional
+from typing import TYPE_CHECKING, Any, Dict, Optional, Tuple
 
-from fontTools.ttLib import TTFont  # type: ignore
+if TYPE_CHECKING:  # pragma: no cover
+    from fontTools.ttLib import TTFont  # type: ignore
+
+# OS/2 table panose field order in the sfnt binary panose data
+PANOSE_FIELDS = (
+    "familytype",
+    "serifstyle",
+    "weight",
+    "proportion",
+    "contrast",
+    "strokevar",
+    "armstyle",
+    "letterform",
+    "midline",
+    "xheight",
+)
+# fontTools OS/2 table panose attribute names in the same order
+FONTTOOLS_PANOSE_ATTRIBUTES = (
+    "bFamilyType",
+    "bSerifStyle",
+    "bWeight",
+    "bProportion",
+    "bContrast",
+    "bStrokeVariation",
+    "bArmStyle",
+    "bLetterForm",
+    "bMidline",
+    "bXHeight",
+)
+# mask of a Panose with all ten fields defined.  Bit i of a mask is set when
+# the panose field at index i is defined.
+PANOSE_FULL_MASK = (1 << len(PANOSE_FIELDS)) - 1
+
+
+def _field_property(index: int) -> property:
+    def getter(self: "Panose") -> Optional[int]:
+        if self._mask & (1 << index):
+            return self._data[index]
+        return None
+
+    return property(getter)
 
 
 class Panose(object):
-    def __init__(self, **kwargs) -> None:
-        self.familytype: Optional[int] = None
-        self.serifstyle: Optional[int] = None
-        self.weight: Optional[int] = None
-        self.proportion: Optional[int] = None
-        self.contrast: Optional[int] = None
-        self.strokevar: Optional[int] = None
-        self.armstyle: Optional[int] = None
-        self.letterform: Optional[int] = None
-        self.midline: Optional[int] = None
-        self.xheight: Optional[int] = None
-        self.__dict__.update(kwargs)
-        self._validate_attributes()
+    """Immutable panose data definition.
 
-    def __str__(self) -> str:
-        return f"< Panose {self.__dict__} >"
+    The definition is stored as the 10 byte sfnt panose data with a mask of
+    the defined fields.  Undefined fields are None and are not written to
+    fonts.  Panose objects are hashable and compare equal when the same
+    fields are defined with the same values.
+    """
 
-    def __repr__(self) -> str:
-        return f"< Panose {self.__dict__} >"
-
-    def _validate_attributes(self) -> None:
-        if self.familytype:
-            int(self.familytype)
-        if self.serifstyle:
-            int(self.serifstyle)
-        if self.weight:
-            int(self.weight)
-        if self.proportion:
-            int(self.proportion)
-        if self.contrast:
-            int(self.contrast)
-        if self.strokevar:
-            int(self.strokevar)
-        if self.armstyle:
-            int(self.armstyle)
-        if self.letterform:
-            int(self.letterform)
-        if self.midline:
-            int(self.midline)
-        if self.xheight:
-            int(self.xheight)
-
-    def set_panose_with_comma_delim_string(self, comma_delim_string: str) -> None:
+    __slots__ = ("_data", "_mask")
+    _data: bytes
+    _mask: int
+
+    familytype = _field_property(0)
+    serifstyle = _field_property(1)
+    weight = _field_property(2)
+    proportion = _field_property(3)
+    contrast = _field_property(4)
+    strokevar = _field_property(5)
+    armstyle = _field_property(6)
+    letterform = _field_property(7)
+    midline = _field_property(8)
+    xheight = _field_property(9)
+
+    def __init__(self, **kwargs: Any) -> None:
+        values = []
+        mask = 0
+        for i, field in enumerate(PANOSE_FIELDS):
+            value = kwargs.pop(field, None)
+            if value is None:
+                values.append(0)
+            else:
+                values.append(int(value))
+                mask |= 1 << i
+        if kwargs:
+            raise TypeError(f"unsupported panose field '{next(iter(kwargs))}'")
+        self._set(_to_panose_bytes(values), mask)
+
+    def _set(self, data: bytes, mask: int) -> None:
+        object.__setattr__(self, "_data", data)
+        object.__setattr__(self, "_mask", mask)
+
+    @classmethod
+    def from_bytes(cls, data: bytes, mask: int = PANOSE_FULL_MASK) -> "Panose":
+        """Returns a Panose of the 10 byte sfnt panose data with the fields in
+        mask defined."""
+        if len(data) != len(PANOSE_FIELDS):
+            raise ValueError(
+                f"panose data must be {len(PANOSE_FIELDS)} bytes, received "
+                f"{len(data)}"
+            )
+        if not 0 <= mask <= PANOSE_FULL_MASK:
+            raise ValueError(f"invalid panose field mask {mask}")
+        panose = cls.__new__(cls)
+        # undefined fields are stored as zero so that equal definitions have
+        # equal data
+        panose._set(
+            bytes(value if mask & (1 << i) else 0 for i, value in enumerate(data)), mask
+        )
+        return panose
+
+    @classmethod
+    def from_comma_delim_string(cls, comma_delim_string: str) -> "Panose":
+        """Returns a Panose with all ten fields defined by a comma-delimited
+        string of panose values."""
         panose_list = comma_delim_string.split(",")
         if len(panose_list) != 10:
             raise ValueError(
                 f"incorrect number of panose values. Received {len(panose_list)} "
                 f"values and require 10 values"
             )
-        # define panose values with parsed data
-        self.familytype = int(panose_list[0])
-        self.serifstyle = int(panose_list[1])
-        self.weight = int(panose_list[2])
-        self.proportion = int(panose_list[3])
-        self.contrast = int(panose_list[4])
-        self.strokevar = int(panose_list[5])
-        self.armstyle = int(panose_list[6])
-        self.letterform = int(panose_list[7])
-        self.midline = int(panose_list[8])
-        self.xheight = int(panose_list[9])
-
-    def set_font_panose_data(self, tt: TTFont) -> TTFont:
-        if self.familytype:
-            tt["OS/2"].panose.bFamilyType = self.familytype
-        if self.serifstyle:
-            tt["OS/2"].panose.bSerifStyle = self.serifstyle
-        if self.weight:
-            tt["OS/2"].panose.bWeight = self.weight
-        if self.proportion:
-            tt["OS/2"].panose.bProportion = self.proportion
-        if self.contrast:
-            tt["OS/2"].panose.bContrast = self.contrast
-        if self.strokevar:
-            tt["OS/2"].panose.bStrokeVariation = self.strokevar
-        if self.armstyle:
-            tt["OS/2"].panose.bArmStyle = self.armstyle
-        if self.letterform:
-            tt["OS/2"].panose.bLetterForm = self.letterform
-        if self.midline:
-            tt["OS/2"].panose.bMidline = self.midline
-        if self.xheight:
-            tt["OS/2"].panose.bXHeight = self.xheight
+        return cls.from_bytes(_to_panose_bytes([int(value) for value in panose_list]))
+
+    @property
+    def mask(self) -> int:
+        return self._mask
+
+    def to_bytes(self) -> bytes:
+        """Returns the 10 byte sfnt panose data with zero values for undefined
+        fields.  Use mask to identify the defined fields."""
+        return self._data
+
+    def as_dict(self) -> Dict[str, Optional[int]]:
+        return {field: getattr(self, field) for field in PANOSE_FIELDS}
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        raise AttributeError("Panose objects are immutable")
+
+    def __delattr__(self, name: str) -> None:
+        raise AttributeError("Panose objects are immutable")
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, Panose):
+            return NotImplemented
+        return self._mask == other._mask and self._data == other._data
+
+    def __hash__(self) -> int:
+        return hash((self._data, self._mask))
+
+    def __reduce__(self) -> Tuple[Any, Tuple[bytes, int]]:
+        return (self.__class__.from_bytes, (self._data, self._mask))
+
+    def __str__(self) -> str:
+        return f"< Panose {self.as_dict()} >"
+
+    def __repr__(self) -> str:
+        return f"< Panose {self.as_dict()} >"
+
+    def set_font_panose_data(self, tt: "TTFont") -> "TTFont":
+        panose = tt["OS/2"].panose
+        for i, attr in enumerate(FONTTOOLS_PANOSE_ATTRIBUTES):
+            if self._mask & (1 << i):
+                setattr(panose, attr, self._data[i])
         return tt
+
+    def cache_key(self) -> str:
+        """Returns a comma-delimited string of the defined panose values with
+        empty values for undefined fields (e.g., '2,,8,,,,,,,')."""
+        return ",".join(
+            str(value) if self._mask & (1 << i) else ""
+            for i, value in enumerate(self._data)
+        )
+
+    def set_panose_bytes(self, panose_bytes: bytes) -> bytes:
+        """Returns the 10 byte sfnt panose data with this object's definitions
+        applied over panose_bytes."""
+        if len(panose_bytes) != len(PANOSE_FIELDS):
+            raise ValueError(
+                f"panose data must be {len(PANOSE_FIELDS)} bytes, received "
+                f"{len(panose_bytes)}"
+            )
+        if self._mask == PANOSE_FULL_MASK:
+            return self._data
+        return bytes(
+            value if self._mask & (1 << i) else panose_bytes[i]
+            for i, value in enumerate(self._data)
+        )
+
+
+def _to_panose_bytes(values: Any) -> bytes:
+    try:
+        return bytes(values)
+    except ValueError:
+        for field, value in zip(PANOSE_FIELDS, values):
+            if not 0 <= value <= 255:
+                raise ValueError(
+                    f"panose '{field}' value must be in the range 0-255, received "
+                    f"{value}"
+                )
+        raise
+
+
+def override_panose(panose: Panose, overrides: Panose) -> Panose:
+    """Returns panose with the defined fields of overrides applied."""
+    return Panose.from_bytes(
+        overrides.set_panose_bytes(panose.to_bytes()), panose.mask | overrides.mask
+    )
@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+
+# Copyright 2020 Source Foundry Authors
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Content hash deduplication of the identical fonts in a batch of edits.
+
+Fonts with the same file content and panose definition are edited once.  The
+first font of each group of identical fonts is edited, and the edited font
+file is copied, or hard linked, to the other fonts of the group.
+
+Fonts are grouped by file size before they are hashed so that only the fonts
+with the size of another font are read, and hard links of the same file are
+grouped without a read.
+"""
+
+import os
+import shutil
+import tempfile
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from .cache import file_digest
+from .edit import (
+    EditOptions,
+    EditResult,
+    FontEditItem,
+    get_output_path,
+    iter_process_font_edits,
+    verify_font_panose,
+)
+from .timing import NULL_TIMER, Span, Timer
+
+
+def find_duplicate_edits(
+    edits: Sequence[FontEditItem], timer: Timer = NULL_TIMER
+) -> Dict[int, int]:
+    """Returns a mapping of the index of each duplicate (font path, Panose)
+    edit in edits to the index of the first edit with the same font file
+    content and panose definition.  Fonts that cannot be read are not
+    duplicates so that their errors are reported by the edit."""
+    # (file size, panose definition) candidate groups of edit indexes
+    candidates: Dict[Tuple[int, str], List[Tuple[int, Tuple[int, int]]]] = {}
+    for i, item in enumerate(edits):
+        if isinstance(item, EditResult):
+            continue
+        fontpath, panose = item
+        try:
+            stat = os.stat(fontpath)
+        except OSError:
+            continue
+        candidates.setdefault((stat.st_size, panose.cache_key()), []).append(
+            (i, (stat.st_dev, stat.st_ino))
+        )
+
+    duplicates: Dict[int, int] = {}
+    for group in candidates.values():
+        if len(group) < 2:
+            continue
+        # hard links of the same file are hashed once
+        digests: Dict[Tuple[int, int], Optional[str]] = {}
+        first_indexes: Dict[str, int] = {}
+        for i, file_id in group:
+            if file_id not in digests:
+                try:
+                    with timer.phase("hash"):
+                        digests[file_id] = file_digest(edits[i][0])
+                except OSError:
+                    digests[file_id] = None
+            digest = digests[file_id]
+            if digest is None:
+                continue
+            if digest in first_indexes:
+                duplicates[i] = first_indexes[digest]
+            else:
+                first_indexes[digest] = i
+    return duplicates
+
+
+def write_duplicate(source_path: str, target_path: str, link: bool) -> bool:
+    """Writes the font file at source_path to target_path, or replaces
+    target_path with a hard link of source_path when link is True.  Hard
+    links fall back to copies on file systems that do not support them.
+    Returns True when a hard link of source_path was created at target_path.
+    Targets that are already hard links of source_path are not written."""
+    if os.path.exists(target_path) and os.path.samefile(source_path, target_path):
+        return False
+    if link:
+        # the link is created beside the target and renamed over it so that
+        # the target is replaced atomically
+        fd, tmp_path = tempfile.mkstemp(
+            suffix=".tmp", dir=os.path.dirname(os.path.abspath(target_path))
+        )
+        os.close(fd)
+        os.unlink(tmp_path)
+        try:
+            os.link(source_path, tmp_path)
+        except OSError:
+            pass
+        else:
+            try:
+                os.replace(tmp_path, target_path)
+            except BaseException:
+                os.unlink(tmp_path)
+                raise
+            return True
+    shutil.copyfile(source_path, target_path)
+    return False
+
+
+def process_duplicate(
+    fontpath: str, original: EditResult, options: EditOptions, link: bool = False
+) -> EditResult:
+    """Returns the EditResult of a duplicate of the font of the original edit
+    result.  The edited font file of the original edit is written to the
+    duplicate font, or to its output_dir path, without an edit.  Duplicates of
+    unchanged fonts that are edited in place are not written."""
+    if original.panose_bytes is None:
+        return EditResult(
+            fontpath, None, False, original.error, duplicate_of=original.fontpath
+        )
+    timer = Timer() if options.timings else NULL_TIMER
+    output_path = None
+    linked = False
+    if not options.dry_run:
+        output_path = get_output_path(fontpath, options.output_dir)
+    try:
+        if not options.dry_run and (original.changed or output_path is not None):
+            with timer.phase("write"):
+                linked = write_duplicate(
+                    original.output_path or original.fontpath,
+                    output_path or fontpath,
+                    link,
+                )
+            if options.verify:
+                with timer.phase("verify"):
+                    verify_font_panose(
+                        output_path or fontpath, original.panose_bytes, original.faces
+                    )
+    except Exception as e:
+        return EditResult(
+            fontpath,
+            None,
+            False,
+            str(e),
+            spans=tuple(timer.spans),
+            duplicate_of=original.fontpath,
+        )
+    return EditResult(
+        fontpath,
+        original.panose_bytes,
+        original.changed,
+        None,
+        output_path=output_path,
+        spans=tuple(timer.spans),
+        panose_key=original.panose_key,
+        faces=original.faces,
+        duplicate_of=original.fontpath,
+        linked=linked,
+    )
+
+
+def iter_deduplicated_edits(
+    edits: Iterable[FontEditItem],
+    options: EditOptions = EditOptions(),
+    jobs: int = 1,
+    link: bool = False,
+) -> Iterator[EditResult]:
+    """Yields the edit results of (font path, Panose) edits in input order
+    with each group of identical fonts edited once.  See iter_process_font_edits.
+
+    The edits are collected and the fonts are grouped before the first edit.
+    The results of duplicate fonts report the path of the edited font in
+    EditResult.duplicate_of, and duplicate fonts are replaced with hard links
+    of the edited font file when link is True."""
+    edits = list(edits)
+    hash_timer = Timer() if options.timings else NULL_TIMER
+    duplicates = find_duplicate_edits(edits, hash_timer)
+    hash_spans: Tuple[Span, ...] = tuple(hash_timer.spans)
+
+    unique_edits = (item for i, item in enumerate(edits) if i not in duplicates)
+    results = iter_process_font_edits(unique_edits, options=options, jobs=jobs)
+    # results of the edits with duplicates, by edit index
+    originals: Dict[int, EditResult] = {}
+    original_indexes = set(duplicates.values())
+    for i, item in enumerate(edits):
+        if i in duplicates:
+            yield process_duplicate(item[0], originals[duplicates[i]], options, link)
+            continue
+        result = next(results)
+        if i in original_indexes:
+            originals[i] = result
+        if i == 0 and hash_spans:
+            # the grouping time is reported with the first result
+            result = result._replace(spans=hash_spans + result.spans)
+        yield result
+    # completes the edit generator so that the worker pool is shut down
+    next(results, None)
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+
+# Copyright 2020 Source Foundry Authors
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Font file path discovery from file, directory, and glob arguments."""
+
+import glob
+import os
+from typing import Iterable, Iterator, Sequence, Tuple
+
+FONT_EXTENSIONS: Tuple[str, ...] = (".ttf", ".otf", ".ttc", ".otc", ".woff", ".woff2")
+
+
+def is_glob_pattern(path: str) -> bool:
+    return any(char in path for char in "*?[")
+
+
+def parse_extensions(comma_delim_string: str) -> Tuple[str, ...]:
+    """Returns lower case file extensions with a leading period from a comma
+    delimited extension list (e.g., 'ttf,.OTF' -> ('.ttf', '.otf'))."""
+    extensions = []
+    for extension in comma_delim_string.split(","):
+        extension = extension.strip().lower()
+        if not extension:
+            raise ValueError(f"invalid file extension list '{comma_delim_string}'")
+        if not extension.startswith("."):
+            extension = f".{extension}"
+        extensions.append(extension)
+    return tuple(extensions)
+
+
+def has_font_extension(path: str, extensions: Sequence[str] = FONT_EXTENSIONS) -> bool:
+    return os.path.splitext(path)[1].lower() in extensions
+
+
+def iter_directory_font_paths(
+    dirpath: str, recursive: bool = False, extensions: Sequence[str] = FONT_EXTENSIONS
+) -> Iterator[str]:
+    """Yields the font file paths in dirpath in sorted order."""
+    for root, dirnames, filenames in os.walk(dirpath):
+        dirnames.sort()
+        for filename in sorted(filenames):
+            if has_font_extension(filename, extensions):
+                yield os.path.join(root, filename)
+        if not recursive:
+            break
+
+
+def iter_font_paths(
+    paths: Iterable[str],
+    recursive: bool = False,
+    extensions: Sequence[str] = FONT_EXTENSIONS,
+) -> Iterator[str]:
+    """Yields font file paths from file, directory, and glob pattern paths as
+    they are found.
+
+    File paths are yielded as defined.  Directory and glob pattern paths yield
+    files with one of the extensions.  Raises ValueError when a path does not
+    exist or a glob pattern does not match any paths.
+    """
+    for path in paths:
+        if os.path.isfile(path):
+            yield path
+        elif os.path.isdir(path):
+            yield from iter_directory_font_paths(path, recursive, extensions)
+        elif is_glob_pattern(path):
+            matched = False
+            for match in glob.iglob(path, recursive=recursive):
+                matched = True
+                if os.path.isdir(match):
+                    yield from iter_directory_font_paths(match, recursive, extensions)
+                elif os.path.isfile(match) and has_font_extension(match, extensions):
+                    yield match
+            if not matched:
+                raise ValueError(f"'{path}' did not match any paths")
+        else:
+            raise ValueError(f"'{path}' does not appear to be a valid file or directory")
+
+
+def path_is_discoverable(path: str) -> bool:
+    """Returns True if path is an existing file or directory or a glob pattern.
+    Glob patterns are not expanded."""
+    return os.path.isfile(path) or os.path.isdir(path) or is_glob_pattern(path)
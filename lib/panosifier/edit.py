@@ -0,0 +1,970 @@
+#!/usr/bin/env python3
+
+# Copyright 2020 Source Foundry Authors
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Per-font panose edit pipeline.
+
+Each font is parsed once.  The edit functions return the 10 byte panose
+data that were written to the font so that reports do not need to re-read
+the font file.
+
+fontTools is imported on the first fontTools engine edit.  Edits with the
+default engine on sfnt, WOFF, and WOFF2 fonts do not import fontTools.
+"""
+
+import io
+import mmap
+import os
+import shutil
+import struct
+import tempfile
+from collections import deque
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    BinaryIO,
+    Deque,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Tuple,
+    Union,
+)
+
+from .cache import file_digest, get_cache
+from .datastructures import FONTTOOLS_PANOSE_ATTRIBUTES, Panose
+from .sfnt import (
+    COLLECTION_TAG,
+    TableRecord,
+    UnsupportedFormatError,
+    WritableBuffer,
+    adjust_head_checksum,
+    calc_checksum,
+    get_os2_panose_bytes,
+    get_table_record,
+    patch_panose_bytes,
+    read_collection_face_offsets,
+    read_os2_table_from_file,
+    read_panose_bytes,
+    read_table_directory_from_file,
+    write_panose_bytes,
+)
+from .timing import NULL_TIMER, Span, Timer
+from .woff import WOFF2_SIGNATURE, WOFF_SIGNATURE, read_woff_font
+
+if TYPE_CHECKING:  # pragma: no cover
+    from fontTools.ttLib import TTFont  # type: ignore
+
+ENGINES = ("fast", "fonttools")
+# maximum number of submitted edits per worker process in parallel runs
+PENDING_JOBS_PER_WORKER = 4
+# font path of font file data that are read from the standard input stream
+STREAM_PATH = "-"
+
+# font file data of in memory edits
+FontData = Union[bytes, bytearray]
+
+
+class EditOptions(NamedTuple):
+    engine: str = "fast"
+    # re-read the written OS/2 table after each edit
+    verify: bool = False
+    # persistent edit cache database path, None to disable the cache
+    cache_path: Optional[str] = None
+    # directory for edited fonts, None to edit fonts in place
+    output_dir: Optional[str] = None
+    # record per-phase timing spans in the edit results
+    timings: bool = False
+    # report the edits without writing fonts
+    dry_run: bool = False
+    # font collection face indexes to edit, None to edit all faces
+    face_indexes: Optional[Tuple[int, ...]] = None
+
+
+class FaceEdit(NamedTuple):
+    face_index: int
+    # panose data in the face after the edit
+    panose_bytes: bytes
+    changed: bool
+    # indexes of the other faces in the collection that share the OS/2 table
+    shared_with: Tuple[int, ...] = ()
+
+
+class FontEdit(NamedTuple):
+    # panose data in the font, or in the first edited face of a font
+    # collection, after the edit
+    panose_bytes: bytes
+    # False when the font already included the panose data and was not written
+    changed: bool
+    # edits of the font collection faces, empty for single face fonts
+    faces: Tuple[FaceEdit, ...] = ()
+
+
+class EditResult(NamedTuple):
+    fontpath: str
+    # panose data in the font after the edit, None on error
+    panose_bytes: Optional[bytes]
+    changed: bool
+    error: Optional[str]
+    # True when the edit was skipped with a cache entry
+    cached: bool = False
+    # edited font path when fonts are not edited in place
+    output_path: Optional[str] = None
+    # per-phase timing spans when EditOptions.timings is True
+    spans: Tuple[Span, ...] = ()
+    # Panose.cache_key() of the edit panose definition
+    panose_key: Optional[str] = None
+    # True when the edit was completed in an earlier journaled run
+    resumed: bool = False
+    # edits of the font collection faces, empty for single face fonts
+    faces: Tuple[FaceEdit, ...] = ()
+    # path of the identical font whose edit was written to this font in
+    # deduplicated runs, None when the font was edited
+    duplicate_of: Optional[str] = None
+    # True when the duplicate font was replaced with a hard link of the edited
+    # font in this run
+    linked: bool = False
+
+    def phase_times(self) -> Dict[str, float]:
+        """Returns the total time in seconds of each timed phase."""
+        times: Dict[str, float] = {}
+        for span in self.spans:
+            times[span.name] = times.get(span.name, 0.0) + span.duration
+        return times
+
+
+def get_fonttools_panose_bytes(tt: "TTFont") -> bytes:
+    panose = tt["OS/2"].panose
+    return bytes(getattr(panose, attr) for attr in FONTTOOLS_PANOSE_ATTRIBUTES)
+
+
+def copy_font_file(fontpath: str, output_path: Optional[str]) -> None:
+    """Copies an unchanged font to output_path.  Fonts that are edited in place
+    (output_path is None) are not written."""
+    if output_path is not None:
+        shutil.copy2(fontpath, output_path)
+
+
+def select_faces(
+    face_count: int, face_indexes: Optional[Tuple[int, ...]]
+) -> Tuple[int, ...]:
+    """Returns the face_indexes of a font collection with face_count faces, or
+    all face indexes when face_indexes is None.  Raises ValueError on face
+    indexes that are not in the collection."""
+    if face_indexes is None:
+        return tuple(range(face_count))
+    for index in face_indexes:
+        if not 0 <= index < face_count:
+            raise ValueError(
+                f"face index {index} is out of range for a font collection with "
+                f"{face_count} faces"
+            )
+    return tuple(sorted(set(face_indexes)))
+
+
+def get_face_edits(
+    faces: Tuple[int, ...],
+    os2_offsets: Tuple[int, ...],
+    panose_bytes: Dict[int, bytes],
+    new_panose_bytes: Dict[int, bytes],
+) -> Tuple[FaceEdit, ...]:
+    """Returns the FaceEdit of each edited face index in faces.  os2_offsets
+    are the OS/2 table offsets (or other shared table identifiers) of all faces
+    in the collection, and the panose data are mapped by the same values."""
+    face_edits = []
+    for index in faces:
+        os2_offset = os2_offsets[index]
+        face_edits.append(
+            FaceEdit(
+                index,
+                new_panose_bytes[os2_offset],
+                new_panose_bytes[os2_offset] != panose_bytes[os2_offset],
+                tuple(
+                    other
+                    for other, offset in enumerate(os2_offsets)
+                    if offset == os2_offset and other != index
+                ),
+            )
+        )
+    return tuple(face_edits)
+
+
+def _collection_font_edit(face_edits: Tuple[FaceEdit, ...]) -> FontEdit:
+    return FontEdit(
+        face_edits[0].panose_bytes,
+        any(face.changed for face in face_edits),
+        face_edits,
+    )
+
+
+def edit_collection_fast(
+    fontpath: str,
+    panose: Panose,
+    output_path: Optional[str] = None,
+    timer: Timer = NULL_TIMER,
+    dry_run: bool = False,
+    face_indexes: Optional[Tuple[int, ...]] = None,
+) -> FontEdit:
+    """Patches the OS/2 panose bytes of the font collection faces in
+    face_indexes, or of all faces when face_indexes is None.
+
+    Only the collection header, the face table directories, and the OS/2 and
+    head tables are read and written.  An OS/2 table that is shared by
+    several faces is patched once, and the table records of all faces that
+    share it are updated.
+    """
+    with timer.phase("read"):
+        with open(fontpath, "rb") as f:
+            collection = _read_collection_panose(f, face_indexes)
+    with timer.phase("edit"):
+        new_panose_bytes, font_edit = _edit_collection_panose(collection, panose)
+    if dry_run:
+        return font_edit
+    with timer.phase("write"):
+        if not font_edit.changed:
+            copy_font_file(fontpath, output_path)
+            return font_edit
+
+        if output_path is not None:
+            copy_font_file(fontpath, output_path)
+            fontpath = output_path
+        with open(fontpath, "r+b") as font_file, mmap.mmap(font_file.fileno(), 0) as mm:
+            _patch_collection_panose(mm, collection, new_panose_bytes)
+            mm.flush()
+    return font_edit
+
+
+class _CollectionPanose(NamedTuple):
+    # table records of each face in the collection
+    directories: List[Dict[str, TableRecord]]
+    # edited face indexes
+    faces: Tuple[int, ...]
+    # panose data of the edited faces mapped by OS/2 table offset
+    panose_bytes: Dict[int, bytes]
+
+
+def _read_collection_panose(
+    f: BinaryIO, face_indexes: Optional[Tuple[int, ...]]
+) -> _CollectionPanose:
+    directories = [
+        read_table_directory_from_file(f, offset)
+        for offset in read_collection_face_offsets(f)
+    ]
+    os2_records = [get_table_record(tables, "OS/2") for tables in directories]
+    faces = select_faces(len(directories), face_indexes)
+    panose_bytes: Dict[int, bytes] = {}
+    for index in faces:
+        os2 = os2_records[index]
+        if os2.offset not in panose_bytes:
+            f.seek(os2.offset)
+            panose_bytes[os2.offset] = get_os2_panose_bytes(f.read(os2.length))
+    return _CollectionPanose(directories, faces, panose_bytes)
+
+
+def _edit_collection_panose(
+    collection: _CollectionPanose, panose: Panose
+) -> Tuple[Dict[int, bytes], FontEdit]:
+    # returns the edited panose data mapped by OS/2 table offset and the edit
+    new_panose_bytes = {
+        offset: panose.set_panose_bytes(value)
+        for offset, value in collection.panose_bytes.items()
+    }
+    os2_offsets = tuple(tables["OS/2"].offset for tables in collection.directories)
+    font_edit = _collection_font_edit(
+        get_face_edits(
+            collection.faces, os2_offsets, collection.panose_bytes, new_panose_bytes
+        )
+    )
+    return new_panose_bytes, font_edit
+
+
+def _patch_collection_panose(
+    buf: WritableBuffer, collection: _CollectionPanose, new_panose_bytes: Dict[int, bytes]
+) -> None:
+    for os2_offset, value in new_panose_bytes.items():
+        if value == collection.panose_bytes[os2_offset]:
+            continue
+        delta = patch_panose_bytes(buf, os2_offset, value)
+        _update_collection_checksums(buf, collection.directories, os2_offset, delta)
+
+
+def _update_collection_checksums(
+    buf: WritableBuffer,
+    directories: List[Dict[str, TableRecord]],
+    os2_offset: int,
+    delta: int,
+) -> None:
+    # the OS/2 table records of all faces that share the patched OS/2 table
+    # and the head tables of these faces are updated.  A head table that is
+    # shared by the faces is adjusted once.
+    head_offsets = set()
+    for tables in directories:
+        os2 = tables["OS/2"]
+        if os2.offset != os2_offset:
+            continue
+        struct.pack_into(
+            ">L", buf, os2.record_offset + 4, (os2.checksum + delta) & 0xFFFFFFFF
+        )
+        if "head" in tables:
+            head_offsets.add(tables["head"].offset)
+    for head_offset in head_offsets:
+        adjust_head_checksum(buf, head_offset, delta)
+
+
+def edit_font_fast(
+    fontpath: str,
+    panose: Panose,
+    output_path: Optional[str] = None,
+    timer: Timer = NULL_TIMER,
+    dry_run: bool = False,
+    face_indexes: Optional[Tuple[int, ...]] = None,
+) -> FontEdit:
+    """Patches the OS/2 panose bytes in the font file without a fontTools
+    decompile/compile round trip.  The font file is not written when it
+    already includes the panose data.
+
+    The font file is memory mapped so that only the pages with the table
+    directory, the OS/2 table, and the head table are read and written.  Edits
+    are flushed to the font file in place, or to a copy of the font file at
+    output_path that leaves the source font file unmodified.  WOFF and WOFF2
+    fonts are edited with edit_woff_fast, and font collections with
+    edit_collection_fast.
+    """
+    with open(fontpath, "rb") as f:
+        signature = f.read(4)
+    if signature in (WOFF_SIGNATURE, WOFF2_SIGNATURE):
+        return edit_woff_fast(fontpath, panose, output_path, timer, dry_run)
+    elif signature == COLLECTION_TAG:
+        return edit_collection_fast(
+            fontpath, panose, output_path, timer, dry_run, face_indexes
+        )
+
+    with timer.phase("read"):
+        with open(fontpath, "rb") as f:
+            _, os2_data = read_os2_table_from_file(f)
+            panose_bytes = get_os2_panose_bytes(os2_data)
+    with timer.phase("edit"):
+        new_panose_bytes = panose.set_panose_bytes(panose_bytes)
+    if dry_run:
+        return FontEdit(new_panose_bytes, new_panose_bytes != panose_bytes)
+    with timer.phase("write"):
+        if new_panose_bytes == panose_bytes:
+            copy_font_file(fontpath, output_path)
+            return FontEdit(new_panose_bytes, False)
+
+        if output_path is not None:
+            # the source font is copied without reading the file data into
+            # the process and the copy is patched in place
+            copy_font_file(fontpath, output_path)
+            fontpath = output_path
+        with open(fontpath, "r+b") as font_file, mmap.mmap(font_file.fileno(), 0) as mm:
+            write_panose_bytes(mm, new_panose_bytes)
+            mm.flush()
+    return FontEdit(new_panose_bytes, True)
+
+
+def edit_woff_fast(
+    fontpath: str,
+    panose: Panose,
+    output_path: Optional[str] = None,
+    timer: Timer = NULL_TIMER,
+    dry_run: bool = False,
+) -> FontEdit:
+    """Edits WOFF and WOFF2 fonts with the OS/2 and head table data re-encoded
+    and all other compressed table data reused (see the woff module).  The
+    edited font is written to a temporary file that replaces the font file at
+    output_path, or at fontpath when output_path is None."""
+    with timer.phase("read"):
+        with open(fontpath, "rb") as f:
+            woff = read_woff_font(f)
+        panose_bytes = woff.get_panose_bytes()
+    with timer.phase("edit"):
+        new_panose_bytes = panose.set_panose_bytes(panose_bytes)
+    if dry_run:
+        return FontEdit(new_panose_bytes, new_panose_bytes != panose_bytes)
+    with timer.phase("write"):
+        if new_panose_bytes == panose_bytes:
+            copy_font_file(fontpath, output_path)
+            return FontEdit(new_panose_bytes, False)
+
+        woff.set_panose_bytes(new_panose_bytes)
+        target_path = output_path or fontpath
+        fd, tmp_path = tempfile.mkstemp(
+            suffix=".tmp", dir=os.path.dirname(os.path.abspath(target_path))
+        )
+        try:
+            with open(fontpath, "rb") as source_file, os.fdopen(fd, "wb") as tmp_file:
+                woff.write(source_file, tmp_file)
+            shutil.copymode(fontpath, tmp_path)
+            os.replace(tmp_path, target_path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+    return FontEdit(new_panose_bytes, True)
+
+
+def load_font(fontpath: Union[str, BinaryIO]) -> "TTFont":
+    """Returns a TTFont that decompiles tables on first access only.  Bounding
+    box values are not recalculated on save so that the glyf and CFF tables
+    are not decompiled."""
+    # fontTools is imported on the first font load so that the default engine
+    # and command line paths that do not edit fonts do not import it
+    from fontTools.ttLib import TTFont  # type: ignore
+
+    # lazy=True is not used because fontTools does not permit in place
+    # saves of lazily loaded fonts
+    return TTFont(fontpath, recalcBBoxes=False, recalcTimestamp=False)
+
+
+def save_font_with_raw_tables(
+    tt: "TTFont", fontpath: Union[str, BinaryIO], edited_tags: Tuple[str, ...]
+) -> None:
+    """Saves the font with compiled data for the edited_tags tables.  All other
+    tables are written with the raw table data from the source font file."""
+    use_raw_tables(tt, edited_tags)
+    tt.save(fontpath)
+
+
+def use_raw_tables(tt: "TTFont", edited_tags: Tuple[str, ...]) -> None:
+    """Replaces the edited_tags tables with their compiled data and unloads all
+    other tables so that the font is saved with the raw table data from the
+    source font file."""
+    from fontTools.ttLib.tables.DefaultTable import DefaultTable  # type: ignore
+
+    compiled = {tag: tt.getTableData(tag) for tag in edited_tags}
+    # compiling a table can load other tables (e.g., the OS/2 table compiler
+    # reads the cmap and head tables).  Unload them so that they are copied
+    # through instead of being recompiled.
+    for tag in list(tt.tables.keys()):
+        if tag not in edited_tags and tt.reader is not None and tag in tt.reader:
+            del tt.tables[tag]
+    for tag, data in compiled.items():
+        table = DefaultTable(tag)
+        table.data = data
+        tt.tables[tag] = table
+
+
+def edit_collection_fonttools(
+    fontpath: str,
+    panose: Panose,
+    output_path: Optional[str] = None,
+    timer: Timer = NULL_TIMER,
+    dry_run: bool = False,
+    face_indexes: Optional[Tuple[int, ...]] = None,
+) -> FontEdit:
+    collection, os2_offsets, font_edit = _edit_collection_fonttools(
+        fontpath, panose, timer, face_indexes
+    )
+    if dry_run:
+        return font_edit
+    with timer.phase("write"):
+        if not font_edit.changed:
+            copy_font_file(fontpath, output_path)
+            return font_edit
+        _use_collection_raw_tables(collection, os2_offsets, font_edit)
+        collection.save(output_path or fontpath, shareTables=True)
+    return font_edit
+
+
+def _edit_collection_fonttools(
+    fontfile: Union[str, BinaryIO],
+    panose: Panose,
+    timer: Timer,
+    face_indexes: Optional[Tuple[int, ...]],
+) -> Tuple[Any, Tuple[int, ...], FontEdit]:
+    # returns the edited TTCollection, the OS/2 table offset of each face, and
+    # the edit
+    from fontTools.ttLib import TTCollection  # type: ignore
+
+    with timer.phase("read"):
+        # faces share the table objects of shared tables
+        collection = TTCollection(
+            fontfile, shareTables=True, recalcBBoxes=False, recalcTimestamp=False
+        )
+        fonts = collection.fonts
+        faces = select_faces(len(fonts), face_indexes)
+        # shared OS/2 tables are identified by the table data offset
+        os2_offsets = tuple(tt.reader.tables["OS/2"].offset for tt in fonts)
+        panose_bytes = {
+            os2_offsets[index]: get_fonttools_panose_bytes(fonts[index])
+            for index in faces
+        }
+    with timer.phase("edit"):
+        new_panose_bytes = {
+            os2_offsets[index]: get_fonttools_panose_bytes(
+                panose.set_font_panose_data(fonts[index])
+            )
+            for index in faces
+        }
+        font_edit = _collection_font_edit(
+            get_face_edits(faces, os2_offsets, panose_bytes, new_panose_bytes)
+        )
+    return collection, os2_offsets, font_edit
+
+
+def _use_collection_raw_tables(
+    collection: Any, os2_offsets: Tuple[int, ...], font_edit: FontEdit
+) -> None:
+    edited_offsets = {os2_offsets[face.face_index] for face in font_edit.faces}
+    for index, tt in enumerate(collection.fonts):
+        if os2_offsets[index] in edited_offsets:
+            # faces that share an edited OS/2 table use the shared table
+            # object.  fontTools does not store shared table objects in the
+            # font tables on load.
+            tt["OS/2"] = tt["OS/2"]
+            use_raw_tables(tt, ("OS/2",))
+        else:
+            use_raw_tables(tt, ())
+
+
+def edit_font_fonttools(
+    fontpath: str,
+    panose: Panose,
+    output_path: Optional[str] = None,
+    timer: Timer = NULL_TIMER,
+    dry_run: bool = False,
+    face_indexes: Optional[Tuple[int, ...]] = None,
+) -> FontEdit:
+    with open(fontpath, "rb") as f:
+        if f.read(4) == COLLECTION_TAG:
+            return edit_collection_fonttools(
+                fontpath, panose, output_path, timer, dry_run, face_indexes
+            )
+    with timer.phase("read"):
+        tt = load_font(fontpath)
+        panose_bytes = get_fonttools_panose_bytes(tt)
+    with timer.phase("edit"):
+        new_panose_bytes = get_fonttools_panose_bytes(panose.set_font_panose_data(tt))
+    if dry_run:
+        return FontEdit(new_panose_bytes, new_panose_bytes != panose_bytes)
+    with timer.phase("write"):
+        if new_panose_bytes == panose_bytes:
+            copy_font_file(fontpath, output_path)
+            return FontEdit(new_panose_bytes, False)
+        save_font_with_raw_tables(tt, output_path or fontpath, ("OS/2",))
+    return FontEdit(new_panose_bytes, True)
+
+
+def edit_font(
+    fontpath: str,
+    panose: Panose,
+    engine: str = "fast",
+    output_path: Optional[str] = None,
+    timer: Timer = NULL_TIMER,
+    dry_run: bool = False,
+    face_indexes: Optional[Tuple[int, ...]] = None,
+) -> FontEdit:
+    """Edits the font at fontpath in place, or writes the edited font to
+    output_path when it is defined.  Read, edit, and write phases are timed
+    with timer.  Fonts are not written when dry_run is True.  Font collection
+    edits are limited to the faces in face_indexes when it is defined."""
+    args = (fontpath, panose, output_path, timer, dry_run, face_indexes)
+    if engine == "fast":
+        try:
+            return edit_font_fast(*args)
+        except UnsupportedFormatError:
+            # fall back to fontTools for font formats that the
+            # byte-level patcher does not support
+            return edit_font_fonttools(*args)
+    elif engine == "fonttools":
+        return edit_font_fonttools(*args)
+    else:
+        raise ValueError(f"unsupported engine '{engine}'")
+
+
+def edit_font_data(
+    data: bytes,
+    panose: Panose,
+    engine: str = "fast",
+    timer: Timer = NULL_TIMER,
+    dry_run: bool = False,
+    face_indexes: Optional[Tuple[int, ...]] = None,
+) -> Tuple[FontData, FontEdit]:
+    """Edits font file data in memory and returns the edited font file data and
+    the edit.  data are returned unmodified when the font already includes the
+    panose data or dry_run is True.  See edit_font."""
+    args = (data, panose, timer, dry_run, face_indexes)
+    if engine == "fast":
+        try:
+            return edit_font_data_fast(*args)
+        except UnsupportedFormatError:
+            return edit_font_data_fonttools(*args)
+    elif engine == "fonttools":
+        return edit_font_data_fonttools(*args)
+    else:
+        raise ValueError(f"unsupported engine '{engine}'")
+
+
+def edit_font_data_fast(
+    data: bytes,
+    panose: Panose,
+    timer: Timer = NULL_TIMER,
+    dry_run: bool = False,
+    face_indexes: Optional[Tuple[int, ...]] = None,
+) -> Tuple[FontData, FontEdit]:
+    """Patches the OS/2 panose bytes in a copy of the font file data.  WOFF and
+    WOFF2 fonts are re-encoded as in edit_woff_fast."""
+    signature = data[:4]
+    if signature in (WOFF_SIGNATURE, WOFF2_SIGNATURE):
+        with timer.phase("read"):
+            woff = read_woff_font(io.BytesIO(data))
+            panose_bytes = woff.get_panose_bytes()
+        with timer.phase("edit"):
+            new_panose_bytes = panose.set_panose_bytes(panose_bytes)
+        if dry_run or new_panose_bytes == panose_bytes:
+            return data, FontEdit(new_panose_bytes, new_panose_bytes != panose_bytes)
+        with timer.phase("write"):
+            woff.set_panose_bytes(new_panose_bytes)
+            output = io.BytesIO()
+            woff.write(io.BytesIO(data), output)
+        return output.getvalue(), FontEdit(new_panose_bytes, True)
+    elif signature == COLLECTION_TAG:
+        with timer.phase("read"):
+            collection = _read_collection_panose(io.BytesIO(data), face_indexes)
+        with timer.phase("edit"):
+            new_collection_panose_bytes, font_edit = _edit_collection_panose(
+                collection, panose
+            )
+        if dry_run or not font_edit.changed:
+            return data, font_edit
+        with timer.phase("write"):
+            buf = bytearray(data)
+            _patch_collection_panose(buf, collection, new_collection_panose_bytes)
+        return buf, font_edit
+
+    with timer.phase("read"):
+        panose_bytes = read_panose_bytes(data)
+    with timer.phase("edit"):
+        new_panose_bytes = panose.set_panose_bytes(panose_bytes)
+    if dry_run or new_panose_bytes == panose_bytes:
+        return data, FontEdit(new_panose_bytes, new_panose_bytes != panose_bytes)
+    with timer.phase("write"):
+        buf = bytearray(data)
+        write_panose_bytes(buf, new_panose_bytes)
+    return buf, FontEdit(new_panose_bytes, True)
+
+
+def edit_font_data_fonttools(
+    data: bytes,
+    panose: Panose,
+    timer: Timer = NULL_TIMER,
+    dry_run: bool = False,
+    face_indexes: Optional[Tuple[int, ...]] = None,
+) -> Tuple[FontData, FontEdit]:
+    output = io.BytesIO()
+    if data[:4] == COLLECTION_TAG:
+        collection, os2_offsets, font_edit = _edit_collection_fonttools(
+            io.BytesIO(data), panose, timer, face_indexes
+        )
+        if dry_run or not font_edit.changed:
+            return data, font_edit
+        with timer.phase("write"):
+            _use_collection_raw_tables(collection, os2_offsets, font_edit)
+            collection.save(output, shareTables=True)
+        return output.getvalue(), font_edit
+
+    with timer.phase("read"):
+        tt = load_font(io.BytesIO(data))
+        panose_bytes = get_fonttools_panose_bytes(tt)
+    with timer.phase("edit"):
+        new_panose_bytes = get_fonttools_panose_bytes(panose.set_font_panose_data(tt))
+    if dry_run or new_panose_bytes == panose_bytes:
+        return data, FontEdit(new_panose_bytes, new_panose_bytes != panose_bytes)
+    with timer.phase("write"):
+        save_font_with_raw_tables(tt, output, ("OS/2",))
+    return output.getvalue(), FontEdit(new_panose_bytes, True)
+
+
+def verify_font_panose(
+    fontpath: str, expected_panose_bytes: bytes, faces: Tuple[FaceEdit, ...] = ()
+) -> None:
+    """Re-reads the written OS/2 table and raises ValueError if the panose
+    data or the OS/2 table checksum do not match.  The OS/2 tables of the
+    font collection faces are verified when faces are defined."""
+    with open(fontpath, "rb") as f:
+        verify_font_file_panose(f, expected_panose_bytes, faces)
+
+
+def verify_font_file_panose(
+    f: BinaryIO, expected_panose_bytes: bytes, faces: Tuple[FaceEdit, ...] = ()
+) -> None:
+    """Verifies the panose data of a font file object.  See verify_font_panose."""
+    if faces:
+        verify_collection_panose(f, faces)
+        return
+    try:
+        os2, os2_data = read_os2_table_from_file(f)
+    except UnsupportedFormatError:
+        try:
+            woff = read_woff_font(f)
+        except UnsupportedFormatError:
+            # formats without byte-level read support load only the OS/2 table
+            f.seek(0)
+            panose_bytes = get_fonttools_panose_bytes(load_font(f))
+        else:
+            woff.check_os2_checksum()
+            panose_bytes = woff.get_panose_bytes()
+    else:
+        if calc_checksum(os2_data) != os2.checksum:
+            raise ValueError("'OS/2' table checksum does not match the table data")
+        panose_bytes = get_os2_panose_bytes(os2_data)
+
+    if panose_bytes != expected_panose_bytes:
+        raise ValueError(
+            f"verification failed, expected panose {list(expected_panose_bytes)} "
+            f"and found {list(panose_bytes)}"
+        )
+
+
+def verify_collection_panose(f: BinaryIO, faces: Tuple[FaceEdit, ...]) -> None:
+    face_offsets = read_collection_face_offsets(f)
+    for face in faces:
+        os2, os2_data = read_os2_table_from_file(f, face_offsets[face.face_index])
+        if calc_checksum(os2_data) != os2.checksum:
+            raise ValueError(
+                f"face {face.face_index} 'OS/2' table checksum does not match the "
+                f"table data"
+            )
+        panose_bytes = get_os2_panose_bytes(os2_data)
+        if panose_bytes != face.panose_bytes:
+            raise ValueError(
+                f"verification failed, expected face {face.face_index} panose "
+                f"{list(face.panose_bytes)} and found {list(panose_bytes)}"
+            )
+
+
+def is_font_collection(fontpath: str) -> bool:
+    with open(fontpath, "rb") as f:
+        return f.read(4) == COLLECTION_TAG
+
+
+def get_output_path(fontpath: str, output_dir: Optional[str]) -> Optional[str]:
+    """Returns the output_dir path of the edited font, or None when the font
+    is edited in place."""
+    if output_dir is None:
+        return None
+    output_path = os.path.join(output_dir, os.path.basename(fontpath))
+    # an output directory that holds the source font is an in place edit
+    if os.path.exists(output_path) and os.path.samefile(fontpath, output_path):
+        return None
+    return output_path
+
+
+def process_font(
+    fontpath: str, panose: Panose, options: EditOptions = EditOptions()
+) -> EditResult:
+    """Edits and optionally verifies a single font.  Exceptions are returned
+    in the result so that the function can be used in worker processes.
+
+    When options.cache_path is defined, fonts with the content of a completed
+    edit with the same panose definition, and fonts with an options.output_dir
+    output file that was written by the same edit, are skipped without a font
+    parse.
+    """
+    timer = Timer() if options.timings else NULL_TIMER
+    output_path = None
+    if not options.dry_run:
+        output_path = get_output_path(fontpath, options.output_dir)
+    try:
+        with timer.phase("font"):
+            font_edit, cached = _process_font(
+                fontpath, panose, options, output_path, timer
+            )
+    except Exception as e:
+        return EditResult(fontpath, None, False, str(e), spans=tuple(timer.spans))
+    return EditResult(
+        fontpath,
+        font_edit.panose_bytes,
+        font_edit.changed,
+        None,
+        cached,
+        output_path,
+        tuple(timer.spans),
+        panose.cache_key(),
+        faces=font_edit.faces,
+    )
+
+
+def process_font_data(
+    data: bytes, panose: Panose, options: EditOptions = EditOptions()
+) -> Tuple[FontData, EditResult]:
+    """Edits and optionally verifies font file data in memory and returns the
+    edited font file data and the edit result.  The result fontpath is
+    STREAM_PATH, and options.cache_path and options.output_dir are not used.
+    Exceptions are returned in the result with the unmodified data."""
+    timer = Timer() if options.timings else NULL_TIMER
+    try:
+        with timer.phase("font"):
+            output, font_edit = edit_font_data(
+                data,
+                panose,
+                options.engine,
+                timer,
+                options.dry_run,
+                options.face_indexes,
+            )
+            if options.verify and font_edit.changed and not options.dry_run:
+                with timer.phase("verify"):
+                    verify_font_file_panose(
+                        io.BytesIO(output), font_edit.panose_bytes, font_edit.faces
+                    )
+    except Exception as e:
+        return data, EditResult(
+            STREAM_PATH, None, False, str(e), spans=tuple(timer.spans)
+        )
+    return output, EditResult(
+        STREAM_PATH,
+        font_edit.panose_bytes,
+        font_edit.changed,
+        None,
+        spans=tuple(timer.spans),
+        panose_key=panose.cache_key(),
+        faces=font_edit.faces,
+    )
+
+
+def _process_font(
+    fontpath: str,
+    panose: Panose,
+    options: EditOptions,
+    output_path: Optional[str],
+    timer: Timer,
+) -> Tuple[FontEdit, bool]:
+    # returns the edit and True when the edit was skipped with a cache entry.
+    # Cache entries hold the panose data of a single face, and font
+    # collections are not cached.
+    use_cache = options.cache_path is not None and not is_font_collection(fontpath)
+    if use_cache:
+        with timer.phase("cache"):
+            cache = get_cache(str(options.cache_path))
+            panose_key = panose.cache_key()
+            input_digest = file_digest(fontpath)
+            cached_panose_bytes = cache.lookup(input_digest, panose_key)
+            if (
+                cached_panose_bytes is None
+                and output_path is not None
+                and os.path.isfile(output_path)
+            ):
+                # an output file that was written by a completed edit of the
+                # input file is not written again
+                entry = cache.lookup_edit(input_digest, panose_key)
+                if entry is not None and file_digest(output_path) == entry[0]:
+                    return FontEdit(entry[1], False), True
+        if cached_panose_bytes is not None:
+            if not options.dry_run:
+                with timer.phase("write"):
+                    copy_font_file(fontpath, output_path)
+            return FontEdit(cached_panose_bytes, False), True
+
+    font_edit = edit_font(
+        fontpath,
+        panose,
+        options.engine,
+        output_path,
+        timer,
+        options.dry_run,
+        options.face_indexes,
+    )
+    if options.dry_run:
+        return font_edit, False
+    if options.verify:
+        with timer.phase("verify"):
+            verify_font_panose(
+                output_path or fontpath, font_edit.panose_bytes, font_edit.faces
+            )
+
+    if use_cache:
+        with timer.phase("cache"):
+            if font_edit.changed:
+                output_digest = file_digest(output_path or fontpath)
+            else:
+                output_digest = input_digest
+            cache.record(input_digest, panose_key, output_digest, font_edit.panose_bytes)
+    return font_edit, False
+
+
+def normalize_font_path(fontpath: str) -> str:
+    """Returns the absolute, case normalized path that identifies the font
+    file at fontpath in a batch of edits."""
+    return os.path.normcase(os.path.abspath(fontpath))
+
+
+def iter_process_fonts(
+    fontpaths: Iterable[str],
+    panose: Panose,
+    options: EditOptions = EditOptions(),
+    jobs: int = 1,
+) -> Iterator[EditResult]:
+    """Yields the edit results of fontpaths in input order.  Fonts are edited
+    across a pool of jobs worker processes when jobs is greater than 1."""
+    edits = ((fontpath, panose) for fontpath in fontpaths)
+    yield from iter_process_font_edits(edits, options=options, jobs=jobs)
+
+
+# an edit is a (font path, Panose) pair, or an EditResult of a font that
+# failed before the edit (e.g., in path discovery) and is reported in order
+FontEditItem = Union[Tuple[str, Panose], EditResult]
+
+
+def iter_process_font_edits(
+    edits: Iterable[FontEditItem],
+    options: EditOptions = EditOptions(),
+    jobs: int = 1,
+) -> Iterator[EditResult]:
+    """Yields the edit results of (font path, Panose) edits in input order.
+    EditResult items are yielded in order without an edit.  Fonts are edited
+    across a pool of jobs worker processes when jobs is greater than 1, and
+    edits of the same font file are not run concurrently."""
+    if jobs <= 1:
+        for item in edits:
+            if isinstance(item, EditResult):
+                yield item
+            else:
+                yield process_font(item[0], item[1], options)
+        return
+
+    from concurrent.futures import Future, ProcessPoolExecutor
+
+    # a bounded number of edits are submitted ahead of the reported edit so
+    # that edits are consumed as workers become available
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        # (normalized font path, Future) of the submitted edits
+        pending: Deque[Tuple[Optional[str], Future]] = deque()
+        try:
+            for item in edits:
+                if isinstance(item, EditResult):
+                    key = None
+                    future: Future = Future()
+                    future.set_result(item)
+                else:
+                    key = normalize_font_path(item[0])
+                    # concurrent edits of a font file race the read, modify,
+                    # and write of the file, so the earlier edits of the font
+                    # are completed before the edit is submitted
+                    while any(pending_key == key for pending_key, _ in pending):
+                        yield pending.popleft()[1].result()
+                    future = executor.submit(process_font, item[0], item[1], options)
+                pending.append((key, future))
+                if len(pending) >= jobs * PENDING_JOBS_PER_WORKER:
+                    yield pending.popleft()[1].result()
+            while pending:
+                yield pending.popleft()[1].result()
+        finally:
+            # do not start pending edits when the caller stops early
+            for _, future in pending:
+                future.cancel()
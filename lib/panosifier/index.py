@@ -0,0 +1,430 @@
+#!/usr/bin/env python3
+
+# Copyright 2020 Source Foundry Authors
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""SQLite index of font library panose data with family consistency audits.
+
+The index is a SQLite database with one row per font file, or per face of a
+font collection file: the absolute path, collection face index, modification
+time, size, and SHA-256 hash of the file, the family and style names, the
+OS/2 usWeightClass value, and the ten panose field values.  Index updates
+read the table directories and the OS/2 and name tables of new and modified
+fonts only.  Fonts with the indexed modification time and size
+are not opened.
+
+Audits are SQL queries of the index and do not read the font files:
+
+    mixed-<field>   fonts in families with more than one value of a panose
+                    field, e.g., mixed-familytype
+    weight-class    fonts with a panose weight that does not match the
+                    usWeightClass weight class
+"""
+
+import argparse
+import csv
+import json
+import os
+import struct
+import sys
+from typing import (
+    Any,
+    BinaryIO,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    TextIO,
+)
+
+from .cache import file_digest
+from .classes import WEIGHT_CLASS_BINS
+from .datastructures import PANOSE_FIELDS
+from .discovery import FONT_EXTENSIONS, iter_font_paths, parse_extensions
+from .sfnt import (
+    COLLECTION_TAG,
+    get_name,
+    get_os2_panose_bytes,
+    read_collection_face_offsets,
+    read_tables_from_file,
+)
+from .woff import read_font_tables
+
+DEFAULT_INDEX_PATH = ".panosifier-index"
+INDEX_ENVIRONMENT_VARIABLE = "PANOSIFIER_INDEX"
+# seconds to wait on an index database locked by another process
+INDEX_TIMEOUT = 30.0
+INDEX_FORMATS = ("ndjson", "csv")
+AUDIT_CHECKS = tuple(f"mixed-{field}" for field in PANOSE_FIELDS) + ("weight-class",)
+AUDIT_FIELDS = ("path", "face", "family", "style", "usweightclass") + PANOSE_FIELDS
+# typographic family and subfamily name IDs, and the legacy family and
+# subfamily name IDs
+FAMILY_NAME_IDS = (16, 1)
+STYLE_NAME_IDS = (17, 2)
+# Any (0) and No Fit (1) panose values do not classify a font
+UNCLASSIFIED_VALUES = (0, 1)
+
+_SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS fonts (
+    path TEXT NOT NULL,
+    face INTEGER,
+    mtime_ns INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    digest TEXT NOT NULL,
+    family TEXT,
+    style TEXT,
+    usweightclass INTEGER,
+    {", ".join(f"{field} INTEGER" for field in PANOSE_FIELDS)},
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS fonts_path ON fonts (path);
+CREATE INDEX IF NOT EXISTS fonts_family ON fonts (family);
+"""
+
+
+class IndexEntry(NamedTuple):
+    path: str
+    # collection face index, None for fonts that are not collections
+    face: Optional[int]
+    mtime_ns: int
+    size: int
+    digest: str
+    family: Optional[str]
+    style: Optional[str]
+    us_weight_class: Optional[int]
+    panose_bytes: Optional[bytes]
+    error: Optional[str]
+
+
+class IndexUpdate(NamedTuple):
+    updated: int
+    unchanged: int
+    removed: int
+    # (path, error message) of the fonts that could not be read
+    errors: List[Any]
+
+
+def get_default_index_path() -> str:
+    """Returns the PANOSIFIER_INDEX environment variable path, or the default
+    index path in the working directory."""
+    return os.environ.get(INDEX_ENVIRONMENT_VARIABLE) or DEFAULT_INDEX_PATH
+
+
+def _get_first_name(name: Optional[bytes], name_ids: Iterable[int]) -> Optional[str]:
+    if name is None:
+        return None
+    for name_id in name_ids:
+        value = get_name(name, name_id)
+        if value:
+            return value
+    return None
+
+
+def _read_face_entry(
+    f: BinaryIO,
+    path: str,
+    face: Optional[int],
+    directory_offset: int,
+    stat: os.stat_result,
+    digest: str,
+) -> IndexEntry:
+    # returns the IndexEntry of a font, or of the collection face with the
+    # table directory at directory_offset
+    if face is None:
+        tables = read_font_tables(f, ("OS/2", "name"))
+    else:
+        tables = read_tables_from_file(f, ("OS/2", "name"), directory_offset)
+    if "OS/2" not in tables:
+        raise ValueError("font does not include a 'OS/2' table")
+    os2 = tables["OS/2"]
+    panose_bytes = get_os2_panose_bytes(os2)
+    (us_weight_class,) = struct.unpack_from(">H", os2, 4)
+    name = tables.get("name")
+    return IndexEntry(
+        path,
+        face,
+        stat.st_mtime_ns,
+        stat.st_size,
+        digest,
+        _get_first_name(name, FAMILY_NAME_IDS),
+        _get_first_name(name, STYLE_NAME_IDS),
+        us_weight_class,
+        panose_bytes,
+        None,
+    )
+
+
+def read_index_entries(path: str, stat: os.stat_result) -> List[IndexEntry]:
+    """Returns the IndexEntry of the font file at the absolute path, or one
+    IndexEntry per face of a font collection file.  Fonts and faces that
+    cannot be read are returned with an error message."""
+    digest = file_digest(path)
+
+    def error_entry(face: Optional[int], error: str) -> IndexEntry:
+        return IndexEntry(
+            path,
+            face,
+            stat.st_mtime_ns,
+            stat.st_size,
+            digest,
+            None,
+            None,
+            None,
+            None,
+            error,
+        )
+
+    try:
+        with open(path, "rb") as f:
+            if f.read(4) != COLLECTION_TAG:
+                return [_read_face_entry(f, path, None, 0, stat, digest)]
+            entries = []
+            for face, offset in enumerate(read_collection_face_offsets(f)):
+                try:
+                    entries.append(_read_face_entry(f, path, face, offset, stat, digest))
+                except Exception as e:
+                    entries.append(error_entry(face, f"face {face}: {str(e)}"))
+            return entries
+    except Exception as e:
+        return [error_entry(None, str(e))]
+
+
+def _weight_class_expression() -> str:
+    # SQL expression of the panose weight of the usweightclass column
+    return "2 + " + " + ".join(
+        f"(usweightclass >= {value})" for value in WEIGHT_CLASS_BINS
+    )
+
+
+class PanoseIndex(object):
+    def __init__(self, path: str) -> None:
+        # sqlite3 is imported when an index is used
+        import sqlite3
+
+        self.path = path
+        self.connection = sqlite3.connect(path, timeout=INDEX_TIMEOUT)
+        self.connection.row_factory = sqlite3.Row
+        columns = [
+            row["name"] for row in self.connection.execute("PRAGMA table_info(fonts)")
+        ]
+        if columns and "face" not in columns:
+            # indexes without collection faces are rebuilt from the font files
+            self.connection.execute("DROP TABLE fonts")
+        self.connection.executescript(_SCHEMA)
+
+    def update(self, fontpaths: Iterable[str], prune: bool = False) -> IndexUpdate:
+        """Indexes the new and modified fonts in fontpaths.  Indexed fonts that
+        no longer exist are removed when prune is True."""
+        indexed = {
+            row["path"]: (row["mtime_ns"], row["size"])
+            for row in self.connection.execute(
+                "SELECT DISTINCT path, mtime_ns, size FROM fonts"
+            )
+        }
+        updated = unchanged = removed = 0
+        errors = []
+        columns = (
+            "path, face, mtime_ns, size, digest, family, style, usweightclass, "
+            f"{', '.join(PANOSE_FIELDS)}, error"
+        )
+        placeholders = ", ".join("?" * (9 + len(PANOSE_FIELDS)))
+        with self.connection:
+            for fontpath in fontpaths:
+                path = os.path.abspath(fontpath)
+                stat = os.stat(path)
+                if indexed.get(path) == (stat.st_mtime_ns, stat.st_size):
+                    unchanged += 1
+                    continue
+                # the rows of a modified font are replaced, including the faces
+                # of a collection with a different number of faces
+                self.connection.execute("DELETE FROM fonts WHERE path = ?", (path,))
+                for entry in read_index_entries(path, stat):
+                    panose_values: List[Optional[int]] = (
+                        list(entry.panose_bytes)
+                        if entry.panose_bytes is not None
+                        else [None] * len(PANOSE_FIELDS)
+                    )
+                    self.connection.execute(
+                        f"INSERT INTO fonts ({columns}) VALUES ({placeholders})",
+                        list(entry[:8]) + panose_values + [entry.error],
+                    )
+                    if entry.error is not None:
+                        errors.append((fontpath, entry.error))
+                indexed[path] = (stat.st_mtime_ns, stat.st_size)
+                updated += 1
+            if prune:
+                for path in list(indexed):
+                    if not os.path.exists(path):
+                        self.connection.execute(
+                            "DELETE FROM fonts WHERE path = ?", (path,)
+                        )
+                        removed += 1
+        return IndexUpdate(updated, unchanged, removed, errors)
+
+    def audit(self, check: str) -> Iterator[Dict[str, Any]]:
+        """Yields the audit records of the fonts that fail an AUDIT_CHECKS
+        check, ordered by family, style, and path."""
+        if check not in AUDIT_CHECKS:
+            raise ValueError(f"unsupported audit check '{check}'")
+        columns = ", ".join(AUDIT_FIELDS)
+        order = "ORDER BY family, style, path, face"
+        if check == "weight-class":
+            expression = _weight_class_expression()
+            query = (
+                f"SELECT {columns} FROM fonts WHERE error IS NULL AND weight NOT IN "
+                f"{UNCLASSIFIED_VALUES} AND weight != {expression} {order}"
+            )
+        else:
+            # the field name is one of the PANOSE_FIELDS column names
+            field = check[len("mixed-") :]  # noqa: E203
+            query = (
+                f"SELECT {columns} FROM fonts WHERE error IS NULL AND family IN "
+                f"(SELECT family FROM fonts WHERE error IS NULL AND family IS NOT "
+                f"NULL GROUP BY family HAVING COUNT(DISTINCT {field}) > 1) {order}"
+            )
+        for row in self.connection.execute(query):
+            yield {field: row[field] for field in AUDIT_FIELDS}
+
+    def __len__(self) -> int:
+        return int(self.connection.execute("SELECT COUNT(*) FROM fonts").fetchone()[0])
+
+    def close(self) -> None:
+        self.connection.close()
+
+
+class AuditRecordWriter(object):
+    def __init__(self, stream: TextIO, fmt: str) -> None:
+        if fmt not in INDEX_FORMATS:
+            raise ValueError(f"unsupported audit format '{fmt}'")
+        self.stream = stream
+        self.csv_writer = None
+        if fmt == "csv":
+            self.csv_writer = csv.writer(stream, lineterminator="\n")
+            self.csv_writer.writerow(AUDIT_FIELDS)
+
+    def write(self, record: Dict[str, Any]) -> None:
+        if self.csv_writer is not None:
+            self.csv_writer.writerow(
+                ["" if record[field] is None else record[field] for field in AUDIT_FIELDS]
+            )
+        else:
+            self.stream.write(json.dumps(record) + "\n")
+
+
+def _add_database_argument(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument(
+        "--database",
+        type=str,
+        default=None,
+        metavar="INDEX_PATH",
+        help=f"index database path (default: the {INDEX_ENVIRONMENT_VARIABLE} "
+        f"environment variable path or {DEFAULT_INDEX_PATH})",
+    )
+
+
+def run_index_update(argv: List[str]) -> None:
+    parser = argparse.ArgumentParser(
+        prog="panosifier index update",
+        description="Index the panose data of new and modified fonts",
+    )
+    _add_database_argument(parser)
+    parser.add_argument(
+        "--prune", action="store_true", help="remove indexed fonts that no longer exist"
+    )
+    parser.add_argument(
+        "-r", "--recursive", action="store_true", help="search directories recursively"
+    )
+    parser.add_argument(
+        "--ext",
+        type=str,
+        required=False,
+        help="comma delimited directory and glob file extension list "
+        f"(default: {','.join(FONT_EXTENSIONS)})",
+    )
+    parser.add_argument("PATH", nargs="+", help="Font file, directory, or glob path")
+    args = parser.parse_args(argv)
+
+    try:
+        extensions = parse_extensions(args.ext) if args.ext else FONT_EXTENSIONS
+        index = PanoseIndex(args.database or get_default_index_path())
+        try:
+            result = index.update(
+                iter_font_paths(
+                    args.PATH, recursive=args.recursive, extensions=extensions
+                ),
+                prune=args.prune,
+            )
+            total = len(index)
+        finally:
+            index.close()
+    except Exception as e:
+        sys.stderr.write(f"[ERROR] {str(e)}{os.linesep}")
+        sys.exit(1)
+
+    for fontpath, error in result.errors:
+        sys.stderr.write(f"[ERROR] '{fontpath}' error: {error}{os.linesep}")
+    print(
+        f"{result.updated} updated, {result.unchanged} unchanged, "
+        f"{result.removed} removed, {len(result.errors)} errors ({total} indexed)"
+    )
+    if result.errors:
+        sys.exit(1)
+
+
+def run_index_audit(argv: List[str]) -> None:
+    parser = argparse.ArgumentParser(
+        prog="panosifier index audit",
+        description="Report the indexed fonts that fail a family consistency check",
+    )
+    _add_database_argument(parser)
+    parser.add_argument(
+        "--format",
+        choices=INDEX_FORMATS,
+        default="ndjson",
+        help="record output format (default: ndjson)",
+    )
+    parser.add_argument("CHECK", choices=AUDIT_CHECKS, help="audit check")
+    args = parser.parse_args(argv)
+
+    index_path = args.database or get_default_index_path()
+    if not os.path.isfile(index_path):
+        sys.stderr.write(f"[ERROR] the index '{index_path}' does not exist{os.linesep}")
+        sys.exit(1)
+    writer = AuditRecordWriter(sys.stdout, args.format)
+    record_count = 0
+    index = PanoseIndex(index_path)
+    try:
+        for record in index.audit(args.CHECK):
+            writer.write(record)
+            record_count += 1
+    finally:
+        index.close()
+
+    if record_count:
+        sys.exit(1)
+
+
+def run_index(argv: List[str]) -> None:
+    commands = {"update": run_index_update, "audit": run_index_audit}
+    if argv[:1] and argv[0] in commands:
+        commands[argv[0]](argv[1:])
+        return
+    parser = argparse.ArgumentParser(
+        prog="panosifier index",
+        description="SQLite index of font library panose data",
+    )
+    parser.add_argument("COMMAND", choices=tuple(commands), help="index command")
+    parser.parse_args(argv[:1])
@@ -0,0 +1,590 @@
+#!/usr/bin/env python3
+
+# Copyright 2020 Source Foundry Authors
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Panose inference from font data.
+
+Candidate Latin Text panose values are computed from the font metrics:
+
+- FamilyType is Latin Text (2) when the font maps the basic Latin letters.
+- Weight is classified by the ratio of the cap height to the vertical stem
+  width of 'H', or by the OS/2 usWeightClass value when the stems cannot be
+  measured.
+- Proportion is Monospaced (9) when the printable ASCII glyphs have the same
+  advance width.  Other fonts are classified by the OS/2 usWidthClass value
+  when the value is not medium width.
+- XHeight is classified by the ratio of the x-height to the cap height.
+
+Fields that cannot be inferred are undefined and are not written to fonts.
+
+The cmap, hmtx, and glyph data are read from the raw table data with NumPy
+array operations, and only the outlines of the measured glyphs are decoded.
+The time of an inference does not grow with the number of glyphs in the
+font.  The metrics of a family of fonts are classified in one batch.
+Inference requires the numpy package.
+"""
+
+import struct
+from typing import (
+    Any,
+    BinaryIO,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    NamedTuple,
+    Sequence,
+    Tuple,
+    Union,
+)
+
+from fontTools.cffLib import PrivateDictDecompiler, TopDictDecompiler  # type: ignore
+from fontTools.misc.psCharStrings import T2CharString  # type: ignore
+from fontTools.pens.basePen import BasePen  # type: ignore
+from fontTools.ttLib import TTFont  # type: ignore
+from fontTools.ttLib.sfnt import SFNTReader  # type: ignore
+from fontTools.ttLib.tables._g_l_y_f import Glyph  # type: ignore
+
+from .classes import (
+    LATIN_TEXT_FAMILY_TYPE,
+    MONOSPACED_PROPORTION,
+    WEIGHT_CLASS_BINS,
+    WIDTH_CLASS_PROPORTIONS,
+)
+from .datastructures import (
+    PANOSE_FIELDS,
+    Panose,
+    override_panose,
+)
+from .edit import EditResult, FontEditItem
+from .sfnt import COLLECTION_TAG, UnsupportedFormatError
+
+# number of fonts that are classified in one batch
+INFER_BATCH_SIZE = 256
+
+# PANOSE Latin Text weight classes by the ratio of the cap height to the stem
+# width, from Extra Black (11) below 2.0 to Very Light (2) at 35.0 or more
+WEIGHT_RATIO_BINS = (2.0, 2.5, 3.5, 4.5, 5.5, 7.5, 10.0, 18.0, 35.0)
+# ratio of the x-height to the cap height of the Constant/Small,
+# Constant/Standard, and Constant/Large (2 - 4) x-height classes
+XHEIGHT_RATIO_BINS = (0.5, 0.66)
+
+# stems are measured at these fractions of the cap height, above the serifs
+# and away from the crossbar of 'H'
+STEM_HEIGHTS = (0.25, 0.75)
+# number of line segments of each flattened curve
+CURVE_SEGMENTS = 8
+
+PRINTABLE_ASCII = range(0x21, 0x7F)
+LATIN_LETTERS = "ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz"
+
+
+class FontMetrics(NamedTuple):
+    weight_class: int
+    width_class: int
+    # x-height and cap height in font units, 0 when unknown
+    x_height: int
+    cap_height: int
+    # vertical stem width of 'H' in font units, 0 when unknown
+    stem_width: float
+    # True when the printable ASCII glyphs have the same advance width
+    monospaced: bool
+    # True when the font maps the basic Latin letters
+    latin: bool
+
+
+def _import_numpy() -> Any:
+    try:
+        import numpy  # type: ignore
+    except ImportError:
+        raise ValueError(
+            "panose inference requires the numpy package (pip install "
+            "panosifier[infer])"
+        )
+    return numpy
+
+
+def _read_tables(f: BinaryIO) -> Any:
+    # returns a fontTools SFNTReader of sfnt, WOFF, and WOFF2 fonts.  The
+    # reader returns raw table data and does not decompile tables.
+    f.seek(0)
+    if f.read(4) == COLLECTION_TAG:
+        raise UnsupportedFormatError("panose inference does not support font collections")
+    f.seek(0)
+    return SFNTReader(f)
+
+
+def _get_table(reader: Any, tag: str) -> bytes:
+    if tag not in reader:
+        raise ValueError(f"font does not include a '{tag}' table")
+    return reader[tag]
+
+
+def lookup_cmap(np: Any, cmap: bytes, codepoints: Any) -> Any:
+    """Returns the glyph IDs of the codepoints array in the Unicode format 12 or
+    format 4 cmap subtable of the cmap table data.  Unmapped codepoints have
+    glyph ID 0."""
+    (num_tables,) = struct.unpack_from(">H", cmap, 2)
+    subtables = {}
+    for i in range(num_tables):
+        platform_id, encoding_id, offset = struct.unpack_from(">HHL", cmap, 4 + i * 8)
+        (fmt,) = struct.unpack_from(">H", cmap, offset)
+        subtables[(platform_id, encoding_id, fmt)] = offset
+    for key in ((3, 10, 12), (0, 4, 12), (0, 6, 12), (3, 1, 4), (0, 3, 4)):
+        if key in subtables:
+            offset = subtables[key]
+            if key[2] == 12:
+                return _lookup_cmap_format_12(np, cmap, offset, codepoints)
+            return _lookup_cmap_format_4(np, cmap, offset, codepoints)
+    raise ValueError("font does not include a Unicode cmap subtable")
+
+
+def _lookup_cmap_format_12(np: Any, cmap: bytes, offset: int, codepoints: Any) -> Any:
+    (num_groups,) = struct.unpack_from(">L", cmap, offset + 12)
+    groups = np.frombuffer(cmap, ">u4", num_groups * 3, offset + 16).reshape(-1, 3)
+    starts = groups[:, 0].astype(np.int64)
+    ends = groups[:, 1].astype(np.int64)
+    start_glyph_ids = groups[:, 2].astype(np.int64)
+    index = np.minimum(np.searchsorted(ends, codepoints), num_groups - 1)
+    mapped = (codepoints <= ends[index]) & (codepoints >= starts[index])
+    return np.where(mapped, start_glyph_ids[index] + codepoints - starts[index], 0)
+
+
+def _lookup_cmap_format_4(np: Any, cmap: bytes, offset: int, codepoints: Any) -> Any:
+    (seg_count_x2,) = struct.unpack_from(">H", cmap, offset + 6)
+    seg_count = seg_count_x2 // 2
+    ends_offset = offset + 14
+    starts_offset = ends_offset + seg_count_x2 + 2
+    deltas_offset = starts_offset + seg_count_x2
+    range_offsets_offset = deltas_offset + seg_count_x2
+    ends = np.frombuffer(cmap, ">u2", seg_count, ends_offset).astype(np.int64)
+    starts = np.frombuffer(cmap, ">u2", seg_count, starts_offset).astype(np.int64)
+    deltas = np.frombuffer(cmap, ">u2", seg_count, deltas_offset).astype(np.int64)
+    range_offsets = np.frombuffer(cmap, ">u2", seg_count, range_offsets_offset).astype(
+        np.int64
+    )
+
+    index = np.minimum(np.searchsorted(ends, codepoints), seg_count - 1)
+    mapped = (codepoints <= ends[index]) & (codepoints >= starts[index])
+    delta = deltas[index]
+    range_offset = range_offsets[index]
+    # idRangeOffset values are byte offsets from the idRangeOffset value to
+    # the glyphIdArray value of the segment start
+    address = (
+        range_offsets_offset + 2 * index + range_offset + 2 * (codepoints - starts[index])
+    )
+    data = np.frombuffer(cmap, np.uint8)
+    in_range = mapped & (range_offset != 0) & (address + 1 < len(data))
+    address = np.where(in_range, address, 0)
+    glyph_array_ids = (data[address].astype(np.int64) << 8) | data[address + 1]
+    glyph_array_ids = np.where(
+        in_range & (glyph_array_ids != 0), (glyph_array_ids + delta) & 0xFFFF, 0
+    )
+    glyph_ids = np.where(
+        range_offset == 0, (codepoints + delta) & 0xFFFF, glyph_array_ids
+    )
+    return np.where(mapped, glyph_ids, 0)
+
+
+def get_advance_widths(np: Any, hmtx: bytes, num_h_metrics: int, glyph_ids: Any) -> Any:
+    """Returns the advance widths of the glyph_ids array in the hmtx table data.
+    Glyphs after the last long metric record have the last advance width."""
+    if num_h_metrics < 1:
+        raise ValueError("font does not include horizontal metrics")
+    advances = np.frombuffer(hmtx, ">u2", num_h_metrics * 2)[::2]
+    return advances[np.minimum(glyph_ids, num_h_metrics - 1)]
+
+
+class PolylinePen(BasePen):  # type: ignore
+    """Pen that records the glyph contours as closed polylines with flattened
+    curves."""
+
+    def __init__(self) -> None:
+        super().__init__(None)
+        self.contours: List[List[Tuple[float, float]]] = []
+        self.points: List[Tuple[float, float]] = []
+
+    def _moveTo(self, pt: Tuple[float, float]) -> None:
+        self.points = [pt]
+
+    def _lineTo(self, pt: Tuple[float, float]) -> None:
+        self.points.append(pt)
+
+    def _curveToOne(self, pt1: Any, pt2: Any, pt3: Any) -> None:
+        x0, y0 = self._getCurrentPoint()
+        for i in range(1, CURVE_SEGMENTS + 1):
+            t = i / CURVE_SEGMENTS
+            u = 1 - t
+            a, b, c, d = u * u * u, 3 * u * u * t, 3 * u * t * t, t * t * t
+            self.points.append(
+                (
+                    a * x0 + b * pt1[0] + c * pt2[0] + d * pt3[0],
+                    a * y0 + b * pt1[1] + c * pt2[1] + d * pt3[1],
+                )
+            )
+
+    def _qCurveToOne(self, pt1: Any, pt2: Any) -> None:
+        x0, y0 = self._getCurrentPoint()
+        for i in range(1, CURVE_SEGMENTS + 1):
+            t = i / CURVE_SEGMENTS
+            u = 1 - t
+            a, b, c = u * u, 2 * u * t, t * t
+            self.points.append(
+                (a * x0 + b * pt1[0] + c * pt2[0], a * y0 + b * pt1[1] + c * pt2[1])
+            )
+
+    def _closePath(self) -> None:
+        if len(self.points) > 1:
+            self.contours.append(self.points)
+        self.points = []
+
+    _endPath = _closePath
+
+
+class _NoStrings(object):
+    # string operands of the CFF DICTs are not used, and the String INDEX is
+    # not read
+    def __getitem__(self, sid: int) -> None:
+        return None
+
+
+class _CffIndex(object):
+    """CFF INDEX at offset in the CFF table data.  The item offsets are read
+    on item access."""
+
+    def __init__(self, data: bytes, offset: int) -> None:
+        self.data = data
+        (self.count,) = struct.unpack_from(">H", data, offset)
+        self.offset = offset
+        self.end = offset + 2
+        if self.count:
+            self.off_size = data[offset + 2]
+            # the item data follow the count + 1 offsets.  Offsets are 1 based.
+            self.data_offset = offset + 3 + (self.count + 1) * self.off_size - 1
+            self.end = self.data_offset + self._get_offset(self.count)
+
+    def __len__(self) -> int:
+        return self.count
+
+    def _get_offset(self, i: int) -> int:
+        start = self.offset + 3 + i * self.off_size
+        end = start + self.off_size
+        return int.from_bytes(self.data[start:end], "big")
+
+    def get_item(self, i: int) -> bytes:
+        if not 0 <= i < self.count:
+            raise ValueError(f"CFF INDEX item {i} is out of range")
+        start = self.data_offset + self._get_offset(i)
+        end = self.data_offset + self._get_offset(i + 1)
+        return self.data[start:end]
+
+
+class _CffSubrs(_CffIndex):
+    # subroutine charstrings are decoded when the glyph charstring calls them
+    def __getitem__(self, i: int) -> Any:
+        return T2CharString(self.get_item(i))
+
+
+class _CffPrivate(NamedTuple):
+    # the Private DICT values that T2CharString.draw reads
+    Subrs: Any
+    nominalWidthX: float
+    defaultWidthX: float
+
+
+def _decompile_cff_dict(decompiler_class: Any, data: bytes) -> Dict[str, Any]:
+    decompiler = decompiler_class(_NoStrings())
+    decompiler.decompile(data)
+    return decompiler.getDict()
+
+
+def _read_cff_private(data: bytes, private: Any) -> _CffPrivate:
+    size, offset = private
+    end = offset + size
+    values = _decompile_cff_dict(PrivateDictDecompiler, data[offset:end])
+    # the Subrs offset is relative to the Private DICT
+    subrs: Any = _CffSubrs(data, offset + values["Subrs"]) if "Subrs" in values else []
+    return _CffPrivate(
+        subrs, values.get("nominalWidthX", 0), values.get("defaultWidthX", 0)
+    )
+
+
+def _read_fd_select(np: Any, data: bytes, offset: int, glyph_id: int) -> int:
+    fd_select_format = data[offset]
+    if fd_select_format == 0:
+        return data[offset + 1 + glyph_id]
+    if fd_select_format == 3:
+        (num_ranges,) = struct.unpack_from(">H", data, offset + 1)
+        ranges = np.frombuffer(
+            data,
+            dtype=np.dtype([("first", ">u2"), ("fd", "u1")]),
+            count=num_ranges,
+            offset=offset + 3,
+        )
+        i = np.searchsorted(ranges["first"], glyph_id, side="right") - 1
+        return int(ranges["fd"][i])
+    raise ValueError(f"unsupported CFF FDSelect format {fd_select_format}")
+
+
+def _draw_cff_glyph(np: Any, data: bytes, glyph_id: int, pen: Any) -> None:
+    # only the INDEX headers, the Top DICT, the Private DICT, and the
+    # charstrings of glyph_id and the subroutines that it calls are read.
+    # The Name, String, and charset data are not decoded.
+    names = _CffIndex(data, data[2])
+    top_dicts = _CffIndex(data, names.end)
+    strings = _CffIndex(data, top_dicts.end)
+    global_subrs = _CffSubrs(data, strings.end)
+    top = _decompile_cff_dict(TopDictDecompiler, top_dicts.get_item(0))
+    if "CharStrings" not in top:
+        raise ValueError("CFF font does not include charstrings")
+    charstrings = _CffIndex(data, top["CharStrings"])
+    if "FDArray" in top and "FDSelect" in top:
+        # CID-keyed fonts have a Private DICT for each Font DICT
+        fd_index = _read_fd_select(np, data, top["FDSelect"], glyph_id)
+        top = _decompile_cff_dict(
+            TopDictDecompiler, _CffIndex(data, top["FDArray"]).get_item(fd_index)
+        )
+    if "Private" not in top:
+        raise ValueError("CFF font does not include a Private DICT")
+    charstring = T2CharString(
+        charstrings.get_item(glyph_id),
+        private=_read_cff_private(data, top["Private"]),
+        globalSubrs=global_subrs,
+    )
+    charstring.draw(pen)
+
+
+def _get_glyph_contours(
+    np: Any, f: BinaryIO, reader: Any, glyph_ids: Sequence[int]
+) -> List[List[List[Tuple[float, float]]]]:
+    # returns the flattened contours of each glyph in glyph_ids.  Only the
+    # glyph data of glyph_ids are decoded.  Composite glyphs are not measured.
+    pens = [PolylinePen() for _ in glyph_ids]
+    if "glyf" in reader and "loca" in reader:
+        (loca_format,) = struct.unpack_from(">h", _get_table(reader, "head"), 50)
+        loca = reader["loca"]
+        glyf = reader["glyf"]
+        for glyph_id, pen in zip(glyph_ids, pens):
+            if loca_format:
+                start, end = struct.unpack_from(">LL", loca, glyph_id * 4)
+            else:
+                start, end = (
+                    2 * value for value in struct.unpack_from(">HH", loca, glyph_id * 2)
+                )
+            data = glyf[start:end]
+            if len(data) >= 2 and struct.unpack_from(">h", data, 0)[0] > 0:
+                Glyph(data).draw(pen, None)
+    elif "CFF " in reader:
+        cff = reader["CFF "]
+        for glyph_id, pen in zip(glyph_ids, pens):
+            _draw_cff_glyph(np, cff, glyph_id, pen)
+    elif "CFF2" in reader:
+        # CFF2 fonts are drawn with the fontTools glyph set
+        f.seek(0)
+        tt = TTFont(f, lazy=True)
+        glyph_set = tt.getGlyphSet()
+        for glyph_id, pen in zip(glyph_ids, pens):
+            glyph_set[tt.getGlyphName(glyph_id)].draw(pen)
+    return [pen.contours for pen in pens]
+
+
+def measure_stem_width(
+    np: Any, contours: List[List[Tuple[float, float]]], y: float
+) -> Any:
+    """Returns the widths of the filled runs of the contours along the
+    horizontal line at y.  Runs are filled with the nonzero winding rule."""
+    if not contours:
+        return np.zeros(0)
+    points = [np.asarray(contour, dtype=float) for contour in contours]
+    start = np.concatenate(points)
+    end = np.concatenate([np.roll(contour, -1, axis=0) for contour in points])
+    x0, y0 = start[:, 0], start[:, 1]
+    x1, y1 = end[:, 0], end[:, 1]
+    crossing = (y0 <= y) != (y1 <= y)
+    x0, y0, x1, y1 = x0[crossing], y0[crossing], x1[crossing], y1[crossing]
+    xs = x0 + (y - y0) * (x1 - x0) / (y1 - y0)
+    order = np.argsort(xs, kind="stable")
+    xs = xs[order]
+    winding = np.cumsum(np.where(y1 > y0, 1, -1)[order])
+    filled = np.concatenate(([0], (winding[:-1] != 0).astype(np.int8), [0]))
+    edges = np.diff(filled)
+    return xs[np.flatnonzero(edges == -1)] - xs[np.flatnonzero(edges == 1)]
+
+
+def read_font_metrics(f: BinaryIO) -> FontMetrics:
+    """Reads the panose inference metrics of a font file object."""
+    np = _import_numpy()
+    reader = _read_tables(f)
+    os2 = _get_table(reader, "OS/2")
+    version, _, weight_class, width_class = struct.unpack_from(">HhHH", os2, 0)
+    x_height = cap_height = 0
+    if version >= 2 and len(os2) >= 90:
+        x_height, cap_height = struct.unpack_from(">hh", os2, 86)
+    (num_h_metrics,) = struct.unpack_from(">H", _get_table(reader, "hhea"), 34)
+
+    codepoints = np.arange(PRINTABLE_ASCII.start, PRINTABLE_ASCII.stop)
+    glyph_ids = lookup_cmap(np, _get_table(reader, "cmap"), codepoints)
+    letters = np.frombuffer(LATIN_LETTERS.encode("ascii"), np.uint8) - codepoints[0]
+    latin = bool(np.all(glyph_ids[letters] != 0))
+    monospaced = False
+    stem_width = 0.0
+    if latin:
+        advances = get_advance_widths(
+            np, _get_table(reader, "hmtx"), num_h_metrics, glyph_ids[glyph_ids != 0]
+        )
+        monospaced = bool(advances.min() == advances.max())
+
+        first = PRINTABLE_ASCII.start
+        h_contours, x_contours = _get_glyph_contours(
+            np, f, reader, [int(glyph_ids[ord(char) - first]) for char in "Hx"]
+        )
+        if cap_height <= 0 and h_contours:
+            cap_height = int(round(max(y for contour in h_contours for _, y in contour)))
+        if x_height <= 0 and x_contours:
+            x_height = int(round(max(y for contour in x_contours for _, y in contour)))
+        if cap_height > 0:
+            widths = np.concatenate(
+                [
+                    measure_stem_width(np, h_contours, cap_height * height)
+                    for height in STEM_HEIGHTS
+                ]
+            )
+            if len(widths):
+                stem_width = float(np.median(widths))
+    return FontMetrics(
+        weight_class,
+        width_class,
+        max(x_height, 0),
+        max(cap_height, 0),
+        stem_width,
+        monospaced,
+        latin,
+    )
+
+
+def classify_metrics(metrics: Sequence[FontMetrics]) -> List[Panose]:
+    """Returns the inferred Panose of each FontMetrics.  The metrics are
+    classified with array operations across all fonts."""
+    np = _import_numpy()
+    if not metrics:
+        return []
+    columns = np.array(
+        [
+            (
+                m.weight_class,
+                m.width_class,
+                m.x_height,
+                m.cap_height,
+                m.stem_width,
+                m.monospaced,
+                m.latin,
+            )
+            for m in metrics
+        ],
+        dtype=float,
+    )
+    weight_class, width_class, x_height, cap_height, stem_width = columns[:, :5].T
+    monospaced = columns[:, 5] != 0
+    latin = columns[:, 6] != 0
+    data = np.zeros((len(metrics), len(PANOSE_FIELDS)), dtype=np.uint8)
+    defined = np.zeros((len(metrics), len(PANOSE_FIELDS)), dtype=bool)
+
+    data[:, 0] = LATIN_TEXT_FAMILY_TYPE
+    defined[:, 0] = latin
+
+    measured = (stem_width > 0) & (cap_height > 0)
+    weight_ratio = cap_height / np.where(measured, stem_width, 1.0)
+    data[:, 2] = np.where(
+        measured,
+        11 - np.digitize(weight_ratio, WEIGHT_RATIO_BINS),
+        2 + np.digitize(weight_class, WEIGHT_CLASS_BINS),
+    )
+    defined[:, 2] = measured | (weight_class > 0)
+
+    width_index = np.clip(width_class, 0, len(WIDTH_CLASS_PROPORTIONS) - 1).astype(int)
+    proportion = np.where(
+        monospaced,
+        MONOSPACED_PROPORTION,
+        np.asarray(WIDTH_CLASS_PROPORTIONS)[width_index],
+    )
+    data[:, 3] = proportion
+    defined[:, 3] = proportion != 0
+
+    known_heights = (x_height > 0) & (cap_height > 0)
+    x_ratio = x_height / np.where(known_heights, cap_height, 1.0)
+    data[:, 9] = 2 + np.digitize(x_ratio, XHEIGHT_RATIO_BINS)
+    defined[:, 9] = known_heights
+
+    masks = defined.astype(np.int64) @ (1 << np.arange(len(PANOSE_FIELDS)))
+    return [Panose.from_bytes(row.tobytes(), int(mask)) for row, mask in zip(data, masks)]
+
+
+def infer_panose(fontpath: str) -> Panose:
+    """Returns the inferred Panose of the font at fontpath."""
+    with open(fontpath, "rb") as f:
+        return classify_metrics([read_font_metrics(f)])[0]
+
+
+def infer_family_panose(fontpaths: Sequence[str]) -> List[Panose]:
+    """Returns the inferred Panose of each font in fontpaths.  The fonts are
+    classified in one batch."""
+    metrics = []
+    for fontpath in fontpaths:
+        with open(fontpath, "rb") as f:
+            metrics.append(read_font_metrics(f))
+    return classify_metrics(metrics)
+
+
+def iter_inferred_edits(
+    edits: Iterable[FontEditItem],
+    overrides: Panose,
+    batch_size: int = INFER_BATCH_SIZE,
+) -> Iterator[FontEditItem]:
+    """Yields edits with the inferred Panose of each font and the defined
+    fields of overrides.  Fonts are classified in batches of batch_size fonts,
+    and fonts that cannot be read are yielded as error EditResult items."""
+    _import_numpy()
+    # (edit, FontMetrics or read error message) items, None for EditResult
+    # items
+    pending: List[Tuple[FontEditItem, Union[FontMetrics, str, None]]] = []
+    for item in edits:
+        metrics: Union[FontMetrics, str, None] = None
+        if not isinstance(item, EditResult):
+            try:
+                with open(item[0], "rb") as f:
+                    metrics = read_font_metrics(f)
+            except Exception as e:
+                metrics = str(e)
+        pending.append((item, metrics))
+        if len(pending) >= batch_size:
+            yield from _classify_pending(pending, overrides)
+            pending = []
+    yield from _classify_pending(pending, overrides)
+
+
+def _classify_pending(
+    pending: List[Tuple[FontEditItem, Union[FontMetrics, str, None]]],
+    overrides: Panose,
+) -> Iterator[FontEditItem]:
+    inferred = iter(
+        classify_metrics([m for _, m in pending if isinstance(m, FontMetrics)])
+    )
+    for item, metrics in pending:
+        if isinstance(metrics, FontMetrics):
+            yield item[0], override_panose(next(inferred), overrides)
+        elif metrics is None:
+            yield item
+        else:
+            yield EditResult(item[0], None, False, f"panose inference failed: {metrics}")
@@ -0,0 +1,429 @@
+#!/usr/bin/env python3
+
+# Copyright 2020 Source Foundry Authors
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Panose data of the named instances of variable fonts.
+
+The panose data of each fvar named instance are derived from the OS/2 table
+panose data of the default instance and the instance axis coordinates:
+
+- Weight is classified by the wght axis coordinate on the usWeightClass
+  scale.
+- Proportion is classified by the wdth axis coordinate on the usWidthClass
+  scale.  Medium widths keep the default proportion unless it is a width
+  proportion, which is reset to Any (0).
+- Letterform is switched between the Normal (2 - 8) and Oblique (9 - 15)
+  forms of the default roundness by the slnt and ital axis coordinates.
+
+Fields are derived for Latin Text fonts and fonts with the Any (0) family
+type only.  Instance coordinates are also reported in normalized design
+space through the avar segment maps.  Only the sfnt table directory and the
+OS/2, fvar, avar, and name tables are read, and fontTools is not imported.
+"""
+
+import argparse
+import bisect
+import csv
+import json
+import os
+import struct
+import sys
+from typing import Any, BinaryIO, Dict, List, NamedTuple, Optional, TextIO
+
+from .classes import (
+    LATIN_TEXT_FAMILY_TYPE,
+    MONOSPACED_PROPORTION,
+    WEIGHT_CLASS_BINS,
+    WIDTH_CLASS_PROPORTIONS,
+)
+from .datastructures import (
+    PANOSE_FIELDS,
+    Panose,
+)
+from .discovery import FONT_EXTENSIONS, iter_font_paths, parse_extensions
+from .sfnt import get_name, get_os2_panose_bytes
+from .woff import read_font_tables
+
+INSTANCE_FORMATS = ("ndjson", "csv", "manifest")
+INSTANCE_FIELDS = (
+    ("path", "instance", "postscriptname", "coordinates", "normalized")
+    + PANOSE_FIELDS
+    + ("error",)
+)
+INSTANCE_TABLE_TAGS = ("OS/2", "fvar", "avar", "name")
+# default manifest path of instance fonts, relative to the variable font
+# directory
+DEFAULT_INSTANCE_PATH = "{family}-{instance}{ext}"
+
+FVAR_HEADER_FORMAT = ">HHHHHHHH"
+FVAR_AXIS_FORMAT = ">4slllHH"
+FVAR_AXIS_SIZE = struct.calcsize(FVAR_AXIS_FORMAT)
+# OS/2 usWidthClass 1 - 9 wdth axis percentages
+WIDTH_CLASS_PERCENTAGES = (50.0, 62.5, 75.0, 87.5, 100.0, 112.5, 125.0, 150.0, 200.0)
+MEDIUM_WIDTH_CLASS = 5
+# the Oblique letterforms follow the Normal letterforms of the same roundness
+OBLIQUE_LETTERFORM_OFFSET = 7
+NORMAL_LETTERFORMS = range(2, 9)
+OBLIQUE_LETTERFORMS = range(9, 16)
+
+
+class VariationAxis(NamedTuple):
+    tag: str
+    minimum: float
+    default: float
+    maximum: float
+
+
+class NamedInstance(NamedTuple):
+    name: str
+    postscript_name: Optional[str]
+    # user space coordinates mapped by axis tag
+    coordinates: Dict[str, float]
+    # normalized design space coordinates after the avar mapping
+    normalized: Dict[str, float]
+    panose: Panose
+
+
+def _fixed_to_float(value: int) -> float:
+    return round(value / 0x10000, 4)
+
+
+def _f2dot14_to_float(value: int) -> float:
+    return value / 0x4000
+
+
+def read_avar_segment_maps(avar: bytes) -> List[List[Any]]:
+    """Returns the (from, to) normalized coordinate pairs of each axis segment
+    map in avar table data."""
+    (axis_count,) = struct.unpack_from(">H", avar, 6)
+    segment_maps = []
+    offset = 8
+    for _ in range(axis_count):
+        (position_map_count,) = struct.unpack_from(">H", avar, offset)
+        values = struct.unpack_from(f">{2 * position_map_count}h", avar, offset + 2)
+        segment_maps.append(
+            [
+                (_f2dot14_to_float(values[i]), _f2dot14_to_float(values[i + 1]))
+                for i in range(0, len(values), 2)
+            ]
+        )
+        offset += 2 + 4 * position_map_count
+    return segment_maps
+
+
+def normalize_coordinate(
+    value: float, axis: VariationAxis, segment_map: Optional[List[Any]] = None
+) -> float:
+    """Returns the normalized design space coordinate of a user space axis
+    coordinate, mapped through the avar segment_map when it is defined."""
+    value = min(max(value, axis.minimum), axis.maximum)
+    if value < axis.default:
+        normalized = (value - axis.default) / (axis.default - axis.minimum)
+    elif value > axis.default:
+        normalized = (value - axis.default) / (axis.maximum - axis.default)
+    else:
+        normalized = 0.0
+    if segment_map:
+        for (from_start, to_start), (from_end, to_end) in zip(
+            segment_map, segment_map[1:]
+        ):
+            if from_start <= normalized <= from_end:
+                if from_end == from_start:
+                    normalized = to_start
+                else:
+                    normalized = to_start + (to_end - to_start) * (
+                        normalized - from_start
+                    ) / (from_end - from_start)
+                break
+    # normalized coordinates are F2Dot14 values in fonts
+    return round(normalized * 0x4000) / 0x4000
+
+
+def get_instance_panose(default: Panose, coordinates: Dict[str, float]) -> Panose:
+    """Returns the panose data of an instance at the user space axis
+    coordinates of a variable font with the default instance panose data."""
+    if default.familytype not in (0, LATIN_TEXT_FAMILY_TYPE):
+        return default
+    fields = {}
+    if "wght" in coordinates:
+        fields["weight"] = 2 + bisect.bisect_right(WEIGHT_CLASS_BINS, coordinates["wght"])
+    if "wdth" in coordinates and default.proportion != MONOSPACED_PROPORTION:
+        width = coordinates["wdth"]
+        width_class = 1 + min(
+            range(len(WIDTH_CLASS_PERCENTAGES)),
+            key=lambda i: abs(WIDTH_CLASS_PERCENTAGES[i] - width),
+        )
+        if width_class != MEDIUM_WIDTH_CLASS:
+            fields["proportion"] = WIDTH_CLASS_PROPORTIONS[width_class]
+        elif default.proportion in set(WIDTH_CLASS_PROPORTIONS) - {0}:
+            fields["proportion"] = 0
+    if "slnt" in coordinates or "ital" in coordinates:
+        oblique = coordinates.get("slnt", 0.0) != 0 or coordinates.get("ital", 0.0) >= 0.5
+        letterform = default.letterform
+        if oblique and letterform in NORMAL_LETTERFORMS:
+            fields["letterform"] = letterform + OBLIQUE_LETTERFORM_OFFSET
+        elif not oblique and letterform in OBLIQUE_LETTERFORMS:
+            fields["letterform"] = letterform - OBLIQUE_LETTERFORM_OFFSET
+    if not fields:
+        return default
+    return Panose.from_bytes(Panose(**fields).set_panose_bytes(default.to_bytes()))
+
+
+def read_named_instances(f: BinaryIO) -> List[NamedInstance]:
+    """Returns the NamedInstance of each fvar named instance of a variable font
+    file object.  Raises ValueError when the font does not include an fvar
+    table."""
+    tables = read_font_tables(f, INSTANCE_TABLE_TAGS)
+    for tag in ("OS/2", "fvar"):
+        if tag not in tables:
+            raise ValueError(f"font does not include a '{tag}' table")
+    default = Panose.from_bytes(get_os2_panose_bytes(tables["OS/2"]))
+    fvar = tables["fvar"]
+    (
+        _,
+        _,
+        axes_offset,
+        _,
+        axis_count,
+        axis_size,
+        instance_count,
+        instance_size,
+    ) = struct.unpack_from(FVAR_HEADER_FORMAT, fvar, 0)
+    if axis_size != FVAR_AXIS_SIZE:
+        raise ValueError(f"unsupported fvar axis record size {axis_size}")
+    axes = []
+    for i in range(axis_count):
+        tag, minimum, default_value, maximum, _, _ = struct.unpack_from(
+            FVAR_AXIS_FORMAT, fvar, axes_offset + i * axis_size
+        )
+        axes.append(
+            VariationAxis(
+                tag.decode("latin-1"),
+                _fixed_to_float(minimum),
+                _fixed_to_float(default_value),
+                _fixed_to_float(maximum),
+            )
+        )
+    segment_maps: List[Optional[List[Any]]] = [None] * axis_count
+    if "avar" in tables:
+        avar_maps = read_avar_segment_maps(tables["avar"])
+        if len(avar_maps) != axis_count:
+            raise ValueError("avar and fvar table axis counts do not match")
+        segment_maps = list(avar_maps)
+
+    name = tables.get("name")
+    instances: List[NamedInstance] = []
+    # instance records have an optional postScriptNameID
+    has_postscript_names = instance_size >= axis_count * 4 + 6
+    offset = axes_offset + axis_count * axis_size
+    for _ in range(instance_count):
+        subfamily_name_id, _ = struct.unpack_from(">HH", fvar, offset)
+        values = struct.unpack_from(f">{axis_count}l", fvar, offset + 4)
+        postscript_name = None
+        if has_postscript_names:
+            (postscript_name_id,) = struct.unpack_from(
+                ">H", fvar, offset + 4 + axis_count * 4
+            )
+            if name is not None and postscript_name_id != 0xFFFF:
+                postscript_name = get_name(name, postscript_name_id)
+        instance_name = get_name(name, subfamily_name_id) if name is not None else None
+        coordinates = {
+            axis.tag: _fixed_to_float(value) for axis, value in zip(axes, values)
+        }
+        instances.append(
+            NamedInstance(
+                instance_name or f"instance{len(instances)}",
+                postscript_name,
+                coordinates,
+                {
+                    axis.tag: normalize_coordinate(
+                        coordinates[axis.tag], axis, segment_map
+                    )
+                    for axis, segment_map in zip(axes, segment_maps)
+                },
+                get_instance_panose(default, coordinates),
+            )
+        )
+        offset += instance_size
+    return instances
+
+
+def read_font_named_instances(fontpath: str) -> List[NamedInstance]:
+    with open(fontpath, "rb") as f:
+        return read_named_instances(f)
+
+
+def get_instance_path(fontpath: str, instance: NamedInstance, template: str) -> str:
+    """Returns the instance font path of the template with the {family},
+    {stem}, {instance}, {postscriptname}, and {ext} fields.  The template
+    is relative to the variable font directory, and the returned path is
+    absolute so that manifests resolve it from any manifest directory."""
+    stem, ext = os.path.splitext(os.path.basename(fontpath))
+    # variable font file names commonly end with the axis tags in brackets,
+    # e.g., Family[wdth,wght].ttf
+    family = stem.split("[")[0].rstrip("-_ ") or stem
+    instance_name = "".join(instance.name.split())
+    path = template.format(
+        family=family,
+        stem=stem,
+        instance=instance_name,
+        postscriptname=instance.postscript_name or f"{family}-{instance_name}",
+        ext=ext,
+    )
+    return os.path.abspath(os.path.join(os.path.dirname(fontpath), path))
+
+
+def _format_coordinates(coordinates: Dict[str, float]) -> str:
+    return " ".join(f"{tag}={value:g}" for tag, value in coordinates.items())
+
+
+class InstanceRecordWriter(object):
+    def __init__(
+        self, stream: TextIO, fmt: str, instance_path: str = DEFAULT_INSTANCE_PATH
+    ) -> None:
+        if fmt not in INSTANCE_FORMATS:
+            raise ValueError(f"unsupported instance format '{fmt}'")
+        self.stream = stream
+        self.fmt = fmt
+        self.instance_path = instance_path
+        self.entry_count = 0
+        self.csv_writer = None
+        if fmt == "csv":
+            self.csv_writer = csv.writer(stream, lineterminator="\n")
+            self.csv_writer.writerow(INSTANCE_FIELDS)
+
+    def write(self, fontpath: str, instance: NamedInstance) -> None:
+        if self.fmt == "manifest":
+            entry = {
+                "path": get_instance_path(fontpath, instance, self.instance_path),
+                "panose": list(instance.panose.to_bytes()),
+            }
+            separator = "," if self.entry_count else "["
+            self.stream.write(f"{separator}\n    {json.dumps(entry)}")
+            self.entry_count += 1
+            return
+        record: Dict[str, Any] = {
+            "path": fontpath,
+            "instance": instance.name,
+            "postscriptname": instance.postscript_name,
+            "coordinates": instance.coordinates,
+            "normalized": instance.normalized,
+        }
+        record.update(instance.panose.as_dict())
+        record["error"] = None
+        self.write_record(record)
+
+    def write_error(self, fontpath: str, error: str) -> None:
+        if self.fmt == "manifest":
+            sys.stderr.write(f"[ERROR] '{fontpath}' error: {error}{os.linesep}")
+            return
+        record: Dict[str, Any] = {field: None for field in INSTANCE_FIELDS}
+        record["path"] = fontpath
+        record["error"] = error
+        self.write_record(record)
+
+    def write_record(self, record: Dict[str, Any]) -> None:
+        if self.csv_writer is not None:
+            row = []
+            for field in INSTANCE_FIELDS:
+                value = record[field]
+                if isinstance(value, dict):
+                    value = _format_coordinates(value)
+                row.append("" if value is None else value)
+            self.csv_writer.writerow(row)
+        else:
+            self.stream.write(json.dumps(record) + "\n")
+
+    def close(self) -> None:
+        if self.fmt == "manifest":
+            self.stream.write("\n]\n" if self.entry_count else "[]\n")
+
+
+def run_instances(argv: List[str]) -> None:
+    parser = argparse.ArgumentParser(
+        prog="panosifier instances",
+        description="Panose data report of the named instances of variable fonts",
+    )
+    parser.add_argument(
+        "--format",
+        choices=INSTANCE_FORMATS,
+        default="ndjson",
+        help="record output format, or a JSON manifest of the instance font paths "
+        "(default: ndjson)",
+    )
+    parser.add_argument(
+        "--instance-path",
+        type=str,
+        default=DEFAULT_INSTANCE_PATH,
+        metavar="TEMPLATE",
+        help="manifest instance font path relative to the variable font directory "
+        "with {family}, {stem}, {instance}, {postscriptname}, and {ext} fields "
+        f"(default: {DEFAULT_INSTANCE_PATH})",
+    )
+    parser.add_argument(
+        "-r", "--recursive", action="store_true", help="search directories recursively"
+    )
+    parser.add_argument(
+        "--ext",
+        type=str,
+        required=False,
+        help="comma delimited directory and glob file extension list "
+        f"(default: {','.join(FONT_EXTENSIONS)})",
+    )
+    parser.add_argument("PATH", nargs="+", help="Font file, directory, or glob path")
+    args = parser.parse_args(argv)
+
+    extensions = FONT_EXTENSIONS
+    if args.ext:
+        try:
+            extensions = parse_extensions(args.ext)
+        except ValueError as e:
+            sys.stderr.write(f"[ERROR] {str(e)}{os.linesep}")
+            sys.exit(1)
+
+    try:
+        get_instance_path(
+            "Family.ttf",
+            NamedInstance("Regular", None, {}, {}, Panose()),
+            args.instance_path,
+        )
+    except (KeyError, IndexError, ValueError) as e:
+        sys.stderr.write(
+            f"[ERROR] invalid --instance-path template: {str(e)}{os.linesep}"
+        )
+        sys.exit(1)
+
+    writer = InstanceRecordWriter(sys.stdout, args.format, args.instance_path)
+    error_count = 0
+    try:
+        for fontpath in iter_font_paths(
+            args.PATH, recursive=args.recursive, extensions=extensions
+        ):
+            try:
+                instances = read_font_named_instances(fontpath)
+            except Exception as e:
+                error_count += 1
+                writer.write_error(fontpath, str(e))
+                continue
+            for instance in instances:
+                writer.write(fontpath, instance)
+    except ValueError as e:
+        sys.stdout.flush()
+        sys.stderr.write(f"[ERROR] {str(e)}{os.linesep}")
+        sys.exit(1)
+    writer.close()
+
+    if error_count:
+        sys.exit(1)
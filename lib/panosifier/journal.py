@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+
+# Copyright 2020 Source Foundry Authors
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Append-only journal of completed font edits.
+
+The journal is a newline-delimited JSON file with one entry per completed
+edit.  Entries record the size and modification time of the written font
+file so that a resumed run skips fonts that still hold the completed edit.
+Incomplete trailing lines of interrupted runs are ignored.
+"""
+
+import json
+import os
+from typing import Dict, Iterable, Iterator, NamedTuple, Optional, TextIO
+
+from .datastructures import Panose
+from .edit import EditResult, FontEditItem, get_output_path
+
+
+class JournalEntry(NamedTuple):
+    # absolute source font path
+    path: str
+    panose_key: str
+    panose_bytes: bytes
+    # absolute path of the written font file
+    output_path: str
+    size: int
+    mtime_ns: int
+    verified: bool
+
+
+def entry_from_result(result: EditResult, verified: bool) -> JournalEntry:
+    """Returns the journal entry of a completed edit result."""
+    if result.panose_bytes is None or result.panose_key is None:
+        raise ValueError("failed edits are not journaled")
+    output_path = os.path.abspath(result.output_path or result.fontpath)
+    stat = os.stat(output_path)
+    return JournalEntry(
+        os.path.abspath(result.fontpath),
+        result.panose_key,
+        result.panose_bytes,
+        output_path,
+        stat.st_size,
+        stat.st_mtime_ns,
+        verified,
+    )
+
+
+def read_journal(path: str) -> Dict[str, JournalEntry]:
+    """Returns the last journal entry of each source font path in the journal
+    file at path.  A journal file that does not exist has no entries."""
+    entries: Dict[str, JournalEntry] = {}
+    if not os.path.exists(path):
+        return entries
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                data = json.loads(line)
+                entry = JournalEntry(
+                    data["path"],
+                    data["panose_key"],
+                    bytes(data["panose"]),
+                    data["output_path"],
+                    data["size"],
+                    data["mtime_ns"],
+                    data["verified"],
+                )
+            except (ValueError, KeyError, TypeError):
+                # incomplete line of an interrupted run
+                continue
+            entries[entry.path] = entry
+    return entries
+
+
+def is_completed(
+    entries: Dict[str, JournalEntry],
+    fontpath: str,
+    panose: Panose,
+    output_path: Optional[str],
+    verify: bool,
+) -> Optional[JournalEntry]:
+    """Returns the journal entry of fontpath when the journal records a
+    completed edit with panose that is still in the written font file, and
+    the entry was verified when verify is True.  Returns None otherwise."""
+    entry = entries.get(os.path.abspath(fontpath))
+    if entry is None or entry.panose_key != panose.cache_key():
+        return None
+    if verify and not entry.verified:
+        return None
+    if entry.output_path != os.path.abspath(output_path or fontpath):
+        return None
+    try:
+        stat = os.stat(entry.output_path)
+    except OSError:
+        return None
+    if stat.st_size != entry.size or stat.st_mtime_ns != entry.mtime_ns:
+        return None
+    return entry
+
+
+def iter_resumed_edits(
+    edits: Iterable[FontEditItem],
+    entries: Dict[str, JournalEntry],
+    output_dir: Optional[str],
+    verify: bool,
+) -> Iterator[FontEditItem]:
+    """Yields edits with the edits that are completed in the journal entries
+    replaced by resumed EditResult items."""
+    for item in edits:
+        if not isinstance(item, EditResult):
+            fontpath, panose = item
+            output_path = get_output_path(fontpath, output_dir)
+            entry = is_completed(entries, fontpath, panose, output_path, verify)
+            if entry is not None:
+                item = EditResult(
+                    fontpath,
+                    entry.panose_bytes,
+                    False,
+                    None,
+                    output_path=output_path,
+                    panose_key=entry.panose_key,
+                    resumed=True,
+                )
+        yield item
+
+
+class JournalWriter(object):
+    """Appends entries to a journal file.  Each entry is flushed when it is
+    written so that the journal includes all completed edits of an interrupted
+    run."""
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        # end the incomplete trailing line of an interrupted run
+        with open(path, "ab+") as f:
+            if f.tell() > 0:
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b"\n":
+                    f.write(b"\n")
+        self.file: TextIO = open(path, "a", encoding="utf-8")
+
+    def write(self, entry: JournalEntry) -> None:
+        data = {
+            "path": entry.path,
+            "panose_key": entry.panose_key,
+            "panose": list(entry.panose_bytes),
+            "output_path": entry.output_path,
+            "size": entry.size,
+            "mtime_ns": entry.mtime_ns,
+            "verified": entry.verified,
+        }
+        self.file.write(json.dumps(data) + "\n")
+        self.file.flush()
+
+    def close(self) -> None:
+        self.file.close()
@@ -0,0 +1,349 @@
+#!/usr/bin/env python3
+
+# Copyright 2020 Source Foundry Authors
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Manifest files that map font paths and glob patterns to panose definitions.
+
+A manifest is a CSV, JSON, or TOML file with one entry per path or glob
+pattern.  Each entry defines a "path" and either a "panose" definition with
+all ten values or one or more individual panose field definitions:
+
+CSV (header row required, empty cells are undefined):
+
+    path,panose,weight
+    fonts/*-Regular.ttf,"2,11,5,2,4,5,4,2,2,4",
+    fonts/*-Bold.ttf,,8
+
+JSON (an array of entry objects):
+
+    [
+        {"path": "fonts/*-Regular.ttf", "panose": [2, 11, 5, 2, 4, 5, 4, 2, 2, 4]},
+        {"path": "fonts/*-Bold.ttf", "weight": 8}
+    ]
+
+TOML (an array of [[fonts]] tables):
+
+    [[fonts]]
+    path = "fonts/*-Bold.ttf"
+    weight = 8
+
+Relative paths are resolved relative to the manifest file directory.
+"""
+
+import csv
+import json
+import os
+import re
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+from .datastructures import PANOSE_FIELDS, Panose
+from .discovery import FONT_EXTENSIONS, iter_font_paths
+
+MANIFEST_FORMATS = (".csv", ".json", ".toml")
+MANIFEST_KEYS = ("path", "panose") + PANOSE_FIELDS
+TOML_TABLE = "fonts"
+
+
+class ManifestError(ValueError):
+    def __init__(self, manifest_path: str, lineno: Optional[int], message: str) -> None:
+        self.manifest_path = manifest_path
+        # None when the line is unknown
+        self.lineno = lineno
+        if lineno is None:
+            super().__init__(f"{manifest_path}: {message} (line unknown)")
+        else:
+            super().__init__(f"{manifest_path}:{lineno}: {message}")
+
+
+class ManifestEntry(NamedTuple):
+    path: str
+    panose: Panose
+    lineno: Optional[int]
+
+
+def _to_int(field: str, value: Any) -> int:
+    if isinstance(value, bool) or not isinstance(value, (int, str)):
+        raise ValueError(f"'{field}' value must be an integer, received {value!r}")
+    try:
+        return int(value)
+    except ValueError:
+        raise ValueError(f"'{field}' value must be an integer, received {value!r}")
+
+
+def panose_from_definition(definition: Dict[str, Any]) -> Panose:
+    """Returns a Panose from a manifest entry definition.  Empty string and
+    None values are undefined.  Raises ValueError on invalid definitions."""
+    definition = {
+        key: value for key, value in definition.items() if value not in ("", None)
+    }
+    for key in definition:
+        if key not in MANIFEST_KEYS:
+            raise ValueError(f"unsupported manifest key '{key}'")
+    if "path" not in definition:
+        raise ValueError("missing 'path' definition")
+    return panose_from_fields(definition)
+
+
+def panose_from_fields(definition: Dict[str, Any]) -> Panose:
+    """Returns a Panose from the "panose" or individual panose field values in
+    definition.  Other keys are ignored.  Raises ValueError on invalid
+    definitions."""
+    definition = {
+        key: value for key, value in definition.items() if value not in ("", None)
+    }
+    fields = [field for field in PANOSE_FIELDS if field in definition]
+    if "panose" in definition:
+        if fields:
+            raise ValueError(
+                "the 'panose' definition cannot be used with other panose field "
+                "definitions"
+            )
+        values = definition["panose"]
+        if isinstance(values, str):
+            return Panose.from_comma_delim_string(values)
+        elif isinstance(values, list):
+            return Panose.from_comma_delim_string(
+                ",".join(str(_to_int("panose", value)) for value in values)
+            )
+        raise ValueError("'panose' must be a comma delimited string or a list")
+    if not fields:
+        raise ValueError("include at least one panose definition")
+    return Panose(**{field: _to_int(field, definition[field]) for field in fields})
+
+
+def read_csv_definitions(
+    manifest_path: str, text: str
+) -> Iterator[Tuple[int, Dict[str, Any]]]:
+    reader = csv.DictReader(text.splitlines())
+    for row in reader:
+        if None in row:
+            raise ManifestError(manifest_path, reader.line_num, "too many values in row")
+        yield reader.line_num, dict(row)
+
+
+def _lineno(text: str, index: int) -> int:
+    return text.count("\n", 0, index) + 1
+
+
+def read_json_definitions(manifest_path: str, text: str) -> Iterator[Tuple[int, Any]]:
+    decoder = json.JSONDecoder()
+    whitespace = " \t\r\n"
+    try:
+        index = len(text) - len(text.lstrip(whitespace))
+        if not text.startswith("[", index):
+            raise ManifestError(
+                manifest_path, _lineno(text, index), "expected a JSON array"
+            )
+        index += 1
+        while True:
+            while index < len(text) and text[index] in whitespace:
+                index += 1
+            if text.startswith("]", index):
+                return
+            lineno = _lineno(text, index)
+            definition, index = decoder.raw_decode(text, index)
+            yield lineno, definition
+            while index < len(text) and text[index] in whitespace:
+                index += 1
+            if text.startswith(",", index):
+                index += 1
+            elif not text.startswith("]", index):
+                raise ManifestError(
+                    manifest_path, _lineno(text, index), "expected ',' or ']'"
+                )
+    except json.JSONDecodeError as e:
+        raise ManifestError(manifest_path, e.lineno, e.msg)
+
+
+def read_toml_definitions(
+    manifest_path: str, text: str, table: str = TOML_TABLE
+) -> Iterator[Tuple[Optional[int], Any]]:
+    try:
+        import tomllib  # type: ignore
+    except ImportError:  # pragma: no cover
+        try:
+            import tomli as tomllib  # type: ignore
+        except ImportError:
+            raise ValueError(
+                "TOML manifests require Python 3.11+ or the tomli package. Install "
+                "with 'pip install tomli'"
+            )
+    try:
+        data = tomllib.loads(text)
+    except tomllib.TOMLDecodeError as e:
+        raise ManifestError(manifest_path, getattr(e, "lineno", 1), str(e))
+    unsupported = [key for key in data if key != table]
+    if unsupported:
+        raise ManifestError(
+            manifest_path,
+            1,
+            f"unsupported top level key '{unsupported[0]}', use [[{table}]] tables",
+        )
+    entries = data.get(table, [])
+    if not isinstance(entries, list):
+        raise ManifestError(
+            manifest_path, 1, f"define {table} entries with [[{table}]] tables"
+        )
+    # tomllib does not report positions.  Entries map to the [[table]] header
+    # lines or to the inline array values in order, and are reported without
+    # a line number when they do not map.
+    linenos: List[Optional[int]] = list(_iter_toml_entry_linenos(text, table))
+    if len(linenos) != len(entries):
+        linenos = [None] * len(entries)
+    yield from zip(linenos, entries)
+
+
+def _skip_toml_string(text: str, index: int) -> int:
+    """Returns the index after the TOML string that starts at index."""
+    quote = text[index]
+    if text.startswith(quote * 3, index):
+        index += 3
+        while index < len(text):
+            if quote == '"' and text[index] == "\\":
+                index += 2
+            elif text.startswith(quote * 3, index):
+                # the closing delimiter may follow one or two quotes in the string
+                index += 3
+                while index < len(text) and text[index] == quote:
+                    index += 1
+                return index
+            else:
+                index += 1
+        return index
+    index += 1
+    while index < len(text) and text[index] not in (quote, "\n"):
+        index += 2 if quote == '"' and text[index] == "\\" else 1
+    return index + 1
+
+
+def _iter_toml_entry_linenos(text: str, table: str) -> Iterator[int]:
+    """Yields the line numbers of the [[table]] headers and of the values in
+    an inline array of the table key in the TOML document text.  Header lines
+    may include whitespace, a quoted table name, and a comment."""
+    name = re.escape(table)
+    header = re.compile(rf"\s*\[\[\s*(?:{name}|\"{name}\"|'{name}')\s*\]\]\s*(?:#.*)?")
+    key = re.compile(rf"[ \t]*(?:{name}|\"{name}\"|'{name}')[ \t]*=")
+    index = 0
+    depth = 0
+    # inline is True in the inline array value of the table key, and value is
+    # True when the next inline array value is expected
+    root = True
+    inline = False
+    value = False
+    while index < len(text):
+        if depth == 0 and (index == 0 or text[index - 1] == "\n"):
+            end = text.find("\n", index)
+            line = text[index:] if end < 0 else text[index:end]
+            if line.lstrip().startswith("["):
+                root = False
+                if header.fullmatch(line):
+                    yield _lineno(text, index)
+                index += len(line)
+                continue
+            match = key.match(line)
+            if root and match:
+                inline = True
+                index += match.end()
+                continue
+        char = text[index]
+        if inline and value and depth == 1 and char not in " \t\r\n#]":
+            yield _lineno(text, index)
+            value = False
+        if char in "\"'":
+            index = _skip_toml_string(text, index)
+            continue
+        if char == "#":
+            end = text.find("\n", index)
+            index = len(text) if end < 0 else end
+            continue
+        if char in "[{":
+            depth += 1
+            value = inline and depth == 1
+        elif char in "]}":
+            depth -= 1
+            inline = inline and depth > 0
+        elif char == ",":
+            value = inline and depth == 1
+        index += 1
+
+
+def read_manifest(manifest_path: str) -> List[ManifestEntry]:
+    """Returns the validated entries in a CSV, JSON, or TOML manifest file.
+    Raises ManifestError with the manifest line number on invalid entries."""
+    extension = os.path.splitext(manifest_path)[1].lower()
+    if extension not in MANIFEST_FORMATS:
+        raise ValueError(
+            f"unsupported manifest format '{extension}', use one of "
+            f"{', '.join(MANIFEST_FORMATS)}"
+        )
+    with open(manifest_path, "r", encoding="utf-8") as f:
+        text = f.read()
+
+    if extension == ".csv":
+        definitions: Iterator[Tuple[Optional[int], Any]] = read_csv_definitions(
+            manifest_path, text
+        )
+    elif extension == ".json":
+        definitions = read_json_definitions(manifest_path, text)
+    else:
+        definitions = read_toml_definitions(manifest_path, text)
+
+    manifest_dir = os.path.dirname(manifest_path)
+    entries = []
+    for lineno, definition in definitions:
+        if not isinstance(definition, dict):
+            raise ManifestError(manifest_path, lineno, "entries must be objects")
+        try:
+            panose = panose_from_definition(definition)
+        except ValueError as e:
+            raise ManifestError(manifest_path, lineno, str(e))
+        path = os.path.join(manifest_dir, str(definition["path"]))
+        entries.append(ManifestEntry(path, panose, lineno))
+    if not entries:
+        raise ManifestError(manifest_path, 1, "the manifest does not define any fonts")
+    return entries
+
+
+def build_manifest_plan(
+    manifest_path: str,
+    entries: Sequence[ManifestEntry],
+    recursive: bool = False,
+    extensions: Sequence[str] = FONT_EXTENSIONS,
+) -> List[Tuple[str, Panose]]:
+    """Returns the (font path, Panose) edits for the manifest entries.  Raises
+    ManifestError when a path does not match any fonts or when a font matches
+    more than one entry."""
+    plan = []
+    linenos: Dict[str, Optional[int]] = {}
+    for entry in entries:
+        try:
+            fontpaths = list(iter_font_paths([entry.path], recursive, extensions))
+        except ValueError as e:
+            raise ManifestError(manifest_path, entry.lineno, str(e))
+        for fontpath in fontpaths:
+            # the same font may be reached through symlinks or, on case
+            # insensitive file systems, through differently cased paths
+            key = os.path.normcase(os.path.realpath(fontpath))
+            if key in linenos:
+                lineno = linenos[key]
+                where = "another entry" if lineno is None else f"line {lineno}"
+                raise ManifestError(
+                    manifest_path,
+                    entry.lineno,
+                    f"'{fontpath}' is also defined on {where}",
+                )
+            linenos[key] = entry.lineno
+            plan.append((fontpath, entry.panose))
+    return plan
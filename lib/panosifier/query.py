@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+
+# Copyright 2020 Source Foundry Authors
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Read-only panose data queries.
+
+Queries read the table directory and the OS/2 table only and do not import
+fontTools.  WOFF and WOFF2 fonts are read with the panosifier.woff readers,
+and font collections are reported with one record per face.
+"""
+
+import argparse
+import csv
+import json
+import os
+import sys
+from typing import Any, Dict, List, Optional, TextIO, Tuple
+
+from .datastructures import PANOSE_FIELDS
+from .discovery import FONT_EXTENSIONS, iter_font_paths, parse_extensions
+from .sfnt import (
+    COLLECTION_TAG,
+    get_os2_panose_bytes,
+    read_collection_face_offsets,
+    read_os2_table_from_file,
+)
+from .woff import read_font_tables
+
+QUERY_FORMATS = ("ndjson", "csv")
+QUERY_FIELDS = ("path", "face") + PANOSE_FIELDS + ("error",)
+
+
+def read_font_panose_bytes(fontpath: str) -> List[Tuple[Optional[int], bytes]]:
+    """Returns the (face index, panose data) of each face of an sfnt, WOFF,
+    WOFF2, or font collection file.  The face index is None for fonts that are
+    not collections."""
+    with open(fontpath, "rb") as f:
+        if f.read(4) == COLLECTION_TAG:
+            faces: List[Tuple[Optional[int], bytes]] = []
+            for face_index, offset in enumerate(read_collection_face_offsets(f)):
+                _, os2_data = read_os2_table_from_file(f, offset)
+                faces.append((face_index, get_os2_panose_bytes(os2_data)))
+            return faces
+        tables = read_font_tables(f, ["OS/2"])
+    if "OS/2" not in tables:
+        raise ValueError("font does not include a 'OS/2' table")
+    return [(None, get_os2_panose_bytes(tables["OS/2"]))]
+
+
+def make_record(
+    fontpath: str,
+    face_index: Optional[int],
+    panose_bytes: Optional[bytes],
+    error: Optional[str] = None,
+) -> Dict[str, Any]:
+    record: Dict[str, Any] = {"path": fontpath, "face": face_index}
+    for i, field in enumerate(PANOSE_FIELDS):
+        record[field] = panose_bytes[i] if panose_bytes is not None else None
+    record["error"] = error
+    return record
+
+
+def query_font(fontpath: str) -> List[Dict[str, Any]]:
+    """Returns the query records of a font with the font path, the face index,
+    the ten panose field values, and an error message.  Font collections
+    return one record per face, and other fonts return one record with a
+    face index of None.  A read failure returns one record with None panose
+    values and the error message."""
+    try:
+        faces = read_font_panose_bytes(fontpath)
+    except Exception as e:
+        return [make_record(fontpath, None, None, str(e))]
+    return [
+        make_record(fontpath, face_index, panose_bytes)
+        for face_index, panose_bytes in faces
+    ]
+
+
+class RecordWriter(object):
+    def __init__(self, stream: TextIO, fmt: str) -> None:
+        if fmt not in QUERY_FORMATS:
+            raise ValueError(f"unsupported query format '{fmt}'")
+        self.stream = stream
+        self.fmt = fmt
+        self.csv_writer = None
+        if fmt == "csv":
+            self.csv_writer = csv.writer(stream, lineterminator="\n")
+            self.csv_writer.writerow(QUERY_FIELDS)
+
+    def write(self, record: Dict[str, Any]) -> None:
+        if self.csv_writer is not None:
+            self.csv_writer.writerow(
+                ["" if record[field] is None else record[field] for field in QUERY_FIELDS]
+            )
+        else:
+            self.stream.write(json.dumps(record) + "\n")
+
+
+def run_query(argv: List[str]) -> None:
+    parser = argparse.ArgumentParser(
+        prog="panosifier query", description="Read-only panose data report for fonts"
+    )
+    parser.add_argument(
+        "--format",
+        choices=QUERY_FORMATS,
+        default="ndjson",
+        help="record output format (default: ndjson)",
+    )
+    parser.add_argument(
+        "-r", "--recursive", action="store_true", help="search directories recursively"
+    )
+    parser.add_argument(
+        "--ext",
+        type=str,
+        required=False,
+        help="comma delimited directory and glob file extension list "
+        f"(default: {','.join(FONT_EXTENSIONS)})",
+    )
+    parser.add_argument("PATH", nargs="+", help="Font file, directory, or glob path")
+    args = parser.parse_args(argv)
+
+    extensions = FONT_EXTENSIONS
+    if args.ext:
+        try:
+            extensions = parse_extensions(args.ext)
+        except ValueError as e:
+            sys.stderr.write(f"[ERROR] {str(e)}{os.linesep}")
+            sys.exit(1)
+
+    writer = RecordWriter(sys.stdout, args.format)
+    error_count = 0
+    try:
+        for fontpath in iter_font_paths(
+            args.PATH, recursive=args.recursive, extensions=extensions
+        ):
+            for record in query_font(fontpath):
+                if record["error"] is not None:
+                    error_count += 1
+                writer.write(record)
+    except ValueError as e:
+        sys.stdout.flush()
+        sys.stderr.write(f"[ERROR] {str(e)}{os.linesep}")
+        sys.exit(1)
+
+    if error_count:
+        sys.exit(1)
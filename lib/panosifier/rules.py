@@ -0,0 +1,421 @@
+#!/usr/bin/env python3
+
+# Copyright 2020 Source Foundry Authors
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Rules files that assign panose definitions by font metadata.
+
+A rules file is a JSON or TOML file with an ordered list of rules.  Each rule
+defines "when" conditions and either a "panose" definition with all ten
+values or one or more individual panose field definitions:
+
+JSON (an array of rule objects):
+
+    [
+        {"when": {"name.2": "(?i)bold"}, "weight": 8},
+        {"when": {"post.isFixedPitch": true}, "proportion": 9}
+    ]
+
+TOML (an array of [[rules]] tables):
+
+    [[rules]]
+    when = { "OS/2.usWeightClass" = ">= 600", "path" = "fonts/sans/*" }
+    weight = 8
+
+A rule matches a font when all of its conditions match, and a rule without
+conditions matches all fonts.  The definitions of all matching rules are
+applied in file order, and later rules override earlier rules.  Condition
+keys are:
+
+    path                 glob pattern of the font path
+    name.<ID>            regular expression search of the name ID string
+    OS/2.<field>         OS/2 table field value, see OS2_FIELDS
+    post.<field>         post table field value, see POST_FIELDS
+
+String fields match regular expressions.  Numeric fields match a number, a
+list of numbers, a boolean (non-zero), or a comparison string with one of
+the ==, !=, <, <=, >, >=, or & (any of the bits) operators, e.g., ">= 600"
+or "& 0x01".
+
+Rules are compiled once into a matcher.  The matcher reads only the tables
+and name IDs that the rule conditions use, reads them once for each font,
+and evaluates each distinct condition once for each font.
+
+The rules are evaluated for each edited face of a font collection.  A
+collection is edited when all of its edited faces match the same panose
+definition, and collections with faces that match different definitions are
+reported as errors.
+"""
+
+import fnmatch
+import json
+import operator
+import os
+import re
+import struct
+from typing import (
+    Any,
+    BinaryIO,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Sequence,
+    Tuple,
+)
+
+from .datastructures import PANOSE_FIELDS, Panose, override_panose
+from .edit import EditResult, FontEditItem, select_faces
+from .manifest import (
+    ManifestError,
+    panose_from_fields,
+    read_json_definitions,
+    read_toml_definitions,
+)
+from .sfnt import (
+    COLLECTION_TAG,
+    get_name,
+    read_collection_face_offsets,
+    read_tables_from_file,
+)
+from .woff import read_font_tables
+
+RULES_FORMATS = (".json", ".toml")
+RULE_KEYS = ("when", "panose") + PANOSE_FIELDS
+TOML_RULES_TABLE = "rules"
+
+# OS/2 table field struct formats and offsets.  sxHeight and sCapHeight are
+# defined in version 2 and later tables.
+OS2_FIELDS = {
+    "version": (">H", 0),
+    "xAvgCharWidth": (">h", 2),
+    "usWeightClass": (">H", 4),
+    "usWidthClass": (">H", 6),
+    "fsType": (">H", 8),
+    "sFamilyClass": (">h", 30),
+    "achVendID": (">4s", 58),
+    "fsSelection": (">H", 62),
+    "sxHeight": (">h", 86),
+    "sCapHeight": (">h", 88),
+}
+# post table field struct formats and offsets.  italicAngle is a 16.16 fixed
+# point value.
+POST_FIELDS = {
+    "italicAngle": (">l", 4),
+    "underlinePosition": (">h", 8),
+    "underlineThickness": (">h", 10),
+    "isFixedPitch": (">L", 12),
+}
+STRING_KEYS = ("path", "OS/2.achVendID")
+
+COMPARISON_OPERATORS: Dict[str, Callable[[Any, Any], Any]] = {
+    "==": operator.eq,
+    "!=": operator.ne,
+    "<=": operator.le,
+    ">=": operator.ge,
+    "<": operator.lt,
+    ">": operator.gt,
+    "&": lambda value, bits: value & bits,
+}
+_COMPARISON_RE = re.compile(r"^\s*(==|!=|<=|>=|<|>|&)\s*(\S+)\s*$")
+
+Predicate = Callable[[Any], bool]
+
+
+class Rule(NamedTuple):
+    # (metadata key, condition value) pairs
+    conditions: Tuple[Tuple[str, Any], ...]
+    panose: Panose
+    lineno: Optional[int]
+
+
+def _is_string_key(key: str) -> bool:
+    return key in STRING_KEYS or key.startswith("name.")
+
+
+def validate_key(key: str) -> None:
+    """Raises ValueError on unsupported condition keys."""
+    if key == "path":
+        return
+    table, _, field = key.partition(".")
+    if table == "name" and field.isdigit():
+        return
+    if (table == "OS/2" and field in OS2_FIELDS) or (
+        table == "post" and field in POST_FIELDS
+    ):
+        return
+    raise ValueError(f"unsupported rule condition key '{key}'")
+
+
+def _to_number(value: str) -> Any:
+    try:
+        return int(value, 0)
+    except ValueError:
+        return float(value)
+
+
+def compile_condition(key: str, value: Any) -> Predicate:
+    """Returns the predicate of a condition on the font metadata key value.
+    Predicates of missing metadata values are False.  Raises ValueError on
+    invalid conditions."""
+    validate_key(key)
+    if _is_string_key(key):
+        if not isinstance(value, str):
+            raise ValueError(f"'{key}' condition must be a string, received {value!r}")
+        try:
+            if key == "path":
+                pattern = re.compile(fnmatch.translate(os.path.normpath(value)))
+            else:
+                pattern = re.compile(value)
+        except re.error as e:
+            raise ValueError(f"invalid '{key}' regular expression: {str(e)}")
+        return lambda field: field is not None and pattern.search(field) is not None
+    if isinstance(value, bool):
+        return lambda field: field is not None and bool(field) == value
+    if isinstance(value, (int, float)):
+        return lambda field: field is not None and field == value
+    if isinstance(value, list) and all(
+        isinstance(item, (int, float)) and not isinstance(item, bool) for item in value
+    ):
+        values = frozenset(value)
+        return lambda field: field is not None and field in values
+    if isinstance(value, str):
+        match = _COMPARISON_RE.match(value)
+        if match:
+            compare = COMPARISON_OPERATORS[match.group(1)]
+            try:
+                operand = _to_number(match.group(2))
+            except ValueError:
+                pass
+            else:
+                if match.group(1) != "&" or isinstance(operand, int):
+                    return lambda field: field is not None and bool(
+                        compare(field, operand)
+                    )
+    raise ValueError(
+        f"'{key}' condition must be a number, a list of numbers, a boolean, or a "
+        f"comparison, received {value!r}"
+    )
+
+
+def _unpack_field(data: Optional[bytes], field_format: str, offset: int) -> Any:
+    if data is None or len(data) < offset + struct.calcsize(field_format):
+        return None
+    (value,) = struct.unpack_from(field_format, data, offset)
+    return value
+
+
+class RuleMatcher(object):
+    """Rules compiled into the distinct condition predicates and the font
+    metadata keys that they read."""
+
+    def __init__(self, rules: Sequence[Rule]) -> None:
+        self.rules = list(rules)
+        # distinct (key, condition) predicates and the predicate indexes of
+        # each rule
+        self.predicates: List[Tuple[str, Predicate]] = []
+        self.rule_predicates: List[Tuple[int, ...]] = []
+        predicate_indexes: Dict[str, int] = {}
+        for rule in self.rules:
+            indexes = []
+            for key, value in rule.conditions:
+                # conditions are compared by the JSON representation so that
+                # list conditions are hashable
+                condition_key = json.dumps([key, value], sort_keys=True)
+                if condition_key not in predicate_indexes:
+                    predicate_indexes[condition_key] = len(self.predicates)
+                    self.predicates.append((key, compile_condition(key, value)))
+                indexes.append(predicate_indexes[condition_key])
+            self.rule_predicates.append(tuple(indexes))
+        self.keys = sorted({key for key, _ in self.predicates})
+        self.tables = sorted(
+            {key.partition(".")[0] for key in self.keys if key != "path"}
+        )
+        self.name_ids = sorted(
+            {int(key.partition(".")[2]) for key in self.keys if key.startswith("name.")}
+        )
+
+    def read_metadata(
+        self,
+        f: Optional[BinaryIO],
+        fontpath: str,
+        directory_offset: Optional[int] = None,
+    ) -> Dict[str, Any]:
+        """Returns the values of the metadata keys of the rule conditions for
+        the font file object at fontpath, or for the font collection face with
+        the table directory at directory_offset.  Only the tables that the
+        conditions use are read, and the font file is not read when the
+        conditions use the font path only."""
+        metadata: Dict[str, Any] = {"path": os.path.normpath(fontpath)}
+        if not self.tables or f is None:
+            return metadata
+        if directory_offset is None:
+            tables = read_font_tables(f, self.tables)
+        else:
+            tables = read_tables_from_file(f, self.tables, directory_offset)
+        name = tables.get("name")
+        for name_id in self.name_ids:
+            metadata[f"name.{name_id}"] = (
+                get_name(name, name_id) if name is not None else None
+            )
+        for key in self.keys:
+            table, _, field = key.partition(".")
+            if table == "OS/2":
+                value = _unpack_field(tables.get("OS/2"), *OS2_FIELDS[field])
+                if isinstance(value, bytes):
+                    value = value.decode("latin-1").rstrip(" \0")
+                metadata[key] = value
+            elif table == "post":
+                value = _unpack_field(tables.get("post"), *POST_FIELDS[field])
+                if field == "italicAngle" and value is not None:
+                    value = value / 0x10000
+                metadata[key] = value
+        return metadata
+
+    def read_font_metadata(self, fontpath: str) -> Dict[str, Any]:
+        if not self.tables:
+            return self.read_metadata(None, fontpath)
+        with open(fontpath, "rb") as f:
+            return self.read_metadata(f, fontpath)
+
+    def read_face_metadata(
+        self,
+        f: Optional[BinaryIO],
+        fontpath: str,
+        face_indexes: Optional[Tuple[int, ...]] = None,
+    ) -> List[Dict[str, Any]]:
+        """Returns the metadata of each face in face_indexes, or of all faces,
+        of a font collection file object, or a list with the metadata of a
+        font that is not a collection.  See read_metadata."""
+        if not self.tables or f is None:
+            return [self.read_metadata(None, fontpath)]
+        f.seek(0)
+        if f.read(4) != COLLECTION_TAG:
+            return [self.read_metadata(f, fontpath)]
+        offsets = read_collection_face_offsets(f)
+        return [
+            self.read_metadata(f, fontpath, offsets[face_index])
+            for face_index in select_faces(len(offsets), face_indexes)
+        ]
+
+    def read_font_face_metadata(
+        self, fontpath: str, face_indexes: Optional[Tuple[int, ...]] = None
+    ) -> List[Dict[str, Any]]:
+        if not self.tables:
+            return self.read_face_metadata(None, fontpath)
+        with open(fontpath, "rb") as f:
+            return self.read_face_metadata(f, fontpath, face_indexes)
+
+    def match(self, metadata: Dict[str, Any]) -> Panose:
+        """Returns the Panose of the matching rule definitions for the font
+        metadata.  Each distinct condition is evaluated at most once."""
+        results: List[Optional[bool]] = [None] * len(self.predicates)
+        panose = Panose()
+        for rule, indexes in zip(self.rules, self.rule_predicates):
+            matched = True
+            for i in indexes:
+                if results[i] is None:
+                    key, predicate = self.predicates[i]
+                    results[i] = predicate(metadata.get(key))
+                if not results[i]:
+                    matched = False
+                    break
+            if matched:
+                panose = override_panose(panose, rule.panose)
+        return panose
+
+    def match_faces(self, faces_metadata: Sequence[Dict[str, Any]]) -> Panose:
+        """Returns the Panose of the matching rule definitions for the font
+        metadata of each face of a font.  Raises ValueError when the faces
+        match different panose definitions."""
+        panose = self.match(faces_metadata[0])
+        for metadata in faces_metadata[1:]:
+            if self.match(metadata) != panose:
+                raise ValueError(
+                    "the font collection faces match different panose definitions, "
+                    "edit the faces separately with the --face-index option"
+                )
+        return panose
+
+
+def read_rules(rules_path: str) -> List[Rule]:
+    """Returns the validated rules in a JSON or TOML rules file.  Raises
+    ManifestError with the rules file line number on invalid rules."""
+    extension = os.path.splitext(rules_path)[1].lower()
+    if extension not in RULES_FORMATS:
+        raise ValueError(
+            f"unsupported rules format '{extension}', use one of "
+            f"{', '.join(RULES_FORMATS)}"
+        )
+    with open(rules_path, "r", encoding="utf-8") as f:
+        text = f.read()
+
+    if extension == ".json":
+        definitions: Iterator[Tuple[Optional[int], Any]] = read_json_definitions(
+            rules_path, text
+        )
+    else:
+        definitions = read_toml_definitions(rules_path, text, TOML_RULES_TABLE)
+
+    rules = []
+    for lineno, definition in definitions:
+        try:
+            if not isinstance(definition, dict):
+                raise ValueError("rules must be objects")
+            for key in definition:
+                if key not in RULE_KEYS:
+                    raise ValueError(f"unsupported rule key '{key}'")
+            conditions = definition.get("when", {})
+            if not isinstance(conditions, dict):
+                raise ValueError("'when' must be an object of conditions")
+            for key, value in conditions.items():
+                compile_condition(key, value)
+            panose = panose_from_fields(definition)
+        except ValueError as e:
+            raise ManifestError(rules_path, lineno, str(e))
+        rules.append(Rule(tuple(conditions.items()), panose, lineno))
+    if not rules:
+        raise ManifestError(rules_path, 1, "the rules file does not define any rules")
+    return rules
+
+
+def iter_rule_edits(
+    edits: Iterable[FontEditItem],
+    matcher: RuleMatcher,
+    overrides: Panose = Panose(),
+    face_indexes: Optional[Tuple[int, ...]] = None,
+) -> Iterator[FontEditItem]:
+    """Yields each (font path, Panose) edit with the panose definitions of the
+    matching rules and the defined fields of overrides.  The rules are
+    evaluated as the edits are consumed, in a single pass over the fonts, and
+    for the faces in face_indexes, or all faces, of font collections.
+    EditResult items are yielded unchanged, and fonts that cannot be read and
+    collections with faces that match different definitions are yielded as
+    error EditResult items."""
+    for item in edits:
+        if isinstance(item, EditResult):
+            yield item
+            continue
+        fontpath = item[0]
+        try:
+            panose = matcher.match_faces(
+                matcher.read_font_face_metadata(fontpath, face_indexes)
+            )
+        except Exception as e:
+            yield EditResult(fontpath, None, False, f"rules evaluation failed: {str(e)}")
+            continue
+        yield fontpath, override_panose(panose, overrides)
@@ -0,0 +1,463 @@
+#!/usr/bin/env python3
+
+# Copyright 2020 Source Foundry Authors
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Long-running panosifier server over a local Unix domain socket.
+
+Clients connect, send one JSON request object on a single line, and read one
+JSON response object.  Every request may define a "cwd" that relative paths
+are resolved against.  Requests are handled one at a time, and connections
+that do not send a complete request within CONNECTION_TIMEOUT seconds are
+answered with an error.
+
+    {"command": "run", "argv": ["--weight", "8", "Font.ttf"]}
+        -> {"exit_code": 0, "stdout": "...", "stderr": "..."}
+
+        Runs the panosifier command line with argv.  "env" may define the
+        PANOSIFIER_CACHE and PANOSIFIER_INDEX environment variable values.
+
+    {"command": "edit", "paths": ["fonts"], "weight": 8}
+        -> {"results": [{"path": ..., "panose": [...], "changed": true,
+                         "cached": false, "error": null}, ...]}
+
+        Edits fonts with a "panose" definition or individual panose field
+        definitions.  "recursive", "engine", "verify", "jobs", "dry_run", and
+        "face_indexes" are optional.  Paths that are not found are reported
+        with an error.  Font collection results include "faces" with the
+        "face_index", "panose", "changed", and "shared_with" of each face.
+
+    {"command": "query", "paths": ["fonts"]}
+        -> {"results": [{"path": ..., "face": null, "familytype": 2, ...}, ...]}
+
+        Font collections are reported with one result per face and the
+        "face" index of the face.
+
+    {"command": "ping"} -> {"protocol": 1}
+    {"command": "shutdown"} -> {}
+
+Requests that cannot be handled return {"error": "message"}.
+"""
+
+import argparse
+import io
+import json
+import os
+import signal
+import socket
+import sys
+import traceback
+from contextlib import redirect_stderr, redirect_stdout
+from stat import S_ISSOCK
+from typing import Any, Dict, List, Optional
+
+from .socketpath import (
+    SOCKET_ENVIRONMENT_VARIABLE,
+    get_default_socket_directory,
+    get_default_socket_path,
+    get_user_id,
+)
+
+PROTOCOL_VERSION = 1
+# environment variables of the client that are forwarded with "run" requests:
+# the __main__ CACHE_ENVIRONMENT_VARIABLE and the index
+# INDEX_ENVIRONMENT_VARIABLE.  The modules are not imported so that commands
+# are forwarded without the import time.
+FORWARDED_ENVIRONMENT_VARIABLES = ("PANOSIFIER_CACHE", "PANOSIFIER_INDEX")
+# subcommands that do not accept the --jobs option
+NO_JOBS_COMMANDS = ("query", "instances", "index")
+# maximum request and response size
+MAX_MESSAGE_SIZE = 64 * 1024 * 1024
+# seconds to wait on a blocked read or write of a client connection so that a
+# stalled client does not block the requests of other clients
+CONNECTION_TIMEOUT = 30.0
+
+
+def is_user_socket(socket_path: str) -> bool:
+    """Returns True when socket_path is a socket that is owned by the current
+    user.  Commands are not forwarded to sockets of other users, which would
+    receive the command line and working directory."""
+    try:
+        stat = os.stat(socket_path)
+    except OSError:
+        return False
+    return S_ISSOCK(stat.st_mode) and stat.st_uid == get_user_id()
+
+
+def make_socket_directory(socket_path: str) -> None:
+    """Creates the directory of socket_path with owner-only permissions when
+    it does not exist.  Raises ValueError when the default per-user socket
+    directory is owned by another user or is accessible by other users."""
+    directory = os.path.dirname(os.path.abspath(socket_path))
+    if not os.path.isdir(directory):
+        os.makedirs(directory, mode=0o700)
+        os.chmod(directory, 0o700)
+    if directory == os.path.abspath(get_default_socket_directory()):
+        stat = os.stat(directory)
+        if stat.st_uid != get_user_id() or stat.st_mode & 0o077:
+            raise ValueError(
+                f"the socket directory '{directory}' must be owned by the current "
+                f"user and must not be accessible by other users"
+            )
+
+
+def read_message(sock: socket.socket) -> Dict[str, Any]:
+    """Reads a newline terminated JSON object from sock."""
+    chunks = []
+    size = 0
+    while True:
+        chunk = sock.recv(65536)
+        if not chunk:
+            break
+        chunks.append(chunk)
+        size += len(chunk)
+        if chunk.endswith(b"\n"):
+            break
+        if size > MAX_MESSAGE_SIZE:
+            raise ValueError("message exceeds the maximum message size")
+    message = json.loads(b"".join(chunks).decode("utf-8"))
+    if not isinstance(message, dict):
+        raise ValueError("messages must be JSON objects")
+    return message
+
+
+def write_message(sock: socket.socket, message: Dict[str, Any]) -> None:
+    sock.sendall(json.dumps(message).encode("utf-8") + b"\n")
+
+
+def request(
+    message: Dict[str, Any],
+    socket_path: Optional[str] = None,
+    timeout: Optional[float] = None,
+) -> Dict[str, Any]:
+    """Sends a request to the server at socket_path and returns the response.
+    Raises OSError when a server is not running."""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.settimeout(timeout)
+        sock.connect(socket_path or get_default_socket_path())
+        write_message(sock, message)
+        return read_message(sock)
+
+
+def forward_run(argv: List[str], socket_path: Optional[str] = None) -> Optional[int]:
+    """Runs the command line argv on a running server and writes the server
+    output to the standard output and error streams.  Returns the exit status
+    code, or None when a server of the current user is not running.  Errors
+    after the request is sent are reported with an exit status code of 1 so
+    that the command is not run again."""
+    socket_path = socket_path or get_default_socket_path()
+    # the socket file check avoids a connection attempt when a server is not
+    # running
+    if not hasattr(socket, "AF_UNIX") or not os.path.exists(socket_path):
+        return None
+    if not is_user_socket(socket_path):
+        sys.stderr.write(
+            f"[WARNING] commands are not forwarded to '{socket_path}' because it "
+            f"is not a socket of the current user{os.linesep}"
+        )
+        return None
+    message = {
+        "command": "run",
+        "argv": argv,
+        "cwd": os.getcwd(),
+        "env": {
+            name: os.environ[name]
+            for name in FORWARDED_ENVIRONMENT_VARIABLES
+            if name in os.environ
+        },
+    }
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        try:
+            sock.connect(socket_path)
+        except OSError:
+            # stale socket files of servers that are no longer running
+            return None
+        try:
+            write_message(sock, message)
+            response = read_message(sock)
+            if "error" in response:
+                sys.stderr.write(f"[ERROR] {response['error']}{os.linesep}")
+                return 1
+            stdout, stderr = str(response["stdout"]), str(response["stderr"])
+            exit_code = int(response["exit_code"])
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            # the server may have run the command
+            sys.stderr.write(
+                f"[ERROR] the server at '{socket_path}' did not return a valid "
+                f"response: {str(e)}{os.linesep}"
+            )
+            return 1
+    sys.stdout.write(stdout)
+    sys.stderr.write(stderr)
+    return exit_code
+
+
+class PanosifierServer(object):
+    def __init__(
+        self,
+        socket_path: str,
+        jobs: int = 1,
+        connection_timeout: Optional[float] = CONNECTION_TIMEOUT,
+    ) -> None:
+        self.socket_path = socket_path
+        # default number of worker processes for requests that do not define
+        # a jobs value.  Workers are forked from the server process with the
+        # imported modules.
+        self.jobs = jobs
+        self.connection_timeout = connection_timeout
+        self.running = False
+
+    def handle(self, message: Dict[str, Any]) -> Dict[str, Any]:
+        """Returns the response to a request message."""
+        command = message.get("command")
+        cwd = os.getcwd()
+        try:
+            if message.get("cwd") is not None:
+                os.chdir(message["cwd"])
+            if command == "run":
+                return self.handle_run(message)
+            elif command == "edit":
+                return self.handle_edit(message)
+            elif command == "query":
+                return self.handle_query(message)
+            elif command == "ping":
+                return {"protocol": PROTOCOL_VERSION}
+            elif command == "shutdown":
+                self.running = False
+                return {}
+            return {"error": f"unsupported command '{command}'"}
+        except Exception as e:
+            return {"error": str(e)}
+        finally:
+            os.chdir(cwd)
+
+    def handle_run(self, message: Dict[str, Any]) -> Dict[str, Any]:
+        from .__main__ import run
+        from .edit import STREAM_PATH
+
+        argv = [str(arg) for arg in message.get("argv", [])]
+        if argv[:1] == ["serve"]:
+            return {"error": "the 'serve' command cannot be forwarded"}
+        if STREAM_PATH in argv:
+            return {"error": f"the '{STREAM_PATH}' path cannot be forwarded"}
+        # an argv --jobs option overrides the server default
+        if self.jobs > 1 and argv[:1] not in [[command] for command in NO_JOBS_COMMANDS]:
+            argv = ["--jobs", str(self.jobs)] + argv
+        env = message.get("env", {})
+        saved_env = {
+            name: os.environ.get(name) for name in FORWARDED_ENVIRONMENT_VARIABLES
+        }
+        stdout = io.StringIO()
+        stderr = io.StringIO()
+        exit_code = 0
+        try:
+            for name in FORWARDED_ENVIRONMENT_VARIABLES:
+                os.environ.pop(name, None)
+                if name in env:
+                    os.environ[name] = str(env[name])
+            with redirect_stdout(stdout), redirect_stderr(stderr):
+                try:
+                    run(argv)
+                except SystemExit as e:
+                    if isinstance(e.code, int):
+                        exit_code = e.code
+                    elif e.code is not None:
+                        sys.stderr.write(f"{e.code}{os.linesep}")
+                        exit_code = 1
+                except Exception:
+                    traceback.print_exc()
+                    exit_code = 1
+        finally:
+            for name, value in saved_env.items():
+                os.environ.pop(name, None)
+                if value is not None:
+                    os.environ[name] = value
+        return {
+            "exit_code": exit_code,
+            "stdout": stdout.getvalue(),
+            "stderr": stderr.getvalue(),
+        }
+
+    def handle_edit(self, message: Dict[str, Any]) -> Dict[str, Any]:
+        from .api import iter_apply_panose
+        from .manifest import panose_from_fields
+
+        results = []
+        for result in iter_apply_panose(
+            message.get("paths", []),
+            panose_from_fields(message),
+            recursive=bool(message.get("recursive")),
+            jobs=int(message.get("jobs", self.jobs)),
+            dry_run=bool(message.get("dry_run")),
+            engine=message.get("engine", "fast"),
+            verify=bool(message.get("verify")),
+            timings=False,
+            face_indexes=message.get("face_indexes"),
+        ):
+            results.append(
+                {
+                    "path": result.fontpath,
+                    "panose": (
+                        list(result.panose_bytes)
+                        if result.panose_bytes is not None
+                        else None
+                    ),
+                    "changed": result.changed,
+                    "cached": result.cached,
+                    "error": result.error,
+                    "faces": [
+                        {
+                            "face_index": face.face_index,
+                            "panose": list(face.panose_bytes),
+                            "changed": face.changed,
+                            "shared_with": list(face.shared_with),
+                        }
+                        for face in result.faces
+                    ],
+                }
+            )
+        return {"results": results}
+
+    def handle_query(self, message: Dict[str, Any]) -> Dict[str, Any]:
+        from .discovery import iter_font_paths
+        from .query import query_font
+
+        fontpaths = iter_font_paths(
+            message.get("paths", []), recursive=bool(message.get("recursive"))
+        )
+        return {
+            "results": [
+                record for fontpath in fontpaths for record in query_font(fontpath)
+            ]
+        }
+
+    def handle_connection(self, conn: socket.socket) -> None:
+        """Reads a request from an accepted connection and writes the
+        response.  Requests that are not received before the connection
+        timeout are answered with an error, and connections that fail are
+        dropped."""
+        try:
+            message = read_message(conn)
+        except socket.timeout:
+            response: Dict[str, Any] = {"error": "timed out waiting for the request"}
+        except ValueError as e:
+            response = {"error": str(e)}
+        except OSError:
+            # the client disconnected
+            return
+        else:
+            response = self.handle(message)
+        try:
+            write_message(conn, response)
+        except OSError:
+            # the client disconnected or stopped reading
+            pass
+
+    def serve_forever(self) -> None:
+        """Accepts and handles connections until a shutdown request.  The
+        socket file is removed on exit."""
+        if os.path.exists(self.socket_path):
+            try:
+                request({"command": "ping"}, self.socket_path, timeout=5.0)
+            except OSError:
+                # stale socket file
+                os.unlink(self.socket_path)
+            else:
+                raise ValueError(f"a server is already running at '{self.socket_path}'")
+
+        make_socket_directory(self.socket_path)
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as server_sock:
+            # the socket file is created with owner-only permissions
+            umask = os.umask(0o177)
+            try:
+                server_sock.bind(self.socket_path)
+            finally:
+                os.umask(umask)
+            try:
+                os.chmod(self.socket_path, 0o600)
+                server_sock.listen(64)
+                self.running = True
+                while self.running:
+                    conn, _ = server_sock.accept()
+                    with conn:
+                        conn.settimeout(self.connection_timeout)
+                        self.handle_connection(conn)
+            finally:
+                os.unlink(self.socket_path)
+
+
+def _stop_server(signum: int, frame: Any) -> None:
+    raise KeyboardInterrupt
+
+
+def run_serve(argv: List[str]) -> None:
+    from .__main__ import jobs_count
+
+    parser = argparse.ArgumentParser(
+        prog="panosifier serve",
+        description="Run a panosifier server on a local Unix domain socket",
+    )
+    parser.add_argument(
+        "--socket",
+        type=str,
+        default=None,
+        metavar="SOCKET_PATH",
+        help=f"server socket path (default: the {SOCKET_ENVIRONMENT_VARIABLE} "
+        f"environment variable path or {get_default_socket_path()})",
+    )
+    parser.add_argument(
+        "--jobs",
+        type=jobs_count,
+        default=1,
+        metavar="N",
+        help="default number of parallel font edit processes or 'auto' (default: 1)",
+    )
+    parser.add_argument(
+        "--stop", action="store_true", help="stop the server that is running"
+    )
+    args = parser.parse_args(argv)
+    socket_path = args.socket or get_default_socket_path()
+
+    if not hasattr(socket, "AF_UNIX"):
+        sys.stderr.write(
+            f"[ERROR] the server requires Unix domain socket support{os.linesep}"
+        )
+        sys.exit(1)
+
+    if args.stop:
+        try:
+            request({"command": "shutdown"}, socket_path, timeout=30.0)
+        except OSError:
+            sys.stderr.write(
+                f"[ERROR] a server is not running at '{socket_path}'{os.linesep}"
+            )
+            sys.exit(1)
+        return
+
+    # import the edit pipeline and fontTools once for all requests
+    import fontTools.ttLib  # type: ignore # noqa: F401
+
+    from . import edit, query  # noqa: F401
+
+    signal.signal(signal.SIGTERM, _stop_server)
+    server = PanosifierServer(socket_path, jobs=args.jobs)
+    print(f"panosifier server listening on {socket_path}")
+    sys.stdout.flush()
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    except (OSError, ValueError) as e:
+        sys.stderr.write(f"[ERROR] {str(e)}{os.linesep}")
+        sys.exit(1)
@@ -0,0 +1,261 @@
+#!/usr/bin/env python3
+
+# Copyright 2020 Source Foundry Authors
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Byte-level sfnt table directory access and OS/2 panose patching.
+
+These functions operate on a binary buffer (e.g., a bytearray or a memory
+mapped file) that holds a complete sfnt font file.  They do not depend on fontTools.
+"""
+
+import mmap
+import struct
+from typing import BinaryIO, Dict, Iterable, List, NamedTuple, Optional, Tuple, Union
+
+# sfnt header: sfntVersion, numTables, searchRange, entrySelector, rangeShift
+SFNT_HEADER_FORMAT = ">4sHHHH"
+SFNT_HEADER_SIZE = struct.calcsize(SFNT_HEADER_FORMAT)
+# table record: tableTag, checksum, offset, length
+TABLE_RECORD_FORMAT = ">4sLLL"
+TABLE_RECORD_SIZE = struct.calcsize(TABLE_RECORD_FORMAT)
+
+SFNT_VERSIONS = (b"\x00\x01\x00\x00", b"OTTO", b"true")
+
+# font collection header: ttcTag, majorVersion, minorVersion, numFonts.  The
+# header is followed by the table directory offset of each face.
+COLLECTION_HEADER_FORMAT = ">4sHHL"
+COLLECTION_HEADER_SIZE = struct.calcsize(COLLECTION_HEADER_FORMAT)
+COLLECTION_TAG = b"ttcf"
+
+# panose is a 10 byte array that begins at byte offset 32 in the OS/2 table
+OS2_PANOSE_OFFSET = 32
+PANOSE_LENGTH = 10
+# head.checkSumAdjustment is a uint32 at byte offset 8 in the head table
+HEAD_CHECKSUM_ADJUSTMENT_OFFSET = 8
+CHECKSUM_MAGIC = 0xB1B0AFBA
+# Windows Unicode BMP US English, Windows Unicode BMP, and Macintosh Roman
+# name records in order of preference
+NAME_PLATFORMS = ((3, 1, 0x409), (3, 1, None), (1, 0, None))
+
+Buffer = Union[bytes, bytearray, mmap.mmap]
+WritableBuffer = Union[bytearray, mmap.mmap]
+
+
+class UnsupportedFormatError(ValueError):
+    pass
+
+
+class TableRecord(NamedTuple):
+    tag: str
+    checksum: int
+    offset: int
+    length: int
+    # byte offset of this table record in the table directory
+    record_offset: int
+
+
+def calc_checksum(data: Buffer) -> int:
+    """Returns the OpenType uint32 checksum of data, zero padded to 4 bytes."""
+    remainder = len(data) % 4
+    if remainder:
+        data = bytes(data) + b"\0" * (4 - remainder)
+    values = struct.unpack(f">{len(data) // 4}L", data)
+    return sum(values) & 0xFFFFFFFF
+
+
+def read_table_directory(
+    buf: Buffer, file_size: Optional[int] = None, directory_offset: int = 0
+) -> Dict[str, TableRecord]:
+    """Returns the sfnt table records in buf mapped by table tag.
+
+    buf must include at least the sfnt header and table directory.  Table
+    bounds are checked against file_size when buf does not hold the full file.
+    directory_offset is the file offset of the table directory in buf (e.g.,
+    of a font collection face) and is added to the table record offsets.
+    """
+    if file_size is None:
+        file_size = len(buf)
+    if len(buf) < SFNT_HEADER_SIZE:
+        raise UnsupportedFormatError("file is too short to be an sfnt font")
+    sfnt_version, num_tables, _, _, _ = struct.unpack_from(SFNT_HEADER_FORMAT, buf, 0)
+    if sfnt_version not in SFNT_VERSIONS:
+        raise UnsupportedFormatError(f"unsupported sfnt version {bytes(sfnt_version)!r}")
+    if len(buf) < SFNT_HEADER_SIZE + num_tables * TABLE_RECORD_SIZE:
+        raise ValueError("truncated sfnt table directory")
+
+    tables = {}
+    for i in range(num_tables):
+        record_offset = SFNT_HEADER_SIZE + i * TABLE_RECORD_SIZE
+        tag, checksum, offset, length = struct.unpack_from(
+            TABLE_RECORD_FORMAT, buf, record_offset
+        )
+        record_offset += directory_offset
+        if offset + length > file_size:
+            raise ValueError(f"'{tag.decode('latin-1')}' table extends past end of file")
+        tag_str = tag.decode("latin-1")
+        tables[tag_str] = TableRecord(tag_str, checksum, offset, length, record_offset)
+    return tables
+
+
+def get_table_record(tables: Dict[str, TableRecord], tag: str) -> TableRecord:
+    try:
+        return tables[tag]
+    except KeyError:
+        raise ValueError(f"font does not include a '{tag}' table")
+
+
+def get_os2_panose_bytes(os2_data: Buffer) -> bytes:
+    """Returns the 10 raw panose bytes in OS/2 table data."""
+    panose_end = OS2_PANOSE_OFFSET + PANOSE_LENGTH
+    if len(os2_data) < panose_end:
+        raise ValueError("'OS/2' table is too short to include panose data")
+    return bytes(os2_data[OS2_PANOSE_OFFSET:panose_end])
+
+
+def read_panose_bytes(buf: Buffer) -> bytes:
+    """Returns the 10 raw OS/2 table panose bytes in an sfnt font buffer."""
+    os2 = get_table_record(read_table_directory(buf), "OS/2")
+    os2_start = os2.offset
+    os2_end = os2_start + os2.length
+    return get_os2_panose_bytes(buf[os2_start:os2_end])
+
+
+def get_name(name: bytes, name_id: int) -> Optional[str]:
+    """Returns the name_id string in name table data, or None when the table
+    does not include a Windows Unicode or Macintosh Roman record."""
+    _, count, string_offset = struct.unpack_from(">HHH", name, 0)
+    records: Dict[Tuple[int, int, Optional[int]], bytes] = {}
+    for i in range(count):
+        platform_id, encoding_id, language_id, record_name_id, length, offset = (
+            struct.unpack_from(">HHHHHH", name, 6 + i * 12)
+        )
+        if record_name_id == name_id:
+            start = string_offset + offset
+            end = start + length
+            records.setdefault((platform_id, encoding_id, language_id), name[start:end])
+            records.setdefault((platform_id, encoding_id, None), name[start:end])
+    for key in NAME_PLATFORMS:
+        if key in records:
+            encoding = "utf-16-be" if key[0] == 3 else "mac-roman"
+            return records[key].decode(encoding, errors="replace")
+    return None
+
+
+def read_table_directory_from_file(
+    f: BinaryIO, directory_offset: int = 0
+) -> Dict[str, TableRecord]:
+    """Reads the sfnt header and table directory at directory_offset in a font
+    file object and returns the table records mapped by table tag."""
+    f.seek(0, 2)
+    file_size = f.tell()
+    f.seek(directory_offset)
+    header = f.read(SFNT_HEADER_SIZE)
+    if len(header) == SFNT_HEADER_SIZE:
+        (num_tables,) = struct.unpack_from(">H", header, 4)
+        header += f.read(num_tables * TABLE_RECORD_SIZE)
+    return read_table_directory(header, file_size, directory_offset)
+
+
+def read_os2_table_from_file(
+    f: BinaryIO, directory_offset: int = 0
+) -> Tuple[TableRecord, bytes]:
+    """Reads the OS/2 table record and table data from an sfnt font file
+    object, or from the font collection face with the table directory at
+    directory_offset.  Only the sfnt header, table directory, and OS/2 table
+    are read."""
+    os2 = get_table_record(read_table_directory_from_file(f, directory_offset), "OS/2")
+    f.seek(os2.offset)
+    return os2, f.read(os2.length)
+
+
+def read_tables_from_file(
+    f: BinaryIO, tags: Iterable[str], directory_offset: int = 0
+) -> Dict[str, bytes]:
+    """Returns the data of the tag tables in an sfnt font file object, or in
+    the font collection face with the table directory at directory_offset,
+    mapped by tag.  Tables that the font does not include are not returned."""
+    records = read_table_directory_from_file(f, directory_offset)
+    tables: Dict[str, bytes] = {}
+    for tag in tags:
+        if tag in records:
+            f.seek(records[tag].offset)
+            tables[tag] = f.read(records[tag].length)
+    return tables
+
+
+def read_collection_face_offsets(f: BinaryIO) -> List[int]:
+    """Returns the table directory offset of each face in a font collection
+    file object.  Raises UnsupportedFormatError when the file is not a font
+    collection."""
+    f.seek(0)
+    header = f.read(COLLECTION_HEADER_SIZE)
+    if len(header) != COLLECTION_HEADER_SIZE or header[:4] != COLLECTION_TAG:
+        raise UnsupportedFormatError("file is not a font collection")
+    _, _, _, num_fonts = struct.unpack(COLLECTION_HEADER_FORMAT, header)
+    data = f.read(num_fonts * 4)
+    if len(data) != num_fonts * 4:
+        raise ValueError("truncated font collection header")
+    return list(struct.unpack(f">{num_fonts}L", data))
+
+
+def patch_panose_bytes(buf: WritableBuffer, os2_offset: int, panose_bytes: bytes) -> int:
+    """Overwrites the panose bytes of the 4-byte aligned OS/2 table data at
+    os2_offset in buf and returns the uint32 checksum difference of the OS/2
+    table data."""
+    if len(panose_bytes) != PANOSE_LENGTH:
+        raise ValueError(
+            f"panose data must be {PANOSE_LENGTH} bytes, received {len(panose_bytes)}"
+        )
+    # the panose bytes span the OS/2 table words at offsets 32 - 44
+    word_start = os2_offset + OS2_PANOSE_OFFSET
+    word_end = word_start + 12
+    panose_end = word_start + PANOSE_LENGTH
+    old_sum = calc_checksum(buf[word_start:word_end])
+    buf[word_start:panose_end] = panose_bytes
+    return (calc_checksum(buf[word_start:word_end]) - old_sum) & 0xFFFFFFFF
+
+
+def adjust_head_checksum(buf: WritableBuffer, head_offset: int, delta: int) -> None:
+    """Updates head.checkSumAdjustment of the head table data at head_offset in
+    buf for an OS/2 table data checksum difference of delta.  The whole font
+    checksum changes by delta in the OS/2 table data and by delta in the OS/2
+    table record checksum."""
+    adj_offset = head_offset + HEAD_CHECKSUM_ADJUSTMENT_OFFSET
+    (adjustment,) = struct.unpack_from(">L", buf, adj_offset)
+    struct.pack_into(">L", buf, adj_offset, (adjustment - 2 * delta) & 0xFFFFFFFF)
+
+
+def write_panose_bytes(buf: WritableBuffer, panose_bytes: bytes) -> None:
+    """Overwrites the OS/2 table panose bytes in an sfnt font buffer in place.
+
+    The OS/2 table record checksum and head.checkSumAdjustment are updated
+    incrementally with the checksum difference of the edited 4-byte words.
+    """
+    tables = read_table_directory(buf)
+    os2 = get_table_record(tables, "OS/2")
+    if os2.length < OS2_PANOSE_OFFSET + PANOSE_LENGTH:
+        raise ValueError("'OS/2' table is too short to include panose data")
+
+    # the table data are 4-byte aligned in the file
+    delta = patch_panose_bytes(buf, os2.offset, panose_bytes)
+    if delta == 0:
+        return
+
+    # OS/2 table record checksum
+    struct.pack_into(
+        ">L", buf, os2.record_offset + 4, (os2.checksum + delta) & 0xFFFFFFFF
+    )
+    if "head" in tables:
+        adjust_head_checksum(buf, tables["head"].offset, delta)
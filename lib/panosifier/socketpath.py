@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+
+# Copyright 2020 Source Foundry Authors
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Default panosifier server socket paths.
+
+The socket path is resolved without the panosifier.server imports so that
+the command line checks for a running server before the server module is
+imported.
+"""
+
+import os
+import tempfile
+
+SOCKET_ENVIRONMENT_VARIABLE = "PANOSIFIER_SOCKET"
+
+
+def get_user_id() -> int:
+    return os.getuid() if hasattr(os, "getuid") else 0
+
+
+def get_default_socket_directory() -> str:
+    """Returns the per-user XDG_RUNTIME_DIR directory, or a per-user directory
+    in the temporary directory that the server creates with owner-only
+    permissions."""
+    runtime_dir = os.environ.get("XDG_RUNTIME_DIR")
+    if runtime_dir and os.path.isdir(runtime_dir):
+        return runtime_dir
+    return os.path.join(tempfile.gettempdir(), f"panosifier-{get_user_id()}")
+
+
+def get_default_socket_path() -> str:
+    """Returns the PANOSIFIER_SOCKET environment variable path, or the socket
+    path in the default per-user socket directory."""
+    path = os.environ.get(SOCKET_ENVIRONMENT_VARIABLE)
+    if path:
+        return path
+    return os.path.join(get_default_socket_directory(), "panosifier.sock")
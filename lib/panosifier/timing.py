@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+
+# Copyright 2020 Source Foundry Authors
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Per-phase edit pipeline timing.
+
+Phases are timed with a Timer.  The NULL_TIMER does not record anything
+and is used when timing is disabled so that instrumented code paths cost a
+method call and two no-op context manager calls per phase.
+"""
+
+import math
+import os
+import time
+from typing import Any, Dict, Iterable, List, NamedTuple, Sequence, Tuple
+
+
+class Span(NamedTuple):
+    name: str
+    # time.perf_counter() value at the start of the phase, in seconds
+    start: float
+    duration: float
+    pid: int
+
+
+class PhaseSummary(NamedTuple):
+    name: str
+    samples: int
+    total: float
+    p50: float
+    p95: float
+
+
+class _PhaseContext(object):
+    __slots__ = ("timer", "name", "start")
+
+    def __init__(self, timer: "Timer", name: str) -> None:
+        self.timer = timer
+        self.name = name
+        self.start = 0.0
+
+    def __enter__(self) -> None:
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.timer.spans.append(
+            Span(self.name, self.start, time.perf_counter() - self.start, os.getpid())
+        )
+
+
+class _NullContext(object):
+    __slots__ = ()
+
+    def __enter__(self) -> None:
+        pass
+
+    def __exit__(self, *exc_info: Any) -> None:
+        pass
+
+
+_NULL_CONTEXT = _NullContext()
+
+
+class Timer(object):
+    def __init__(self) -> None:
+        self.spans: List[Span] = []
+
+    def phase(self, name: str) -> Any:
+        """Returns a context manager that records a span for the phase."""
+        return _PhaseContext(self, name)
+
+
+class NullTimer(Timer):
+    def phase(self, name: str) -> Any:
+        return _NULL_CONTEXT
+
+
+NULL_TIMER = NullTimer()
+
+
+def percentile(sorted_values: Sequence[float], percent: float) -> float:
+    """Returns the nearest-rank percentile of sorted_values."""
+    rank = max(1, math.ceil(percent / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def summarize_spans(spans: Iterable[Span]) -> List[PhaseSummary]:
+    """Returns the count, total, p50, and p95 durations of each phase in first
+    seen phase order."""
+    durations: Dict[str, List[float]] = {}
+    for span in spans:
+        durations.setdefault(span.name, []).append(span.duration)
+    summaries = []
+    for name, values in durations.items():
+        values.sort()
+        summaries.append(
+            PhaseSummary(
+                name,
+                len(values),
+                sum(values),
+                percentile(values, 50),
+                percentile(values, 95),
+            )
+        )
+    return summaries
+
+
+def write_chrome_trace(path: str, events: Iterable[Tuple[str, Span]]) -> None:
+    """Writes (font path, Span) events to path in the Chrome trace event JSON
+    format (e.g., for chrome://tracing or https://ui.perfetto.dev)."""
+    import json
+
+    trace_events = [
+        {
+            "name": span.name,
+            "cat": "panosifier",
+            "ph": "X",
+            "ts": span.start * 1e6,
+            "dur": span.duration * 1e6,
+            "pid": span.pid,
+            "tid": span.pid,
+            "args": {"path": fontpath},
+        }
+        for fontpath, span in events
+    ]
+    with open(path, "w") as f:
+        json.dump({"traceEvents": trace_events, "displayTimeUnit": "ms"}, f)
@@ -0,0 +1,394 @@
+#!/usr/bin/env python3
+
+# Copyright 2020 Source Foundry Authors
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""WOFF and WOFF2 font file panose patching.
+
+WOFF table data are compressed table by table.  Only the OS/2 and head
+tables are decompressed and re-encoded, and all other compressed table data
+are copied from the source font file.
+
+WOFF2 table data are compressed in a single brotli stream.  The stream is
+decompressed and patched, and the transformed glyf, loca, and hmtx table
+data in the stream are reused without reconstruction.  WOFF2 support
+requires the brotli package.
+"""
+
+import struct
+import zlib
+from typing import Any, BinaryIO, Dict, Iterable, List, NamedTuple, Optional, Tuple, Union
+
+from .sfnt import (
+    COLLECTION_TAG,
+    OS2_PANOSE_OFFSET,
+    PANOSE_LENGTH,
+    UnsupportedFormatError,
+    adjust_head_checksum,
+    calc_checksum,
+    get_os2_panose_bytes,
+    patch_panose_bytes,
+    read_tables_from_file,
+)
+
+WOFF_SIGNATURE = b"wOFF"
+WOFF2_SIGNATURE = b"wOF2"
+
+# signature, flavor, length, numTables, reserved, totalSfntSize, majorVersion,
+# minorVersion, metaOffset, metaLength, metaOrigLength, privOffset, privLength
+WOFF_HEADER_FORMAT = ">4s4sLHHLHHLLLLL"
+WOFF_HEADER_SIZE = struct.calcsize(WOFF_HEADER_FORMAT)
+# tag, offset, compLength, origLength, origChecksum
+WOFF_TABLE_ENTRY_FORMAT = ">4sLLLL"
+WOFF_TABLE_ENTRY_SIZE = struct.calcsize(WOFF_TABLE_ENTRY_FORMAT)
+# same compression level as the fontTools WOFF writer
+WOFF_ZLIB_LEVEL = 6
+
+# signature, flavor, length, numTables, reserved, totalSfntSize,
+# totalCompressedSize, majorVersion, minorVersion, metaOffset, metaLength,
+# metaOrigLength, privOffset, privLength
+WOFF2_HEADER_FORMAT = ">4s4sLHHLLHHLLLLL"
+WOFF2_HEADER_SIZE = struct.calcsize(WOFF2_HEADER_FORMAT)
+# table tags of the WOFF2 table directory entry flags tag index values 0 - 62.
+# Index 63 is followed by an arbitrary 4 byte tag.
+# fmt: off
+WOFF2_KNOWN_TAGS = (
+    "cmap", "head", "hhea", "hmtx", "maxp", "name", "OS/2", "post", "cvt ",
+    "fpgm", "glyf", "loca", "prep", "CFF ", "VORG", "EBDT", "EBLC", "gasp",
+    "hdmx", "kern", "LTSH", "PCLT", "VDMX", "vhea", "vmtx", "BASE", "GDEF",
+    "GPOS", "GSUB", "EBSC", "JSTF", "MATH", "CBDT", "CBLC", "COLR", "CPAL",
+    "SVG ", "sbix", "acnt", "avar", "bdat", "bloc", "bsln", "cvar", "fdsc",
+    "feat", "fmtx", "fvar", "gvar", "hsty", "just", "lcar", "mort", "morx",
+    "opbd", "prop", "trak", "Zapf", "Silf", "Glat", "Gloc", "Feat", "Sill",
+)
+# fmt: on
+WOFF2_ARBITRARY_TAG_INDEX = 63
+
+
+class WoffTableEntry(NamedTuple):
+    tag: str
+    offset: int
+    comp_length: int
+    orig_length: int
+    orig_checksum: int
+
+
+def _pad_length(length: int) -> int:
+    return (length + 3) & ~3
+
+
+def _read_exactly(f: BinaryIO, offset: int, length: int) -> bytes:
+    f.seek(offset)
+    data = f.read(length)
+    if len(data) != length:
+        raise ValueError("truncated WOFF font file")
+    return data
+
+
+def _copy_flavor_data(
+    source: BinaryIO,
+    output: BinaryIO,
+    offset: int,
+    meta: Tuple[int, int],
+    priv: Tuple[int, int],
+) -> Tuple[int, int, int]:
+    """Copies the (offset, length) metadata and private data blocks from source
+    to output at the 4-byte aligned offset.  Returns the new metadata and
+    private data block offsets, and the output file length."""
+    meta_offset = priv_offset = 0
+    if meta[1]:
+        meta_offset = offset
+        output.write(_read_exactly(source, meta[0], meta[1]))
+        offset += meta[1]
+    if priv[1]:
+        output.write(b"\0" * (_pad_length(offset) - offset))
+        priv_offset = offset = _pad_length(offset)
+        output.write(_read_exactly(source, priv[0], priv[1]))
+        offset += priv[1]
+    return meta_offset, priv_offset, offset
+
+
+class WoffFont(object):
+    """WOFF font file with decoded OS/2 and head table data."""
+
+    def __init__(self, f: BinaryIO) -> None:
+        header = f.read(WOFF_HEADER_SIZE)
+        if len(header) != WOFF_HEADER_SIZE:
+            raise ValueError("truncated WOFF header")
+        self.header = list(struct.unpack(WOFF_HEADER_FORMAT, header))
+        num_tables = self.header[3]
+        directory = f.read(num_tables * WOFF_TABLE_ENTRY_SIZE)
+        if len(directory) != num_tables * WOFF_TABLE_ENTRY_SIZE:
+            raise ValueError("truncated WOFF table directory")
+        self.entries: List[WoffTableEntry] = []
+        for i in range(num_tables):
+            tag, *values = struct.unpack_from(
+                WOFF_TABLE_ENTRY_FORMAT, directory, i * WOFF_TABLE_ENTRY_SIZE
+            )
+            self.entries.append(WoffTableEntry(tag.decode("latin-1"), *values))
+        tables = {entry.tag: entry for entry in self.entries}
+        self.tables = tables
+        if "OS/2" not in tables:
+            raise ValueError("font does not include a 'OS/2' table")
+        self.os2 = self.read_table(f, tables["OS/2"])
+        if len(self.os2) < OS2_PANOSE_OFFSET + PANOSE_LENGTH:
+            raise ValueError("'OS/2' table is too short to include panose data")
+        self.os2_checksum = tables["OS/2"].orig_checksum
+        self.head = self.read_table(f, tables["head"]) if "head" in tables else None
+        self.os2_checksum_delta = 0
+
+    def read_table(self, f: BinaryIO, entry: WoffTableEntry) -> bytearray:
+        data = _read_exactly(f, entry.offset, entry.comp_length)
+        if entry.comp_length < entry.orig_length:
+            data = zlib.decompress(data)
+        if len(data) != entry.orig_length:
+            raise ValueError(f"'{entry.tag}' table data length does not match")
+        return bytearray(data)
+
+    def get_table_data(self, f: BinaryIO, tag: str) -> Optional[bytes]:
+        """Returns the decompressed data of the tag table in the font file
+        object, or None when the font does not include the table."""
+        if tag not in self.tables:
+            return None
+        return bytes(self.read_table(f, self.tables[tag]))
+
+    def get_panose_bytes(self) -> bytes:
+        return get_os2_panose_bytes(self.os2)
+
+    def check_os2_checksum(self) -> None:
+        """Raises ValueError if the OS/2 table checksum does not match."""
+        if calc_checksum(self.os2) != self.os2_checksum:
+            raise ValueError("'OS/2' table checksum does not match the table data")
+
+    def set_panose_bytes(self, panose_bytes: bytes) -> None:
+        delta = patch_panose_bytes(self.os2, 0, panose_bytes)
+        self.os2_checksum_delta = (self.os2_checksum_delta + delta) & 0xFFFFFFFF
+        if self.head is not None:
+            adjust_head_checksum(self.head, 0, delta)
+
+    def write(self, source: BinaryIO, output: BinaryIO) -> None:
+        """Writes the font to output with the re-encoded OS/2 and head table
+        data.  All other table data are copied from the source font file."""
+        edited = {"OS/2": bytes(self.os2)}
+        if self.head is not None:
+            edited["head"] = bytes(self.head)
+
+        offset = WOFF_HEADER_SIZE + len(self.entries) * WOFF_TABLE_ENTRY_SIZE
+        output.seek(offset)
+        new_entries: Dict[str, WoffTableEntry] = {}
+        # table data are written in the source file order
+        for entry in sorted(self.entries, key=lambda entry: entry.offset):
+            checksum = entry.orig_checksum
+            if entry.tag in edited:
+                orig_data = edited[entry.tag]
+                data = zlib.compress(orig_data, WOFF_ZLIB_LEVEL)
+                if len(data) >= len(orig_data):
+                    data = orig_data
+                if entry.tag == "OS/2":
+                    checksum = (checksum + self.os2_checksum_delta) & 0xFFFFFFFF
+            else:
+                data = _read_exactly(source, entry.offset, entry.comp_length)
+            new_entries[entry.tag] = entry._replace(
+                offset=offset, comp_length=len(data), orig_checksum=checksum
+            )
+            output.write(data)
+            output.write(b"\0" * (_pad_length(len(data)) - len(data)))
+            offset += _pad_length(len(data))
+
+        header = self.header
+        meta_offset, priv_offset, length = _copy_flavor_data(
+            source, output, offset, (header[8], header[9]), (header[11], header[12])
+        )
+        header[2] = length
+        header[8] = meta_offset
+        header[11] = priv_offset
+        output.seek(0)
+        output.write(struct.pack(WOFF_HEADER_FORMAT, *header))
+        for entry in self.entries:
+            new_entry = new_entries[entry.tag]
+            output.write(
+                struct.pack(
+                    WOFF_TABLE_ENTRY_FORMAT,
+                    new_entry.tag.encode("latin-1"),
+                    *new_entry[1:],
+                )
+            )
+
+
+def _read_uint_base128(data: bytes, offset: int) -> Tuple[int, int]:
+    """Returns a WOFF2 UIntBase128 value at offset in data and the offset of
+    the next byte."""
+    value = 0
+    for i in range(5):
+        if offset >= len(data):
+            raise ValueError("truncated WOFF2 table directory")
+        byte = data[offset]
+        offset += 1
+        if i == 0 and byte == 0x80:
+            raise ValueError("invalid WOFF2 UIntBase128 value")
+        value = (value << 7) | (byte & 0x7F)
+        if value > 0xFFFFFFFF:
+            raise ValueError("invalid WOFF2 UIntBase128 value")
+        if not byte & 0x80:
+            return value, offset
+    raise ValueError("invalid WOFF2 UIntBase128 value")
+
+
+def _import_brotli() -> Any:
+    try:
+        import brotli  # type: ignore
+    except ImportError:
+        raise ValueError(
+            "WOFF2 fonts require the brotli package (pip install panosifier[woff2])"
+        )
+    return brotli
+
+
+class Woff2Font(object):
+    """WOFF2 font file with the decompressed table data stream."""
+
+    def __init__(self, f: BinaryIO) -> None:
+        header = f.read(WOFF2_HEADER_SIZE)
+        if len(header) != WOFF2_HEADER_SIZE:
+            raise ValueError("truncated WOFF2 header")
+        self.header = list(struct.unpack(WOFF2_HEADER_FORMAT, header))
+        if self.header[1] == b"ttcf":
+            raise UnsupportedFormatError("WOFF2 font collections are not supported")
+        num_tables = self.header[3]
+        # table directory entries have a flags byte, an optional tag, and
+        # one or two UIntBase128 values of at most 5 bytes
+        directory = f.read(num_tables * 15)
+
+        tables: Dict[str, Tuple[int, int]] = {}
+        stream_length = 0
+        offset = 0
+        for _ in range(num_tables):
+            if offset >= len(directory):
+                raise ValueError("truncated WOFF2 table directory")
+            flags = directory[offset]
+            offset += 1
+            tag_index = flags & 0x3F
+            if tag_index == WOFF2_ARBITRARY_TAG_INDEX:
+                tag_end = offset + 4
+                tag = directory[offset:tag_end].decode("latin-1")
+                offset = tag_end
+            else:
+                tag = WOFF2_KNOWN_TAGS[tag_index]
+            length, offset = _read_uint_base128(directory, offset)
+            transform_version = (flags >> 6) & 0x03
+            # transform version 0 of the glyf and loca tables and the other
+            # transform versions of all other tables define transformLength
+            if (tag in ("glyf", "loca")) == (transform_version == 0):
+                length, offset = _read_uint_base128(directory, offset)
+            tables[tag] = (stream_length, length)
+            stream_length += length
+        self.stream_offset = WOFF2_HEADER_SIZE + offset
+        # the table directory bytes are written to the edited font unchanged
+        self.directory = directory[:offset]
+        self.tables = tables
+
+        if "OS/2" not in tables:
+            raise ValueError("font does not include a 'OS/2' table")
+        if tables["OS/2"][1] < OS2_PANOSE_OFFSET + PANOSE_LENGTH:
+            raise ValueError("'OS/2' table is too short to include panose data")
+        brotli = _import_brotli()
+        compressed = _read_exactly(f, self.stream_offset, self.header[6])
+        self.stream = bytearray(brotli.decompress(compressed))
+        if len(self.stream) != stream_length:
+            raise ValueError("WOFF2 table data stream length does not match")
+        self.os2_offset = tables["OS/2"][0]
+        self.head_offset: Optional[int] = tables["head"][0] if "head" in tables else None
+
+    def get_table_data(self, f: BinaryIO, tag: str) -> Optional[bytes]:
+        """Returns the tag table data in the decompressed stream, or None when
+        the font does not include the table.  The data of the transformed
+        glyf, loca, and hmtx tables are returned in the transformed format."""
+        if tag not in self.tables:
+            return None
+        start, length = self.tables[tag]
+        end = start + length
+        return bytes(self.stream[start:end])
+
+    def get_panose_bytes(self) -> bytes:
+        panose_start = self.os2_offset + OS2_PANOSE_OFFSET
+        panose_end = panose_start + PANOSE_LENGTH
+        return bytes(self.stream[panose_start:panose_end])
+
+    def check_os2_checksum(self) -> None:
+        # WOFF2 table directories do not include table checksums
+        pass
+
+    def set_panose_bytes(self, panose_bytes: bytes) -> None:
+        # table data in the stream are not 4-byte aligned.  Checksums are
+        # calculated from the table start with the same word alignment.
+        delta = patch_panose_bytes(self.stream, self.os2_offset, panose_bytes)
+        if self.head_offset is not None:
+            adjust_head_checksum(self.stream, self.head_offset, delta)
+
+    def write(self, source: BinaryIO, output: BinaryIO) -> None:
+        """Writes the font to output with the recompressed table data stream."""
+        brotli = _import_brotli()
+        compressed = brotli.compress(bytes(self.stream), mode=brotli.MODE_FONT)
+        output.seek(WOFF2_HEADER_SIZE)
+        output.write(self.directory)
+        output.write(compressed)
+        offset = self.stream_offset + len(compressed)
+        output.write(b"\0" * (_pad_length(offset) - offset))
+
+        header = self.header
+        meta_offset, priv_offset, length = _copy_flavor_data(
+            source,
+            output,
+            _pad_length(offset),
+            (header[9], header[10]),
+            (header[12], header[13]),
+        )
+        header[2] = length
+        header[6] = len(compressed)
+        header[9] = meta_offset
+        header[12] = priv_offset
+        output.seek(0)
+        output.write(struct.pack(WOFF2_HEADER_FORMAT, *header))
+
+
+def read_woff_font(f: BinaryIO) -> Union[WoffFont, Woff2Font]:
+    """Returns the WoffFont or Woff2Font of a WOFF or WOFF2 font file object.
+    Raises UnsupportedFormatError on other formats."""
+    f.seek(0)
+    signature = f.read(4)
+    f.seek(0)
+    if signature == WOFF_SIGNATURE:
+        return WoffFont(f)
+    elif signature == WOFF2_SIGNATURE:
+        return Woff2Font(f)
+    raise UnsupportedFormatError(f"unsupported WOFF signature {signature!r}")
+
+
+def read_font_tables(f: BinaryIO, tags: Iterable[str]) -> Dict[str, bytes]:
+    """Returns the data of the tag tables in an sfnt, WOFF, or WOFF2 font file
+    object mapped by tag.  Tables that the font does not include are not
+    returned."""
+    f.seek(0)
+    signature = f.read(4)
+    if signature == COLLECTION_TAG:
+        raise UnsupportedFormatError("font collections are not supported")
+    tables: Dict[str, bytes] = {}
+    if signature in (WOFF_SIGNATURE, WOFF2_SIGNATURE):
+        font = read_woff_font(f)
+        for tag in tags:
+            data = font.get_table_data(f, tag)
+            if data is not None:
+                tables[tag] = data
+        return tables
+    return read_tables_from_file(f, tags)
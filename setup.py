@@ -20,6 +20,10 @@ EXTRAS_REQUIRES = {
     "dev": ["coverage", "pytest", "tox", "flake8", "mypy"],
     # for maintainer installs
     "maintain": ["wheel", "setuptools", "twine"],
+    # for WOFF2 font edits
+    "woff2": ["brotli"],
+    # for panose inference
+    "infer": ["numpy"],
 }
 
 this_file_path = os.path.abspath(os.path.dirname(__file__))
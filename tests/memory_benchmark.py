@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Peak memory benchmark of the panose edit engines on a large font.
+
+Each edit runs in a new subprocess and reports the subprocess peak resident
+set size.  The "baseline" edit is the full fontTools load/save of the
+original panosifier implementation.
+
+Usage:
+
+    python tests/memory_benchmark.py [--size-mb N] [--json]
+"""
+
+import argparse
+import json
+import os
+import shutil
+import struct
+import subprocess
+import sys
+import tempfile
+
+from fontTools.ttLib import TTFont
+from fontTools.ttLib.tables.DefaultTable import DefaultTable
+
+TEST_FONT_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)),
+    "testfiles",
+    "fonts",
+    "NotoSans-Regular.subset.ttf",
+)
+
+EDIT_SCRIPTS = {
+    "baseline": """
+import sys
+from fontTools.ttLib import TTFont
+tt = TTFont(sys.argv[1])
+tt["OS/2"].panose.bWeight = 8
+tt.save(sys.argv[1])
+""",
+    "fonttools": """
+import sys
+from panosifier.datastructures import Panose
+from panosifier.edit import edit_font
+edit_font(sys.argv[1], Panose(weight=8), engine="fonttools")
+""",
+    "fast": """
+import sys
+from panosifier.datastructures import Panose
+from panosifier.edit import edit_font
+edit_font(sys.argv[1], Panose(weight=8), engine="fast")
+""",
+    "fast --output-dir": """
+import sys
+from panosifier.datastructures import Panose
+from panosifier.edit import edit_font
+edit_font(sys.argv[1], Panose(weight=8), output_path=sys.argv[1] + ".out")
+""",
+}
+
+# the peak RSS of the edit subprocess is reported on stdout.  Linux
+# ru_maxrss values are inherited from the parent process, the VmHWM value of
+# the new process image is used when it is available.
+PEAK_RSS_SUFFIX = """
+import resource
+try:
+    with open("/proc/self/status") as f:
+        print([line.split()[1] for line in f if line.startswith("VmHWM:")][0])
+except (OSError, IndexError):
+    print(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+"""
+
+
+def make_large_font(fontpath, size_mb):
+    """Writes the test font with an additional size_mb MB private table."""
+    tt = TTFont(TEST_FONT_PATH)
+    table = DefaultTable("zPAD")
+    table.data = struct.pack(">L", 0) * (size_mb * 1024 * 256)
+    tt["zPAD"] = table
+    tt.save(fontpath)
+
+
+def measure_peak_rss_kb(script, fontpath):
+    output = subprocess.check_output(
+        [sys.executable, "-c", script + PEAK_RSS_SUFFIX, fontpath]
+    )
+    return int(output.decode("ascii").strip().splitlines()[-1])
+
+
+def run_benchmark(size_mb):
+    results = {}
+    with tempfile.TemporaryDirectory() as tmpdirname:
+        source_path = os.path.join(tmpdirname, "source.ttf")
+        make_large_font(source_path, size_mb)
+        # interpreter and import baseline
+        results["python startup"] = measure_peak_rss_kb("", source_path)
+        for name, script in EDIT_SCRIPTS.items():
+            fontpath = os.path.join(tmpdirname, "edit.ttf")
+            shutil.copyfile(source_path, fontpath)
+            results[name] = measure_peak_rss_kb(script, fontpath)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--size-mb", type=int, default=40, help="font file size in MB (default: 40)"
+    )
+    parser.add_argument("--json", action="store_true", help="write JSON output")
+    args = parser.parse_args()
+
+    results = run_benchmark(args.size_mb)
+    if args.json:
+        print(json.dumps({"size_mb": args.size_mb, "peak_rss_kb": results}, indent=2))
+    else:
+        print(f"peak RSS of a {args.size_mb} MB font edit:")
+        for name, peak_rss_kb in results.items():
+            print(f"   {name}: {peak_rss_kb / 1024:.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
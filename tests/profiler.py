@@ -1,40 +1,381 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
+"""Panose edit benchmark harness.
+
+Generates synthetic fonts and times each phase of a panose edit.  Results are
+written as JSON so that runs can be compared across changes.
+
+Usage:
+
+    python tests/profiler.py run [--repeat N] [--output RESULTS.json] [--profile]
+    python tests/profiler.py compare BASELINE.json CURRENT.json [--threshold PCT]
+
+The compare command exits with status code 1 when a phase time of a font in
+CURRENT.json regresses by more than the threshold percentage (default: 10).
+"""
+
+import argparse
 import cProfile
+import io
+import json
+import os
+import platform
 import pstats
-from io import StringIO
-
-
-def profile():
-    # ------------------------------------------------------------------------------
-    # Setup a profile
-    # ------------------------------------------------------------------------------
-    pr = cProfile.Profile()
-    # ------------------------------------------------------------------------------
-    # Enter setup code below
-    # ------------------------------------------------------------------------------
-    # Optional: include setup code here
-
-    # ------------------------------------------------------------------------------
-    # Start profiler
-    # ------------------------------------------------------------------------------
-    pr.enable()
-
-    # ------------------------------------------------------------------------------
-    # BEGIN profiled code block
-    # ------------------------------------------------------------------------------
-
-    # ------------------------------------------------------------------------------
-    # END profiled code block
-    # ------------------------------------------------------------------------------
-    pr.disable()
-    s = StringIO()
-    sortby = "cumulative"
-    ps = pstats.Stats(pr, stream=s).sort_stats(sortby)
-    ps.strip_dirs().sort_stats("time").print_stats()
-    print(s.getvalue())
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from contextlib import redirect_stdout
+
+import fontTools
+from fontTools.fontBuilder import FontBuilder
+from fontTools.pens.t2CharStringPen import T2CharStringPen
+from fontTools.pens.ttGlyphPen import TTGlyphPen
+from fontTools.ttLib import TTCollection, TTFont
+from fontTools.ttLib.tables.TupleVariation import TupleVariation
+
+from panosifier.__main__ import print_panose_report
+from panosifier.datastructures import Panose
+from panosifier.edit import edit_font, get_fonttools_panose_bytes
+
+RESULTS_FORMAT_VERSION = 1
+PHASES = ("load", "panose", "set_font_panose_data", "save", "report", "edit")
+DEFAULT_REPEAT = 5
+DEFAULT_THRESHOLD = 10.0
+# phase time differences below this value in seconds are timer noise
+DEFAULT_MIN_DELTA = 0.0005
+PANOSE_DEFINITION = "2,11,8,2,4,5,4,2,2,4"
+
+# (font name, file extension, glyph count) of the synthetic benchmark fonts
+FONTS = (
+    ("small-latin-ttf", ".ttf", 150),
+    ("large-cff-otf", ".otf", 12000),
+    ("variable-ttf", ".ttf", 1000),
+    ("multi-face-ttc", ".ttc", 1000),
+    ("large-ttf-woff", ".woff", 12000),
+)
+try:
+    import brotli  # noqa: F401
+
+    FONTS += (("large-ttf-woff2", ".woff2", 12000),)
+except ImportError:
+    # WOFF2 fonts require the brotli package
+    pass
+TTC_FACE_COUNT = 4
+
+
+# ------------------------------------------------------------------------------
+# Synthetic fonts
+# ------------------------------------------------------------------------------
+
+
+def _draw_glyph(pen, i):
+    # a distinct two contour glyph per glyph index
+    x = 50 + i % 200
+    pen.moveTo((x, 0))
+    pen.lineTo((x, 700))
+    pen.lineTo((x + 400, 700))
+    pen.lineTo((x + 400, 0))
+    pen.closePath()
+    pen.moveTo((x + 100, 100))
+    pen.lineTo((x + 300, 100))
+    pen.lineTo((x + 300, 600 - i % 300))
+    pen.lineTo((x + 100, 600 - i % 300))
+    pen.closePath()
+
+
+def _new_font_builder(glyph_count, is_ttf):
+    glyph_order = [".notdef"] + [f"glyph{i:05d}" for i in range(1, glyph_count)]
+    fb = FontBuilder(1000, isTTF=is_ttf)
+    fb.setupGlyphOrder(glyph_order)
+    fb.setupCharacterMap(
+        {0x20 + i: name for i, name in enumerate(glyph_order[1:]) if 0x20 + i < 0xD800}
+    )
+    return fb, glyph_order
+
+
+def _finish_font(fb, glyph_order, family_name, style_name="Regular"):
+    fb.setupHorizontalMetrics({name: (600, 50) for name in glyph_order})
+    fb.setupHorizontalHeader(ascent=800, descent=-200)
+    fb.setupNameTable({"familyName": family_name, "styleName": style_name})
+    fb.setupOS2(sTypoAscender=800, sTypoDescender=-200, usWinAscent=800, usWinDescent=200)
+    fb.setupPost()
+    return fb.font
+
+
+def build_ttf(glyph_count, family_name="Benchmark Sans", style_name="Regular"):
+    fb, glyph_order = _new_font_builder(glyph_count, is_ttf=True)
+    glyphs = {}
+    for i, name in enumerate(glyph_order):
+        pen = TTGlyphPen(None)
+        _draw_glyph(pen, i)
+        glyphs[name] = pen.glyph()
+    fb.setupGlyf(glyphs)
+    return _finish_font(fb, glyph_order, family_name, style_name)
+
+
+def build_cff_otf(glyph_count):
+    fb, glyph_order = _new_font_builder(glyph_count, is_ttf=False)
+    charstrings = {}
+    for i, name in enumerate(glyph_order):
+        pen = T2CharStringPen(600, None)
+        _draw_glyph(pen, i)
+        charstrings[name] = pen.getCharString()
+    fb.setupCFF(
+        "BenchmarkSerif-Regular", {"FullName": "Benchmark Serif"}, charstrings, {}
+    )
+    return _finish_font(fb, glyph_order, "Benchmark Serif")
+
+
+def build_variable_ttf(glyph_count):
+    font = build_ttf(glyph_count, family_name="Benchmark Variable")
+    fb = FontBuilder(font=font)
+    fb.setupFvar(
+        [("wght", 100, 400, 900, "Weight"), ("wdth", 75, 100, 125, "Width")],
+        [
+            {"location": {"wght": 100, "wdth": 100}, "stylename": "Thin"},
+            {"location": {"wght": 400, "wdth": 100}, "stylename": "Regular"},
+            {"location": {"wght": 900, "wdth": 100}, "stylename": "Black"},
+        ],
+    )
+    variations = {}
+    for name in font.getGlyphOrder():
+        coordinates, _, _ = font["glyf"][name].getCoordinates(font["glyf"])
+        # outline points and 4 phantom points
+        point_count = len(coordinates) + 4
+        variations[name] = [
+            TupleVariation({"wght": (0, 1, 1)}, [(20, 0)] * point_count),
+            TupleVariation({"wdth": (0, 1, 1)}, [(0, 10)] * point_count),
+        ]
+    fb.setupGvar(variations)
+    return font
+
+
+def write_ttc(fontpath, glyph_count):
+    collection = TTCollection()
+    for i in range(TTC_FACE_COUNT):
+        with io.BytesIO() as buf:
+            build_ttf(glyph_count, style_name=f"Style {i}").save(buf)
+            buf.seek(0)
+            collection.fonts.append(TTFont(buf))
+    collection.save(fontpath)
+
+
+def write_benchmark_font(name, fontpath, glyph_count):
+    if name == "large-cff-otf":
+        build_cff_otf(glyph_count).save(fontpath)
+    elif name == "variable-ttf":
+        build_variable_ttf(glyph_count).save(fontpath)
+    elif name == "multi-face-ttc":
+        write_ttc(fontpath, glyph_count)
+    elif name in ("large-ttf-woff", "large-ttf-woff2"):
+        font = build_ttf(glyph_count)
+        font.flavor = os.path.splitext(fontpath)[1][1:]
+        font.save(fontpath)
+    else:
+        build_ttf(glyph_count).save(fontpath)
+
+
+# ------------------------------------------------------------------------------
+# Phase timing
+# ------------------------------------------------------------------------------
+
+
+def load_fonts(fontpath):
+    if fontpath.endswith(".ttc"):
+        return TTCollection(fontpath).fonts
+    return [TTFont(fontpath)]
+
+
+def time_edit_phases(fontpath):
+    """Returns the time in seconds of each panose edit phase on the font at
+    fontpath.  The font file is edited."""
+    timings = {}
+
+    start = time.perf_counter()
+    fonts = load_fonts(fontpath)
+    # the OS/2 table is decompiled on first access
+    for tt in fonts:
+        tt["OS/2"]
+    timings["load"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    panose = Panose.from_comma_delim_string(PANOSE_DEFINITION)
+    timings["panose"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for tt in fonts:
+        panose.set_font_panose_data(tt)
+    timings["set_font_panose_data"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    if fontpath.endswith(".ttc"):
+        collection = TTCollection()
+        collection.fonts = fonts
+        collection.save(fontpath)
+    else:
+        fonts[0].save(fontpath)
+    timings["save"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    with redirect_stdout(io.StringIO()):
+        for tt in fonts:
+            print_panose_report(fontpath, get_fonttools_panose_bytes(tt))
+    timings["report"] = time.perf_counter() - start
+    return timings
+
+
+def time_panosifier_edit(fontpath):
+    """Returns the time in seconds of a default engine panosifier edit of the
+    font at fontpath, or None when the font format is not supported."""
+    start = time.perf_counter()
+    try:
+        edit_font(fontpath, Panose(weight=5))
+    except Exception:
+        return None
+    return time.perf_counter() - start
+
+
+def run_benchmarks(repeat=DEFAULT_REPEAT, glyph_scale=1.0, profiler=None):
+    """Returns the benchmark results dictionary with the median time in
+    seconds of each phase over repeat edits of each synthetic font."""
+    results = {
+        "format_version": RESULTS_FORMAT_VERSION,
+        "python": platform.python_version(),
+        "fonttools": fontTools.version,
+        "repeat": repeat,
+        "fonts": {},
+    }
+    with tempfile.TemporaryDirectory() as tmpdirname:
+        for name, extension, glyph_count in FONTS:
+            source_path = os.path.join(tmpdirname, f"{name}{extension}")
+            write_benchmark_font(
+                name, source_path, max(2, int(glyph_count * glyph_scale))
+            )
+            fontpath = os.path.join(tmpdirname, f"edit{extension}")
+
+            samples = {phase: [] for phase in PHASES}
+            for _ in range(repeat):
+                shutil.copyfile(source_path, fontpath)
+                if profiler is not None:
+                    profiler.enable()
+                timings = time_edit_phases(fontpath)
+                timings["edit"] = time_panosifier_edit(fontpath)
+                if profiler is not None:
+                    profiler.disable()
+                for phase, seconds in timings.items():
+                    if seconds is not None:
+                        samples[phase].append(seconds)
+
+            results["fonts"][name] = {
+                "file_size": os.path.getsize(source_path),
+                "phases": {
+                    phase: statistics.median(values)
+                    for phase, values in samples.items()
+                    if values
+                },
+            }
+    return results
+
+
+# ------------------------------------------------------------------------------
+# Comparisons
+# ------------------------------------------------------------------------------
+
+
+def compare_results(
+    baseline, current, threshold=DEFAULT_THRESHOLD, min_delta=DEFAULT_MIN_DELTA
+):
+    """Returns (font name, phase, baseline seconds, current seconds) tuples for
+    phases that are more than threshold percent slower in current.  Phase time
+    increases of less than min_delta seconds are not regressions."""
+    regressions = []
+    for name, font_results in current["fonts"].items():
+        baseline_phases = baseline["fonts"].get(name, {}).get("phases", {})
+        for phase, seconds in font_results["phases"].items():
+            if phase not in baseline_phases:
+                continue
+            baseline_seconds = baseline_phases[phase]
+            if seconds - baseline_seconds > min_delta and seconds > baseline_seconds * (
+                1 + threshold / 100
+            ):
+                regressions.append((name, phase, baseline_seconds, seconds))
+    return regressions
+
+
+def print_results(results):
+    for name, font_results in results["fonts"].items():
+        print(f"{name} ({font_results['file_size']} bytes):")
+        for phase, seconds in font_results["phases"].items():
+            print(f"   {phase}: {seconds * 1000:.2f} ms")
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="panosifier benchmark harness")
+    subparsers = parser.add_subparsers(dest="command")
+    subparsers.required = True
+
+    run_parser = subparsers.add_parser("run", help="run the benchmarks")
+    run_parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT)
+    run_parser.add_argument(
+        "--glyph-scale",
+        type=float,
+        default=1.0,
+        help="synthetic font glyph count multiplier (default: 1.0)",
+    )
+    run_parser.add_argument("--output", "-o", help="JSON results file path")
+    run_parser.add_argument(
+        "--profile", action="store_true", help="print cProfile statistics of the edits"
+    )
+
+    compare_parser = subparsers.add_parser("compare", help="compare two result files")
+    compare_parser.add_argument("BASELINE")
+    compare_parser.add_argument("CURRENT")
+    compare_parser.add_argument(
+        "--threshold",
+        type=float,
+        default=DEFAULT_THRESHOLD,
+        help=f"regression threshold percentage (default: {DEFAULT_THRESHOLD})",
+    )
+    compare_parser.add_argument(
+        "--min-delta",
+        type=float,
+        default=DEFAULT_MIN_DELTA,
+        help=f"minimum regression in seconds (default: {DEFAULT_MIN_DELTA})",
+    )
+    args = parser.parse_args(argv)
+
+    if args.command == "run":
+        profiler = cProfile.Profile() if args.profile else None
+        results = run_benchmarks(args.repeat, args.glyph_scale, profiler)
+        if args.output:
+            with open(args.output, "w") as f:
+                json.dump(results, f, indent=2)
+        print_results(results)
+        if profiler is not None:
+            s = io.StringIO()
+            ps = pstats.Stats(profiler, stream=s)
+            ps.strip_dirs().sort_stats("cumulative").print_stats(30)
+            print(s.getvalue())
+        return 0
+
+    with open(args.BASELINE) as f:
+        baseline = json.load(f)
+    with open(args.CURRENT) as f:
+        current = json.load(f)
+    regressions = compare_results(baseline, current, args.threshold, args.min_delta)
+    for name, phase, baseline_seconds, seconds in regressions:
+        print(
+            f"[REGRESSION] {name} {phase}: {baseline_seconds * 1000:.2f} ms -> "
+            f"{seconds * 1000:.2f} ms"
+        )
+    if regressions:
+        return 1
+    print(f"no regressions over {args.threshold}%")
+    return 0
 
 
 if __name__ == "__main__":
-    profile()
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+
+import os
+import shutil
+import tempfile
+
+import pytest
+from fontTools.ttLib import TTFont
+
+from panosifier import api, sfnt
+from panosifier.datastructures import Panose
+
+TEST_FONT_NAME = "NotoSans-Regular.subset.ttf"
+
+
+def get_test_font_path():
+    return os.path.join("tests", "testfiles", "fonts", TEST_FONT_NAME)
+
+
+@pytest.mark.parametrize(
+    "definition",
+    [
+        Panose(weight=8),
+        {"weight": 8},
+        "2,11,8,2,4,5,4,2,2,4",
+        [2, 11, 8, 2, 4, 5, 4, 2, 2, 4],
+    ],
+)
+def test_get_panose(definition):
+    panose = api.get_panose(definition)
+    assert panose.set_panose_bytes(bytes([2, 11, 5, 2, 4, 5, 4, 2, 2, 4])) == bytes(
+        [2, 11, 8, 2, 4, 5, 4, 2, 2, 4]
+    )
+
+
+@pytest.mark.parametrize("definition", [{"bogus": 1}, {}, "1,2,3", [2, 11]])
+def test_get_panose_invalid(definition):
+    with pytest.raises(ValueError):
+        api.get_panose(definition)
+
+
+@pytest.mark.parametrize("jobs", [1, 2])
+def test_apply_panose(jobs):
+    with tempfile.TemporaryDirectory() as tmpdirname:
+        font_dir = os.path.join(tmpdirname, "fonts")
+        os.mkdir(font_dir)
+        dest_paths = []
+        for i in range(3):
+            dest_path = os.path.join(font_dir, f"{i}-{TEST_FONT_NAME}")
+            shutil.copyfile(get_test_font_path(), dest_path)
+            dest_paths.append(dest_path)
+        font_path = os.path.join(tmpdirname, TEST_FONT_NAME)
+        shutil.copyfile(get_test_font_path(), font_path)
+        bogus_path = os.path.join(tmpdirname, "bogus.ttf")
+
+        results = api.apply_panose(
+            [font_path, bogus_path, font_dir], {"weight": 8}, jobs=jobs
+        )
+
+        # path errors are reported in input order without an exception
+        assert [result.fontpath for result in results] == [
+            font_path,
+            bogus_path,
+        ] + dest_paths
+        assert "does not appear to be a valid file" in results[1].error
+        assert [result.changed for result in results] == [True, False, True, True, True]
+        assert results[0].error is None
+        assert results[0].panose_bytes == bytes([2, 11, 8, 2, 4, 5, 4, 2, 2, 4])
+        assert set(results[0].phase_times()) == {"read", "edit", "write", "font"}
+        for dest_path in dest_paths:
+            assert TTFont(dest_path)["OS/2"].panose.bWeight == 8
+
+
+def test_iter_apply_panose_edits_same_font():
+    # edits of the same font file are not run concurrently
+    with tempfile.TemporaryDirectory() as tmpdirname:
+        dest_path = os.path.join(tmpdirname, TEST_FONT_NAME)
+        shutil.copyfile(get_test_font_path(), dest_path)
+        # each weight is written by the first edit of a pair, and the second
+        # edit reads the written weight
+        weights = [8, 8, 5, 5] * 16
+        edits = [(dest_path, Panose(weight=weight)) for weight in weights]
+        edits.append((os.path.join(tmpdirname, ".", TEST_FONT_NAME), Panose(weight=7)))
+
+        results = list(api.iter_apply_panose_edits(edits, jobs=4))
+        assert [result.error for result in results] == [None] * 65
+        assert [result.changed for result in results] == [True, False] * 32 + [True]
+        with open(dest_path, "rb") as f:
+            assert sfnt.calc_checksum(f.read()) == sfnt.CHECKSUM_MAGIC
+        assert TTFont(dest_path)["OS/2"].panose.bWeight == 7
+
+
+@pytest.mark.parametrize("engine", ["fast", "fonttools"])
+def test_apply_panose_dry_run(engine):
+    with tempfile.TemporaryDirectory() as tmpdirname:
+        dest_path = os.path.join(tmpdirname, TEST_FONT_NAME)
+        shutil.copyfile(get_test_font_path(), dest_path)
+        with open(dest_path, "rb") as f:
+            source_data = f.read()
+
+        results = api.apply_panose(
+            dest_path, Panose(weight=8), dry_run=True, engine=engine
+        )
+
+        assert len(results) == 1
+        assert results[0].changed is True
+        assert results[0].panose_bytes == bytes([2, 11, 8, 2, 4, 5, 4, 2, 2, 4])
+        assert "write" not in results[0].phase_times()
+        with open(dest_path, "rb") as f:
+            assert f.read() == source_data
+
+
+def test_apply_panose_invalid_engine():
+    with pytest.raises(ValueError):
+        api.apply_panose(get_test_font_path(), {"weight": 8}, engine="bogus")
@@ -0,0 +1,124 @@
+import hashlib
+import os
+import shutil
+import tempfile
+import time
+
+from panosifier import cache, edit
+from panosifier.datastructures import Panose
+
+TEST_FONT_NAME = "NotoSans-Regular.subset.ttf"
+
+
+def get_test_font_path():
+    return os.path.join("tests", "testfiles", "fonts", TEST_FONT_NAME)
+
+
+def test_file_digest():
+    with open(get_test_font_path(), "rb") as f:
+        expected = hashlib.sha256(f.read()).hexdigest()
+    assert cache.file_digest(get_test_font_path()) == expected
+
+
+def test_panose_cache_lookup_and_record():
+    with tempfile.TemporaryDirectory() as tmpdirname:
+        panose_cache = cache.PanoseCache(os.path.join(tmpdirname, "cache"))
+        assert panose_cache.lookup("b" * 64, "2,,8,,,,,,,") is None
+
+        panose_cache.record("a" * 64, "2,,8,,,,,,,", "b" * 64, bytes(range(10)))
+        # lookups match the output digest of a completed edit
+        assert panose_cache.lookup("b" * 64, "2,,8,,,,,,,") == bytes(range(10))
+        assert panose_cache.lookup("a" * 64, "2,,8,,,,,,,") is None
+        assert panose_cache.lookup("b" * 64, "2,,7,,,,,,,") is None
+        # edit lookups match the input digest of a completed edit
+        assert panose_cache.lookup_edit("a" * 64, "2,,8,,,,,,,") == (
+            "b" * 64,
+            bytes(range(10)),
+        )
+        assert panose_cache.lookup_edit("b" * 64, "2,,8,,,,,,,") is None
+        assert len(panose_cache) == 1
+        panose_cache.close()
+
+
+def test_panose_cache_evict():
+    with tempfile.TemporaryDirectory() as tmpdirname:
+        panose_cache = cache.PanoseCache(os.path.join(tmpdirname, "cache"))
+        for i in range(5):
+            panose_cache.record(str(i), "key", f"out{i}", bytes(10))
+        # age out the first entry
+        panose_cache.connection.execute(
+            "UPDATE edits SET accessed = ? WHERE input_digest = '0'",
+            (time.time() - 2 * 86400,),
+        )
+        assert panose_cache.evict(max_entries=10, max_age_days=1) == 1
+        assert len(panose_cache) == 4
+
+        # least recently accessed entries are removed first
+        panose_cache.lookup("out1", "key")
+        assert panose_cache.evict(max_entries=1, max_age_days=1) == 3
+        assert panose_cache.lookup("out1", "key") == bytes(10)
+        panose_cache.close()
+
+
+def test_process_font_with_cache(monkeypatch):
+    with tempfile.TemporaryDirectory() as tmpdirname:
+        cache_path = os.path.join(tmpdirname, "cache")
+        dest_path = os.path.join(tmpdirname, TEST_FONT_NAME)
+        shutil.copyfile(get_test_font_path(), dest_path)
+
+        result = edit.process_font(
+            dest_path, Panose(weight=8), edit.EditOptions(cache_path=cache_path)
+        )
+        assert result.changed
+        assert not result.cached
+
+        # cache hits do not parse the font
+        def fail_edit_font(*args, **kwargs):
+            raise AssertionError("font parsed")
+
+        monkeypatch.setattr(edit, "edit_font", fail_edit_font)
+        result = edit.process_font(
+            dest_path, Panose(weight=8), edit.EditOptions(cache_path=cache_path)
+        )
+        assert result.cached
+        assert not result.changed
+        assert result.panose_bytes == bytes([2, 11, 8, 2, 4, 5, 4, 2, 2, 4])
+
+        # a different panose definition is not a cache hit
+        result = edit.process_font(
+            dest_path, Panose(weight=7), edit.EditOptions(cache_path=cache_path)
+        )
+        assert result.panose_bytes is None
+        assert result.error == "font parsed"
+
+
+def test_process_font_with_cache_output_dir(monkeypatch):
+    with tempfile.TemporaryDirectory() as tmpdirname:
+        cache_path = os.path.join(tmpdirname, "cache")
+        output_dir = os.path.join(tmpdirname, "out")
+        os.makedirs(output_dir)
+        output_path = os.path.join(output_dir, TEST_FONT_NAME)
+        options = edit.EditOptions(cache_path=cache_path, output_dir=output_dir)
+
+        result = edit.process_font(get_test_font_path(), Panose(weight=8), options)
+        assert result.changed
+        assert not result.cached
+        mtime_ns = os.stat(output_path).st_mtime_ns
+
+        # output files written by the same edit are not parsed or written
+        def fail_edit_font(*args, **kwargs):
+            raise AssertionError("font parsed")
+
+        monkeypatch.setattr(edit, "edit_font", fail_edit_font)
+        result = edit.process_font(get_test_font_path(), Panose(weight=8), options)
+        assert result.error is None
+        assert result.cached
+        assert not result.changed
+        assert result.panose_bytes == bytes([2, 11, 8, 2, 4, 5, 4, 2, 2, 4])
+        assert os.stat(output_path).st_mtime_ns == mtime_ns
+
+        # modified output files are edited again
+        with open(output_path, "ab") as f:
+            f.write(bytes(4))
+        result = edit.process_font(get_test_font_path(), Panose(weight=8), options)
+        assert result.error == "font parsed"
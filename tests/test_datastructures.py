@@ -1,4 +1,5 @@
 import os
+import pickle
 
 import pytest
 from fontTools.ttLib import TTFont
@@ -77,7 +78,7 @@ def test_panose_obj_str_repr():
     )
 
     # test with defined value
-    panose.familytype = 1
+    panose = datastructures.Panose(familytype=1)
 
     p_str = panose.__str__()
     assert (
@@ -91,21 +92,9 @@ def test_panose_obj_str_repr():
     )
 
 
-def test_panose_obj_set_attr_with_comma_delim_string():
-    panose = datastructures.Panose()
-    assert panose.familytype is None
-    assert panose.serifstyle is None
-    assert panose.weight is None
-    assert panose.proportion is None
-    assert panose.contrast is None
-    assert panose.strokevar is None
-    assert panose.armstyle is None
-    assert panose.letterform is None
-    assert panose.midline is None
-    assert panose.xheight is None
-
+def test_panose_obj_from_comma_delim_string():
     value_str = "1,2,3,4,5,6,7,8,9,10"
-    panose.set_panose_with_comma_delim_string(value_str)
+    panose = datastructures.Panose.from_comma_delim_string(value_str)
 
     assert panose.familytype == 1
     assert panose.serifstyle == 2
@@ -117,29 +106,102 @@ def test_panose_obj_set_attr_with_comma_delim_string():
     assert panose.letterform == 8
     assert panose.midline == 9
     assert panose.xheight == 10
+    assert panose.mask == datastructures.PANOSE_FULL_MASK
 
 
-def test_panose_obj_set_attr_with_comma_delim_string_invalid_type():
-    panose = datastructures.Panose()
+def test_panose_obj_from_comma_delim_string_invalid_type():
     value_str = "1,1,1,1,1,1,1,1,1,bogus"
     with pytest.raises(ValueError):
-        panose.set_panose_with_comma_delim_string(value_str)
+        datastructures.Panose.from_comma_delim_string(value_str)
 
 
-def test_panose_obj_set_attr_with_comma_delim_string_invalid_number_of_values():
-    panose = datastructures.Panose()
+def test_panose_obj_from_comma_delim_string_invalid_number_of_values():
     # 10 panose values is required
     # the following string includes 9 panose values
     # should raise exception
     value_str = "1,1,1,1,1,1,1,1,1"
     with pytest.raises(ValueError):
-        panose.set_panose_with_comma_delim_string(value_str)
+        datastructures.Panose.from_comma_delim_string(value_str)
 
     # the following string includes 11 panose values
     # should raise exception
     value_str = "1,1,1,1,1,1,1,1,1,1,1"
     with pytest.raises(ValueError):
-        panose.set_panose_with_comma_delim_string(value_str)
+        datastructures.Panose.from_comma_delim_string(value_str)
+
+
+def test_panose_obj_invalid_range():
+    with pytest.raises(ValueError) as e:
+        datastructures.Panose(weight=256)
+    assert (
+        str(e.value) == "panose 'weight' value must be in the range 0-255, received 256"
+    )
+
+    with pytest.raises(ValueError):
+        datastructures.Panose(familytype=-1)
+
+    with pytest.raises(ValueError):
+        datastructures.Panose.from_comma_delim_string("1,1,1,1,1,1,1,1,1,300")
+
+
+def test_panose_obj_unsupported_field():
+    with pytest.raises(TypeError):
+        datastructures.Panose(bogus=1)
+
+
+def test_panose_obj_immutable():
+    panose = datastructures.Panose(weight=8)
+    with pytest.raises(AttributeError):
+        panose.weight = 9
+    with pytest.raises(AttributeError):
+        panose.bogus = 1
+    assert panose.weight == 8
+
+
+def test_panose_obj_bytes_round_trip():
+    panose = datastructures.Panose(familytype=2, weight=0)
+    assert panose.to_bytes() == bytes([2, 0, 0, 0, 0, 0, 0, 0, 0, 0])
+    assert panose.mask == 0b101
+    assert datastructures.Panose.from_bytes(panose.to_bytes(), panose.mask) == panose
+
+    full_panose = datastructures.Panose.from_bytes(bytes(range(1, 11)))
+    assert full_panose.mask == datastructures.PANOSE_FULL_MASK
+    assert full_panose.xheight == 10
+
+    # undefined field values are ignored
+    assert datastructures.Panose.from_bytes(bytes(range(10)), 0b100) == (
+        datastructures.Panose(weight=2)
+    )
+
+    with pytest.raises(ValueError):
+        datastructures.Panose.from_bytes(bytes(9))
+    with pytest.raises(ValueError):
+        datastructures.Panose.from_bytes(bytes(10), 1 << 10)
+
+
+def test_panose_obj_equality_and_hash():
+    assert datastructures.Panose(weight=8) == datastructures.Panose(weight="8")
+    assert datastructures.Panose(weight=8) != datastructures.Panose(weight=8, midline=2)
+    # undefined and zero ("Any") values are different definitions
+    assert datastructures.Panose() != datastructures.Panose(weight=0)
+    assert len({datastructures.Panose(weight=8), datastructures.Panose(weight=8)}) == 1
+
+
+def test_panose_obj_pickle():
+    panose = datastructures.Panose(weight=8, xheight=0)
+    assert pickle.loads(pickle.dumps(panose)) == panose
+
+
+def test_panose_obj_zero_values():
+    panose = datastructures.Panose(familytype=0, weight=0)
+    assert panose.cache_key() == "0,,0,,,,,,,"
+    assert panose.set_panose_bytes(bytes(range(1, 11))) == bytes(
+        [0, 2, 0, 4, 5, 6, 7, 8, 9, 10]
+    )
+    tt = panose.set_font_panose_data(get_test_font())
+    assert tt["OS/2"].panose.bFamilyType == 0
+    assert tt["OS/2"].panose.bSerifStyle == 11
+    assert tt["OS/2"].panose.bWeight == 0
 
 
 def test_panose_obj_set_font_panose_data():
@@ -179,3 +241,12 @@ def test_panose_obj_set_font_panose_data():
     assert tt["OS/2"].panose.bLetterForm == 8
     assert tt["OS/2"].panose.bMidline == 9
     assert tt["OS/2"].panose.bXHeight == 10
+
+
+def test_override_panose():
+    panose = datastructures.Panose(familytype=2, weight=5, xheight=4)
+    overrides = datastructures.Panose(weight=8, midline=3)
+    assert datastructures.override_panose(panose, overrides) == datastructures.Panose(
+        familytype=2, weight=8, midline=3, xheight=4
+    )
+    assert datastructures.override_panose(panose, datastructures.Panose()) == panose
@@ -0,0 +1,171 @@
+import os
+import shutil
+import tempfile
+
+import pytest
+
+from panosifier import __main__
+from panosifier.api import apply_panose
+from panosifier.datastructures import Panose
+from panosifier.dedupe import find_duplicate_edits, iter_deduplicated_edits
+from panosifier.edit import EditOptions, EditResult
+from panosifier.sfnt import get_os2_panose_bytes
+from panosifier.woff import read_font_tables
+
+TEST_FONT_PATH = os.path.join(
+    "tests", "testfiles", "fonts", "NotoSans-Regular.subset.ttf"
+)
+
+
+def read_weight(fontpath):
+    with open(fontpath, "rb") as f:
+        return get_os2_panose_bytes(read_font_tables(f, ["OS/2"])["OS/2"])[2]
+
+
+@pytest.fixture
+def build_tree():
+    # byte-identical copies of the same font in three build directories
+    with tempfile.TemporaryDirectory() as tmpdirname:
+        fontpaths = []
+        for dirname in ("dist", "web", "desktop"):
+            os.makedirs(os.path.join(tmpdirname, dirname))
+            fontpath = os.path.join(tmpdirname, dirname, "NotoSans-Regular.ttf")
+            shutil.copyfile(TEST_FONT_PATH, fontpath)
+            fontpaths.append(fontpath)
+        yield tmpdirname, fontpaths
+
+
+def test_find_duplicate_edits(build_tree):
+    tmpdirname, fontpaths = build_tree
+    # a font with the same size and different content
+    with open(TEST_FONT_PATH, "rb") as f:
+        data = bytearray(f.read())
+    data[-1] ^= 0xFF
+    modified_path = os.path.join(tmpdirname, "Modified.ttf")
+    with open(modified_path, "wb") as f:
+        f.write(data)
+    linked_path = os.path.join(tmpdirname, "Linked.ttf")
+    os.link(fontpaths[2], linked_path)
+
+    weight = Panose(weight=8)
+    edits = [
+        (fontpaths[0], weight),
+        EditResult("missing", None, False, "error"),
+        (modified_path, weight),
+        (fontpaths[1], weight),
+        (fontpaths[2], Panose(weight=7)),
+        (os.path.join(tmpdirname, "missing.ttf"), weight),
+        (linked_path, weight),
+        (fontpaths[2], weight),
+    ]
+    assert find_duplicate_edits(edits) == {3: 0, 6: 0, 7: 0}
+
+
+def test_iter_deduplicated_edits(build_tree):
+    tmpdirname, fontpaths = build_tree
+    edits = [(fontpath, Panose(weight=8)) for fontpath in fontpaths]
+    results = list(iter_deduplicated_edits(edits, EditOptions(verify=True)))
+    assert [result.fontpath for result in results] == fontpaths
+    assert [result.duplicate_of for result in results] == [None] + fontpaths[:1] * 2
+    assert all(result.changed and result.error is None for result in results)
+    assert not any(result.linked for result in results)
+    assert [read_weight(fontpath) for fontpath in fontpaths] == [8, 8, 8]
+    # the duplicates are copies
+    assert not os.path.samefile(fontpaths[0], fontpaths[1])
+
+    # duplicates of unchanged fonts are not written
+    mtime_ns = os.stat(fontpaths[1]).st_mtime_ns
+    results = list(iter_deduplicated_edits(edits, jobs=2))
+    assert not any(result.changed for result in results)
+    assert os.stat(fontpaths[1]).st_mtime_ns == mtime_ns
+
+
+def test_iter_deduplicated_edits_link(build_tree):
+    tmpdirname, fontpaths = build_tree
+    edits = [(fontpath, Panose(weight=8)) for fontpath in fontpaths]
+    results = list(iter_deduplicated_edits(edits, link=True))
+    assert [result.linked for result in results] == [False, True, True]
+    assert os.path.samefile(fontpaths[0], fontpaths[1])
+    assert os.path.samefile(fontpaths[0], fontpaths[2])
+    assert read_weight(fontpaths[2]) == 8
+    assert sorted(os.listdir(os.path.dirname(fontpaths[1]))) == ["NotoSans-Regular.ttf"]
+
+    # fonts that are already hard links of the edited font are not linked again
+    edits = [(fontpath, Panose(weight=9)) for fontpath in fontpaths]
+    results = list(iter_deduplicated_edits(edits, link=True))
+    assert not any(result.linked for result in results)
+    assert [result.duplicate_of for result in results] == [None] + fontpaths[:1] * 2
+    assert read_weight(fontpaths[2]) == 9
+
+
+def test_iter_deduplicated_edits_output_dir(build_tree):
+    tmpdirname, fontpaths = build_tree
+    output_dir = os.path.join(tmpdirname, "out")
+    os.makedirs(output_dir)
+    dup_path = os.path.join(tmpdirname, "web", "Copy.ttf")
+    shutil.copyfile(TEST_FONT_PATH, dup_path)
+    edits = [(fontpaths[0], Panose(weight=5)), (dup_path, Panose(weight=5))]
+    options = EditOptions(output_dir=output_dir)
+    results = list(iter_deduplicated_edits(edits, options, link=True))
+    # unchanged fonts are written to the output directory
+    assert not any(result.changed for result in results)
+    assert results[1].duplicate_of == fontpaths[0]
+    assert results[1].output_path == os.path.join(output_dir, "Copy.ttf")
+    assert os.path.samefile(results[0].output_path, os.path.join(output_dir, "Copy.ttf"))
+    assert not os.path.samefile(dup_path, os.path.join(output_dir, "Copy.ttf"))
+
+
+def test_iter_deduplicated_edits_errors(build_tree):
+    tmpdirname, fontpaths = build_tree
+    bogus_paths = []
+    for name in ("Bogus1.ttf", "Bogus2.ttf"):
+        bogus_paths.append(os.path.join(tmpdirname, name))
+        with open(bogus_paths[-1], "wb") as f:
+            f.write(b"bogus font data")
+    edits = [(fontpath, Panose(weight=8)) for fontpath in bogus_paths]
+    results = list(iter_deduplicated_edits(edits))
+    assert results[0].error is not None
+    assert results[1].error == results[0].error
+    assert results[1].duplicate_of == bogus_paths[0]
+
+
+def test_iter_deduplicated_edits_dry_run(build_tree):
+    tmpdirname, fontpaths = build_tree
+    edits = [(fontpath, Panose(weight=8)) for fontpath in fontpaths]
+    results = list(iter_deduplicated_edits(edits, EditOptions(dry_run=True), link=True))
+    assert all(result.changed for result in results)
+    assert not any(result.linked for result in results)
+    assert [read_weight(fontpath) for fontpath in fontpaths] == [5, 5, 5]
+
+
+def test_apply_panose_dedupe(build_tree):
+    tmpdirname, fontpaths = build_tree
+    results = apply_panose([tmpdirname], {"weight": 8}, recursive=True, dedupe=True)
+    assert sum(result.duplicate_of is not None for result in results) == 2
+    # the grouping time is reported in the timed phases
+    assert "hash" in results[0].phase_times()
+    assert [read_weight(fontpath) for fontpath in fontpaths] == [8, 8, 8]
+
+
+def test_main_dedupe(capsys, build_tree):
+    tmpdirname, fontpaths = build_tree
+    __main__.run(["--weight", "8", "--dedupe"] + fontpaths)
+    captured = capsys.readouterr()
+    assert "3 changed, 0 unchanged (2 duplicates of identical fonts were not edited)" in (
+        captured.out
+    )
+
+    __main__.run(["--weight", "9", "--link-duplicates"] + fontpaths)
+    captured = capsys.readouterr()
+    assert (
+        "3 changed, 0 unchanged (2 duplicates of identical fonts were not edited, "
+        "2 hard linked)"
+    ) in captured.out
+    assert os.path.samefile(fontpaths[0], fontpaths[2])
+
+    # already linked fonts are not reported as hard linked
+    __main__.run(["--weight", "7", "--link-duplicates"] + fontpaths)
+    captured = capsys.readouterr()
+    assert (
+        "3 changed, 0 unchanged (2 duplicates of identical fonts were not edited)"
+    ) in captured.out
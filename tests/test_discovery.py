@@ -0,0 +1,109 @@
+import os
+import tempfile
+
+import pytest
+
+from panosifier import discovery
+
+
+def make_tree(tmpdirname):
+    paths = [
+        os.path.join(tmpdirname, "a.ttf"),
+        os.path.join(tmpdirname, "b.OTF"),
+        os.path.join(tmpdirname, "notes.txt"),
+        os.path.join(tmpdirname, "sub", "c.woff2"),
+        os.path.join(tmpdirname, "sub", "deeper", "d.ttc"),
+    ]
+    for path in paths:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(b"")
+    return paths
+
+
+def test_has_font_extension():
+    assert discovery.has_font_extension("font.ttf")
+    assert discovery.has_font_extension("font.WOFF2")
+    assert not discovery.has_font_extension("font.txt")
+    assert not discovery.has_font_extension("ttf")
+
+
+def test_iter_font_paths_file_paths():
+    with tempfile.TemporaryDirectory() as tmpdirname:
+        paths = make_tree(tmpdirname)
+        # file paths are yielded as defined, including non-font extensions
+        assert list(discovery.iter_font_paths([paths[2], paths[0]])) == [
+            paths[2],
+            paths[0],
+        ]
+
+
+def test_iter_font_paths_directory():
+    with tempfile.TemporaryDirectory() as tmpdirname:
+        paths = make_tree(tmpdirname)
+        assert list(discovery.iter_font_paths([tmpdirname])) == paths[0:2]
+        assert list(discovery.iter_font_paths([tmpdirname], recursive=True)) == [
+            paths[0],
+            paths[1],
+            paths[3],
+            paths[4],
+        ]
+
+
+def test_iter_font_paths_glob():
+    with tempfile.TemporaryDirectory() as tmpdirname:
+        paths = make_tree(tmpdirname)
+        assert list(discovery.iter_font_paths([os.path.join(tmpdirname, "*.ttf")])) == [
+            paths[0]
+        ]
+        recursive_glob = os.path.join(tmpdirname, "**", "*.ttc")
+        assert list(discovery.iter_font_paths([recursive_glob], recursive=True)) == [
+            paths[4]
+        ]
+
+
+def test_iter_font_paths_invalid_paths():
+    with tempfile.TemporaryDirectory() as tmpdirname:
+        with pytest.raises(ValueError) as e:
+            list(discovery.iter_font_paths([os.path.join(tmpdirname, "bogus.ttf")]))
+        assert "does not appear to be a valid file or directory" in str(e.value)
+
+        with pytest.raises(ValueError) as e:
+            list(discovery.iter_font_paths([os.path.join(tmpdirname, "*.ttf")]))
+        assert "did not match any paths" in str(e.value)
+
+
+def test_parse_extensions():
+    assert discovery.parse_extensions("ttf") == (".ttf",)
+    assert discovery.parse_extensions("ttf, .OTF") == (".ttf", ".otf")
+    with pytest.raises(ValueError):
+        discovery.parse_extensions("ttf,,otf")
+
+
+def test_iter_font_paths_extensions():
+    with tempfile.TemporaryDirectory() as tmpdirname:
+        paths = make_tree(tmpdirname)
+        assert list(
+            discovery.iter_font_paths(
+                [tmpdirname], recursive=True, extensions=(".otf", ".woff2")
+            )
+        ) == [paths[1], paths[3]]
+
+
+def test_iter_font_paths_is_lazy():
+    with tempfile.TemporaryDirectory() as tmpdirname:
+        paths = make_tree(tmpdirname)
+        fontpaths = discovery.iter_font_paths([paths[0], "bogus.ttf"])
+        # paths are validated as they are reached
+        assert next(fontpaths) == paths[0]
+        with pytest.raises(ValueError):
+            next(fontpaths)
+
+
+def test_path_is_discoverable():
+    with tempfile.TemporaryDirectory() as tmpdirname:
+        paths = make_tree(tmpdirname)
+        assert discovery.path_is_discoverable(paths[0])
+        assert discovery.path_is_discoverable(tmpdirname)
+        assert discovery.path_is_discoverable(os.path.join(tmpdirname, "*.ttf"))
+        assert not discovery.path_is_discoverable(os.path.join(tmpdirname, "bogus.ttf"))
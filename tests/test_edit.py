@@ -0,0 +1,417 @@
+import io
+import os
+import shutil
+import tempfile
+
+import fontTools.ttLib
+import pytest
+from fontTools.ttLib import TTFont
+
+from panosifier import edit
+from panosifier.datastructures import Panose
+
+TEST_FONT_NAME = "NotoSans-Regular.subset.ttf"
+
+
+def get_test_font_path():
+    return os.path.join("tests", "testfiles", "fonts", TEST_FONT_NAME)
+
+
+@pytest.mark.parametrize("engine", edit.ENGINES)
+def test_edit_font_returns_written_panose(engine):
+    with tempfile.TemporaryDirectory() as tmpdirname:
+        dest_path = os.path.join(tmpdirname, TEST_FONT_NAME)
+        shutil.copyfile(get_test_font_path(), dest_path)
+
+        font_edit = edit.edit_font(dest_path, Panose(weight=8), engine=engine)
+        assert font_edit.panose_bytes == bytes([2, 11, 8, 2, 4, 5, 4, 2, 2, 4])
+        assert font_edit.changed
+        assert (
+            edit.get_fonttools_panose_bytes(TTFont(dest_path)) == font_edit.panose_bytes
+        )
+
+
+@pytest.mark.parametrize("engine", edit.ENGINES)
+def test_edit_font_skips_unchanged_font(engine):
+    with tempfile.TemporaryDirectory() as tmpdirname:
+        dest_path = os.path.join(tmpdirname, TEST_FONT_NAME)
+        shutil.copyfile(get_test_font_path(), dest_path)
+        os.utime(dest_path, (0, 0))
+
+        font_edit = edit.edit_font(dest_path, Panose(weight=5), engine=engine)
+        assert font_edit.panose_bytes == bytes([2, 11, 5, 2, 4, 5, 4, 2, 2, 4])
+        assert not font_edit.changed
+        assert os.stat(dest_path).st_mtime == 0
+        with open(dest_path, "rb") as f, open(get_test_font_path(), "rb") as g:
+            assert f.read() == g.read()
+
+
+def test_edit_font_fonttools_parses_font_once(monkeypatch):
+    instantiations = []
+
+    class CountingTTFont(TTFont):
+        def __init__(self, *args, **kwargs):
+            instantiations.append(args)
+            super().__init__(*args, **kwargs)
+
+    # fontTools is imported on the first font load
+    monkeypatch.setattr(fontTools.ttLib, "TTFont", CountingTTFont)
+    with tempfile.TemporaryDirectory() as tmpdirname:
+        dest_path = os.path.join(tmpdirname, TEST_FONT_NAME)
+        shutil.copyfile(get_test_font_path(), dest_path)
+
+        edit.edit_font(dest_path, Panose(weight=8), engine="fonttools")
+        assert len(instantiations) == 1
+
+
+def test_edit_font_invalid_engine():
+    with pytest.raises(ValueError):
+        edit.edit_font(get_test_font_path(), Panose(weight=8), engine="bogus")
+
+
+def test_verify_font_panose():
+    panose_bytes = bytes([2, 11, 5, 2, 4, 5, 4, 2, 2, 4])
+    edit.verify_font_panose(get_test_font_path(), panose_bytes)
+
+    with pytest.raises(ValueError) as e:
+        edit.verify_font_panose(get_test_font_path(), bytes(10))
+    assert "verification failed" in str(e.value)
+
+
+def test_verify_font_panose_checksum_mismatch():
+    with tempfile.TemporaryDirectory() as tmpdirname:
+        dest_path = os.path.join(tmpdirname, TEST_FONT_NAME)
+        shutil.copyfile(get_test_font_path(), dest_path)
+        # edit the panose data without a checksum update
+        with open(dest_path, "r+b") as f:
+            f.seek(648 + 32 + 2)
+            f.write(b"\x08")
+
+        with pytest.raises(ValueError) as e:
+            edit.verify_font_panose(dest_path, bytes([2, 11, 8, 2, 4, 5, 4, 2, 2, 4]))
+        assert "checksum" in str(e.value)
+
+
+def test_process_font_returns_error():
+    result = edit.process_font(
+        os.path.join("tests", "testfiles", "fonts", "README.md"), Panose(weight=8)
+    )
+    assert result.panose_bytes is None
+    assert result.error is not None
+
+
+@pytest.mark.parametrize("jobs", [1, 2])
+def test_iter_process_fonts_input_order(jobs):
+    with tempfile.TemporaryDirectory() as tmpdirname:
+        fontpaths = []
+        for i in range(4):
+            dest_path = os.path.join(tmpdirname, f"{i}-{TEST_FONT_NAME}")
+            shutil.copyfile(get_test_font_path(), dest_path)
+            fontpaths.append(dest_path)
+
+        results = list(edit.iter_process_fonts(fontpaths, Panose(weight=8), jobs=jobs))
+        assert [result.fontpath for result in results] == fontpaths
+        for result in results:
+            assert result.error is None
+            assert result.panose_bytes == bytes([2, 11, 8, 2, 4, 5, 4, 2, 2, 4])
+
+
+@pytest.mark.parametrize(
+    "engine, max_decompiled",
+    [
+        ("fast", set()),
+        # the fontTools OS/2 table compiler reads the cmap and head tables
+        ("fonttools", {"OS/2", "cmap", "post", "maxp", "head"}),
+    ],
+)
+def test_edit_font_decompiled_tables(monkeypatch, engine, max_decompiled):
+    decompiled = []
+    getitem = TTFont.__getitem__
+
+    def counting_getitem(self, tag):
+        if tag != "GlyphOrder" and not self.isLoaded(tag):
+            decompiled.append(tag)
+        return getitem(self, tag)
+
+    monkeypatch.setattr(TTFont, "__getitem__", counting_getitem)
+    with tempfile.TemporaryDirectory() as tmpdirname:
+        dest_path = os.path.join(tmpdirname, TEST_FONT_NAME)
+        shutil.copyfile(get_test_font_path(), dest_path)
+
+        edit.edit_font(dest_path, Panose(weight=8), engine=engine)
+        assert set(decompiled) <= max_decompiled
+        for tag in ("glyf", "loca", "GSUB", "GPOS", "name", "hmtx"):
+            assert tag not in decompiled
+
+
+def test_save_font_with_raw_tables_copies_unedited_tables():
+    with tempfile.TemporaryDirectory() as tmpdirname:
+        dest_path = os.path.join(tmpdirname, TEST_FONT_NAME)
+        shutil.copyfile(get_test_font_path(), dest_path)
+        tt_pre = TTFont(get_test_font_path())
+
+        edit.edit_font(dest_path, Panose(weight=8), engine="fonttools")
+
+        tt_post = TTFont(dest_path)
+        for tag in tt_pre.reader.keys():
+            if tag == "head":
+                # head.checkSumAdjustment is recalculated
+                assert tt_post.reader[tag][:8] == tt_pre.reader[tag][:8]
+                assert tt_post.reader[tag][12:] == tt_pre.reader[tag][12:]
+            elif tag != "OS/2":
+                assert tt_post.reader[tag] == tt_pre.reader[tag]
+        assert tt_post["OS/2"].panose.bWeight == 8
+
+
+@pytest.mark.parametrize("jobs", [1, 2])
+def test_iter_process_fonts_consumes_paths_lazily(jobs):
+    with tempfile.TemporaryDirectory() as tmpdirname:
+        consumed = []
+
+        def fontpaths():
+            for i in range(jobs * edit.PENDING_JOBS_PER_WORKER + 2):
+                dest_path = os.path.join(tmpdirname, f"{i}-{TEST_FONT_NAME}")
+                shutil.copyfile(get_test_font_path(), dest_path)
+                consumed.append(dest_path)
+                yield dest_path
+
+        results = edit.iter_process_fonts(fontpaths(), Panose(weight=8), jobs=jobs)
+        first = next(results)
+        assert first.fontpath == consumed[0]
+        assert len(consumed) <= jobs * edit.PENDING_JOBS_PER_WORKER
+        assert len(list(results)) == len(consumed) - 1
+
+
+@pytest.mark.parametrize("engine", edit.ENGINES)
+def test_edit_font_output_path_does_not_modify_source(engine):
+    with tempfile.TemporaryDirectory() as tmpdirname:
+        dest_path = os.path.join(tmpdirname, TEST_FONT_NAME)
+        output_path = os.path.join(tmpdirname, "out.ttf")
+        shutil.copyfile(get_test_font_path(), dest_path)
+        with open(dest_path, "rb") as f:
+            source_data = f.read()
+
+        font_edit = edit.edit_font(
+            dest_path, Panose(weight=8), engine=engine, output_path=output_path
+        )
+
+        assert font_edit.changed is True
+        with open(dest_path, "rb") as f:
+            assert f.read() == source_data
+        assert TTFont(output_path)["OS/2"].panose.bWeight == 8
+        edit.verify_font_panose(output_path, font_edit.panose_bytes)
+
+
+def test_process_font_output_dir_of_source_font_is_in_place():
+    with tempfile.TemporaryDirectory() as tmpdirname:
+        dest_path = os.path.join(tmpdirname, TEST_FONT_NAME)
+        shutil.copyfile(get_test_font_path(), dest_path)
+
+        result = edit.process_font(
+            dest_path, Panose(weight=8), edit.EditOptions(output_dir=tmpdirname)
+        )
+
+        assert result.error is None
+        assert result.output_path is None
+        assert TTFont(dest_path)["OS/2"].panose.bWeight == 8
+
+
+def test_process_font_output_dir_copies_unchanged_fonts():
+    with tempfile.TemporaryDirectory() as tmpdirname:
+        output_dir = os.path.join(tmpdirname, "out")
+        os.mkdir(output_dir)
+
+        result = edit.process_font(
+            get_test_font_path(),
+            Panose(weight=5),
+            edit.EditOptions(output_dir=output_dir),
+        )
+
+        assert result.changed is False
+        assert result.output_path == os.path.join(output_dir, TEST_FONT_NAME)
+        with open(get_test_font_path(), "rb") as f1, open(result.output_path, "rb") as f2:
+            assert f1.read() == f2.read()
+
+
+@pytest.mark.parametrize("engine", edit.ENGINES)
+def test_process_font_timing_spans(engine):
+    with tempfile.TemporaryDirectory() as tmpdirname:
+        dest_path = os.path.join(tmpdirname, TEST_FONT_NAME)
+        shutil.copyfile(get_test_font_path(), dest_path)
+
+        result = edit.process_font(dest_path, Panose(weight=8), edit.EditOptions(engine))
+        assert result.spans == ()
+
+        options = edit.EditOptions(engine, verify=True, timings=True)
+        result = edit.process_font(dest_path, Panose(weight=7), options)
+        assert [span.name for span in result.spans] == [
+            "read",
+            "edit",
+            "write",
+            "verify",
+            "font",
+        ]
+
+
+def write_test_collection(fontpath):
+    # faces 0 and 1 share the OS/2 table, face 2 has a different OS/2 table
+    collection = fontTools.ttLib.TTCollection()
+    for i in range(3):
+        tt = TTFont(get_test_font_path(), recalcTimestamp=False)
+        for tag in tt.keys():
+            tt[tag]
+        if i == 2:
+            tt["OS/2"].panose.bWeight = 7
+        collection.fonts.append(tt)
+    collection.save(fontpath, shareTables=True)
+
+
+def get_collection_weights(fontpath):
+    collection = fontTools.ttLib.TTCollection(fontpath)
+    return [tt["OS/2"].panose.bWeight for tt in collection.fonts]
+
+
+@pytest.mark.parametrize("engine", edit.ENGINES)
+def test_edit_collection_all_faces(engine):
+    with tempfile.TemporaryDirectory() as tmpdirname:
+        dest_path = os.path.join(tmpdirname, "collection.ttc")
+        write_test_collection(dest_path)
+
+        font_edit = edit.edit_font(dest_path, Panose(weight=9), engine=engine)
+        assert font_edit.changed
+        assert [face.face_index for face in font_edit.faces] == [0, 1, 2]
+        assert [face.shared_with for face in font_edit.faces] == [(1,), (0,), ()]
+        assert all(face.panose_bytes[2] == 9 for face in font_edit.faces)
+        assert get_collection_weights(dest_path) == [9, 9, 9]
+        edit.verify_font_panose(dest_path, font_edit.panose_bytes, font_edit.faces)
+        for i in range(3):
+            # table record checksums match the table data
+            TTFont(dest_path, fontNumber=i, checkChecksums=2)
+
+
+@pytest.mark.parametrize("engine", edit.ENGINES)
+def test_edit_collection_face_indexes(engine):
+    with tempfile.TemporaryDirectory() as tmpdirname:
+        dest_path = os.path.join(tmpdirname, "collection.ttc")
+        write_test_collection(dest_path)
+
+        font_edit = edit.edit_font(
+            dest_path, Panose(weight=9), engine=engine, face_indexes=(2,)
+        )
+        assert [face.face_index for face in font_edit.faces] == [2]
+        assert get_collection_weights(dest_path) == [5, 5, 9]
+
+        # the OS/2 table of face 0 is shared with face 1 and both are edited
+        font_edit = edit.edit_font(
+            dest_path, Panose(weight=8), engine=engine, face_indexes=(0,)
+        )
+        assert font_edit.faces == (
+            edit.FaceEdit(0, bytes([2, 11, 8, 2, 4, 5, 4, 2, 2, 4]), True, (1,)),
+        )
+        assert get_collection_weights(dest_path) == [8, 8, 9]
+
+        font_edit = edit.edit_font(
+            dest_path, Panose(weight=8), engine=engine, face_indexes=(1,)
+        )
+        assert not font_edit.changed
+
+        with pytest.raises(ValueError):
+            edit.edit_font(dest_path, Panose(weight=8), engine=engine, face_indexes=(3,))
+
+
+def test_edit_collection_fast_matches_fonttools():
+    with tempfile.TemporaryDirectory() as tmpdirname:
+        source_path = os.path.join(tmpdirname, "source.ttc")
+        write_test_collection(source_path)
+        fast_path = os.path.join(tmpdirname, "fast.ttc")
+        fonttools_path = os.path.join(tmpdirname, "fonttools.ttc")
+        shutil.copyfile(source_path, fast_path)
+        shutil.copyfile(source_path, fonttools_path)
+        panose = Panose.from_comma_delim_string("1,2,3,4,5,6,7,8,9,10")
+
+        fast_edit = edit.edit_font(fast_path, panose, "fast", face_indexes=(0,))
+        fonttools_edit = edit.edit_font(
+            fonttools_path, panose, "fonttools", face_indexes=(0,)
+        )
+        assert fast_edit == fonttools_edit
+        fast_fonts = fontTools.ttLib.TTCollection(fast_path).fonts
+        fonttools_fonts = fontTools.ttLib.TTCollection(fonttools_path).fonts
+        for tt_fast, tt_fonttools in zip(fast_fonts, fonttools_fonts):
+            # fontTools recalculates head.checkSumAdjustment of the shared head
+            # table for a different face
+            for tag in tt_fast.reader.keys():
+                if tag != "head":
+                    assert tt_fast.reader[tag] == tt_fonttools.reader[tag]
+
+
+def test_process_font_collection_with_cache():
+    with tempfile.TemporaryDirectory() as tmpdirname:
+        dest_path = os.path.join(tmpdirname, "collection.ttc")
+        write_test_collection(dest_path)
+        options = edit.EditOptions(
+            cache_path=os.path.join(tmpdirname, "cache.sqlite3"), verify=True
+        )
+
+        # font collections are not cached
+        for _ in range(2):
+            result = edit.process_font(dest_path, Panose(weight=9), options)
+            assert result.error is None
+            assert not result.cached
+            assert len(result.faces) == 3
+
+
+@pytest.mark.parametrize("engine", edit.ENGINES)
+@pytest.mark.parametrize("extension", (".ttf", ".woff", ".ttc"))
+def test_edit_font_data_matches_file_edit(engine, extension):
+    with tempfile.TemporaryDirectory() as tmpdirname:
+        dest_path = os.path.join(tmpdirname, "font" + extension)
+        if extension == ".ttc":
+            write_test_collection(dest_path)
+        else:
+            tt = TTFont(get_test_font_path())
+            tt.flavor = extension[1:] if extension == ".woff" else None
+            tt.save(dest_path)
+        with open(dest_path, "rb") as f:
+            data = f.read()
+
+        output, data_edit = edit.edit_font_data(data, Panose(weight=9), engine=engine)
+        font_edit = edit.edit_font(dest_path, Panose(weight=9), engine=engine)
+        assert data_edit == font_edit
+        with open(dest_path, "rb") as f:
+            assert bytes(output) == f.read()
+        # the input data are not modified
+        assert output is not data
+
+
+def test_edit_font_data_unchanged_and_dry_run():
+    with open(get_test_font_path(), "rb") as f:
+        data = f.read()
+
+    output, font_edit = edit.edit_font_data(data, Panose(weight=5))
+    assert not font_edit.changed
+    assert output is data
+
+    output, font_edit = edit.edit_font_data(data, Panose(weight=8), dry_run=True)
+    assert font_edit.changed
+    assert font_edit.panose_bytes[2] == 8
+    assert output is data
+
+
+def test_process_font_data():
+    with open(get_test_font_path(), "rb") as f:
+        data = f.read()
+
+    output, result = edit.process_font_data(
+        data, Panose(weight=8), edit.EditOptions(verify=True, timings=True)
+    )
+    assert result.fontpath == edit.STREAM_PATH
+    assert result.error is None
+    assert result.changed
+    assert result.panose_key == Panose(weight=8).cache_key()
+    assert "verify" in result.phase_times()
+    assert edit.get_fonttools_panose_bytes(TTFont(io.BytesIO(output)))[2] == 8
+
+    output, result = edit.process_font_data(b"bogus", Panose(weight=8))
+    assert result.panose_bytes is None
+    assert result.error is not None
+    assert output == b"bogus"
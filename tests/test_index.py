@@ -0,0 +1,273 @@
+import json
+import os
+import shutil
+import tempfile
+
+import pytest
+from fontTools.ttLib import TTCollection, TTFont
+
+from panosifier import __main__
+from panosifier.api import apply_panose
+from panosifier.cache import file_digest
+from panosifier.index import AUDIT_CHECKS, PanoseIndex
+
+TEST_FONT_PATH = os.path.join(
+    "tests", "testfiles", "fonts", "NotoSans-Regular.subset.ttf"
+)
+
+
+@pytest.fixture
+def font_library():
+    # three copies of the same Noto Sans family font
+    with tempfile.TemporaryDirectory() as tmpdirname:
+        fontpaths = []
+        for style in ("Regular", "Bold", "Italic"):
+            fontpath = os.path.join(tmpdirname, f"NotoSans-{style}.ttf")
+            shutil.copyfile(TEST_FONT_PATH, fontpath)
+            fontpaths.append(fontpath)
+        yield tmpdirname, fontpaths
+
+
+def touch(path):
+    # a later modification time than the indexed time
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+
+def test_index_update(font_library):
+    tmpdirname, fontpaths = font_library
+    index = PanoseIndex(os.path.join(tmpdirname, "index.sqlite"))
+    try:
+        result = index.update(fontpaths)
+        assert (result.updated, result.unchanged, result.removed) == (3, 0, 0)
+        assert result.errors == []
+        assert len(index) == 3
+
+        row = index.connection.execute(
+            "SELECT * FROM fonts WHERE path = ?", (os.path.abspath(fontpaths[0]),)
+        ).fetchone()
+        assert row["digest"] == file_digest(fontpaths[0])
+        assert row["size"] == os.path.getsize(fontpaths[0])
+        assert row["family"] == "Noto Sans"
+        assert row["style"] == "Regular"
+        assert row["usweightclass"] == 400
+        assert [row[field] for field in ("familytype", "weight", "xheight")] == [2, 5, 4]
+        assert row["error"] is None
+    finally:
+        index.close()
+
+
+def test_index_update_incremental(font_library):
+    tmpdirname, fontpaths = font_library
+    index_path = os.path.join(tmpdirname, "index.sqlite")
+    index = PanoseIndex(index_path)
+    try:
+        index.update(fontpaths)
+        result = index.update(fontpaths)
+        assert (result.updated, result.unchanged) == (0, 3)
+
+        apply_panose([fontpaths[1]], {"weight": 8})
+        touch(fontpaths[1])
+        result = index.update(fontpaths)
+        assert (result.updated, result.unchanged) == (1, 2)
+        row = index.connection.execute(
+            "SELECT weight, digest FROM fonts WHERE path = ?",
+            (os.path.abspath(fontpaths[1]),),
+        ).fetchone()
+        assert row["weight"] == 8
+        assert row["digest"] == file_digest(fontpaths[1])
+    finally:
+        index.close()
+
+
+def test_index_update_prune(font_library):
+    tmpdirname, fontpaths = font_library
+    index = PanoseIndex(os.path.join(tmpdirname, "index.sqlite"))
+    try:
+        index.update(fontpaths)
+        os.remove(fontpaths[2])
+        result = index.update(fontpaths[:2])
+        assert result.removed == 0
+        assert len(index) == 3
+        result = index.update(fontpaths[:2], prune=True)
+        assert (result.unchanged, result.removed) == (2, 1)
+        assert len(index) == 2
+    finally:
+        index.close()
+
+
+def test_index_update_errors(font_library):
+    tmpdirname, fontpaths = font_library
+    bogus_path = os.path.join(tmpdirname, "Bogus.ttf")
+    with open(bogus_path, "wb") as f:
+        f.write(b"bogus font data")
+    index = PanoseIndex(os.path.join(tmpdirname, "index.sqlite"))
+    try:
+        result = index.update(fontpaths + [bogus_path])
+        assert result.updated == 4
+        assert [path for path, _ in result.errors] == [bogus_path]
+        # fonts that cannot be read are not audited
+        for check in AUDIT_CHECKS:
+            assert list(index.audit(check)) == []
+    finally:
+        index.close()
+
+
+def test_index_update_collection(capsys, font_library):
+    tmpdirname, fontpaths = font_library
+    collection_path = os.path.join(tmpdirname, "NotoSans.ttc")
+    collection = TTCollection()
+    for weight in (5, 8):
+        tt = TTFont(TEST_FONT_PATH)
+        tt["OS/2"].panose.bWeight = weight
+        collection.fonts.append(tt)
+    collection.save(collection_path)
+
+    index_path = os.path.join(tmpdirname, "index.sqlite")
+    __main__.run(["index", "update", "--database", index_path, tmpdirname])
+    captured = capsys.readouterr()
+    # collections are indexed with one row per face
+    assert "4 updated, 0 unchanged, 0 removed, 0 errors (5 indexed)" in captured.out
+    index = PanoseIndex(index_path)
+    try:
+        rows = index.connection.execute(
+            "SELECT face, weight FROM fonts WHERE path = ? ORDER BY face",
+            (os.path.abspath(collection_path),),
+        ).fetchall()
+        assert [(row["face"], row["weight"]) for row in rows] == [(0, 5), (1, 8)]
+        records = list(index.audit("mixed-weight"))
+        assert [(record["path"], record["face"]) for record in records][-2:] == [
+            (os.path.abspath(collection_path), 0),
+            (os.path.abspath(collection_path), 1),
+        ]
+
+        # the faces of a modified collection replace the indexed faces
+        collection = TTCollection(collection_path)
+        collection.fonts = collection.fonts[:1]
+        collection.save(collection_path)
+        touch(collection_path)
+        result = index.update([collection_path])
+        assert (result.updated, result.errors) == (1, [])
+        assert len(index) == 4
+    finally:
+        index.close()
+
+
+def test_index_rebuilds_index_without_faces(font_library):
+    tmpdirname, fontpaths = font_library
+    index_path = os.path.join(tmpdirname, "index.sqlite")
+    index = PanoseIndex(index_path)
+    index.connection.executescript(
+        "DROP TABLE fonts; CREATE TABLE fonts (path TEXT PRIMARY KEY, mtime_ns INTEGER);"
+    )
+    index.close()
+    index = PanoseIndex(index_path)
+    try:
+        result = index.update(fontpaths)
+        assert (result.updated, len(index)) == (3, 3)
+    finally:
+        index.close()
+
+
+def test_index_audit(font_library):
+    tmpdirname, fontpaths = font_library
+    apply_panose([fontpaths[1]], {"weight": 8})
+    apply_panose([fontpaths[2]], {"familytype": 3})
+    index = PanoseIndex(os.path.join(tmpdirname, "index.sqlite"))
+    try:
+        index.update(fontpaths)
+        # audits read the index only
+        for fontpath in fontpaths:
+            os.remove(fontpath)
+
+        records = list(index.audit("mixed-familytype"))
+        assert sorted(record["path"] for record in records) == sorted(
+            os.path.abspath(fontpath) for fontpath in fontpaths
+        )
+        assert sorted(record["familytype"] for record in records) == [2, 2, 3]
+
+        # usWeightClass 400 is weight 5
+        records = list(index.audit("weight-class"))
+        assert [record["path"] for record in records] == [os.path.abspath(fontpaths[1])]
+        assert records[0]["weight"] == 8
+        assert records[0]["usweightclass"] == 400
+
+        assert list(index.audit("mixed-xheight")) == []
+        with pytest.raises(ValueError):
+            list(index.audit("bogus"))
+    finally:
+        index.close()
+
+
+def test_run_index(capsys, font_library):
+    tmpdirname, fontpaths = font_library
+    index_path = os.path.join(tmpdirname, "index.sqlite")
+    apply_panose([fontpaths[1]], {"weight": 8})
+
+    __main__.run(["index", "update", "--database", index_path, tmpdirname])
+    captured = capsys.readouterr()
+    assert "3 updated, 0 unchanged, 0 removed, 0 errors (3 indexed)" in captured.out
+
+    __main__.run(["index", "update", "--database", index_path, tmpdirname])
+    captured = capsys.readouterr()
+    assert "0 updated, 3 unchanged" in captured.out
+
+    __main__.run(["index", "audit", "--database", index_path, "mixed-familytype"])
+    captured = capsys.readouterr()
+    assert captured.out == ""
+
+    # audits exit with a non-zero status when fonts fail the check
+    with pytest.raises(SystemExit) as e:
+        __main__.run(["index", "audit", "--database", index_path, "weight-class"])
+    captured = capsys.readouterr()
+    assert e.value.code == 1
+    records = [json.loads(line) for line in captured.out.splitlines()]
+    assert [record["style"] for record in records] == ["Regular"]
+    assert records[0]["path"] == os.path.abspath(fontpaths[1])
+
+    with pytest.raises(SystemExit) as e:
+        __main__.run(
+            [
+                "index",
+                "audit",
+                "--database",
+                index_path,
+                "--format",
+                "csv",
+                "mixed-weight",
+            ]
+        )
+    captured = capsys.readouterr()
+    lines = captured.out.splitlines()
+    assert lines[0].startswith("path,face,family,style,usweightclass,familytype,")
+    assert len(lines) == 4
+
+
+def test_run_index_errors(capsys, font_library, monkeypatch):
+    tmpdirname, fontpaths = font_library
+    monkeypatch.setenv("PANOSIFIER_INDEX", os.path.join(tmpdirname, "index.sqlite"))
+    with pytest.raises(SystemExit) as e:
+        __main__.run(["index", "audit", "weight-class"])
+    captured = capsys.readouterr()
+    assert e.value.code == 1
+    assert "does not exist" in captured.err
+
+    bogus_path = os.path.join(tmpdirname, "Bogus.ttf")
+    with open(bogus_path, "wb") as f:
+        f.write(b"bogus font data")
+    with pytest.raises(SystemExit) as e:
+        __main__.run(["index", "update", tmpdirname])
+    captured = capsys.readouterr()
+    assert e.value.code == 1
+    assert f"[ERROR] '{bogus_path}' error:" in captured.err
+    assert "4 updated, 0 unchanged, 0 removed, 1 errors (4 indexed)" in captured.out
+
+    with pytest.raises(SystemExit) as e:
+        __main__.run(["index", "update", os.path.join(tmpdirname, "missing.ttf")])
+    captured = capsys.readouterr()
+    assert e.value.code == 1
+    assert "[ERROR]" in captured.err
+
+    with pytest.raises(SystemExit) as e:
+        __main__.run(["index", "bogus"])
+    assert e.value.code == 2
@@ -0,0 +1,273 @@
+import os
+import tempfile
+
+import pytest
+from fontTools.cffLib import FDArrayIndex, FDSelect, FontDict, SubrsIndex
+from fontTools.fontBuilder import FontBuilder
+from fontTools.misc.psCharStrings import T2CharString
+from fontTools.pens.t2CharStringPen import T2CharStringPen
+from fontTools.pens.ttGlyphPen import TTGlyphPen
+from fontTools.ttLib import TTFont
+
+from panosifier.datastructures import Panose
+from panosifier.edit import EditResult
+
+np = pytest.importorskip("numpy")
+infer = pytest.importorskip("panosifier.infer")
+
+TEST_FONT_PATH = os.path.join(
+    "tests", "testfiles", "fonts", "NotoSans-Regular.subset.ttf"
+)
+PRINTABLE_ASCII = [chr(c) for c in range(0x21, 0x7F)]
+
+
+def draw_glyph(pen, char, stem, cap_height, x_height):
+    if char == "H":
+        # two stems and a crossbar
+        for x in (50, 450 - stem):
+            pen.moveTo((x, 0))
+            pen.lineTo((x, cap_height))
+            pen.lineTo((x + stem, cap_height))
+            pen.lineTo((x + stem, 0))
+            pen.closePath()
+        pen.moveTo((50, 330))
+        pen.lineTo((50, 400))
+        pen.lineTo((450, 400))
+        pen.lineTo((450, 330))
+        pen.closePath()
+    else:
+        height = x_height if char.islower() else cap_height
+        pen.moveTo((50, 0))
+        pen.qCurveTo((50, height), (250, height))
+        pen.lineTo((250 + stem, height))
+        pen.lineTo((250 + stem, 0))
+        pen.closePath()
+
+
+def convert_to_cid(tt):
+    # CID-keyed CFF with the 'H' outline in local and global subroutines
+    cff = tt["CFF "].cff
+    top = cff.topDictIndex[0]
+    charstring = top.CharStrings[tt.getGlyphOrder()[ord("H") - 0x20]]
+    charstring.decompile()
+    program = charstring.program
+    top.Private.Subrs = SubrsIndex()
+    top.Private.Subrs.append(T2CharString(program=program[1:7] + ["return"]))
+    cff.GlobalSubrs.append(T2CharString(program=program[7:-1] + ["return"]))
+    charstring.program = program[:1] + [-107, "callsubr", -107, "callgsubr", "endchar"]
+
+    top.ROS = ("Adobe", "Identity", 0)
+    top.CIDCount = len(tt.getGlyphOrder())
+    font_dict = FontDict()
+    font_dict.Private = top.Private
+    top.FDArray = FDArrayIndex()
+    top.FDArray.append(font_dict)
+    top.FDSelect = FDSelect()
+    top.FDSelect.format = 3
+    top.FDSelect.gidArray = [0] * top.CIDCount
+    del top.Private
+
+
+def write_latin_font(
+    fontpath,
+    stem=80,
+    cap_height=700,
+    x_height=500,
+    monospaced=False,
+    cff=False,
+    os2_heights=True,
+    weight_class=400,
+    cid=False,
+):
+    if cid:
+        glyph_order = [".notdef"] + [f"cid{i:05d}" for i in range(1, 95)]
+    else:
+        glyph_order = [".notdef"] + [f"uni{ord(c):04X}" for c in PRINTABLE_ASCII]
+    fb = FontBuilder(1000, isTTF=not cff)
+    fb.setupGlyphOrder(glyph_order)
+    fb.setupCharacterMap(dict(zip((ord(c) for c in PRINTABLE_ASCII), glyph_order[1:])))
+    chars = [None] + PRINTABLE_ASCII
+    if cff:
+        charstrings = {}
+        for name, char in zip(glyph_order, chars):
+            pen = T2CharStringPen(600, None)
+            if char is not None:
+                draw_glyph(pen, char, stem, cap_height, x_height)
+            charstrings[name] = pen.getCharString()
+        fb.setupCFF("Test-Regular", {"FullName": "Test"}, charstrings, {})
+        if cid:
+            convert_to_cid(fb.font)
+    else:
+        glyphs = {}
+        for name, char in zip(glyph_order, chars):
+            pen = TTGlyphPen(None)
+            if char is not None:
+                draw_glyph(pen, char, stem, cap_height, x_height)
+            glyphs[name] = pen.glyph()
+        fb.setupGlyf(glyphs)
+    fb.setupHorizontalMetrics(
+        {
+            name: (600 if monospaced or i == 0 else 400 + i * 3, 50)
+            for i, name in enumerate(glyph_order)
+        }
+    )
+    fb.setupHorizontalHeader(ascent=800, descent=-200)
+    fb.setupNameTable({"familyName": "Test", "styleName": "Regular"})
+    fb.setupOS2(
+        usWeightClass=weight_class,
+        sxHeight=x_height if os2_heights else 0,
+        sCapHeight=cap_height if os2_heights else 0,
+    )
+    fb.setupPost()
+    fb.save(fontpath)
+
+
+@pytest.mark.parametrize("cff", (False, True))
+@pytest.mark.parametrize("os2_heights", (True, False))
+def test_infer_panose(cff, os2_heights):
+    with tempfile.TemporaryDirectory() as tmpdirname:
+        fontpath = os.path.join(tmpdirname, "Test.otf" if cff else "Test.ttf")
+        write_latin_font(fontpath, cff=cff, os2_heights=os2_heights)
+
+        with open(fontpath, "rb") as f:
+            metrics = infer.read_font_metrics(f)
+        assert metrics.latin
+        assert not metrics.monospaced
+        assert metrics.stem_width == pytest.approx(80)
+        assert metrics.cap_height == 700
+        assert metrics.x_height == 500
+
+        # cap height to stem width ratio 8.75 is Book weight, and x-height to
+        # cap height ratio 0.71 is Constant/Large
+        assert infer.infer_panose(fontpath) == Panose(familytype=2, weight=5, xheight=4)
+
+
+@pytest.mark.parametrize(
+    "stem, x_height, weight, xheight",
+    [(30, 300, 3, 2), (150, 400, 7, 3), (400, 500, 11, 4)],
+)
+def test_infer_panose_classes(stem, x_height, weight, xheight):
+    with tempfile.TemporaryDirectory() as tmpdirname:
+        fontpath = os.path.join(tmpdirname, "Test.ttf")
+        write_latin_font(fontpath, stem=stem, x_height=x_height)
+
+        panose = infer.infer_panose(fontpath)
+        assert panose.weight == weight
+        assert panose.xheight == xheight
+
+
+def test_infer_panose_cff_subroutines_and_cid():
+    with tempfile.TemporaryDirectory() as tmpdirname:
+        fontpath = os.path.join(tmpdirname, "Test.otf")
+        write_latin_font(fontpath, cff=True, cid=True)
+        tt = TTFont(fontpath)
+        assert hasattr(tt["CFF "].cff.topDictIndex[0], "FDArray")
+
+        assert infer.infer_panose(fontpath) == Panose(familytype=2, weight=5, xheight=4)
+
+
+def test_infer_panose_monospaced():
+    with tempfile.TemporaryDirectory() as tmpdirname:
+        fontpath = os.path.join(tmpdirname, "Test.ttf")
+        write_latin_font(fontpath, monospaced=True)
+
+        assert infer.infer_panose(fontpath).proportion == 9
+
+
+def test_infer_panose_woff():
+    with tempfile.TemporaryDirectory() as tmpdirname:
+        fontpath = os.path.join(tmpdirname, "Test.woff")
+        write_latin_font(fontpath)
+        tt = TTFont(fontpath)
+        tt.flavor = "woff"
+        tt.save(fontpath)
+
+        assert infer.infer_panose(fontpath) == Panose(familytype=2, weight=5, xheight=4)
+
+
+def test_infer_panose_without_latin_letters():
+    # the weight is classified by usWeightClass 400 and the x-height by the
+    # OS/2 heights
+    assert infer.infer_panose(TEST_FONT_PATH) == Panose(weight=5, xheight=4)
+
+
+def test_classify_metrics_batch():
+    metrics = [
+        infer.FontMetrics(900, 5, 0, 0, 0.0, False, False),
+        infer.FontMetrics(400, 3, 500, 700, 100.0, False, True),
+        infer.FontMetrics(400, 8, 0, 700, 0.0, True, True),
+        infer.FontMetrics(0, 0, 0, 0, 0.0, False, False),
+    ]
+    assert infer.classify_metrics(metrics) == [
+        Panose(weight=10),
+        Panose(familytype=2, weight=6, proportion=6, xheight=4),
+        Panose(familytype=2, weight=5, proportion=9),
+        Panose(),
+    ]
+    assert infer.classify_metrics([]) == []
+
+
+def test_lookup_cmap_matches_fonttools():
+    # format 4 segments with idDelta values and with glyph ID arrays, and a
+    # format 12 subtable for the supplementary plane codepoints
+    glyph_order = [".notdef"] + [f"g{i}" for i in range(1, 300)]
+    fb = FontBuilder(1000, isTTF=True)
+    fb.setupGlyphOrder(glyph_order)
+    cmap = {0x41 + i: f"g{i + 1}" for i in range(100)}
+    cmap.update({0x400 + i: f"g{(i * 7) % 299 + 1}" for i in range(100)})
+    cmap.update({0x800 + 3 * i: f"g{299 - i}" for i in range(100)})
+    for mapping in (cmap, {**cmap, 0x1F600: "g250"}):
+        fb.setupCharacterMap(mapping)
+        tt = fb.font
+        data = tt["cmap"].compile(tt)
+        codepoints = np.arange(0, 0x20000, dtype=np.int64)
+        expected = np.zeros(len(codepoints), dtype=np.int64)
+        for codepoint, name in tt.getBestCmap().items():
+            expected[codepoint] = tt.getGlyphID(name)
+        assert np.array_equal(infer.lookup_cmap(np, data, codepoints), expected)
+
+
+def test_measure_stem_width_nonzero_winding():
+    # overlapping contours of the same stem are one filled run
+    contours = [
+        [(0, 0), (0, 100), (80, 100), (80, 0)],
+        [(40, 0), (40, 100), (120, 100), (120, 0)],
+        [(200, 0), (200, 100), (260, 100), (260, 0)],
+    ]
+    widths = infer.measure_stem_width(np, contours, 50)
+    assert list(widths) == [120, 60]
+    assert len(infer.measure_stem_width(np, [], 50)) == 0
+
+
+def test_iter_inferred_edits():
+    with tempfile.TemporaryDirectory() as tmpdirname:
+        fontpaths = []
+        for stem in (80, 150):
+            fontpath = os.path.join(tmpdirname, f"Test-{stem}.ttf")
+            write_latin_font(fontpath, stem=stem)
+            fontpaths.append(fontpath)
+        bogus_path = os.path.join(tmpdirname, "Bogus.ttf")
+        with open(bogus_path, "wb") as f:
+            f.write(b"bogus")
+        error = EditResult("missing", None, False, "'missing' error")
+
+        edits = [
+            (fontpaths[0], Panose(weight=1)),
+            error,
+            (bogus_path, Panose(weight=1)),
+            (fontpaths[1], Panose(weight=1)),
+        ]
+        results = list(
+            infer.iter_inferred_edits(edits, Panose(serifstyle=11), batch_size=3)
+        )
+        assert results[0] == (
+            fontpaths[0],
+            Panose(familytype=2, serifstyle=11, weight=5, xheight=4),
+        )
+        assert results[1] is error
+        assert results[2].fontpath == bogus_path
+        assert results[2].error.startswith("panose inference failed:")
+        assert results[3] == (
+            fontpaths[1],
+            Panose(familytype=2, serifstyle=11, weight=7, xheight=4),
+        )
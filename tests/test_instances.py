@@ -0,0 +1,268 @@
+import csv
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+import pytest
+from fontTools.fontBuilder import FontBuilder
+from fontTools.pens.ttGlyphPen import TTGlyphPen
+from fontTools.ttLib import TTFont, newTable
+from fontTools.varLib.models import normalizeValue, piecewiseLinearMap
+
+from panosifier import __main__, instances
+from panosifier.datastructures import Panose
+from panosifier.manifest import read_manifest
+
+TEST_FONT_PATH = os.path.join(
+    "tests", "testfiles", "fonts", "NotoSans-Regular.subset.ttf"
+)
+AXES = [
+    ("wght", 100, 400, 900, "Weight"),
+    ("wdth", 75, 100, 100, "Width"),
+    ("slnt", -10, 0, 0, "Slant"),
+]
+# the wght user coordinate 700 maps to the normalized coordinate of 600
+AVAR_SEGMENTS = {"wght": {-1.0: -1.0, 0.0: 0.0, 0.6: 0.4, 1.0: 1.0}}
+INSTANCES = [
+    ("Regular", {"wght": 400, "wdth": 100, "slnt": 0}),
+    ("Bold", {"wght": 700, "wdth": 100, "slnt": 0}),
+    ("Condensed Bold", {"wght": 700, "wdth": 75, "slnt": 0}),
+    ("Thin Italic", {"wght": 100, "wdth": 100, "slnt": -10}),
+]
+
+
+def write_variable_font(fontpath, avar=True, postscript_names=True):
+    fb = FontBuilder(1000, isTTF=True)
+    fb.setupGlyphOrder([".notdef"])
+    fb.setupCharacterMap({})
+    fb.setupGlyf({".notdef": TTGlyphPen(None).glyph()})
+    fb.setupHorizontalMetrics({".notdef": (500, 0)})
+    fb.setupHorizontalHeader(ascent=800, descent=-200)
+    fb.setupNameTable({"familyName": "Test", "styleName": "Regular"})
+    fb.setupOS2()
+    Panose.from_bytes(bytes([2, 11, 5, 2, 4, 5, 4, 2, 2, 4])).set_font_panose_data(
+        fb.font
+    )
+    fb.setupPost()
+    fvar_instances = []
+    for name, location in INSTANCES:
+        instance = {"stylename": name, "location": location}
+        if postscript_names:
+            instance["postscriptfontname"] = f"Test-{name.replace(' ', '')}"
+        fvar_instances.append(instance)
+    fb.setupFvar(AXES, fvar_instances)
+    if avar:
+        avar = newTable("avar")
+        avar.segments = {
+            tag: AVAR_SEGMENTS.get(tag, {-1.0: -1.0, 0.0: 0.0, 1.0: 1.0})
+            for tag, *_ in AXES
+        }
+        fb.font["avar"] = avar
+    fb.save(fontpath)
+
+
+@pytest.fixture
+def variable_font_path():
+    with tempfile.TemporaryDirectory() as tmpdirname:
+        fontpath = os.path.join(tmpdirname, "Test[slnt,wdth,wght].ttf")
+        write_variable_font(fontpath)
+        yield fontpath
+
+
+def test_read_named_instances(variable_font_path):
+    named_instances = instances.read_font_named_instances(variable_font_path)
+    assert [instance.name for instance in named_instances] == [
+        name for name, _ in INSTANCES
+    ]
+    assert named_instances[1].postscript_name == "Test-Bold"
+    assert named_instances[1].coordinates == {"wght": 700, "wdth": 100, "slnt": 0}
+
+    panose = [instance.panose.to_bytes() for instance in named_instances]
+    assert panose == [
+        bytes([2, 11, 5, 2, 4, 5, 4, 2, 2, 4]),
+        bytes([2, 11, 8, 2, 4, 5, 4, 2, 2, 4]),
+        bytes([2, 11, 8, 6, 4, 5, 4, 2, 2, 4]),
+        bytes([2, 11, 2, 2, 4, 5, 4, 9, 2, 4]),
+    ]
+
+
+def test_read_named_instances_normalized_matches_fonttools(variable_font_path):
+    tt = TTFont(variable_font_path)
+    avar = tt["avar"].segments
+    axes = {axis.axisTag: axis for axis in tt["fvar"].axes}
+    for instance in instances.read_font_named_instances(variable_font_path):
+        for tag, value in instance.coordinates.items():
+            axis = axes[tag]
+            expected = normalizeValue(
+                value, (axis.minValue, axis.defaultValue, axis.maxValue)
+            )
+            expected = piecewiseLinearMap(expected, avar[tag])
+            assert instance.normalized[tag] == pytest.approx(expected, abs=1 / 0x4000)
+    # 700 maps to 600 in user space with the F2Dot14 avar table values
+    bold = instances.read_font_named_instances(variable_font_path)[1]
+    assert bold.normalized["wght"] == pytest.approx(0.4, abs=2 / 0x4000)
+
+
+def test_read_named_instances_without_avar_and_postscript_names():
+    with tempfile.TemporaryDirectory() as tmpdirname:
+        fontpath = os.path.join(tmpdirname, "Test.ttf")
+        write_variable_font(fontpath, avar=False, postscript_names=False)
+        bold = instances.read_font_named_instances(fontpath)[1]
+        assert bold.postscript_name is None
+        assert bold.normalized["wght"] == pytest.approx(0.6, abs=1 / 0x4000)
+
+
+def test_read_named_instances_woff(variable_font_path):
+    tt = TTFont(variable_font_path)
+    tt.flavor = "woff"
+    woff_path = variable_font_path.replace(".ttf", ".woff")
+    tt.save(woff_path)
+    assert instances.read_font_named_instances(
+        woff_path
+    ) == instances.read_font_named_instances(variable_font_path)
+
+
+def test_read_named_instances_static_font():
+    with pytest.raises(ValueError, match="'fvar'"):
+        instances.read_font_named_instances(TEST_FONT_PATH)
+
+
+@pytest.mark.parametrize(
+    "familytype, coordinates, expected",
+    [
+        # width proportions are reset to Any at medium widths
+        (2, {"wdth": 100}, [2, 0, 5, 0, 0, 0, 0, 9, 0, 0]),
+        (2, {"wdth": 150, "slnt": 0}, [2, 0, 5, 7, 0, 0, 0, 2, 0, 0]),
+        (2, {"ital": 1}, [2, 0, 5, 6, 0, 0, 0, 9, 0, 0]),
+        # other family types are not Latin Text classifications
+        (3, {"wght": 900}, [3, 0, 5, 6, 0, 0, 0, 9, 0, 0]),
+    ],
+)
+def test_get_instance_panose(familytype, coordinates, expected):
+    default = Panose.from_bytes(bytes([familytype, 0, 5, 6, 0, 0, 0, 9, 0, 0]))
+    assert list(instances.get_instance_panose(default, coordinates).to_bytes()) == (
+        expected
+    )
+
+
+def test_run_instances_ndjson(capsys, variable_font_path):
+    __main__.run(["instances", variable_font_path])
+    captured = capsys.readouterr()
+    records = [json.loads(line) for line in captured.out.splitlines()]
+    assert [record["instance"] for record in records] == [name for name, _ in INSTANCES]
+    assert records[2]["weight"] == 8
+    assert records[2]["proportion"] == 6
+    assert records[2]["coordinates"] == {"wght": 700, "wdth": 75, "slnt": 0}
+    assert records[2]["error"] is None
+
+
+def test_run_instances_csv(capsys, variable_font_path):
+    __main__.run(["instances", "--format", "csv", variable_font_path])
+    captured = capsys.readouterr()
+    rows = list(csv.reader(captured.out.splitlines()))
+    assert rows[0][:5] == [
+        "path",
+        "instance",
+        "postscriptname",
+        "coordinates",
+        "normalized",
+    ]
+    assert len(rows) == 5
+    assert rows[2][:4] == [
+        variable_font_path,
+        "Bold",
+        "Test-Bold",
+        "wght=700 wdth=100 slnt=0",
+    ]
+    assert rows[2][5:] == ["2", "11", "8", "2", "4", "5", "4", "2", "2", "4", ""]
+
+
+def test_run_instances_manifest(capsys, variable_font_path):
+    __main__.run(["instances", "--format", "manifest", variable_font_path])
+    captured = capsys.readouterr()
+    manifest_path = os.path.join(os.path.dirname(variable_font_path), "manifest.json")
+    with open(manifest_path, "w") as f:
+        f.write(captured.out)
+
+    # the manifest paths are the instance font paths
+    fontdir = os.path.dirname(variable_font_path)
+    assert [entry["path"] for entry in json.loads(captured.out)] == [
+        os.path.join(fontdir, path)
+        for path in (
+            "Test-Regular.ttf",
+            "Test-Bold.ttf",
+            "Test-CondensedBold.ttf",
+            "Test-ThinItalic.ttf",
+        )
+    ]
+    entries = read_manifest(manifest_path)
+    assert entries[3].panose.weight == 2
+    assert entries[3].panose.letterform == 9
+
+
+def test_run_instances_manifest_relative_font_path(
+    capsys, monkeypatch, variable_font_path
+):
+    fontdir, filename = os.path.split(variable_font_path)
+    monkeypatch.chdir(fontdir)
+    __main__.run(["instances", "--format", "manifest", filename])
+    captured = capsys.readouterr()
+    # the manifest is saved outside of the working directory
+    os.makedirs("manifests")
+    manifest_path = os.path.join("manifests", "manifest.json")
+    with open(manifest_path, "w") as f:
+        f.write(captured.out)
+
+    entries = read_manifest(manifest_path)
+    assert os.path.samefile(os.path.dirname(entries[0].path), fontdir)
+    assert os.path.basename(entries[0].path) == "Test-Regular.ttf"
+
+    __main__.run(
+        [
+            "instances",
+            "--format",
+            "manifest",
+            "--instance-path",
+            "instances/{postscriptname}{ext}",
+            variable_font_path,
+        ]
+    )
+    captured = capsys.readouterr()
+    assert json.loads(captured.out)[1]["path"] == os.path.join(
+        fontdir, "instances", "Test-Bold.ttf"
+    )
+
+
+def test_run_instances_errors(capsys, variable_font_path):
+    with pytest.raises(SystemExit) as e:
+        __main__.run(["instances", variable_font_path, TEST_FONT_PATH])
+    captured = capsys.readouterr()
+    assert e.value.code == 1
+    lines = captured.out.splitlines()
+    assert len(lines) == 5
+    assert "'fvar'" in json.loads(lines[4])["error"]
+
+    with pytest.raises(SystemExit) as e:
+        __main__.run(["instances", "--format", "manifest", TEST_FONT_PATH])
+    captured = capsys.readouterr()
+    assert e.value.code == 1
+    assert json.loads(captured.out) == []
+    assert "[ERROR]" in captured.err
+
+    with pytest.raises(SystemExit) as e:
+        __main__.run(["instances", "--instance-path", "{bogus}", variable_font_path])
+    captured = capsys.readouterr()
+    assert e.value.code == 1
+    assert "--instance-path" in captured.err
+
+
+def test_run_instances_does_not_import_fonttools(variable_font_path):
+    code = (
+        "import sys\n"
+        "from panosifier.__main__ import run\n"
+        f"run(['instances', {variable_font_path!r}])\n"
+        "assert 'fontTools' not in sys.modules\n"
+    )
+    subprocess.run([sys.executable, "-c", code], check=True, stdout=subprocess.DEVNULL)
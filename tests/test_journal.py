@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+
+import os
+import shutil
+import tempfile
+
+from panosifier import journal
+from panosifier.datastructures import Panose
+from panosifier.edit import EditResult
+
+TEST_FONT_NAME = "NotoSans-Regular.subset.ttf"
+PANOSE_BYTES = bytes([2, 11, 8, 2, 4, 5, 4, 2, 2, 4])
+
+
+def get_test_font_path():
+    return os.path.join("tests", "testfiles", "fonts", TEST_FONT_NAME)
+
+
+def _completed_result(fontpath, panose):
+    return EditResult(fontpath, PANOSE_BYTES, True, None, panose_key=panose.cache_key())
+
+
+def test_journal_round_trip_and_incomplete_lines():
+    with tempfile.TemporaryDirectory() as tmpdirname:
+        dest_path = os.path.join(tmpdirname, TEST_FONT_NAME)
+        journal_path = os.path.join(tmpdirname, "journal.ndjson")
+        shutil.copyfile(get_test_font_path(), dest_path)
+        panose = Panose(weight=8)
+
+        writer = journal.JournalWriter(journal_path)
+        writer.write(
+            journal.entry_from_result(_completed_result(dest_path, panose), True)
+        )
+        writer.close()
+        # incomplete line of an interrupted run
+        with open(journal_path, "a") as f:
+            f.write('{"path": "/interrupted')
+
+        writer = journal.JournalWriter(journal_path)
+        writer.write(
+            journal.entry_from_result(_completed_result(dest_path, panose), True)
+        )
+        writer.close()
+
+        entries = journal.read_journal(journal_path)
+        assert list(entries) == [os.path.abspath(dest_path)]
+        with open(journal_path) as f:
+            assert len(f.read().splitlines()) == 3
+
+
+def test_is_completed():
+    with tempfile.TemporaryDirectory() as tmpdirname:
+        dest_path = os.path.join(tmpdirname, TEST_FONT_NAME)
+        shutil.copyfile(get_test_font_path(), dest_path)
+        panose = Panose(weight=8)
+        entry = journal.entry_from_result(_completed_result(dest_path, panose), False)
+        entries = {entry.path: entry}
+
+        assert journal.is_completed(entries, dest_path, panose, None, False) == entry
+        # a different panose definition, an unverified entry, or output path
+        assert (
+            journal.is_completed(entries, dest_path, Panose(weight=7), None, False)
+            is None
+        )
+        assert journal.is_completed(entries, dest_path, panose, None, True) is None
+        assert journal.is_completed(entries, dest_path, panose, "out.ttf", False) is None
+        # a font that was modified after the journaled edit
+        os.utime(dest_path, ns=(0, 0))
+        assert journal.is_completed(entries, dest_path, panose, None, False) is None
+
+
+def test_read_journal_missing_file():
+    assert journal.read_journal(os.path.join("bogus", "journal.ndjson")) == {}
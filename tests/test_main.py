@@ -1,12 +1,16 @@
 #!/usr/bin/env python3
 
 import argparse
+import io
+import json
 import os
 import shutil
+import subprocess
+import sys
 import tempfile
 
 import pytest
-from fontTools.ttLib import TTFont
+from fontTools.ttLib import TTCollection, TTFont
 
 from panosifier import __main__
 
@@ -182,6 +186,31 @@ def test_run_invalid_panose_definition(capsys):
     assert "[ERROR]" in captured.err
 
 
+def test_run_define_zero_any_values():
+    test_font_name = "NotoSans-Regular.subset.ttf"
+    source_path = os.path.join("tests", "testfiles", "fonts", test_font_name)
+    with tempfile.TemporaryDirectory() as tmpdirname:
+        dest_path = os.path.join(tmpdirname, test_font_name)
+        shutil.copyfile(source_path, dest_path)
+
+        # 0 ("Any") values are valid definitions
+        for engine in ("fast", "fonttools"):
+            shutil.copyfile(source_path, dest_path)
+            __main__.run(["--engine", engine, "--weight", "0", dest_path])
+            tt_post = TTFont(dest_path)
+            assert tt_post["OS/2"].panose.bWeight == 0
+            assert tt_post["OS/2"].panose.bSerifStyle == 11
+
+
+def test_run_panose_value_out_of_range(capsys):
+    test_font_name = "NotoSans-Regular.subset.ttf"
+    source_path = os.path.join("tests", "testfiles", "fonts", test_font_name)
+    with pytest.raises(SystemExit) as e:
+        __main__.run(["--weight", "256", source_path])
+    assert e.value.code == 1
+    assert "must be in the range 0-255" in capsys.readouterr().err
+
+
 def test_run_invalid_option_definition(capsys):
     test_font_name = "NotoSans-Regular.subset.ttf"
     source_path = os.path.join("tests", "testfiles", "fonts", test_font_name)
@@ -199,3 +228,646 @@ def test_run_invalid_option_definition(capsys):
         assert e.type == SystemExit
         assert e.value.code == 2
         assert "invalid int value" in captured.err
+
+
+def test_run_engines_write_identical_fonts():
+    test_font_name = "NotoSans-Regular.subset.ttf"
+    source_path = os.path.join("tests", "testfiles", "fonts", test_font_name)
+    with tempfile.TemporaryDirectory() as tmpdirname:
+        # normalize the test font with a full fontTools decompile/compile
+        # so that the table layout matches fontTools compiler output
+        normalized_path = os.path.join(tmpdirname, test_font_name)
+        tt = TTFont(source_path, recalcTimestamp=False)
+        for tag in tt.keys():
+            tt[tag]
+        tt.save(normalized_path)
+
+        fast_path = os.path.join(tmpdirname, "fast.ttf")
+        fonttools_path = os.path.join(tmpdirname, "fonttools.ttf")
+        shutil.copyfile(normalized_path, fast_path)
+        shutil.copyfile(normalized_path, fonttools_path)
+
+        __main__.run(["--panose", "1,2,3,4,5,6,7,8,9,10", "--engine", "fast", fast_path])
+        __main__.run(
+            ["--panose", "1,2,3,4,5,6,7,8,9,10", "--engine", "fonttools", fonttools_path]
+        )
+
+        with open(fast_path, "rb") as f:
+            fast_bytes = f.read()
+        with open(fonttools_path, "rb") as f:
+            fonttools_bytes = f.read()
+        with open(normalized_path, "rb") as f:
+            assert f.read() != fast_bytes
+        assert fast_bytes == fonttools_bytes
+
+
+def test_run_fast_engine_with_woff():
+    test_font_name = "NotoSans-Regular.subset.ttf"
+    source_path = os.path.join("tests", "testfiles", "fonts", test_font_name)
+    with tempfile.TemporaryDirectory() as tmpdirname:
+        dest_path = os.path.join(tmpdirname, "NotoSans-Regular.subset.woff")
+        tt = TTFont(source_path)
+        tt.flavor = "woff"
+        tt.save(dest_path)
+
+        __main__.run(["--weight", "8", dest_path])
+
+        tt_post = TTFont(dest_path)
+        assert tt_post.flavor == "woff"
+        assert tt_post["OS/2"].panose.bWeight == 8
+
+
+def test_run_verify_report(capsys):
+    test_font_name = "NotoSans-Regular.subset.ttf"
+    source_path = os.path.join("tests", "testfiles", "fonts", test_font_name)
+    with tempfile.TemporaryDirectory() as tmpdirname:
+        dest_path = os.path.join(tmpdirname, test_font_name)
+        shutil.copyfile(source_path, dest_path)
+
+        __main__.run(["--weight", "8", "--verify", dest_path])
+
+        captured = capsys.readouterr()
+        assert f"{dest_path} panose:" in captured.out
+        assert "   FamilyType: 2" in captured.out
+        assert "   Weight: 8" in captured.out
+        assert "   XHeight: 4" in captured.out
+
+
+def test_run_jobs(capsys):
+    test_font_name = "NotoSans-Regular.subset.ttf"
+    source_path = os.path.join("tests", "testfiles", "fonts", test_font_name)
+    with tempfile.TemporaryDirectory() as tmpdirname:
+        dest_paths = []
+        for i in range(3):
+            dest_path = os.path.join(tmpdirname, f"{i}-{test_font_name}")
+            shutil.copyfile(source_path, dest_path)
+            dest_paths.append(dest_path)
+
+        __main__.run(["--weight", "8", "--jobs", "2"] + dest_paths)
+
+        captured = capsys.readouterr()
+        report_order = [
+            line[: -len(" panose:")]
+            for line in captured.out.splitlines()
+            if line.endswith(" panose:")
+        ]
+        assert report_order == dest_paths
+        for dest_path in dest_paths:
+            assert TTFont(dest_path)["OS/2"].panose.bWeight == 8
+
+
+def test_run_invalid_jobs_value(capsys):
+    test_path = os.path.join("tests", "testfiles", "fonts", "NotoSans-Regular.subset.ttf")
+    for jobs in ("0", "bogus"):
+        with pytest.raises(SystemExit) as e:
+            __main__.run(["--weight", "8", "--jobs", jobs, test_path])
+
+        captured = capsys.readouterr()
+        assert e.value.code == 2
+        assert "jobs value" in captured.err
+
+
+def test_jobs_count_auto():
+    assert __main__.jobs_count("auto") == (os.cpu_count() or 1)
+    assert __main__.jobs_count("3") == 3
+
+
+def test_run_directory_recursive_with_extension_filter(capsys):
+    test_font_name = "NotoSans-Regular.subset.ttf"
+    source_path = os.path.join("tests", "testfiles", "fonts", test_font_name)
+    with tempfile.TemporaryDirectory() as tmpdirname:
+        top_path = os.path.join(tmpdirname, "a.ttf")
+        nested_path = os.path.join(tmpdirname, "sub", "b.ttf")
+        filtered_path = os.path.join(tmpdirname, "sub", "c.otf")
+        os.makedirs(os.path.join(tmpdirname, "sub"))
+        for dest_path in (top_path, nested_path, filtered_path):
+            shutil.copyfile(source_path, dest_path)
+
+        __main__.run(["--weight", "8", tmpdirname])
+        assert TTFont(top_path)["OS/2"].panose.bWeight == 8
+        assert TTFont(nested_path)["OS/2"].panose.bWeight == 5
+
+        __main__.run(["--weight", "7", "--recursive", "--ext", "ttf", tmpdirname])
+        assert TTFont(top_path)["OS/2"].panose.bWeight == 7
+        assert TTFont(nested_path)["OS/2"].panose.bWeight == 7
+        assert TTFont(filtered_path)["OS/2"].panose.bWeight == 5
+
+        __main__.run(["--weight", "6", os.path.join(tmpdirname, "sub", "*.otf")])
+        assert TTFont(filtered_path)["OS/2"].panose.bWeight == 6
+
+        captured = capsys.readouterr()
+        assert f"{nested_path} panose:" in captured.out
+
+
+def test_run_glob_without_matches(capsys):
+    with tempfile.TemporaryDirectory() as tmpdirname:
+        with pytest.raises(SystemExit) as e:
+            __main__.run(["--weight", "8", os.path.join(tmpdirname, "*.ttf")])
+
+        captured = capsys.readouterr()
+        assert e.value.code == 1
+        assert "did not match any paths" in captured.err
+
+
+def test_run_manifest(capsys):
+    test_font_name = "NotoSans-Regular.subset.ttf"
+    source_path = os.path.join("tests", "testfiles", "fonts", test_font_name)
+    with tempfile.TemporaryDirectory() as tmpdirname:
+        regular_path = os.path.join(tmpdirname, "Test-Regular.ttf")
+        bold_path = os.path.join(tmpdirname, "Test-Bold.ttf")
+        shutil.copyfile(source_path, regular_path)
+        shutil.copyfile(source_path, bold_path)
+        manifest_path = os.path.join(tmpdirname, "manifest.json")
+        with open(manifest_path, "w") as f:
+            f.write(
+                '[{"path": "Test-Regular.ttf", "panose": "1,2,3,4,5,6,7,8,9,10"},'
+                ' {"path": "Test-Bold.ttf", "weight": 8}]'
+            )
+
+        __main__.run(["--manifest", manifest_path])
+
+        assert TTFont(regular_path)["OS/2"].panose.bFamilyType == 1
+        assert TTFont(regular_path)["OS/2"].panose.bWeight == 3
+        assert TTFont(bold_path)["OS/2"].panose.bFamilyType == 2
+        assert TTFont(bold_path)["OS/2"].panose.bWeight == 8
+        captured = capsys.readouterr()
+        assert f"{regular_path} panose:" in captured.out
+        assert f"{bold_path} panose:" in captured.out
+
+
+def test_run_manifest_invalid_arguments(capsys):
+    with tempfile.TemporaryDirectory() as tmpdirname:
+        manifest_path = os.path.join(tmpdirname, "manifest.csv")
+        with open(manifest_path, "w") as f:
+            f.write("path,weight\nbogus.ttf,8\n")
+
+        with pytest.raises(SystemExit) as e:
+            __main__.run(["--manifest", manifest_path, "--weight", "8"])
+        captured = capsys.readouterr()
+        assert e.value.code == 1
+        assert "cannot be used with font path arguments" in captured.err
+
+        with pytest.raises(SystemExit) as e:
+            __main__.run(["--manifest", manifest_path])
+        captured = capsys.readouterr()
+        assert e.value.code == 1
+        assert f"{manifest_path}:2: " in captured.err
+
+
+def test_run_without_paths(capsys):
+    with pytest.raises(SystemExit) as e:
+        __main__.run(["--weight", "8"])
+    captured = capsys.readouterr()
+    assert e.value.code == 1
+    assert "include at least one font path" in captured.err
+
+
+def test_run_summary_counts_unchanged_fonts(capsys):
+    test_font_name = "NotoSans-Regular.subset.ttf"
+    source_path = os.path.join("tests", "testfiles", "fonts", test_font_name)
+    with tempfile.TemporaryDirectory() as tmpdirname:
+        dest_paths = []
+        for i in range(3):
+            dest_path = os.path.join(tmpdirname, f"{i}-{test_font_name}")
+            shutil.copyfile(source_path, dest_path)
+            dest_paths.append(dest_path)
+
+        __main__.run(["--weight", "8", dest_paths[0]])
+        capsys.readouterr()
+        os.utime(dest_paths[0], (0, 0))
+
+        __main__.run(["--weight", "8"] + dest_paths)
+        captured = capsys.readouterr()
+        assert captured.out.splitlines()[-1] == "2 changed, 1 unchanged"
+        # unchanged fonts are not written
+        assert os.stat(dest_paths[0]).st_mtime == 0
+
+
+def test_run_with_cache(capsys, monkeypatch):
+    monkeypatch.delenv("PANOSIFIER_CACHE", raising=False)
+    test_font_name = "NotoSans-Regular.subset.ttf"
+    source_path = os.path.join("tests", "testfiles", "fonts", test_font_name)
+    with tempfile.TemporaryDirectory() as tmpdirname:
+        cache_path = os.path.join(tmpdirname, "cache")
+        dest_path = os.path.join(tmpdirname, test_font_name)
+        shutil.copyfile(source_path, dest_path)
+
+        __main__.run(["--weight", "8", "--cache", cache_path, dest_path])
+        captured = capsys.readouterr()
+        assert captured.out.splitlines()[-1] == "1 changed, 0 unchanged"
+
+        __main__.run(["--weight", "8", "--cache", cache_path, dest_path])
+        captured = capsys.readouterr()
+        assert "   Weight: 8" in captured.out
+        assert captured.out.splitlines()[-1] == "0 changed, 1 unchanged (1 from cache)"
+
+        # the environment variable defines the cache path
+        monkeypatch.setenv("PANOSIFIER_CACHE", cache_path)
+        __main__.run(["--weight", "8", dest_path])
+        captured = capsys.readouterr()
+        assert captured.out.splitlines()[-1] == "0 changed, 1 unchanged (1 from cache)"
+
+        __main__.run(["--weight", "8", "--no-cache", dest_path])
+        captured = capsys.readouterr()
+        assert captured.out.splitlines()[-1] == "0 changed, 1 unchanged"
+
+
+def test_run_output_dir(capsys):
+    test_font_name = "NotoSans-Regular.subset.ttf"
+    source_path = os.path.join("tests", "testfiles", "fonts", test_font_name)
+    with tempfile.TemporaryDirectory() as tmpdirname:
+        output_dir = os.path.join(tmpdirname, "out")
+        os.mkdir(output_dir)
+        output_path = os.path.join(output_dir, test_font_name)
+
+        __main__.run(["--weight", "8", "--output-dir", output_dir, source_path])
+        captured = capsys.readouterr()
+        assert f"{output_path} panose:" in captured.out
+        assert TTFont(output_path)["OS/2"].panose.bWeight == 8
+        assert TTFont(source_path)["OS/2"].panose.bWeight == 5
+
+
+def test_run_output_dir_invalid(capsys):
+    test_font_name = "NotoSans-Regular.subset.ttf"
+    source_path = os.path.join("tests", "testfiles", "fonts", test_font_name)
+    with tempfile.TemporaryDirectory() as tmpdirname:
+        with pytest.raises(SystemExit) as e:
+            __main__.run(
+                ["--weight", "8", "--output-dir", os.path.join(tmpdirname, "bogus")]
+                + [source_path]
+            )
+        assert e.value.code == 1
+        assert "does not appear to be a valid directory" in capsys.readouterr().err
+
+        # fonts with the same file name cannot be written to one directory
+        subdir = os.path.join(tmpdirname, "sub")
+        os.mkdir(subdir)
+        dest_path = os.path.join(subdir, test_font_name)
+        shutil.copyfile(source_path, dest_path)
+        with pytest.raises(SystemExit) as e:
+            __main__.run(
+                ["--weight", "8", "--output-dir", tmpdirname, source_path, dest_path]
+            )
+        assert e.value.code == 1
+        assert "have the same output directory path" in capsys.readouterr().err
+        assert TTFont(dest_path)["OS/2"].panose.bWeight == 5
+
+
+def test_run_timings_and_trace_file(capsys):
+    test_font_name = "NotoSans-Regular.subset.ttf"
+    source_path = os.path.join("tests", "testfiles", "fonts", test_font_name)
+    with tempfile.TemporaryDirectory() as tmpdirname:
+        dest_path = os.path.join(tmpdirname, test_font_name)
+        trace_path = os.path.join(tmpdirname, "trace.json")
+        shutil.copyfile(source_path, dest_path)
+
+        __main__.run(
+            ["--weight", "8", "--timings", "--trace-file", trace_path, dest_path]
+        )
+        captured = capsys.readouterr()
+        # the report format does not change
+        assert captured.out.splitlines()[-1] == "1 changed, 0 unchanged"
+        phases = [line.split()[0] for line in captured.err.splitlines()]
+        assert phases == ["phase", "read", "edit", "write", "font", "report"]
+        with open(trace_path) as f:
+            trace = json.load(f)
+        assert {event["name"] for event in trace["traceEvents"]} == set(phases[1:])
+        assert all(event["args"]["path"] == dest_path for event in trace["traceEvents"])
+
+
+# modules that are imported only when fonts are edited with fontTools, edited in
+# parallel, cached, or read from a manifest
+DEFERRED_MODULES = (
+    "fontTools",
+    "concurrent.futures",
+    "sqlite3",
+    "csv",
+    "panosifier.api",
+    "panosifier.edit",
+    "panosifier.journal",
+    "panosifier.server",
+)
+# import and run time budget of the command line paths that do not edit fonts
+NO_FONT_PATH_BUDGET_SECONDS = 0.5
+
+
+@pytest.mark.parametrize(
+    "argv", [["--version"], ["--help"], ["--weight", "8"], ["--weight", "8", "bogus.ttf"]]
+)
+def test_main_no_font_paths_defer_imports(argv):
+    with tempfile.TemporaryDirectory() as tmpdirname:
+        code = (
+            "import sys, time\n"
+            f"sys.argv = ['panosifier'] + {argv!r}\n"
+            "start = time.perf_counter()\n"
+            "from panosifier.__main__ import main\n"
+            "try:\n"
+            "    main()\n"
+            "except SystemExit:\n"
+            "    pass\n"
+            "elapsed = time.perf_counter() - start\n"
+            f"for name in {DEFERRED_MODULES!r}:\n"
+            "    assert name not in sys.modules, name\n"
+            f"assert elapsed < {NO_FONT_PATH_BUDGET_SECONDS}, elapsed\n"
+        )
+        # the server socket path check of main() is included without a server
+        env = dict(os.environ, PANOSIFIER_SOCKET=os.path.join(tmpdirname, "s.sock"))
+        env.pop("PANOSIFIER_NO_SERVER", None)
+        subprocess.run(
+            [sys.executable, "-c", code],
+            check=True,
+            env=env,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+
+
+def test_main_edit_constants():
+    from panosifier import edit
+
+    assert __main__.ENGINES == edit.ENGINES
+    assert __main__.STREAM_PATH == edit.STREAM_PATH
+
+
+def test_run_fast_engine_does_not_import_fonttools():
+    test_font_name = "NotoSans-Regular.subset.ttf"
+    source_path = os.path.join("tests", "testfiles", "fonts", test_font_name)
+    with tempfile.TemporaryDirectory() as tmpdirname:
+        dest_path = os.path.join(tmpdirname, test_font_name)
+        shutil.copyfile(source_path, dest_path)
+        code = (
+            "import sys\n"
+            "from panosifier.__main__ import run\n"
+            f"run(['--weight', '8', {dest_path!r}])\n"
+            "assert 'fontTools' not in sys.modules\n"
+        )
+        subprocess.run(
+            [sys.executable, "-c", code], check=True, stdout=subprocess.DEVNULL
+        )
+
+
+def test_run_dry_run(capsys):
+    test_font_name = "NotoSans-Regular.subset.ttf"
+    source_path = os.path.join("tests", "testfiles", "fonts", test_font_name)
+    with tempfile.TemporaryDirectory() as tmpdirname:
+        dest_path = os.path.join(tmpdirname, test_font_name)
+        shutil.copyfile(source_path, dest_path)
+
+        __main__.run(["--weight", "8", "--dry-run", dest_path])
+        captured = capsys.readouterr()
+        assert "   Weight: 8" in captured.out
+        assert captured.out.splitlines()[-1] == (
+            "1 changed, 0 unchanged (dry run, no fonts were written)"
+        )
+        assert TTFont(dest_path)["OS/2"].panose.bWeight == 5
+
+
+def test_run_keep_going(capsys):
+    test_font_name = "NotoSans-Regular.subset.ttf"
+    source_path = os.path.join("tests", "testfiles", "fonts", test_font_name)
+    corrupt_path = os.path.join("tests", "testfiles", "fonts", "README.md")
+    with tempfile.TemporaryDirectory() as tmpdirname:
+        dest_path = os.path.join(tmpdirname, test_font_name)
+        shutil.copyfile(source_path, dest_path)
+        bogus_path = os.path.join(tmpdirname, "bogus*.ttf")
+
+        with pytest.raises(SystemExit) as e:
+            __main__.run(
+                ["--weight", "8", "--keep-going", corrupt_path, bogus_path, dest_path]
+            )
+        captured = capsys.readouterr()
+        assert e.value.code == 1
+        # the font after the failures is edited
+        assert TTFont(dest_path)["OS/2"].panose.bWeight == 8
+        assert captured.out.splitlines()[-1] == "1 changed, 0 unchanged, 2 failed"
+        assert "[ERROR] 2 font edits failed:" in captured.err
+        assert f"   '{bogus_path}' did not match any paths" in captured.err
+
+
+def test_run_journal_resume(capsys):
+    test_font_name = "NotoSans-Regular.subset.ttf"
+    source_path = os.path.join("tests", "testfiles", "fonts", test_font_name)
+    corrupt_path = os.path.join("tests", "testfiles", "fonts", "README.md")
+    with tempfile.TemporaryDirectory() as tmpdirname:
+        journal_path = os.path.join(tmpdirname, "journal.ndjson")
+        dest_paths = []
+        for i in range(2):
+            dest_path = os.path.join(tmpdirname, f"{i}-{test_font_name}")
+            shutil.copyfile(source_path, dest_path)
+            dest_paths.append(dest_path)
+
+        # the run stops at the corrupt font
+        with pytest.raises(SystemExit):
+            __main__.run(
+                ["--weight", "8", "--journal", journal_path]
+                + [dest_paths[0], corrupt_path, dest_paths[1]]
+            )
+        capsys.readouterr()
+        assert TTFont(dest_paths[1])["OS/2"].panose.bWeight == 5
+
+        __main__.run(
+            ["--weight", "8", "--journal", journal_path, "--resume"] + dest_paths
+        )
+        captured = capsys.readouterr()
+        assert captured.out.splitlines()[-1] == (
+            "1 changed, 1 unchanged (1 completed in the journal)"
+        )
+        assert TTFont(dest_paths[1])["OS/2"].panose.bWeight == 8
+
+        # a font that was modified after the journaled edit is edited again
+        __main__.run(["--weight", "9", dest_paths[0]])
+        capsys.readouterr()
+        __main__.run(
+            ["--weight", "8", "--journal", journal_path, "--resume"] + dest_paths
+        )
+        captured = capsys.readouterr()
+        assert captured.out.splitlines()[-1] == (
+            "1 changed, 1 unchanged (1 completed in the journal)"
+        )
+        assert TTFont(dest_paths[0])["OS/2"].panose.bWeight == 8
+
+
+def test_run_keep_going_journal_write_error(capsys, monkeypatch):
+    from panosifier import journal
+
+    test_font_name = "NotoSans-Regular.subset.ttf"
+    source_path = os.path.join("tests", "testfiles", "fonts", test_font_name)
+    with tempfile.TemporaryDirectory() as tmpdirname:
+        journal_path = os.path.join(tmpdirname, "journal.ndjson")
+        dest_paths = []
+        for i in range(3):
+            dest_path = os.path.join(tmpdirname, f"{i}-{test_font_name}")
+            shutil.copyfile(source_path, dest_path)
+            dest_paths.append(dest_path)
+
+        # the journal entry of the second font fails
+        entry_from_result = journal.entry_from_result
+
+        def fail_entry_from_result(result, verified):
+            if result.fontpath == dest_paths[1]:
+                raise OSError("journal stat failed")
+            return entry_from_result(result, verified)
+
+        monkeypatch.setattr(journal, "entry_from_result", fail_entry_from_result)
+        with pytest.raises(SystemExit) as e:
+            __main__.run(
+                ["--weight", "8", "--keep-going", "--journal", journal_path] + dest_paths
+            )
+        captured = capsys.readouterr()
+        assert e.value.code == 1
+        # the fonts after the journal write error are edited and journaled
+        assert TTFont(dest_paths[2])["OS/2"].panose.bWeight == 8
+        assert captured.out.splitlines()[-1] == "2 changed, 0 unchanged, 1 failed"
+        assert (
+            f"   '{dest_paths[1]}' error: journal write failed: journal stat failed"
+        ) in captured.err
+        entries = journal.read_journal(journal_path)
+        assert sorted(entries) == [os.path.abspath(dest_paths[i]) for i in (0, 2)]
+
+        # runs that do not keep going stop at the journal write error
+        with pytest.raises(SystemExit) as e:
+            __main__.run(["--weight", "7", "--journal", journal_path] + dest_paths)
+        assert e.value.code == 1
+        assert TTFont(dest_paths[2])["OS/2"].panose.bWeight == 8
+
+
+def test_run_resume_requires_journal(capsys):
+    with pytest.raises(SystemExit) as e:
+        __main__.run(
+            [
+                "--weight",
+                "8",
+                "--resume",
+                os.path.join(
+                    "tests", "testfiles", "fonts", "NotoSans-Regular.subset.ttf"
+                ),
+            ]
+        )
+    assert e.value.code == 1
+    assert "requires the '--journal' option" in capsys.readouterr().err
+
+
+def test_run_collection_face_index_report(capsys):
+    test_font_name = "NotoSans-Regular.subset.ttf"
+    source_path = os.path.join("tests", "testfiles", "fonts", test_font_name)
+    with tempfile.TemporaryDirectory() as tmpdirname:
+        dest_path = os.path.join(tmpdirname, "collection.ttc")
+        collection = TTCollection()
+        for _ in range(3):
+            tt = TTFont(source_path)
+            tt["OS/2"]
+            collection.fonts.append(tt)
+        collection.save(dest_path, shareTables=True)
+
+        __main__.run(["--weight", "8", "--face-index", "0,2", dest_path])
+        captured = capsys.readouterr()
+        assert f"{dest_path} face 0 panose:" in captured.out
+        assert f"{dest_path} face 1 panose:" not in captured.out
+        assert f"{dest_path} face 2 panose:" in captured.out
+        assert "   OS/2 table shared with faces: 1, 2" in captured.out
+        assert "   OS/2 table shared with faces: 0, 1" in captured.out
+        assert captured.out.splitlines()[-1] == "1 changed, 0 unchanged"
+
+        with pytest.raises(SystemExit) as e:
+            __main__.run(["--weight", "8", "--face-index", "3", dest_path])
+        assert e.value.code == 1
+        assert "face index 3 is out of range" in capsys.readouterr().err
+
+
+def test_run_invalid_face_index(capsys):
+    source_path = os.path.join(
+        "tests", "testfiles", "fonts", "NotoSans-Regular.subset.ttf"
+    )
+    with pytest.raises(SystemExit) as e:
+        __main__.run(["--weight", "8", "--face-index", "0,-1", source_path])
+    assert e.value.code == 2
+    assert "face indexes must be 0 or more" in capsys.readouterr().err
+
+
+def test_run_stream(capsysbinary, monkeypatch):
+    source_path = os.path.join(
+        "tests", "testfiles", "fonts", "NotoSans-Regular.subset.ttf"
+    )
+    with open(source_path, "rb") as f:
+        data = f.read()
+    monkeypatch.setattr(sys, "stdin", io.TextIOWrapper(io.BytesIO(data)))
+
+    __main__.run(["--weight", "8", "--verify", "-"])
+
+    captured = capsysbinary.readouterr()
+    tt = TTFont(io.BytesIO(captured.out))
+    assert tt["OS/2"].panose.bWeight == 8
+    # the report is written to the standard error stream
+    err = captured.err.decode("utf-8")
+    assert "- panose:" in err
+    assert "   Weight: 8" in err
+    assert err.splitlines()[-1] == "1 changed, 0 unchanged"
+    # the source font is not modified
+    assert TTFont(source_path)["OS/2"].panose.bWeight == 5
+
+
+def test_run_stream_dry_run(capsysbinary, monkeypatch):
+    source_path = os.path.join(
+        "tests", "testfiles", "fonts", "NotoSans-Regular.subset.ttf"
+    )
+    with open(source_path, "rb") as f:
+        monkeypatch.setattr(sys, "stdin", io.TextIOWrapper(io.BytesIO(f.read())))
+
+    __main__.run(["--weight", "8", "--dry-run", "-"])
+
+    captured = capsysbinary.readouterr()
+    assert captured.out == b""
+    assert b"(dry run, no fonts were written)" in captured.err
+
+
+@pytest.mark.parametrize(
+    "argv",
+    [
+        ["--weight", "8", "-", "Font.ttf"],
+        ["--weight", "8", "--output-dir", ".", "-"],
+        ["--weight", "8", "--journal", "journal.jsonl", "-"],
+    ],
+)
+def test_run_stream_invalid_arguments(capsys, argv):
+    with pytest.raises(SystemExit) as e:
+        __main__.run(argv)
+    assert e.value.code == 1
+    assert "the '-' path cannot be used" in capsys.readouterr().err
+
+
+def test_run_stream_invalid_font(capsysbinary, monkeypatch):
+    monkeypatch.setattr(sys, "stdin", io.TextIOWrapper(io.BytesIO(b"bogus")))
+    with pytest.raises(SystemExit) as e:
+        __main__.run(["--weight", "8", "-"])
+    assert e.value.code == 1
+    captured = capsysbinary.readouterr()
+    assert captured.out == b""
+    assert b"[ERROR] '-' error:" in captured.err
+
+
+def test_run_infer(capsys):
+    pytest.importorskip("numpy")
+    test_font_name = "NotoSans-Regular.subset.ttf"
+    source_path = os.path.join("tests", "testfiles", "fonts", test_font_name)
+    with tempfile.TemporaryDirectory() as tmpdirname:
+        dest_path = os.path.join(tmpdirname, test_font_name)
+        shutil.copyfile(source_path, dest_path)
+
+        # the inferred Weight (5) and XHeight (4) values are in the font
+        __main__.run(["--infer", dest_path])
+        captured = capsys.readouterr()
+        assert captured.out.splitlines()[-1] == "0 changed, 1 unchanged"
+
+        # panose value options override the inferred values
+        __main__.run(["--infer", "--xheight", "7", dest_path])
+        captured = capsys.readouterr()
+        assert "   Weight: 5" in captured.out
+        assert "   XHeight: 7" in captured.out
+        assert captured.out.splitlines()[-1] == "1 changed, 0 unchanged"
+
+
+def test_run_infer_invalid_arguments(capsys):
+    with pytest.raises(SystemExit) as e:
+        __main__.run(["--infer", "--panose", "2,11,5,2,4,5,4,2,2,4", "Font.ttf"])
+    assert e.value.code == 1
+    assert "the '--infer' option cannot be used" in capsys.readouterr().err
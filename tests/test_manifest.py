@@ -0,0 +1,282 @@
+import os
+import shutil
+import tempfile
+
+import pytest
+
+from panosifier import manifest
+
+
+def get_test_font_path():
+    return os.path.join("tests", "testfiles", "fonts", "NotoSans-Regular.subset.ttf")
+
+
+def write_manifest(dirpath, filename, text):
+    manifest_path = os.path.join(dirpath, filename)
+    with open(manifest_path, "w") as f:
+        f.write(text)
+    return manifest_path
+
+
+def make_fonts(dirpath):
+    fontpaths = []
+    for filename in ("Test-Regular.ttf", "Test-Bold.ttf"):
+        fontpath = os.path.join(dirpath, filename)
+        shutil.copyfile(get_test_font_path(), fontpath)
+        fontpaths.append(fontpath)
+    return fontpaths
+
+
+def test_panose_from_definition():
+    panose = manifest.panose_from_definition(
+        {"path": "a.ttf", "panose": "1,2,3,4,5,6,7,8,9,10"}
+    )
+    assert panose.familytype == 1
+    assert panose.xheight == 10
+
+    panose = manifest.panose_from_definition(
+        {"path": "a.ttf", "panose": [1, 2, 3, 4, 5, 6, 7, 8, 9, 10]}
+    )
+    assert panose.weight == 3
+
+    panose = manifest.panose_from_definition(
+        {"path": "a.ttf", "panose": "", "weight": "8", "xheight": 2}
+    )
+    assert panose.familytype is None
+    assert panose.weight == 8
+    assert panose.xheight == 2
+
+
+@pytest.mark.parametrize(
+    "definition, message",
+    [
+        ({"weight": 8}, "missing 'path'"),
+        ({"path": "a.ttf"}, "at least one panose definition"),
+        ({"path": "a.ttf", "panose": "1,2,3", "weight": 8}, "cannot be used"),
+        ({"path": "a.ttf", "panose": "1,2,3"}, "incorrect number of panose values"),
+        ({"path": "a.ttf", "weight": "bold"}, "must be an integer"),
+        ({"path": "a.ttf", "weight": True}, "must be an integer"),
+        ({"path": "a.ttf", "wieght": 8}, "unsupported manifest key 'wieght'"),
+    ],
+)
+def test_panose_from_definition_invalid(definition, message):
+    with pytest.raises(ValueError) as e:
+        manifest.panose_from_definition(definition)
+    assert message in str(e.value)
+
+
+def test_read_manifest_csv():
+    with tempfile.TemporaryDirectory() as tmpdirname:
+        manifest_path = write_manifest(
+            tmpdirname,
+            "manifest.csv",
+            'path,panose,weight\n*-Regular.ttf,"1,2,3,4,5,6,7,8,9,10",\n'
+            "*-Bold.ttf,,8\n",
+        )
+        entries = manifest.read_manifest(manifest_path)
+        assert [entry.path for entry in entries] == [
+            os.path.join(tmpdirname, "*-Regular.ttf"),
+            os.path.join(tmpdirname, "*-Bold.ttf"),
+        ]
+        assert [entry.lineno for entry in entries] == [2, 3]
+        assert entries[0].panose.familytype == 1
+        assert entries[1].panose.weight == 8
+
+
+def test_read_manifest_json():
+    with tempfile.TemporaryDirectory() as tmpdirname:
+        manifest_path = write_manifest(
+            tmpdirname,
+            "manifest.json",
+            "[\n"
+            '  {"path": "*-Regular.ttf",\n'
+            '   "panose": [1, 2, 3, 4, 5, 6, 7, 8, 9, 10]},\n'
+            '  {"path": "*-Bold.ttf", "weight": 8}\n'
+            "]\n",
+        )
+        entries = manifest.read_manifest(manifest_path)
+        assert [entry.lineno for entry in entries] == [2, 4]
+        assert entries[0].panose.xheight == 10
+        assert entries[1].panose.weight == 8
+
+
+def test_read_manifest_toml():
+    with tempfile.TemporaryDirectory() as tmpdirname:
+        manifest_path = write_manifest(
+            tmpdirname,
+            "manifest.toml",
+            "# family manifest\n"
+            "[[fonts]]\n"
+            'path = "*-Regular.ttf"\n'
+            'panose = "1,2,3,4,5,6,7,8,9,10"\n'
+            "\n"
+            "[[fonts]]\n"
+            'path = "*-Bold.ttf"\n'
+            "weight = 8\n",
+        )
+        try:
+            entries = manifest.read_manifest(manifest_path)
+        except ValueError as e:
+            if "tomli" in str(e):
+                pytest.skip("TOML parser is not available")
+            raise
+        assert [entry.lineno for entry in entries] == [2, 6]
+        assert entries[0].panose.midline == 9
+        assert entries[1].panose.weight == 8
+
+
+@pytest.mark.parametrize(
+    "text, linenos",
+    [
+        ('[[fonts]]  # bold faces\npath = "a.ttf"\nweight = 8\n', [1]),
+        (
+            '[[ fonts ]]\npath = "a.ttf"\nweight = 8\n\n  [["fonts"]]\npath = "b.ttf"\nweight = 5\n',
+            [1, 5],
+        ),
+        (
+            'fonts = [{path = "a.ttf", weight = 8}, {path = "b.ttf", weight = 5}]\n',
+            [1, 1],
+        ),
+        (
+            "fonts = [\n"
+            '  {path = "a.ttf", weight = 8},  # regular, {\n'
+            '  {path = "b]\\",{.ttf", weight = 5},\n'
+            "]\n",
+            [2, 3],
+        ),
+    ],
+)
+def test_read_manifest_toml_tables(text, linenos):
+    with tempfile.TemporaryDirectory() as tmpdirname:
+        manifest_path = write_manifest(tmpdirname, "manifest.toml", text)
+        try:
+            entries = manifest.read_manifest(manifest_path)
+        except ValueError as e:
+            if "tomli" in str(e):
+                pytest.skip("TOML parser is not available")
+            raise
+        assert [entry.lineno for entry in entries] == linenos
+        assert entries[0].path == os.path.join(tmpdirname, "a.ttf")
+
+
+@pytest.mark.parametrize(
+    "filename, text, lineno",
+    [
+        ("manifest.csv", "path,weight\na.ttf,8\nb.ttf,bold\n", 3),
+        ("manifest.csv", "path,weight\na.ttf,8,9\n", 2),
+        ("manifest.json", '[\n{"path": "a.ttf", "weight": 8},\n{"path": "b.ttf"}\n]', 3),
+        ("manifest.json", '[\n{"path": "a.ttf", "weight": 8}\n{"path": "b.ttf"}\n]', 3),
+        ("manifest.json", '[\n{"path": "a.ttf", "weight": 8,}\n]', 2),
+        ("manifest.json", '{"path": "a.ttf", "weight": 8}', 1),
+    ],
+)
+def test_read_manifest_errors_report_line_numbers(filename, text, lineno):
+    with tempfile.TemporaryDirectory() as tmpdirname:
+        manifest_path = write_manifest(tmpdirname, filename, text)
+        with pytest.raises(manifest.ManifestError) as e:
+            manifest.read_manifest(manifest_path)
+        assert e.value.lineno == lineno
+        assert str(e.value).startswith(f"{manifest_path}:{lineno}: ")
+
+
+def test_read_manifest_toml_errors_report_line_numbers():
+    with tempfile.TemporaryDirectory() as tmpdirname:
+        manifest_path = write_manifest(
+            tmpdirname,
+            "manifest.toml",
+            "[[fonts]]\n"
+            'path = """a.ttf\n'
+            "[[fonts]]\n"
+            '"""\n'
+            "weight = 8\n"
+            "\n"
+            "[[fonts]]\n"
+            'path = "b.ttf"\n'
+            'weight = "bold"\n',
+        )
+        try:
+            with pytest.raises(manifest.ManifestError) as e:
+                manifest.read_manifest(manifest_path)
+        except ValueError as e:
+            if "tomli" in str(e):
+                pytest.skip("TOML parser is not available")
+            raise
+        assert e.value.lineno == 7
+
+        manifest_path = write_manifest(
+            tmpdirname,
+            "manifest.toml",
+            'fonts = [\n  {path = "a.ttf", weight = 8},\n  {path = "b.ttf"},\n]\n',
+        )
+        with pytest.raises(manifest.ManifestError) as e:
+            manifest.read_manifest(manifest_path)
+        assert e.value.lineno == 3
+
+
+def test_manifest_error_unknown_line():
+    e = manifest.ManifestError("manifest.toml", None, "entries must be objects")
+    assert e.lineno is None
+    assert str(e) == "manifest.toml: entries must be objects (line unknown)"
+
+
+def test_read_manifest_unsupported_format():
+    with pytest.raises(ValueError) as e:
+        manifest.read_manifest("manifest.yaml")
+    assert "unsupported manifest format" in str(e.value)
+
+
+def test_build_manifest_plan():
+    with tempfile.TemporaryDirectory() as tmpdirname:
+        regular_path, bold_path = make_fonts(tmpdirname)
+        manifest_path = write_manifest(
+            tmpdirname, "manifest.csv", "path,weight\n*-Regular.ttf,5\n*-Bold.ttf,8\n"
+        )
+        entries = manifest.read_manifest(manifest_path)
+        plan = manifest.build_manifest_plan(manifest_path, entries)
+        assert [(fontpath, panose.weight) for fontpath, panose in plan] == [
+            (regular_path, 5),
+            (bold_path, 8),
+        ]
+
+
+def test_build_manifest_plan_errors():
+    with tempfile.TemporaryDirectory() as tmpdirname:
+        make_fonts(tmpdirname)
+        manifest_path = write_manifest(
+            tmpdirname, "manifest.csv", "path,weight\n*.ttf,5\n*-Bold.ttf,8\n"
+        )
+        entries = manifest.read_manifest(manifest_path)
+        with pytest.raises(manifest.ManifestError) as e:
+            manifest.build_manifest_plan(manifest_path, entries)
+        assert e.value.lineno == 3
+        assert "is also defined on line 2" in str(e.value)
+
+        manifest_path = write_manifest(
+            tmpdirname, "manifest.csv", "path,weight\n*-Italic.ttf,5\n"
+        )
+        entries = manifest.read_manifest(manifest_path)
+        with pytest.raises(manifest.ManifestError) as e:
+            manifest.build_manifest_plan(manifest_path, entries)
+        assert e.value.lineno == 2
+        assert "did not match any paths" in str(e.value)
+
+
+def test_build_manifest_plan_symlinked_duplicate():
+    with tempfile.TemporaryDirectory() as tmpdirname:
+        fontdir = os.path.join(tmpdirname, "fonts")
+        os.mkdir(fontdir)
+        make_fonts(fontdir)
+        try:
+            os.symlink(fontdir, os.path.join(tmpdirname, "link"))
+        except (OSError, NotImplementedError):
+            pytest.skip("symlinks are not supported")
+        manifest_path = write_manifest(
+            tmpdirname,
+            "manifest.csv",
+            "path,weight\nfonts/Test-Bold.ttf,8\nlink/Test-Bold.ttf,5\n",
+        )
+        entries = manifest.read_manifest(manifest_path)
+        with pytest.raises(manifest.ManifestError) as e:
+            manifest.build_manifest_plan(manifest_path, entries)
+        assert e.value.lineno == 3
+        assert "is also defined on line 2" in str(e.value)
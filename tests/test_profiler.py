@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+
+import json
+import os
+import tempfile
+
+from tests import profiler
+
+
+def _results(phases):
+    return {"fonts": {"small-latin-ttf": {"file_size": 1, "phases": phases}}}
+
+
+def test_run_benchmarks_all_fonts_and_phases():
+    results = profiler.run_benchmarks(repeat=1, glyph_scale=0.01)
+    assert set(results["fonts"]) == {name for name, _, _ in profiler.FONTS}
+    for name, font_results in results["fonts"].items():
+        assert font_results["file_size"] > 0
+        for phase in profiler.PHASES:
+            if phase != "edit":
+                assert font_results["phases"][phase] >= 0
+    # results are JSON serializable
+    json.dumps(results)
+
+
+def test_compare_results():
+    baseline = _results({"load": 0.010, "save": 0.010, "report": 0.0001})
+    current = _results({"load": 0.0105, "save": 0.020, "report": 0.0003})
+    regressions = profiler.compare_results(baseline, current, threshold=10)
+    # the report phase difference is below the minimum delta
+    assert regressions == [("small-latin-ttf", "save", 0.010, 0.020)]
+    assert profiler.compare_results(baseline, current, threshold=200) == []
+
+
+def test_main_compare_exit_status(capsys):
+    with tempfile.TemporaryDirectory() as tmpdirname:
+        baseline_path = os.path.join(tmpdirname, "baseline.json")
+        current_path = os.path.join(tmpdirname, "current.json")
+        with open(baseline_path, "w") as f:
+            json.dump(_results({"save": 0.010}), f)
+        with open(current_path, "w") as f:
+            json.dump(_results({"save": 0.020}), f)
+
+        assert profiler.main(["compare", baseline_path, baseline_path]) == 0
+        assert profiler.main(["compare", baseline_path, current_path]) == 1
+        assert "[REGRESSION] small-latin-ttf save" in capsys.readouterr().out
@@ -0,0 +1,122 @@
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+import pytest
+from fontTools.ttLib import TTCollection, TTFont
+
+from panosifier import __main__, query
+
+
+def get_test_font_path():
+    return os.path.join("tests", "testfiles", "fonts", "NotoSans-Regular.subset.ttf")
+
+
+def test_query_font():
+    records = query.query_font(get_test_font_path())
+    assert records == [
+        {
+            "path": get_test_font_path(),
+            "face": None,
+            "familytype": 2,
+            "serifstyle": 11,
+            "weight": 5,
+            "proportion": 2,
+            "contrast": 4,
+            "strokevar": 5,
+            "armstyle": 4,
+            "letterform": 2,
+            "midline": 2,
+            "xheight": 4,
+            "error": None,
+        }
+    ]
+
+
+@pytest.mark.parametrize("flavor", ["woff", "woff2"])
+def test_query_font_woff(flavor):
+    if flavor == "woff2":
+        pytest.importorskip("brotli")
+    with tempfile.TemporaryDirectory() as tmpdirname:
+        fontpath = os.path.join(tmpdirname, f"NotoSans-Regular.{flavor}")
+        tt = TTFont(get_test_font_path())
+        tt["OS/2"].panose.bWeight = 8
+        tt.flavor = flavor
+        tt.save(fontpath)
+        records = query.query_font(fontpath)
+        assert len(records) == 1
+        assert records[0]["error"] is None
+        assert records[0]["face"] is None
+        assert records[0]["weight"] == 8
+
+
+def test_query_font_collection():
+    with tempfile.TemporaryDirectory() as tmpdirname:
+        fontpath = os.path.join(tmpdirname, "NotoSans.ttc")
+        collection = TTCollection()
+        for weight in (5, 5, 8):
+            tt = TTFont(get_test_font_path())
+            tt["OS/2"].panose.bWeight = weight
+            collection.fonts.append(tt)
+        collection.save(fontpath, shareTables=True)
+        records = query.query_font(fontpath)
+        assert [record["path"] for record in records] == [fontpath] * 3
+        assert [record["face"] for record in records] == [0, 1, 2]
+        assert [record["weight"] for record in records] == [5, 5, 8]
+        assert all(record["error"] is None for record in records)
+
+
+def test_query_font_invalid_font():
+    records = query.query_font(os.path.join("tests", "testfiles", "fonts", "README.md"))
+    assert len(records) == 1
+    record = records[0]
+    assert record["weight"] is None
+    assert "unsupported sfnt version" in record["error"]
+
+
+def test_run_query_ndjson(capsys):
+    __main__.run(["query", os.path.join("tests", "testfiles", "fonts")])
+    captured = capsys.readouterr()
+    lines = captured.out.splitlines()
+    assert len(lines) == 1
+    assert [json.loads(line) for line in lines] == query.query_font(get_test_font_path())
+
+
+def test_run_query_csv(capsys):
+    __main__.run(["query", "--format", "csv", get_test_font_path()])
+    captured = capsys.readouterr()
+    assert captured.out.splitlines() == [
+        "path,face,familytype,serifstyle,weight,proportion,contrast,strokevar,armstyle,"
+        "letterform,midline,xheight,error",
+        f"{get_test_font_path()},,2,11,5,2,4,5,4,2,2,4,",
+    ]
+
+
+def test_run_query_exit_status_with_errors(capsys):
+    argv = ["query", get_test_font_path(), os.path.join("tests", "testfiles", "fonts")]
+    argv.append(os.path.join("tests", "testfiles", "fonts", "README.md"))
+    with pytest.raises(SystemExit) as e:
+        __main__.run(argv)
+
+    captured = capsys.readouterr()
+    assert e.value.code == 1
+    assert len(captured.out.splitlines()) == 3
+
+    with pytest.raises(SystemExit) as e:
+        __main__.run(["query", "bogus.ttf"])
+
+    captured = capsys.readouterr()
+    assert e.value.code == 1
+    assert "[ERROR]" in captured.err
+
+
+def test_run_query_does_not_import_fonttools():
+    code = (
+        "import sys\n"
+        "from panosifier.__main__ import run\n"
+        f"run(['query', {get_test_font_path()!r}])\n"
+        "assert 'fontTools' not in sys.modules\n"
+    )
+    subprocess.run([sys.executable, "-c", code], check=True, stdout=subprocess.DEVNULL)
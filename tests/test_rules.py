@@ -0,0 +1,371 @@
+import os
+import shutil
+import tempfile
+
+import pytest
+from fontTools.ttLib import TTCollection, TTFont
+
+from panosifier import __main__
+from panosifier.datastructures import Panose
+from panosifier.edit import EditResult
+from panosifier.manifest import ManifestError
+from panosifier.rules import (
+    Rule,
+    RuleMatcher,
+    compile_condition,
+    iter_rule_edits,
+    read_rules,
+)
+from panosifier.sfnt import get_os2_panose_bytes
+from panosifier.woff import read_font_tables
+
+TEST_FONT_PATH = os.path.join(
+    "tests", "testfiles", "fonts", "NotoSans-Regular.subset.ttf"
+)
+TEST_FONT_PANOSE = [2, 11, 5, 2, 4, 5, 4, 2, 2, 4]
+
+
+def read_panose_list(fontpath):
+    with open(fontpath, "rb") as f:
+        return list(get_os2_panose_bytes(read_font_tables(f, ["OS/2"])["OS/2"]))
+
+
+def write_rules(dirpath, filename, text):
+    rules_path = os.path.join(dirpath, filename)
+    with open(rules_path, "w") as f:
+        f.write(text)
+    return rules_path
+
+
+@pytest.mark.parametrize(
+    "key, value, field, expected",
+    [
+        ("path", "*/sans/*.ttf", os.path.join("fonts", "sans", "A.ttf"), True),
+        ("path", "*/sans/*.ttf", os.path.join("fonts", "serif", "A.ttf"), False),
+        ("name.2", "(?i)^bold", "Bold Italic", True),
+        ("name.2", "(?i)^bold", "Regular", False),
+        ("name.2", "Bold", None, False),
+        ("OS/2.usWeightClass", 700, 700, True),
+        ("OS/2.usWeightClass", [600, 700], 600, True),
+        ("OS/2.usWeightClass", ">= 600", 500, False),
+        ("OS/2.usWeightClass", "< 600", 500, True),
+        ("OS/2.usWeightClass", ">= 600", None, False),
+        ("OS/2.fsSelection", "& 0x01", 0x41, True),
+        ("OS/2.fsSelection", "& 0x01", 0x40, False),
+        ("OS/2.achVendID", "^GOOG$", "GOOG", True),
+        ("post.isFixedPitch", True, 1, True),
+        ("post.isFixedPitch", True, 0, False),
+        ("post.italicAngle", "!= 0", -12.5, True),
+    ],
+)
+def test_compile_condition(key, value, field, expected):
+    assert compile_condition(key, value)(field) is expected
+
+
+@pytest.mark.parametrize(
+    "key, value",
+    [
+        ("bogus", 1),
+        ("OS/2.bogus", 1),
+        ("head.unitsPerEm", 1000),
+        ("name.family", "Sans"),
+        ("name.1", 1),
+        ("name.1", "("),
+        ("OS/2.usWeightClass", "bold"),
+        ("OS/2.usWeightClass", ">= bold"),
+        ("OS/2.fsSelection", "& 0.5"),
+        ("OS/2.usWeightClass", [400, "bold"]),
+        ("OS/2.usWeightClass", {"min": 400}),
+    ],
+)
+def test_compile_condition_invalid(key, value):
+    with pytest.raises(ValueError):
+        compile_condition(key, value)
+
+
+def test_rule_matcher():
+    rules = [
+        Rule((), Panose(familytype=2), 1),
+        Rule((("OS/2.usWeightClass", ">= 600"),), Panose(weight=8), 2),
+        Rule(
+            (("OS/2.usWeightClass", ">= 600"), ("name.2", "Italic")),
+            Panose(weight=9, letterform=9),
+            3,
+        ),
+    ]
+    matcher = RuleMatcher(rules)
+    # the repeated condition is compiled once
+    assert len(matcher.predicates) == 2
+    assert matcher.tables == ["OS/2", "name"]
+    assert matcher.name_ids == [2]
+
+    panose = matcher.match({"OS/2.usWeightClass": 400, "name.2": "Italic"})
+    assert panose == Panose(familytype=2)
+    panose = matcher.match({"OS/2.usWeightClass": 700, "name.2": "Regular"})
+    assert panose == Panose(familytype=2, weight=8)
+    # later rules override earlier rules
+    panose = matcher.match({"OS/2.usWeightClass": 700, "name.2": "Bold Italic"})
+    assert panose == Panose(familytype=2, weight=9, letterform=9)
+
+
+def test_rule_matcher_read_font_metadata():
+    matcher = RuleMatcher(
+        [
+            Rule(
+                (
+                    ("name.1", "Noto"),
+                    ("name.2", "Regular"),
+                    ("OS/2.usWeightClass", 400),
+                    ("OS/2.achVendID", "GOOG"),
+                    ("post.isFixedPitch", False),
+                ),
+                Panose(weight=5),
+                1,
+            )
+        ]
+    )
+    metadata = matcher.read_font_metadata(TEST_FONT_PATH)
+    assert metadata["name.1"] == "Noto Sans"
+    assert metadata["name.2"] == "Regular"
+    assert metadata["OS/2.usWeightClass"] == 400
+    assert metadata["OS/2.achVendID"] == "GOOG"
+    assert metadata["post.isFixedPitch"] == 0
+    assert matcher.match(metadata) == Panose(weight=5)
+
+    # path conditions do not read the font file
+    matcher = RuleMatcher([Rule((("path", "*.ttf"),), Panose(weight=5), 1)])
+    assert matcher.tables == []
+    metadata = matcher.read_font_metadata("missing.ttf")
+    assert metadata == {"path": "missing.ttf"}
+
+
+def test_read_rules_json():
+    with tempfile.TemporaryDirectory() as tmpdirname:
+        rules_path = write_rules(
+            tmpdirname,
+            "rules.json",
+            "[\n"
+            '    {"panose": "2,11,5,2,4,5,4,2,2,4"},\n'
+            '    {"when": {"name.2": "Bold"}, "weight": 8}\n'
+            "]\n",
+        )
+        rules = read_rules(rules_path)
+        assert len(rules) == 2
+        assert rules[0].conditions == ()
+        assert list(rules[0].panose.to_bytes()) == TEST_FONT_PANOSE
+        assert rules[1].conditions == (("name.2", "Bold"),)
+        assert rules[1].panose == Panose(weight=8)
+        assert rules[1].lineno == 3
+
+
+def test_read_rules_toml():
+    with tempfile.TemporaryDirectory() as tmpdirname:
+        rules_path = write_rules(
+            tmpdirname,
+            "rules.toml",
+            "[[rules]]\n"
+            'when = { "OS/2.usWeightClass" = ">= 600", "path" = "*/sans/*" }\n'
+            "weight = 8\n"
+            "\n"
+            "[[rules]]\n"
+            "proportion = 9\n",
+        )
+        try:
+            rules = read_rules(rules_path)
+        except ValueError as e:
+            if "tomli" in str(e):
+                pytest.skip("TOML parser is not available")
+            raise
+        assert len(rules) == 2
+        assert dict(rules[0].conditions) == {
+            "OS/2.usWeightClass": ">= 600",
+            "path": "*/sans/*",
+        }
+        assert rules[0].panose == Panose(weight=8)
+        assert rules[1].panose == Panose(proportion=9)
+        assert rules[1].lineno == 5
+
+
+def test_read_rules_toml_tables():
+    with tempfile.TemporaryDirectory() as tmpdirname:
+        rules_path = write_rules(
+            tmpdirname,
+            "rules.toml",
+            "[[ rules ]]  # all fonts\n"
+            "familytype = 2\n"
+            "\n"
+            '[[rules]] # bold faces\nwhen = { "name.2" = "Bold" }\nweight = 8\n',
+        )
+        try:
+            rules = read_rules(rules_path)
+        except ValueError as e:
+            if "tomli" in str(e):
+                pytest.skip("TOML parser is not available")
+            raise
+        assert [rule.lineno for rule in rules] == [1, 4]
+
+        rules_path = write_rules(
+            tmpdirname, "rules.toml", "rules = [{weight = 8}, {proportion = 9}]\n"
+        )
+        rules = read_rules(rules_path)
+        assert [rule.panose for rule in rules] == [Panose(weight=8), Panose(proportion=9)]
+        assert [rule.lineno for rule in rules] == [1, 1]
+
+
+@pytest.mark.parametrize(
+    "text, lineno, message",
+    [
+        ('[\n  {"weight": 8},\n  {"when": {"bogus": 1}, "weight": 8}\n]\n', 3, "bogus"),
+        ('[\n  {"when": {"name.2": "Bold"}, "weight": "bold"}\n]\n', 2, "weight"),
+        ('[\n  {"when": {"name.2": "Bold"}}\n]\n', 2, ""),
+        ('[\n  {"weight": 8, "bogus": 1}\n]\n', 2, "'bogus'"),
+        ('[\n  {"when": [], "weight": 8}\n]\n', 2, "'when'"),
+        ("[]\n", 1, "does not define any rules"),
+    ],
+)
+def test_read_rules_invalid(text, lineno, message):
+    with tempfile.TemporaryDirectory() as tmpdirname:
+        rules_path = write_rules(tmpdirname, "rules.json", text)
+        with pytest.raises(ManifestError) as e:
+            read_rules(rules_path)
+        assert e.value.lineno == lineno
+        assert message in str(e.value)
+
+
+def test_read_rules_unsupported_format():
+    with pytest.raises(ValueError, match="unsupported rules format"):
+        read_rules("rules.yaml")
+
+
+def test_iter_rule_edits():
+    matcher = RuleMatcher(
+        [
+            Rule((("OS/2.usWeightClass", 400),), Panose(weight=6), 1),
+            Rule((("path", "*Bold*"),), Panose(weight=8), 2),
+        ]
+    )
+    with tempfile.TemporaryDirectory() as tmpdirname:
+        bogus_path = os.path.join(tmpdirname, "Bogus.ttf")
+        with open(bogus_path, "wb") as f:
+            f.write(b"bogus font data")
+        skipped = EditResult("skipped.ttf", None, False, "skipped")
+        edits = [
+            (TEST_FONT_PATH, Panose()),
+            skipped,
+            (bogus_path, Panose()),
+        ]
+        results = list(iter_rule_edits(edits, matcher, Panose(familytype=3)))
+        assert results[0] == (TEST_FONT_PATH, Panose(familytype=3, weight=6))
+        assert results[1] is skipped
+        assert isinstance(results[2], EditResult)
+        assert results[2].fontpath == bogus_path
+        assert "rules evaluation failed" in results[2].error
+
+
+def test_main_rules(capsys):
+    with tempfile.TemporaryDirectory() as tmpdirname:
+        fontdir = os.path.join(tmpdirname, "fonts")
+        os.makedirs(fontdir)
+        regular_path = os.path.join(fontdir, "NotoSans-Regular.ttf")
+        bold_path = os.path.join(fontdir, "NotoSans-Bold.ttf")
+        shutil.copyfile(TEST_FONT_PATH, regular_path)
+        shutil.copyfile(TEST_FONT_PATH, bold_path)
+        rules_path = write_rules(
+            tmpdirname,
+            "rules.json",
+            "[\n"
+            '    {"when": {"name.1": "^Noto Sans$"}, "serifstyle": 12},\n'
+            '    {"when": {"path": "*-Bold.ttf"}, "weight": 8}\n'
+            "]\n",
+        )
+        __main__.run(["--rules", rules_path, "--familytype", "3", fontdir])
+        captured = capsys.readouterr()
+        assert "[ERROR]" not in captured.err
+
+        assert read_panose_list(regular_path) == [3, 12, 5, 2, 4, 5, 4, 2, 2, 4]
+        assert read_panose_list(bold_path) == [3, 12, 8, 2, 4, 5, 4, 2, 2, 4]
+
+
+def write_collection(fontpath, weight_classes):
+    collection = TTCollection()
+    for weight_class in weight_classes:
+        tt = TTFont(TEST_FONT_PATH)
+        tt["OS/2"].usWeightClass = weight_class
+        collection.fonts.append(tt)
+    collection.save(fontpath)
+
+
+def get_collection_weights(fontpath):
+    return [tt["OS/2"].panose.bWeight for tt in TTCollection(fontpath).fonts]
+
+
+def test_main_rules_collection(capsys):
+    with tempfile.TemporaryDirectory() as tmpdirname:
+        rules_path = write_rules(
+            tmpdirname,
+            "rules.json",
+            "[\n"
+            '    {"when": {"name.1": "^Noto Sans$"}, "serifstyle": 12},\n'
+            '    {"when": {"OS/2.usWeightClass": ">= 600"}, "weight": 8}\n'
+            "]\n",
+        )
+        # faces that match the same definitions are edited
+        regular_path = os.path.join(tmpdirname, "Regular.ttc")
+        write_collection(regular_path, [400, 400])
+        __main__.run(["--rules", rules_path, regular_path])
+        captured = capsys.readouterr()
+        assert "[ERROR]" not in captured.err
+        assert [tt["OS/2"].panose.bSerifStyle for tt in TTCollection(regular_path)] == [
+            12,
+            12,
+        ]
+
+        # faces that match different definitions are not edited
+        mixed_path = os.path.join(tmpdirname, "Mixed.ttc")
+        write_collection(mixed_path, [400, 700])
+        with pytest.raises(SystemExit) as e:
+            __main__.run(["--rules", rules_path, mixed_path])
+        captured = capsys.readouterr()
+        assert e.value.code == 1
+        assert "faces match different panose definitions" in captured.err
+        assert get_collection_weights(mixed_path) == [5, 5]
+
+        # the rules are evaluated for the edited faces only
+        __main__.run(["--rules", rules_path, "--face-index", "1", mixed_path])
+        captured = capsys.readouterr()
+        assert "[ERROR]" not in captured.err
+        assert get_collection_weights(mixed_path) == [5, 8]
+
+
+def test_main_rules_no_matches_unchanged(capsys):
+    with tempfile.TemporaryDirectory() as tmpdirname:
+        fontpath = os.path.join(tmpdirname, "NotoSans-Regular.ttf")
+        shutil.copyfile(TEST_FONT_PATH, fontpath)
+        rules_path = write_rules(
+            tmpdirname, "rules.json", '[{"when": {"name.2": "Bold"}, "weight": 8}]'
+        )
+        with open(fontpath, "rb") as f:
+            original = f.read()
+        __main__.run(["--rules", rules_path, fontpath])
+        with open(fontpath, "rb") as f:
+            assert f.read() == original
+
+
+def test_main_rules_errors(capsys):
+    with tempfile.TemporaryDirectory() as tmpdirname:
+        fontpath = os.path.join(tmpdirname, "NotoSans-Regular.ttf")
+        shutil.copyfile(TEST_FONT_PATH, fontpath)
+        rules_path = write_rules(
+            tmpdirname, "rules.json", '[\n  {"when": {"bogus": 1}, "weight": 8}\n]\n'
+        )
+        with pytest.raises(SystemExit) as e:
+            __main__.run(["--rules", rules_path, fontpath])
+        captured = capsys.readouterr()
+        assert e.value.code == 1
+        assert f"{rules_path}:2" in captured.err
+
+        with pytest.raises(SystemExit) as e:
+            __main__.run(["--rules", rules_path, "--infer", fontpath])
+        captured = capsys.readouterr()
+        assert e.value.code == 1
+        assert "'--rules'" in captured.err
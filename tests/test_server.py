@@ -0,0 +1,344 @@
+#!/usr/bin/env python3
+
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import pytest
+from fontTools.ttLib import TTFont
+
+from panosifier import __main__, server
+
+TEST_FONT_NAME = "NotoSans-Regular.subset.ttf"
+
+
+def get_test_font_path():
+    return os.path.join("tests", "testfiles", "fonts", TEST_FONT_NAME)
+
+
+def test_handle_run_with_cwd():
+    with tempfile.TemporaryDirectory() as tmpdirname:
+        shutil.copyfile(get_test_font_path(), os.path.join(tmpdirname, TEST_FONT_NAME))
+        panosifier_server = server.PanosifierServer(os.path.join(tmpdirname, "s"))
+        cwd = os.getcwd()
+
+        response = panosifier_server.handle(
+            {
+                "command": "run",
+                "argv": ["--weight", "8", TEST_FONT_NAME],
+                "cwd": tmpdirname,
+            }
+        )
+
+        assert os.getcwd() == cwd
+        assert response["exit_code"] == 0
+        assert response["stdout"].startswith(f"{TEST_FONT_NAME} panose:")
+        assert response["stderr"] == ""
+        font_path = os.path.join(tmpdirname, TEST_FONT_NAME)
+        assert TTFont(font_path)["OS/2"].panose.bWeight == 8
+
+
+def test_handle_run_exit_code():
+    panosifier_server = server.PanosifierServer("s")
+    response = panosifier_server.handle({"command": "run", "argv": ["bogus.ttf"]})
+    assert response["exit_code"] == 1
+    assert "[ERROR]" in response["stderr"]
+
+    response = panosifier_server.handle({"command": "run", "argv": ["--version"]})
+    assert response["exit_code"] == 0
+    assert response["stdout"].startswith("panosifier v")
+
+
+def test_handle_edit_and_query():
+    with tempfile.TemporaryDirectory() as tmpdirname:
+        dest_path = os.path.join(tmpdirname, TEST_FONT_NAME)
+        shutil.copyfile(get_test_font_path(), dest_path)
+        panosifier_server = server.PanosifierServer(os.path.join(tmpdirname, "s"))
+
+        response = panosifier_server.handle(
+            {"command": "edit", "paths": [tmpdirname], "weight": 8}
+        )
+        assert response == {
+            "results": [
+                {
+                    "path": dest_path,
+                    "panose": [2, 11, 8, 2, 4, 5, 4, 2, 2, 4],
+                    "changed": True,
+                    "cached": False,
+                    "error": None,
+                    "faces": [],
+                }
+            ]
+        }
+
+        response = panosifier_server.handle({"command": "query", "paths": [dest_path]})
+        assert response["results"][0]["weight"] == 8
+
+
+@pytest.mark.parametrize(
+    "message",
+    [
+        {"command": "bogus"},
+        {"command": "edit", "paths": [get_test_font_path()]},
+        {"command": "run", "argv": ["serve"]},
+        {"command": "run", "argv": ["--weight", "8", "-"]},
+    ],
+)
+def test_handle_errors(message):
+    response = server.PanosifierServer("s").handle(message)
+    assert "error" in response
+
+
+def test_serve_forever_and_forward_run(capsys):
+    with tempfile.TemporaryDirectory() as tmpdirname:
+        socket_path = os.path.join(tmpdirname, "panosifier.sock")
+        dest_path = os.path.join(tmpdirname, TEST_FONT_NAME)
+        shutil.copyfile(get_test_font_path(), dest_path)
+        # a server is not running
+        assert server.forward_run(["--weight", "8", dest_path], socket_path) is None
+
+        panosifier_server = server.PanosifierServer(socket_path)
+        thread = threading.Thread(target=panosifier_server.serve_forever)
+        thread.start()
+        try:
+            for _ in range(100):
+                if os.path.exists(socket_path):
+                    break
+                time.sleep(0.05)
+            assert server.request({"command": "ping"}, socket_path) == {"protocol": 1}
+
+            exit_code = server.forward_run(["--weight", "8", dest_path], socket_path)
+            assert exit_code == 0
+            captured = capsys.readouterr()
+            assert captured.out.splitlines()[-1] == "1 changed, 0 unchanged"
+        finally:
+            server.request({"command": "shutdown"}, socket_path)
+            thread.join()
+        assert not os.path.exists(socket_path)
+
+
+def test_serve_forever_stalled_client():
+    with tempfile.TemporaryDirectory() as tmpdirname:
+        socket_path = os.path.join(tmpdirname, "panosifier.sock")
+        panosifier_server = server.PanosifierServer(socket_path, connection_timeout=0.2)
+        thread = threading.Thread(target=panosifier_server.serve_forever)
+        thread.start()
+        try:
+            for _ in range(100):
+                if os.path.exists(socket_path):
+                    break
+                time.sleep(0.05)
+            # a client that connects and never writes a request
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as stalled_sock:
+                stalled_sock.settimeout(10.0)
+                stalled_sock.connect(socket_path)
+                # a partial request line
+                with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as partial_sock:
+                    partial_sock.settimeout(10.0)
+                    partial_sock.connect(socket_path)
+                    partial_sock.sendall(b'{"command": ')
+                    response = server.request(
+                        {"command": "ping"}, socket_path, timeout=10.0
+                    )
+                    assert response == {"protocol": 1}
+                    assert "timed out" in server.read_message(partial_sock)["error"]
+                assert "timed out" in server.read_message(stalled_sock)["error"]
+        finally:
+            server.request({"command": "shutdown"}, socket_path, timeout=10.0)
+            thread.join()
+
+
+def test_get_default_socket_path(monkeypatch):
+    with tempfile.TemporaryDirectory() as tmpdirname:
+        monkeypatch.delenv("PANOSIFIER_SOCKET", raising=False)
+        monkeypatch.setenv("XDG_RUNTIME_DIR", tmpdirname)
+        assert server.get_default_socket_path() == os.path.join(
+            tmpdirname, "panosifier.sock"
+        )
+        monkeypatch.delenv("XDG_RUNTIME_DIR")
+        assert server.get_default_socket_path() == os.path.join(
+            tempfile.gettempdir(), f"panosifier-{os.getuid()}", "panosifier.sock"
+        )
+        monkeypatch.setenv("PANOSIFIER_SOCKET", "custom.sock")
+        assert server.get_default_socket_path() == "custom.sock"
+
+
+def test_make_socket_directory(monkeypatch):
+    with tempfile.TemporaryDirectory() as tmpdirname:
+        socket_dir = os.path.join(tmpdirname, "sockets")
+        server.make_socket_directory(os.path.join(socket_dir, "panosifier.sock"))
+        assert os.stat(socket_dir).st_mode & 0o777 == 0o700
+
+        # the default socket directory must not be accessible by other users
+        os.chmod(tmpdirname, 0o755)
+        monkeypatch.setenv("XDG_RUNTIME_DIR", tmpdirname)
+        with pytest.raises(ValueError, match="other users"):
+            server.make_socket_directory(os.path.join(tmpdirname, "panosifier.sock"))
+
+
+def test_serve_forever_socket_permissions():
+    with tempfile.TemporaryDirectory() as tmpdirname:
+        socket_path = os.path.join(tmpdirname, "sockets", "panosifier.sock")
+        panosifier_server = server.PanosifierServer(socket_path)
+        thread = threading.Thread(target=panosifier_server.serve_forever)
+        thread.start()
+        try:
+            for _ in range(100):
+                if os.path.exists(socket_path):
+                    break
+                time.sleep(0.05)
+            assert os.stat(socket_path).st_mode & 0o777 == 0o600
+            assert os.stat(os.path.dirname(socket_path)).st_mode & 0o777 == 0o700
+            assert server.is_user_socket(socket_path)
+        finally:
+            server.request({"command": "shutdown"}, socket_path)
+            thread.join()
+
+
+def test_forward_run_other_user_socket(capsys, monkeypatch):
+    with tempfile.TemporaryDirectory() as tmpdirname:
+        socket_path = os.path.join(tmpdirname, "panosifier.sock")
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.bind(socket_path)
+            sock.listen(1)
+            # the socket is owned by another user
+            monkeypatch.setattr(server, "get_user_id", lambda: os.getuid() + 1)
+            assert server.forward_run(["--weight", "8", "Font.ttf"], socket_path) is None
+            captured = capsys.readouterr()
+            assert "[WARNING]" in captured.err
+            # the command was not sent
+            sock.settimeout(0.1)
+            with pytest.raises(socket.timeout):
+                sock.accept()
+
+        # files that are not sockets
+        font_path = os.path.join(tmpdirname, TEST_FONT_NAME)
+        shutil.copyfile(get_test_font_path(), font_path)
+        assert not server.is_user_socket(font_path)
+
+
+def test_forward_run_server_error_after_request(capsys):
+    # a server that reads the request and closes the connection without a
+    # response
+    with tempfile.TemporaryDirectory() as tmpdirname:
+        socket_path = os.path.join(tmpdirname, "panosifier.sock")
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.bind(socket_path)
+            sock.listen(1)
+
+            def accept_and_close():
+                conn, _ = sock.accept()
+                with conn:
+                    server.read_message(conn)
+
+            thread = threading.Thread(target=accept_and_close)
+            thread.start()
+            try:
+                exit_code = server.forward_run(["--weight", "8", "Font.ttf"], socket_path)
+            finally:
+                thread.join()
+        assert exit_code == 1
+        captured = capsys.readouterr()
+        assert "did not return a valid response" in captured.err
+
+
+def test_forwarded_environment_variables():
+    from panosifier import __main__, index
+
+    assert __main__.CACHE_ENVIRONMENT_VARIABLE in server.FORWARDED_ENVIRONMENT_VARIABLES
+    assert index.INDEX_ENVIRONMENT_VARIABLE in server.FORWARDED_ENVIRONMENT_VARIABLES
+
+
+def test_forward_run_index_environment_variable(capsys, monkeypatch):
+    with tempfile.TemporaryDirectory() as tmpdirname:
+        socket_path = os.path.join(tmpdirname, "panosifier.sock")
+        font_dir = os.path.join(tmpdirname, "fonts")
+        os.mkdir(font_dir)
+        shutil.copyfile(get_test_font_path(), os.path.join(font_dir, TEST_FONT_NAME))
+        index_path = os.path.join(tmpdirname, "index", "fonts.sqlite")
+        os.mkdir(os.path.dirname(index_path))
+
+        panosifier_server = server.PanosifierServer(socket_path)
+        thread = threading.Thread(target=panosifier_server.serve_forever)
+        thread.start()
+        try:
+            for _ in range(100):
+                if os.path.exists(socket_path):
+                    break
+                time.sleep(0.05)
+            monkeypatch.chdir(tmpdirname)
+            monkeypatch.setenv("PANOSIFIER_INDEX", index_path)
+            exit_code = server.forward_run(["index", "update", "fonts"], socket_path)
+            assert exit_code == 0
+            assert "1 updated" in capsys.readouterr().out
+        finally:
+            server.request({"command": "shutdown"}, socket_path)
+            thread.join()
+        assert os.path.exists(index_path)
+        assert not os.path.exists(os.path.join(tmpdirname, ".panosifier-index"))
+
+
+def test_main_forwards_to_running_server(capsys, monkeypatch):
+    with tempfile.TemporaryDirectory() as tmpdirname:
+        socket_path = os.path.join(tmpdirname, "panosifier.sock")
+        dest_path = os.path.join(tmpdirname, TEST_FONT_NAME)
+        shutil.copyfile(get_test_font_path(), dest_path)
+        monkeypatch.setenv("PANOSIFIER_SOCKET", socket_path)
+        monkeypatch.delenv("PANOSIFIER_NO_SERVER", raising=False)
+        monkeypatch.setattr(sys, "argv", ["panosifier", "--weight", "8", dest_path])
+
+        panosifier_server = server.PanosifierServer(socket_path)
+        thread = threading.Thread(target=panosifier_server.serve_forever)
+        thread.start()
+        try:
+            for _ in range(100):
+                if os.path.exists(socket_path):
+                    break
+                time.sleep(0.05)
+            with pytest.raises(SystemExit) as e:
+                __main__.main()
+            assert e.value.code == 0
+            assert "1 changed, 0 unchanged" in capsys.readouterr().out
+        finally:
+            server.request({"command": "shutdown"}, socket_path)
+            thread.join()
+
+
+@pytest.mark.parametrize(
+    "argv, socket_exists",
+    [
+        (["--weight", "8", "bogus.ttf"], False),
+        (["--version"], True),
+        (["--help"], True),
+        (["query", "--help"], True),
+    ],
+)
+def test_main_does_not_import_server(argv, socket_exists):
+    with tempfile.TemporaryDirectory() as tmpdirname:
+        socket_path = os.path.join(tmpdirname, "panosifier.sock")
+        if socket_exists:
+            open(socket_path, "w").close()
+        code = (
+            "import sys\n"
+            f"sys.argv = ['panosifier'] + {argv!r}\n"
+            "from panosifier.__main__ import main\n"
+            "try:\n"
+            "    main()\n"
+            "except SystemExit:\n"
+            "    pass\n"
+            "assert 'panosifier.server' not in sys.modules\n"
+        )
+        env = dict(os.environ, PANOSIFIER_SOCKET=socket_path)
+        env.pop("PANOSIFIER_NO_SERVER", None)
+        subprocess.run(
+            [sys.executable, "-c", code],
+            check=True,
+            env=env,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
@@ -0,0 +1,85 @@
+import io
+import os
+import struct
+
+import pytest
+from fontTools.ttLib import TTFont
+
+from panosifier import sfnt
+
+
+def get_test_font_path():
+    return os.path.join("tests", "testfiles", "fonts", "NotoSans-Regular.subset.ttf")
+
+
+def get_test_font_bytes():
+    with open(get_test_font_path(), "rb") as f:
+        return bytearray(f.read())
+
+
+def test_calc_checksum():
+    assert sfnt.calc_checksum(b"") == 0
+    assert sfnt.calc_checksum(b"\x00\x00\x00\x01") == 1
+    # data are zero padded to a 4 byte boundary
+    assert sfnt.calc_checksum(b"\x01") == 0x01000000
+    # sum is truncated to uint32
+    assert sfnt.calc_checksum(b"\xff\xff\xff\xff\x00\x00\x00\x02") == 1
+
+
+def test_read_table_directory():
+    tables = sfnt.read_table_directory(get_test_font_bytes())
+    assert "OS/2" in tables
+    assert "head" in tables
+    os2 = tables["OS/2"]
+    assert os2.offset == 648
+    assert os2.length == 96
+    assert os2.checksum == 1760103542
+
+
+def test_read_table_directory_unsupported_format():
+    with pytest.raises(sfnt.UnsupportedFormatError):
+        sfnt.read_table_directory(b"wOFF" + b"\0" * 40)
+
+    with pytest.raises(sfnt.UnsupportedFormatError):
+        sfnt.read_table_directory(b"\0\1")
+
+
+def test_read_panose_bytes():
+    assert sfnt.read_panose_bytes(get_test_font_bytes()) == bytes(
+        [2, 11, 5, 2, 4, 5, 4, 2, 2, 4]
+    )
+
+
+def test_write_panose_bytes():
+    buf = get_test_font_bytes()
+    sfnt.write_panose_bytes(buf, bytes(range(1, 11)))
+    assert sfnt.read_panose_bytes(buf) == bytes(range(1, 11))
+
+    tables = sfnt.read_table_directory(buf)
+    os2 = tables["OS/2"]
+    head = tables["head"]
+    # incrementally updated table checksum matches the full table checksum
+    assert os2.checksum == sfnt.calc_checksum(buf[os2.offset : os2.offset + os2.length])
+
+    # incrementally updated checkSumAdjustment matches a full file checksum
+    adj_offset = head.offset + sfnt.HEAD_CHECKSUM_ADJUSTMENT_OFFSET
+    (adjustment,) = struct.unpack_from(">L", buf, adj_offset)
+    zeroed = bytearray(buf)
+    zeroed[adj_offset : adj_offset + 4] = b"\0\0\0\0"
+    assert adjustment == (sfnt.CHECKSUM_MAGIC - sfnt.calc_checksum(zeroed)) & 0xFFFFFFFF
+
+    # fontTools reads the edited font
+    tt = TTFont(io.BytesIO(bytes(buf)))
+    assert tt["OS/2"].panose.bFamilyType == 1
+    assert tt["OS/2"].panose.bXHeight == 10
+
+
+def test_write_panose_bytes_invalid_length():
+    with pytest.raises(ValueError):
+        sfnt.write_panose_bytes(get_test_font_bytes(), bytes(range(1, 10)))
+
+
+def test_read_collection_face_offsets():
+    with open(get_test_font_path(), "rb") as f:
+        with pytest.raises(sfnt.UnsupportedFormatError):
+            sfnt.read_collection_face_offsets(f)
@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+
+import json
+import os
+import tempfile
+
+from panosifier import timing
+
+
+def test_timer_records_phase_spans():
+    timer = timing.Timer()
+    with timer.phase("outer"):
+        with timer.phase("inner"):
+            pass
+    assert [span.name for span in timer.spans] == ["inner", "outer"]
+    assert timer.spans[1].duration >= timer.spans[0].duration
+    assert timer.spans[0].pid == os.getpid()
+
+
+def test_null_timer_does_not_record_spans():
+    with timing.NULL_TIMER.phase("read"):
+        pass
+    assert timing.NULL_TIMER.spans == []
+
+
+def test_percentile():
+    values = [float(i) for i in range(1, 101)]
+    assert timing.percentile(values, 50) == 50.0
+    assert timing.percentile(values, 95) == 95.0
+    assert timing.percentile([3.0], 95) == 3.0
+
+
+def test_summarize_spans():
+    spans = [timing.Span("read", 0.0, float(i), 1) for i in range(1, 21)]
+    spans.append(timing.Span("write", 0.0, 2.0, 1))
+    summaries = timing.summarize_spans(spans)
+    assert summaries == [
+        timing.PhaseSummary("read", 20, 210.0, 10.0, 19.0),
+        timing.PhaseSummary("write", 1, 2.0, 2.0, 2.0),
+    ]
+
+
+def test_write_chrome_trace():
+    with tempfile.TemporaryDirectory() as tmpdirname:
+        trace_path = os.path.join(tmpdirname, "trace.json")
+        timing.write_chrome_trace(
+            trace_path, [("font.ttf", timing.Span("read", 1.5, 0.25, 42))]
+        )
+        with open(trace_path) as f:
+            trace = json.load(f)
+    assert trace["traceEvents"] == [
+        {
+            "name": "read",
+            "cat": "panosifier",
+            "ph": "X",
+            "ts": 1500000.0,
+            "dur": 250000.0,
+            "pid": 42,
+            "tid": 42,
+            "args": {"path": "font.ttf"},
+        }
+    ]
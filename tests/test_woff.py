@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+
+import os
+import shutil
+import tempfile
+
+import pytest
+from fontTools.ttLib import TTFont
+from fontTools.ttLib.sfnt import WOFFFlavorData
+
+from panosifier import woff
+from panosifier.datastructures import Panose
+from panosifier.edit import edit_font, verify_font_panose
+from panosifier.sfnt import UnsupportedFormatError
+
+TEST_FONT_NAME = "NotoSans-Regular.subset.ttf"
+PANOSE = Panose.from_comma_delim_string("1,2,3,4,5,6,7,8,9,10")
+METADATA = b"<?xml version='1.0' encoding='UTF-8'?><metadata version='1.0'/>"
+
+
+def get_test_font_path():
+    return os.path.join("tests", "testfiles", "fonts", TEST_FONT_NAME)
+
+
+def write_woff_font(fontpath, flavor, flavor_data=None):
+    # tables are compiled by fontTools so that the fontTools engine writes
+    # identical table data
+    tt = TTFont(get_test_font_path(), recalcTimestamp=False)
+    for tag in tt.keys():
+        tt[tag]
+    tt.flavor = flavor
+    if flavor_data is not None:
+        flavor_data.metaData = METADATA
+        flavor_data.privData = b"private data"
+        tt.flavorData = flavor_data
+    tt.save(fontpath)
+
+
+def assert_engines_write_identical_tables(tmpdirname, flavor, flavor_data=None):
+    source_path = os.path.join(tmpdirname, f"source.{flavor}")
+    fast_path = os.path.join(tmpdirname, f"fast.{flavor}")
+    fonttools_path = os.path.join(tmpdirname, f"fonttools.{flavor}")
+    write_woff_font(source_path, flavor, flavor_data)
+    shutil.copyfile(source_path, fast_path)
+    shutil.copyfile(source_path, fonttools_path)
+
+    assert edit_font(fast_path, PANOSE, "fast").changed
+    assert edit_font(fonttools_path, PANOSE, "fonttools").changed
+    verify_font_panose(fast_path, PANOSE.to_bytes())
+
+    tt_source = TTFont(source_path)
+    tt_fast = TTFont(fast_path, checkChecksums=2)
+    tt_fonttools = TTFont(fonttools_path)
+    assert tt_fast.flavor == flavor
+    assert tt_fast["OS/2"].panose.bWeight == 3
+    for tag in tt_source.reader.keys():
+        # the OS/2 panose data and head.checkSumAdjustment are edited
+        assert tt_fast.reader[tag] == tt_fonttools.reader[tag]
+        if tag not in ("OS/2", "head"):
+            assert tt_fast.reader[tag] == tt_source.reader[tag]
+    return tt_fast
+
+
+def test_edit_woff_reuses_compressed_table_data():
+    with tempfile.TemporaryDirectory() as tmpdirname:
+        tt_fast = assert_engines_write_identical_tables(
+            tmpdirname, "woff", WOFFFlavorData()
+        )
+        assert tt_fast.flavorData.metaData == METADATA
+        assert tt_fast.flavorData.privData == b"private data"
+
+        source_path = os.path.join(tmpdirname, "source.woff")
+        fast_path = os.path.join(tmpdirname, "fast.woff")
+        with open(source_path, "rb") as source_file, open(fast_path, "rb") as fast_file:
+            source = woff.WoffFont(source_file)
+            fast = woff.WoffFont(fast_file)
+            for source_entry, fast_entry in zip(source.entries, fast.entries):
+                if source_entry.tag in ("OS/2", "head"):
+                    continue
+                # compressed table data are copied
+                source_file.seek(source_entry.offset)
+                fast_file.seek(fast_entry.offset)
+                assert source_file.read(source_entry.comp_length) == fast_file.read(
+                    fast_entry.comp_length
+                )
+
+
+def test_edit_woff2_reuses_transformed_table_data():
+    pytest.importorskip("brotli")
+    from fontTools.ttLib.woff2 import WOFF2FlavorData
+
+    with tempfile.TemporaryDirectory() as tmpdirname:
+        tt_fast = assert_engines_write_identical_tables(
+            tmpdirname, "woff2", WOFF2FlavorData()
+        )
+        assert tt_fast.flavorData.metaData == METADATA
+        assert tt_fast.flavorData.privData == b"private data"
+
+        source_path = os.path.join(tmpdirname, "source.woff2")
+        fast_path = os.path.join(tmpdirname, "fast.woff2")
+        with open(source_path, "rb") as source_file, open(fast_path, "rb") as fast_file:
+            source = woff.Woff2Font(source_file)
+            fast = woff.Woff2Font(fast_file)
+        assert fast.directory == source.directory
+        # the table data stream differs in the OS/2 panose data and
+        # head.checkSumAdjustment only
+        differences = [
+            i for i, (a, b) in enumerate(zip(source.stream, fast.stream)) if a != b
+        ]
+        assert len(source.stream) == len(fast.stream)
+        assert all(
+            source.os2_offset + 32 <= i < source.os2_offset + 42
+            or source.head_offset + 8 <= i < source.head_offset + 12
+            for i in differences
+        )
+
+
+def test_edit_woff_unchanged_and_dry_run():
+    with tempfile.TemporaryDirectory() as tmpdirname:
+        fontpath = os.path.join(tmpdirname, "font.woff")
+        write_woff_font(fontpath, "woff")
+        with open(fontpath, "rb") as f:
+            source_bytes = f.read()
+
+        font_edit = edit_font(fontpath, Panose(weight=5))
+        assert not font_edit.changed
+        font_edit = edit_font(fontpath, Panose(weight=8), dry_run=True)
+        assert font_edit.changed
+        with open(fontpath, "rb") as f:
+            assert f.read() == source_bytes
+
+
+def test_edit_woff_output_path():
+    with tempfile.TemporaryDirectory() as tmpdirname:
+        fontpath = os.path.join(tmpdirname, "font.woff")
+        output_path = os.path.join(tmpdirname, "output.woff")
+        write_woff_font(fontpath, "woff")
+        with open(fontpath, "rb") as f:
+            source_bytes = f.read()
+
+        edit_font(fontpath, Panose(weight=8), output_path=output_path)
+        with open(fontpath, "rb") as f:
+            assert f.read() == source_bytes
+        assert TTFont(output_path)["OS/2"].panose.bWeight == 8
+        # temporary files are removed
+        assert sorted(os.listdir(tmpdirname)) == ["font.woff", "output.woff"]
+
+
+def test_read_woff_font_unsupported_format():
+    with open(get_test_font_path(), "rb") as f:
+        with pytest.raises(UnsupportedFormatError):
+            woff.read_woff_font(f)
+
+
+def test_read_uint_base128():
+    assert woff._read_uint_base128(bytes([0x3F]), 0) == (63, 1)
+    assert woff._read_uint_base128(bytes([0x81, 0x00, 0x7F]), 0) == (128, 2)
+    with pytest.raises(ValueError):
+        # leading zeros
+        woff._read_uint_base128(bytes([0x80, 0x01]), 0)
+    with pytest.raises(ValueError):
+        # more than 5 bytes
+        woff._read_uint_base128(bytes([0x81] * 6), 0)